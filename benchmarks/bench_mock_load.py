@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+モックのollamaサーバーに対する同時ストリーミング応答の負荷を計測するスクリプト。
+
+src.mock_ollamaのサーバーを起動し、OllamaClient.chat_streamを複数のスレッドから同時に実行して、
+最初のトークンまでの時間（p50、p95）、リクエストの所要時間、全体のトークン数/秒、エラーの数を表示します。
+生成速度やエラーの発生率はサーバーの設定で決まり、--seedを指定すると同じ条件で繰り返し計測できます。
+ollamaサーバーとGPUは不要です。
+
+--hostを指定すると、起動済みのサーバー（例: python -m src.mock_ollama や実際のollama）に対して計測します。
+
+使い方:
+    python benchmarks/bench_mock_load.py [--requests N] [--concurrency N ...] [--tokens-per-second N] [--seed N]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.mock_ollama import MockOllamaServer  # noqa: E402
+from src.ollama_client import OllamaClient  # noqa: E402
+
+
+def percentile(values, fraction):
+    """
+    値のリストの百分位数を返します（値がない場合は0）。
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_load(host, model, total_requests, concurrency):
+    """
+    concurrency個のスレッドでtotal_requests件のチャットを実行します。
+
+    Returns:
+        dict: 最初のトークンまでの時間と所要時間のリスト、トークン数、エラー数、経過時間
+    """
+    client = OllamaClient(host=host, pool_maxsize=concurrency)
+    lock = threading.Lock()
+    remaining = [total_requests]
+    result = {"ttft": [], "latency": [], "tokens": 0, "errors": 0}
+
+    def worker():
+        while True:
+            with lock:
+                if remaining[0] == 0:
+                    return
+                remaining[0] -= 1
+                index = remaining[0]
+            started = time.perf_counter()
+            first_token = []
+
+            def on_chunk(content):
+                if content and not first_token:
+                    first_token.append(time.perf_counter() - started)
+
+            try:
+                final = None
+                for chunk in client.chat_stream(model, [{"role": "user", "content": f"質問{index}"}], callback=on_chunk):
+                    final = chunk
+                with lock:
+                    result["ttft"].extend(first_token)
+                    result["latency"].append(time.perf_counter() - started)
+                    result["tokens"] += final.get("eval_count", 0) if final else 0
+            except Exception:
+                with lock:
+                    result["errors"] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    result["elapsed"] = time.perf_counter() - started
+    client.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", help="計測するollamaサーバーのURL（省略時はモックのサーバーを起動）")
+    parser.add_argument("--model", default="llama2", help="使用するモデル名")
+    parser.add_argument("--requests", type=int, default=64, help="同時実行数ごとのリクエスト数")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64], help="同時実行数")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="モックのサーバーの1秒あたりのトークン数")
+    parser.add_argument("--first-token-delay", type=float, default=0.05, help="モックのサーバーの最初のトークンまでの秒数")
+    parser.add_argument("--response-tokens", type=int, default=32, help="モックのサーバーの応答のトークン数")
+    parser.add_argument("--num-parallel", type=int, default=4, help="モックのサーバーのモデルごとの同時生成数")
+    parser.add_argument("--jitter", type=float, default=0.0, help="モックのサーバーの待ち時間のゆらぎの割合")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="モックのサーバーがエラーを返す割合")
+    parser.add_argument("--seed", type=int, default=0, help="モックのサーバーの乱数のシード")
+    args = parser.parse_args()
+
+    server = None
+    host = args.host
+    if host is None:
+        server = MockOllamaServer(
+            tokens_per_second=args.tokens_per_second,
+            first_token_delay=args.first_token_delay,
+            response_tokens=args.response_tokens,
+            num_parallel=args.num_parallel,
+            jitter=args.jitter,
+            error_rate=args.error_rate,
+            seed=args.seed,
+        ).start()
+        host = server.url
+
+    try:
+        print(f"ollamaサーバー: {host}")
+        print(
+            f"{'concurrency':>11} {'ttft p50 (ms)':>14} {'ttft p95 (ms)':>14} {'latency p95 (ms)':>17} "
+            f"{'tokens/s':>9} {'errors':>7}"
+        )
+        for concurrency in args.concurrency:
+            result = run_load(host, args.model, args.requests, concurrency)
+            print(
+                f"{concurrency:>11} {percentile(result['ttft'], 0.5) * 1000:>14.1f} "
+                f"{percentile(result['ttft'], 0.95) * 1000:>14.1f} {percentile(result['latency'], 0.95) * 1000:>17.1f} "
+                f"{result['tokens'] / result['elapsed']:>9.1f} {result['errors']:>7}"
+            )
+    finally:
+        if server is not None:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
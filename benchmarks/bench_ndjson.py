@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+ストリーミング応答（NDJSON）の解析の時間を計測するスクリプト。
+
+以前のchat_streamのループ（iter_lines、行ごとのdecode、json.loads）と、
+src.ndjsonによる解析（iter_content(STREAM_CHUNK_SIZE)、バイト列のまま解析）を比較します。
+ollamaサーバーは不要です。
+
+記録したストリームを使用する場合は、次のように保存したファイルを指定します:
+    curl -N http://localhost:11434/api/chat -d '{"model": "llama2", "messages": [...]}' > stream.ndjson
+
+使い方:
+    python benchmarks/bench_ndjson.py [--tokens N ...] [--repeat N] [--stdlib] [stream.ndjson ...]
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import src.ndjson  # noqa: E402
+from src.ndjson import STREAM_CHUNK_SIZE, iter_chat_chunks  # noqa: E402
+
+
+def make_stream(token_count):
+    """
+    ollamaの /api/chat と同じ形式のストリーミング応答を作成します。
+
+    Args:
+        token_count: トークン数
+
+    Returns:
+        bytes: NDJSONのバイト列
+    """
+    words = ["こんにちは", "、", "今日は", "Python", "の", "話", "を", "しましょう", "。", "\n"]
+    lines = []
+    for i in range(token_count):
+        lines.append(
+            {
+                "model": "llama2:latest",
+                "created_at": "2024-01-01T00:00:00.000000Z",
+                "message": {"role": "assistant", "content": words[i % len(words)]},
+                "done": False,
+            }
+        )
+    lines.append(
+        {
+            "model": "llama2:latest",
+            "created_at": "2024-01-01T00:00:10.000000Z",
+            "message": {"role": "assistant", "content": ""},
+            "done_reason": "stop",
+            "done": True,
+            "total_duration": 10000000000,
+            "load_duration": 1000000,
+            "prompt_eval_count": 26,
+            "prompt_eval_duration": 100000000,
+            "eval_count": token_count,
+            "eval_duration": 9000000000,
+        }
+    )
+    return b"".join(json.dumps(line, ensure_ascii=False).encode("utf-8") + b"\n" for line in lines)
+
+
+def make_response(data):
+    """
+    バイト列を本文とするrequestsのレスポンスを作成します。
+    """
+    response = requests.Response()
+    response.status_code = 200
+    response.raw = io.BytesIO(data)
+    return response
+
+
+def parse_before(data):
+    """
+    以前のchat_streamと同じループで解析し、本文を結合します。
+    """
+    parts = []
+    for line in make_response(data).iter_lines():
+        if line:
+            line_str = line.decode("utf-8")
+            try:
+                json_obj = json.loads(line_str)
+                if "message" in json_obj and "content" in json_obj["message"]:
+                    parts.append(json_obj["message"]["content"])
+                    if json_obj.get("done", False):
+                        break
+            except json.JSONDecodeError:
+                pass
+    return "".join(parts)
+
+
+def parse_after(data):
+    """
+    src.ndjsonで解析し、本文を結合します。
+    """
+    parts = []
+    for content, done, _ in iter_chat_chunks(make_response(data).iter_content(chunk_size=STREAM_CHUNK_SIZE)):
+        parts.append(content)
+        if done:
+            break
+    return "".join(parts)
+
+
+def measure(parse, data, repeat):
+    """
+    解析にかかる最短の時間を計測します。
+
+    Returns:
+        tuple: (結果の文字列, 秒数)
+    """
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = parse(data)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("streams", nargs="*", help="記録したストリーミング応答のファイル")
+    parser.add_argument("--tokens", type=int, nargs="+", default=[1000, 10000, 100000], help="作成する応答のトークン数")
+    parser.add_argument("--repeat", type=int, default=5, help="計測の繰り返し回数")
+    parser.add_argument(
+        "--stdlib", action="store_true", help="orjsonなどがインストールされていても標準のjsonモジュールを使用する"
+    )
+    args = parser.parse_args()
+
+    if args.stdlib:
+        src.ndjson.JSON_BACKEND = "json"
+        src.ndjson.loads = src.ndjson.loads_stdlib
+        src.ndjson.DecodeError = (json.JSONDecodeError, UnicodeDecodeError)
+
+    inputs = []
+    for path in args.streams:
+        with open(path, "rb") as f:
+            inputs.append((os.path.basename(path), f.read()))
+    if not inputs:
+        inputs = [(f"{tokens} tokens", make_stream(tokens)) for tokens in args.tokens]
+
+    print(f"JSONライブラリ: {src.ndjson.JSON_BACKEND}")
+    print(f"{'stream':>16} {'before (ms)':>12} {'after (ms)':>11} {'speedup':>8}")
+    for name, data in inputs:
+        before, before_time = measure(parse_before, data, args.repeat)
+        after, after_time = measure(parse_after, data, args.repeat)
+        assert before == after
+        print(f"{name:>16} {before_time * 1000:>12.1f} {after_time * 1000:>11.1f} {before_time / after_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
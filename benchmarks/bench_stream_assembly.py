@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+ストリーミング応答の組み立ての時間とピークメモリを計測するスクリプト。
+
+chat_streamの応答（NDJSON）をメモリ上で生成し、以前の文字列連結（full_content +=）による
+組み立てと、現在のOllamaClient.chat_streamによる組み立てを比較します。ollamaサーバーは不要です。
+
+使い方:
+    python benchmarks/bench_stream_assembly.py [トークン数 ...]
+"""
+
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.ollama_client import OllamaClient  # noqa: E402
+
+DEFAULT_TOKEN_COUNTS = [10000, 50000, 100000]
+
+
+class FakeStreamResponse:
+    """
+    requestsのストリーミング応答の代わりに、用意したNDJSONの行を受信したバイト列として返すクラス。
+    """
+
+    def __init__(self, lines):
+        self.lines = lines
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size=1):
+        buffer = bytearray()
+        for line in self.lines:
+            buffer += line + b"\n"
+            while len(buffer) >= chunk_size:
+                yield bytes(buffer[:chunk_size])
+                del buffer[:chunk_size]
+        if buffer:
+            yield bytes(buffer)
+
+    def close(self):
+        pass
+
+
+def make_lines(token_count):
+    """
+    トークン数分のチャンクと完了を示す行を作成します。
+
+    Args:
+        token_count: トークン数
+
+    Returns:
+        list: NDJSONの各行（bytes）
+    """
+    lines = [
+        json.dumps({"message": {"role": "assistant", "content": f"tok{i % 97} "}, "done": False}).encode("utf-8")
+        for i in range(token_count)
+    ]
+    lines.append(json.dumps({"message": {"role": "assistant", "content": ""}, "done": True}).encode("utf-8"))
+    return lines
+
+
+def assemble_before(lines):
+    """
+    以前の実装と同じく、chat_streamとhandle_messageの両方で文字列を連結して応答を組み立てます。
+    """
+    full_content = ""
+    app_content = ""
+    for line in lines:
+        json_obj = json.loads(line.decode("utf-8"))
+        content = json_obj["message"]["content"]
+        full_content += content
+        if json_obj.get("done", False):
+            json_obj["message"]["content"] = full_content
+            return json_obj["message"]["content"]
+        app_content += content
+    return full_content
+
+
+def assemble_after(lines):
+    """
+    現在のOllamaClient.chat_streamで応答を組み立てます。
+    """
+    client = OllamaClient(gpu_backend="none")
+    client.session.post = lambda *args, **kwargs: FakeStreamResponse(lines)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for chunk in client.chat_stream("bench", [], callback=lambda content: None):
+            if chunk.get("done", False):
+                return chunk["message"]["content"]
+    return ""
+
+
+def measure(assemble, lines):
+    """
+    組み立てにかかる時間とピークメモリを計測します。
+
+    Returns:
+        tuple: (結果の文字列, 秒数, ピークメモリのバイト数)
+    """
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = assemble(lines)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main(token_counts):
+    print(f"{'tokens':>8} {'impl':>7} {'time (ms)':>10} {'peak (KiB)':>11}")
+    for token_count in token_counts:
+        lines = make_lines(token_count)
+        before, before_time, before_peak = measure(assemble_before, lines)
+        after, after_time, after_peak = measure(assemble_after, lines)
+        assert before == after
+        print(f"{token_count:>8} {'before':>7} {before_time * 1000:>10.1f} {before_peak / 1024:>11.1f}")
+        print(f"{token_count:>8} {'after':>7} {after_time * 1000:>10.1f} {after_peak / 1024:>11.1f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_TOKEN_COUNTS)
@@ -16,10 +16,24 @@ setup(
         "requests>=2.31.0,<3.0.0",  # requestsの依存関係を明示
     ],
     extras_require={
+        "async": [
+            "aiohttp>=3.8.0,<4.0.0",  # 非同期モード（APP_MODE=async）用
+        ],
+        "fast": [
+            "orjson>=3.8.0",  # ストリーミング応答の高速なJSON解析用（msgspecも利用可能）
+        ],
+        "semantic": [
+            "numpy>=1.22.0",  # 意味の近い質問の応答キャッシュ（SEMANTIC_CACHE）のベクトル検索用
+        ],
+        "nvml": [
+            "nvidia-ml-py>=12.0.0",  # NVMLによるGPU情報の取得用
+        ],
         "test": [
             "pytest>=7.0.0,<8.0.0",
             "pytest-cov>=4.0.0,<5.0.0",  # カバレッジレポート用
             "requests-mock>=1.11.0,<2.0.0",  # HTTPリクエストのモック用
+            "aiohttp>=3.8.0,<4.0.0",  # 非同期クライアントのテスト用
+            "numpy>=1.22.0",  # 意味の近い質問の応答キャッシュのテスト用
         ],
         "dev": [
             "black>=23.0.0,<24.0.0",  # コードフォーマット用
@@ -7,28 +7,231 @@ LLMチャットWebアプリケーションのメインモジュール。
 チャットインターフェースを提供します。
 """
 
+import atexit
+import logging
 import os
-from flask import Flask, render_template, request, jsonify
-from flask_socketio import SocketIO
+import secrets
+import uuid
+from flask import Flask, Response, render_template, request, jsonify, send_file, session
+from flask_socketio import SocketIO, join_room, leave_room
+from src.batch_jobs import BatchRunner
 from src.chat_session import ChatSession
+from src.chunk_coalescer import ChunkCoalescer
+from src.conversation_store import create_conversation_store, parse_page_params
+from src.emit_stats import EmitStats, EmitStatsManager, MeasuredPacket, take_encoded_size
+from src.log_utils import configure_logging
+from src.metrics import (
+    CONTENT_TYPE,
+    EMIT_DURATION,
+    GENERATIONS,
+    QUEUE_WAIT,
+    REGISTRY,
+    GenerationTimer,
+    update_scheduler_gauges,
+)
+from src.model_params import DEFAULT_MODEL_PARAMS, apply_model_params, to_ollama_options
+from src.model_warmup import KeepAlivePolicy, ModelWarmer, parse_keep_alive, parse_model_keep_alive
 from src.ollama_client import OllamaClient
+from src.ollama_pool import OllamaPool, normalize_model_name
+from src.response_cache import ResponseCache
+from src.scheduler import GenerationScheduler, QueueFull, parse_model_limits
+from src.semantic_cache import SemanticCache
+from src.session_manager import SessionManager
+from src.system_monitor import SystemMonitor
 
-app = Flask(__name__)
-app.config["SECRET_KEY"] = "your-secret-key"
-socketio = SocketIO(app)
+logger = logging.getLogger(__name__)
 
-# チャットセッションの初期化
-chat_session = ChatSession()
+app = Flask(__name__)
+# 未設定の場合は起動ごとにランダムな鍵を生成する（再起動すると既存のセッションCookieは無効になる）
+app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY") or secrets.token_hex(32)
+# Socket.IOの送信量の計測（エンコード済みのパケットとルームの参加者数から集計する）
+emit_stats = EmitStats()
+socketio = SocketIO(app, client_manager=EmitStatsManager(emit_stats), serializer=MeasuredPacket)
 
 # ollamaクライアントの初期化
 ollama_host = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
-ollama_client = OllamaClient(host=ollama_host)
+# 複数のollamaサーバーに負荷を分散する場合はカンマ区切りで指定する
+ollama_hosts = [host.strip() for host in os.environ.get("OLLAMA_HOSTS", "").split(",") if host.strip()]
+# temperatureが0のチャットの応答を、同じリクエストに対してollamaを呼ばずに返すキャッシュ（既定では無効）
+response_cache = (
+    ResponseCache(
+        memory_max_bytes=int(os.environ.get("RESPONSE_CACHE_MEMORY_BYTES", 64 * 1024 * 1024)),
+        disk_dir=os.environ.get("RESPONSE_CACHE_DIR") or None,
+        disk_max_bytes=int(os.environ.get("RESPONSE_CACHE_DISK_BYTES", 1024 * 1024 * 1024)),
+        ttl=float(os.environ.get("RESPONSE_CACHE_TTL", 86400.0)),
+    )
+    if os.environ.get("RESPONSE_CACHE", "false").lower() == "true"
+    else None
+)
+# 意味の近い質問に対して生成を行わずに応答を返すキャッシュ（既定では無効、NumPyが必要）
+semantic_cache = (
+    SemanticCache(
+        os.environ.get("SEMANTIC_CACHE_EMBED_MODEL", "nomic-embed-text"),
+        threshold=float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", 0.95)),
+        max_entries=int(os.environ.get("SEMANTIC_CACHE_MAX_ENTRIES", 1000)),
+        ttl=float(os.environ.get("SEMANTIC_CACHE_TTL", 86400.0)),
+    )
+    if os.environ.get("SEMANTIC_CACHE", "false").lower() == "true"
+    else None
+)
+ollama_client_options = dict(
+    pool_maxsize=int(os.environ.get("OLLAMA_POOL_MAXSIZE", 10)),
+    connect_timeout=float(os.environ.get("OLLAMA_CONNECT_TIMEOUT", 5.0)),
+    read_timeout=float(os.environ.get("OLLAMA_READ_TIMEOUT", 300.0)),
+    gpu_backend=os.environ.get("GPU_TELEMETRY_BACKEND", "auto"),
+    models_cache_ttl=float(os.environ.get("MODELS_CACHE_TTL", 30.0)),
+    model_info_cache_ttl=float(os.environ.get("MODEL_INFO_CACHE_TTL", 300.0)),
+    cache_stale_ttl=float(os.environ.get("CACHE_STALE_TTL", 300.0)),
+    capability_ttl=float(os.environ.get("CAPABILITY_TTL", 300.0)),
+    response_cache=response_cache,
+    semantic_cache=semantic_cache,
+)
+if ollama_hosts:
+    ollama_client = OllamaPool(
+        ollama_hosts,
+        failure_threshold=int(os.environ.get("OLLAMA_POOL_FAILURE_THRESHOLD", 3)),
+        eject_seconds=float(os.environ.get("OLLAMA_POOL_EJECT_SECONDS", 30.0)),
+        **ollama_client_options,
+    )
+else:
+    ollama_client = OllamaClient(host=ollama_host, **ollama_client_options)
+
+# 会話の履歴の保存先（再起動後もクライアントの最後の会話を復元する）
+conversation_store = create_conversation_store(
+    os.environ.get("CONVERSATION_STORE", "sqlite").lower(), os.environ.get("CONVERSATION_DB", "conversations.db")
+)
+atexit.register(conversation_store.close)
+
+# クライアントごとのチャットセッションの管理（メモリには直近のメッセージだけを保持する）
+session_manager = SessionManager(
+    max_sessions=int(os.environ.get("SESSION_MAX_COUNT", 1000)),
+    idle_ttl=float(os.environ.get("SESSION_IDLE_TTL", 3600.0)),
+    default_params=DEFAULT_MODEL_PARAMS,
+    store=conversation_store,
+    max_resident_messages=int(os.environ.get("CONVERSATION_RESIDENT_MESSAGES", 200)),
+)
+
+
+def get_session_id() -> str:
+    """
+    現在のリクエストに対応するセッションIDを取得します。
+
+    CookieのクライアントIDを優先し、CookieがないSocket.IO接続ではsidを使用します。
+    HTTPリクエストでクライアントIDがない場合は新たに発行してCookieに保存します。
+
+    Returns:
+        str: セッションID
+    """
+    client_id = session.get("client_id")
+    if client_id:
+        return client_id
+
+    sid = getattr(request, "sid", None)
+    if sid:
+        return sid
+
+    client_id = uuid.uuid4().hex
+    session["client_id"] = client_id
+    return client_id
+
+
+# モデルごとの同時実行数の制限と、上限を超えたリクエストの待ち行列（同時実行数はollamaサーバー1台あたりの値）
+scheduler = GenerationScheduler(
+    max_concurrent_per_model=int(os.environ.get("GENERATION_MAX_CONCURRENT", 4)),
+    model_limits=parse_model_limits(os.environ.get("GENERATION_MODEL_LIMITS", "")),
+    max_queue=int(os.environ.get("GENERATION_QUEUE_SIZE", 32)),
+    max_queue_per_user=int(os.environ.get("GENERATION_QUEUE_PER_USER", 4)),
+    backends=len(ollama_client.members) if ollama_hosts else 1,
+)
+
+# モデルごとのkeep_aliveと常にメモリにロードしておくモデル、およびモデルの事前ロード
+keep_alive_policy = KeepAlivePolicy(
+    default=parse_keep_alive(os.environ.get("OLLAMA_KEEP_ALIVE")),
+    per_model=parse_model_keep_alive(os.environ.get("MODEL_KEEP_ALIVE", "")),
+    pinned=[name.strip() for name in os.environ.get("PINNED_MODELS", "").split(",") if name.strip()],
+)
+model_warmer = ModelWarmer(
+    lambda model, keep_alive: ollama_client.preload_model(model, keep_alive=keep_alive),
+    keep_alive_policy,
+    retry_interval=float(os.environ.get("PINNED_MODELS_RETRY_INTERVAL", 30.0)),
+)
+preload_on_select = os.environ.get("PRELOAD_ON_SELECT", "true").lower() == "true"
+
+# プロンプトをまとめて実行するバッチジョブ（対話の生成と同じスケジューラでモデルごとの同時実行数を制限する）
+batch_runner = BatchRunner(
+    ollama_client,
+    scheduler,
+    os.environ.get("BATCH_JOB_DIR", "batch_jobs"),
+    max_workers=int(os.environ.get("BATCH_MAX_WORKERS", 8)),
+    default_workers=int(os.environ.get("BATCH_DEFAULT_WORKERS", 2)),
+    keep_alive_policy=keep_alive_policy,
+)
+
+# ストリーミング応答のチャンクをまとめて送信する間隔とバイト数
+stream_flush_interval = float(os.environ.get("STREAM_FLUSH_INTERVAL_MS", 30)) / 1000.0
+stream_flush_max_bytes = int(os.environ.get("STREAM_FLUSH_MAX_BYTES", 1024))
+
+# コンテキスト長のうち応答の生成用に確保する割合（残りを履歴に割り当てる）
+context_response_reserve = float(os.environ.get("CONTEXT_RESPONSE_RESERVE", 0.25))
+
+# 応答の生成に使用するAPI（"chat"は毎回履歴を送信し、"generate"は前回のコンテキストに続けて生成する）
+chat_api_mode = os.environ.get("CHAT_API_MODE", "chat").lower()
+
+
+def emit_to(event: str, data: dict, room: str) -> None:
+    """
+    指定したsidまたはルームにのみイベントを送信し、送信量を記録します。
+
+    Args:
+        event: イベント名
+        data: 送信するデータ
+        room: 送信先のsidまたはルーム名
+    """
+    with EMIT_DURATION.time(event=event):
+        socketio.emit(event, data, to=room)
+    emit_stats.record(event, room, take_encoded_size())
 
-# 現在選択されているモデル
-current_model = None
 
-# モデルパラメータの設定
-model_params = {"temperature": 0.7, "top_p": 0.9, "top_k": 40, "context_length": 4096, "repeat_penalty": 1.1}
+def conditional_jsonify(payload: dict):
+    """
+    内容から算出したETagを付けたJSONレスポンスを作成します。
+
+    リクエストのIf-None-Matchが一致する場合は本文のない304レスポンスを返します。
+
+    Args:
+        payload: レスポンスのデータ
+
+    Returns:
+        Response: JSONレスポンスまたは304レスポンス
+    """
+    response = jsonify(payload)
+    response.add_etag()
+    # ブラウザには毎回ETagで再検証させる
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+
+# 起動中のモデルとGPU情報の購読者が参加するルーム名
+SYSTEM_MONITOR_ROOM = "system_monitor"
+
+# 起動中のモデルとGPU情報を1つのスレッドで取得してキャッシュし、変化があれば購読者に通知する
+system_monitor = SystemMonitor(
+    {
+        # 取得のたびにロードされていない固定モデルの事前ロードを開始する
+        "running_models": lambda: model_warmer.observe(ollama_client.list_running_models()),
+        "gpus": lambda: ollama_client.get_gpu_info(),
+    },
+    interval=float(os.environ.get("SYSTEM_MONITOR_INTERVAL", 1.0)),
+    on_change=lambda changed: emit_to("system_update", changed, SYSTEM_MONITOR_ROOM),
+)
+
+
+@app.before_request
+def ensure_client_id():
+    """
+    HTTPリクエストごとにクライアントIDのCookieが発行されていることを保証します。
+    """
+    get_session_id()
 
 
 @app.route("/")
@@ -47,11 +250,15 @@ def get_models():
     """
     利用可能なモデルの一覧を取得します。
 
+    クエリパラメータ refresh を指定するとキャッシュを破棄して取得し直します。
+
     Returns:
-        Response: モデル情報のJSONレスポンス
+        Response: モデル情報のJSONレスポンス（ETag付き）
     """
+    if request.args.get("refresh"):
+        ollama_client.invalidate_cache()
     models = ollama_client.list_models()
-    return jsonify({"models": models})
+    return conditional_jsonify({"models": models})
 
 
 @app.route("/api/running_models")
@@ -60,10 +267,10 @@ def get_running_models():
     現在起動中のモデルの一覧を取得します。
 
     Returns:
-        Response: 起動中のモデル情報のJSONレスポンス
+        Response: 起動中のモデル情報のJSONレスポンス（ETag付き）
     """
-    models = ollama_client.list_running_models()
-    return jsonify({"models": models})
+    models = system_monitor.get("running_models")
+    return conditional_jsonify({"models": models})
 
 
 @app.route("/api/kill_model", methods=["POST"])
@@ -81,6 +288,10 @@ def kill_model():
         return jsonify({"success": False, "error": "モデルIDが指定されていません"}), 400
 
     success = ollama_client.kill_model(model_id)
+
+    # 起動中のモデルが変化したため、次回の取得で最新の状態を取得する
+    system_monitor.invalidate("running_models")
+
     return jsonify({"success": success})
 
 
@@ -90,10 +301,88 @@ def get_gpu_info():
     GPUの情報と使用率を取得します。
 
     Returns:
-        Response: GPU情報のJSONレスポンス
+        Response: GPU情報のJSONレスポンス（ETag付き）
+    """
+    gpu_info = system_monitor.get("gpus")
+    return conditional_jsonify({"gpus": gpu_info})
+
+
+@app.route("/api/pool_stats")
+def get_pool_stats():
     """
-    gpu_info = ollama_client.get_gpu_info()
-    return jsonify({"gpus": gpu_info})
+    ollamaサーバーへのHTTPコネクションプールの統計情報を取得します。
+
+    Returns:
+        Response: プール統計情報のJSONレスポンス
+    """
+    return jsonify({"stats": ollama_client.get_pool_stats()})
+
+
+@app.route("/api/cache_stats")
+def get_cache_stats():
+    """
+    モデル一覧とモデル情報のキャッシュの統計情報を取得します。
+
+    Returns:
+        Response: キャッシュごとの統計のJSONレスポンス
+    """
+    return jsonify({"stats": ollama_client.get_cache_stats()})
+
+
+@app.route("/api/capabilities")
+def get_capabilities():
+    """
+    ollamaサーバーのバージョンと、操作ごとに使用している取得方法を取得します。
+
+    Returns:
+        Response: バージョンと方法のJSONレスポンス
+    """
+    return jsonify(ollama_client.get_capabilities())
+
+
+@app.route("/api/scheduler_stats")
+def get_scheduler_stats():
+    """
+    モデルごとの実行中の生成と待ち行列の統計情報を取得します。
+
+    Returns:
+        Response: モデル名ごとの統計のJSONレスポンス
+    """
+    return jsonify({"stats": scheduler.stats()})
+
+
+@app.route("/api/warmup_stats")
+def get_warmup_stats():
+    """
+    固定モデルと事前ロードの状態を取得します。
+
+    Returns:
+        Response: 固定モデル、ロード中のモデル、ロードの回数のJSONレスポンス
+    """
+    return jsonify({"stats": model_warmer.stats()})
+
+
+@app.route("/api/emit_stats")
+def get_emit_stats():
+    """
+    Socket.IOの送信量の統計情報を取得します。
+
+    Returns:
+        Response: 合計とイベントごとの送信量のJSONレスポンス（接続のsidは含まない）
+    """
+    return jsonify({"stats": emit_stats.snapshot()})
+
+
+@app.route("/metrics")
+def get_metrics():
+    """
+    応答の生成、待ち行列、Socket.IOの送信、ollamaへのリクエストの所要時間をPrometheusのテキスト形式で取得します。
+
+    Returns:
+        Response: Prometheusのテキスト形式のレスポンス
+    """
+    update_scheduler_gauges(scheduler.stats())
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
 
 
 @app.route("/api/select_model", methods=["POST"])
@@ -110,16 +399,49 @@ def select_model():
     if not model_name:
         return jsonify({"success": False, "error": "モデル名が指定されていません"}), 400
 
-    global current_model
-    current_model = model_name
+    chat_session = session_manager.get(get_session_id())
+    chat_session.model = model_name
 
     # チャットセッションをクリア
     chat_session.clear()
 
+    # 最初のメッセージでロードを待たないように、バックグラウンドでモデルをロードする
+    preloading = False
+    if preload_on_select and data.get("preload", True):
+        preloading = model_warmer.warm(model_name) is not None
+
     # モデル情報を取得
     model_info = ollama_client.get_model_info(model_name)
 
-    return jsonify({"success": True, "model": model_name, "model_info": model_info})
+    return jsonify(
+        {
+            "success": True,
+            "model": model_name,
+            "model_info": model_info,
+            "preloading": preloading,
+            "conversation_id": chat_session.conversation_id,
+        }
+    )
+
+
+@app.route("/api/conversations/<conversation_id>/messages")
+def get_conversation_messages(conversation_id):
+    """
+    会話のメッセージを新しいものから1ページずつ取得します。
+
+    クエリパラメータのbeforeにレスポンスのnext_beforeを指定すると、続きの古いメッセージを取得できます。
+
+    Args:
+        conversation_id: 会話ID
+
+    Returns:
+        Response: メッセージのリスト（古い順）と続きのページの有無のJSONレスポンス
+    """
+    try:
+        before, limit = parse_page_params(request.args.get("before"), request.args.get("limit"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(conversation_store.page(conversation_id, before=before, limit=limit))
 
 
 @app.route("/api/model_params", methods=["GET"])
@@ -130,7 +452,8 @@ def get_model_params():
     Returns:
         Response: モデルパラメータのJSONレスポンス
     """
-    return jsonify({"params": model_params})
+    chat_session = session_manager.get(get_session_id())
+    return jsonify({"params": chat_session.params})
 
 
 @app.route("/api/model_params", methods=["POST"])
@@ -144,30 +467,116 @@ def update_model_params():
     data = request.json
     params = data.get("params", {})
 
-    global model_params
+    chat_session = session_manager.get(get_session_id())
 
     # パラメータの検証と更新
-    if "temperature" in params:
-        temp = float(params["temperature"])
-        model_params["temperature"] = max(0.0, min(1.0, temp))
+    model_params = apply_model_params(chat_session.params, params)
 
-    if "top_p" in params:
-        top_p = float(params["top_p"])
-        model_params["top_p"] = max(0.0, min(1.0, top_p))
+    return jsonify({"success": True, "params": model_params})
 
-    if "top_k" in params:
-        top_k = int(params["top_k"])
-        model_params["top_k"] = max(1, top_k)
 
-    if "context_length" in params:
-        ctx_len = int(params["context_length"])
-        model_params["context_length"] = max(512, min(32768, ctx_len))
+@app.route("/api/batch_jobs", methods=["POST"])
+def create_batch_job():
+    """
+    JSONL形式のプロンプトからバッチジョブを作成して実行を開始します。
 
-    if "repeat_penalty" in params:
-        penalty = float(params["repeat_penalty"])
-        model_params["repeat_penalty"] = max(1.0, min(2.0, penalty))
+    プロンプトはmultipartの"file"またはリクエストの本文で送信し、
+    クエリパラメータのworkersで同時に実行するワーカー数を指定できます。
 
-    return jsonify({"success": True, "params": model_params})
+    Returns:
+        Response: ジョブの進捗のJSONレスポンス
+    """
+    upload = request.files.get("file")
+    data = upload.read() if upload is not None else request.get_data()
+    try:
+        job = batch_runner.submit(data, request.args.get("workers"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"job": job.status()}), 202
+
+
+@app.route("/api/batch_jobs", methods=["GET"])
+def list_batch_jobs():
+    """
+    バッチジョブの一覧を作成の新しい順に取得します。
+
+    Returns:
+        Response: ジョブごとの進捗のJSONレスポンス
+    """
+    return jsonify({"jobs": batch_runner.list_status()})
+
+
+@app.route("/api/batch_jobs/<job_id>")
+def get_batch_job(job_id):
+    """
+    バッチジョブの進捗とスループットを取得します。
+
+    Args:
+        job_id: ジョブID
+
+    Returns:
+        Response: ジョブの進捗のJSONレスポンス
+    """
+    job = batch_runner.get(job_id)
+    if job is None:
+        return jsonify({"error": "ジョブが見つかりません"}), 404
+    return jsonify({"job": job.status()})
+
+
+@app.route("/api/batch_jobs/<job_id>/results")
+def get_batch_job_results(job_id):
+    """
+    バッチジョブのそれまでに完了した結果をJSONL形式で取得します。
+
+    Args:
+        job_id: ジョブID
+
+    Returns:
+        Response: 結果のファイル
+    """
+    job = batch_runner.get(job_id)
+    if job is None:
+        return jsonify({"error": "ジョブが見つかりません"}), 404
+    if not os.path.exists(job.output_path):
+        return Response(b"", mimetype="application/x-ndjson")
+    return send_file(os.path.abspath(job.output_path), mimetype="application/x-ndjson", max_age=0)
+
+
+@app.route("/api/batch_jobs/<job_id>/cancel", methods=["POST"])
+def cancel_batch_job(job_id):
+    """
+    バッチジョブを中止します。中止までに成功した結果は残り、再開できます。
+
+    Args:
+        job_id: ジョブID
+
+    Returns:
+        Response: ジョブの進捗のJSONレスポンス
+    """
+    job = batch_runner.cancel(job_id)
+    if job is None:
+        return jsonify({"error": "ジョブが見つかりません"}), 404
+    return jsonify({"job": job.status()})
+
+
+@app.route("/api/batch_jobs/<job_id>/resume", methods=["POST"])
+def resume_batch_job(job_id):
+    """
+    中止、失敗、停止したバッチジョブを、成功していないプロンプトから再開します。
+
+    Args:
+        job_id: ジョブID
+
+    Returns:
+        Response: ジョブの進捗のJSONレスポンス
+    """
+    try:
+        job = batch_runner.resume(job_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
+    if job is None:
+        return jsonify({"error": "ジョブが見つかりません"}), 404
+    return jsonify({"job": job.status()}), 202
 
 
 @socketio.on("send_message")
@@ -181,49 +590,111 @@ def handle_message(data):
     """
     user_message = data.get("message", "")
 
-    # メッセージをセッションに追加
-    chat_session.add_message("user", user_message)
+    # クライアントのセッションを取得
+    session_id = get_session_id()
+    chat_session = session_manager.get(session_id)
+    current_model = chat_session.model
+    model_params = dict(chat_session.params)
+
+    # 応答は会話のルームにのみ送信する（同じ会話を表示しているクライアントだけが受信する）
+    room = chat_session.conversation_id
+    join_room(room)
 
     # モデルが選択されていない場合はオウム返し
     if current_model is None:
+        chat_session.add_message("user", user_message)
         response = user_message
         chat_session.add_message("assistant", response)
-        socketio.emit("receive_message", {"sender": "assistant", "message": response})
+        emit_to("receive_message", {"sender": "assistant", "message": response}, room)
         return
 
+    # チャンクをまとめてクライアントに送信する（最初のチャンクは即座に送信）
+    coalescer = ChunkCoalescer(
+        lambda text: emit_to("receive_chunk", {"content": text}, room),
+        interval=stream_flush_interval,
+        max_bytes=stream_flush_max_bytes,
+    )
+
+    # stop_generationイベントや切断で生成を中止できるように記録する
+    cancel_token = chat_session.begin_generation(request.sid)
+    ticket = None
+    timer = None
+    # メトリクスのラベルはスケジューラと揃えてタグ付きのモデル名にする
+    model_label = normalize_model_name(current_model)
+
     try:
-        # ollamaを使用してチャット
-        messages = chat_session.get_messages()
+        # モデルの同時実行数に空きがなければ待ち行列で順番を待つ（待機中の順番をクライアントに通知）
+        with QUEUE_WAIT.time(model=model_label):
+            ticket = scheduler.acquire(
+                current_model,
+                session_id,
+                on_queued=lambda position: emit_to(
+                    "status_update",
+                    {"status": "queued", "position": position, "message": f"順番待ち中（{position}番目）"},
+                    room,
+                ),
+                cancel_token=cancel_token,
+            )
+        if ticket is None:
+            finish_cancelled_generation(chat_session, "", coalescer, room)
+            return
+
+        # メッセージをセッションに追加（受け付けられなかったメッセージは履歴に残さない）
+        chat_session.add_message("user", user_message)
+
+        history_budget = int(model_params["context_length"] * (1.0 - context_response_reserve))
 
         # 進行状況を通知
-        socketio.emit("status_update", {"status": "thinking", "message": "考え中..."})
+        emit_to("status_update", {"status": "thinking", "message": "考え中..."}, room)
+
+        # 最初のトークンまでの時間と生成全体の時間を計測する
+        timer = GenerationTimer(model_label)
 
         # ストリーミングチャットの実行
         def on_chunk(chunk):
             """
             チャンクを受け取るたびに呼び出されるコールバック関数
             """
-            # クライアントにチャンクを送信
-            socketio.emit("receive_chunk", {"content": chunk})
-
-        # 完全なレスポンスを構築
-        full_content = ""
-
-        # ストリーミングチャットを実行
-        for response_chunk in ollama_client.chat_stream(
-            model=current_model,
-            messages=messages,
-            options={
-                "temperature": model_params["temperature"],
-                "top_p": model_params["top_p"],
-                "top_k": model_params["top_k"],
-                "num_ctx": model_params["context_length"],
-                "repeat_penalty": model_params["repeat_penalty"],
-            },
-            callback=on_chunk,
-        ):
+            timer.on_chunk(chunk)
+            # チャンクをバッファに追加
+            coalescer.add(chunk)
+
+        # generateモードでは前回のコンテキストに続けて新しいメッセージだけを評価させる
+        pending = None
+        if chat_api_mode == "generate":
+            pending = chat_session.get_pending_prompt(current_model, max_context_tokens=history_budget)
+        if pending is not None:
+            stream = ollama_client.generate_stream(
+                model=current_model,
+                **pending,
+                options=to_ollama_options(model_params),
+                callback=on_chunk,
+                cancel_token=cancel_token,
+                keep_alive=keep_alive_policy.for_model(current_model),
+            )
+        else:
+            # ollamaを使用してチャット（コンテキスト長に収まるように履歴を絞り込む）
+            stream = ollama_client.chat_stream(
+                model=current_model,
+                messages=chat_session.get_context_window(history_budget),
+                options=to_ollama_options(model_params),
+                callback=on_chunk,
+                cancel_token=cancel_token,
+                keep_alive=keep_alive_policy.for_model(current_model),
+            )
+
+        # ストリーミングチャットを実行（完全な応答は完了時のチャンクで返される）
+        for response_chunk in stream:
+            # 中止された場合は途中までの応答をセッションに記録する
+            if response_chunk.get("cancelled", False):
+                timer.finish("cancelled")
+                finish_cancelled_generation(chat_session, response_chunk["message"]["content"], coalescer, room)
+                break
+
             # 完了フラグをチェック
             if response_chunk.get("done", False):
+                timer.finish("completed", response_chunk)
+
                 # 最終的なレスポンスを取得
                 assistant_message = response_chunk.get("message", {}).get("content", "")
 
@@ -231,22 +702,142 @@ def handle_message(data):
                 if not assistant_message:
                     assistant_message = "申し訳ありませんが、応答を生成できませんでした。"
 
-                # レスポンスをセッションに追加
+                # レスポンスをセッションに追加し、次の生成で続けられるようにコンテキストを記録する
                 chat_session.add_message("assistant", assistant_message)
+                if response_chunk.get("context"):
+                    chat_session.set_context(current_model, response_chunk["context"])
 
-                # クライアントに完了を通知
-                socketio.emit("receive_message", {"sender": "assistant", "message": assistant_message})
-                socketio.emit("status_update", {"status": "ready", "message": "準備完了"})
+                # 残りのチャンクを送信してからクライアントに完了を通知
+                coalescer.close()
+                emit_to("receive_message", {"sender": "assistant", "message": assistant_message}, room)
+                emit_to("status_update", {"status": "ready", "message": "準備完了"}, room)
                 break
-            else:
-                # チャンクからコンテンツを取得
-                chunk_content = response_chunk.get("message", {}).get("content", "")
-                full_content += chunk_content
 
+    except QueueFull as e:
+        GENERATIONS.inc(model=model_label, outcome="rejected")
+        coalescer.close()
+        error_message = f"混雑しているため受け付けられませんでした。{e.retry_after}秒後に再度お試しください"
+        emit_to("receive_message", {"sender": "system", "message": error_message}, room)
+        emit_to("status_update", {"status": "rejected", "retry_after": e.retry_after, "message": "混雑しています"}, room)
     except Exception as e:
+        coalescer.close()
         error_message = f"エラーが発生しました: {str(e)}"
-        socketio.emit("receive_message", {"sender": "system", "message": error_message})
-        socketio.emit("status_update", {"status": "error", "message": "エラーが発生しました"})
+        emit_to("receive_message", {"sender": "system", "message": error_message}, room)
+        emit_to("status_update", {"status": "error", "message": "エラーが発生しました"}, room)
+    finally:
+        # 完了や中止を記録せずに終わった生成（例外など）は失敗として記録する
+        if timer is not None:
+            timer.finish("error")
+        if ticket is not None:
+            scheduler.release(ticket)
+        chat_session.end_generation(cancel_token)
+
+
+def finish_cancelled_generation(chat_session: ChatSession, partial: str, coalescer: ChunkCoalescer, room: str) -> None:
+    """
+    中止された生成の途中までの応答をセッションに記録し、クライアントに通知します。
+
+    Args:
+        chat_session: 生成を実行していたチャットセッション
+        partial: 中止までに生成された応答
+        coalescer: 送信待ちのチャンクを保持しているChunkCoalescer
+        room: 送信先のルーム名
+    """
+    if partial:
+        chat_session.add_message("assistant", partial)
+    coalescer.close()
+    if partial:
+        emit_to("receive_message", {"sender": "assistant", "message": partial, "cancelled": True}, room)
+    else:
+        emit_to("receive_message", {"sender": "system", "message": "応答の生成を停止しました"}, room)
+    emit_to("status_update", {"status": "ready", "message": "生成を停止しました"}, room)
+
+
+@socketio.on("stop_generation")
+def handle_stop_generation():
+    """
+    クライアントのセッションで実行中の応答の生成を中止します。
+
+    ollamaへのHTTPレスポンスを閉じて生成を止め、途中までの応答はセッションに記録されます。
+    """
+    chat_session = session_manager.get(get_session_id())
+    chat_session.cancel_generation()
+
+
+@socketio.on("connect")
+def handle_connect():
+    """
+    クライアントの接続を処理します。
+
+    接続をクライアントの会話のルームに参加させ、会話IDを通知します。
+    """
+    chat_session = session_manager.get(get_session_id())
+    join_room(chat_session.conversation_id)
+    emit_to("session_info", {"conversation_id": chat_session.conversation_id, "model": chat_session.model}, request.sid)
+
+
+@socketio.on("join_conversation")
+def handle_join_conversation(data):
+    """
+    他のクライアントの会話を閲覧するためにルームへ参加します。
+
+    Args:
+        data (dict): クライアントから送信されたデータ
+            - conversation_id: 参加する会話ID
+    """
+    conversation_id = (data or {}).get("conversation_id")
+    if conversation_id:
+        join_room(conversation_id)
+
+
+@socketio.on("leave_conversation")
+def handle_leave_conversation(data):
+    """
+    閲覧していた会話のルームから退出します。
+
+    Args:
+        data (dict): クライアントから送信されたデータ
+            - conversation_id: 退出する会話ID
+    """
+    conversation_id = (data or {}).get("conversation_id")
+    if conversation_id:
+        leave_room(conversation_id)
+
+
+@socketio.on("subscribe_system_updates")
+def handle_subscribe_system_updates():
+    """
+    起動中のモデルとGPU情報の更新の購読を開始します。
+
+    サンプリングスレッドを開始し、現在の状態を送信します。以降は値が変化した項目のみ送信されます。
+    """
+    system_monitor.start()
+    snapshot = {key: system_monitor.get(key) for key in system_monitor.sources}
+    join_room(SYSTEM_MONITOR_ROOM)
+    emit_to("system_update", snapshot, request.sid)
+
+
+@socketio.on("unsubscribe_system_updates")
+def handle_unsubscribe_system_updates():
+    """
+    起動中のモデルとGPU情報の更新の購読を終了します。
+    """
+    leave_room(SYSTEM_MONITOR_ROOM)
+
+
+@socketio.on("disconnect")
+def handle_disconnect():
+    """
+    クライアントの切断を処理します。
+
+    切断した接続が開始した応答の生成は中止します。
+    Cookieを持たずsidで管理していたセッションは再接続できないため、切断時に破棄します。
+    """
+    session_id = get_session_id()
+    if session_id in session_manager:
+        session_manager.get(session_id).cancel_generation(owner=request.sid)
+    if not session.get("client_id"):
+        session_manager.remove(request.sid)
 
 
 def main():
@@ -258,14 +849,27 @@ def main():
     """
     # テスト中でない場合のみサーバーを起動
     if os.environ.get("PYTEST_CURRENT_TEST") is None:
+        # LOG_LEVEL、LOG_FORMATなどの環境変数に従ってログの出力を設定する
+        configure_logging()
+
+        # 非同期モードではaiohttpとAsyncServerでSocket.IOを提供する
+        if os.environ.get("APP_MODE", "threading").lower() == "async":
+            from src.async_app import main as async_main
+
+            async_main()
+            return
+
         host = os.environ.get("HOST", "127.0.0.1")
         port = int(os.environ.get("PORT", 5000))
         debug = os.environ.get("DEBUG", "False").lower() == "true"
 
         # 起動メッセージ
-        print("ollama簡易クライアントを起動しています...")
-        print(f"サーバーアドレス: http://{host}:{port}")
-        print(f"ollamaサーバー: {ollama_host}")
+        logger.info("ollama簡易クライアントを起動しています...")
+        logger.info("サーバーアドレス: http://%s:%s", host, port)
+        logger.info("ollamaサーバー: %s", ", ".join(ollama_hosts) or ollama_host)
+
+        # サーバーの停止で中断していたバッチジョブを再開する
+        batch_runner.recover()
 
         socketio.run(app, host=host, port=port, debug=debug, allow_unsafe_werkzeug=True)
 
@@ -0,0 +1,814 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+LLMチャットWebアプリケーションの非同期サーバーモジュール。
+
+このモジュールはaiohttpとpython-socketioのAsyncServerを使用して、
+app.pyと同じチャットインターフェースを非同期に提供します。
+各ストリーミング応答はスレッドを占有しないため、1プロセスで多数の同時応答を処理できます。
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import uuid
+from http.cookies import SimpleCookie
+from typing import Any, Dict, Optional, Union
+
+import jinja2
+import socketio
+from aiohttp import web
+
+from src.async_ollama_client import AsyncOllamaClient
+from src.async_ollama_pool import AsyncOllamaPool
+from src.batch_jobs import AsyncBatchRunner
+from src.ollama_pool import normalize_model_name
+from src.scheduler import AsyncGenerationScheduler, QueueFull, parse_model_limits
+from src.chat_session import ChatSession
+from src.chunk_coalescer import AsyncChunkCoalescer
+from src.conversation_store import create_conversation_store, parse_page_params
+from src.emit_stats import AsyncEmitStatsManager, EmitStats, MeasuredPacket, take_encoded_size
+from src.log_utils import configure_logging
+from src.metrics import (
+    CONTENT_TYPE,
+    EMIT_DURATION,
+    GENERATIONS,
+    QUEUE_WAIT,
+    REGISTRY,
+    GenerationTimer,
+    update_scheduler_gauges,
+)
+from src.model_params import DEFAULT_MODEL_PARAMS, apply_model_params, to_ollama_options
+from src.model_warmup import AsyncModelWarmer, KeepAlivePolicy, parse_keep_alive, parse_model_keep_alive
+from src.response_cache import ResponseCache
+from src.semantic_cache import SemanticCache
+from src.session_manager import SessionManager
+from src.system_monitor import AsyncSystemMonitor
+
+logger = logging.getLogger(__name__)
+
+# クライアントIDを保存するCookie名
+CLIENT_ID_COOKIE = "llm_client_id"
+
+# 起動中のモデルとGPU情報の購読者が参加するルーム名
+SYSTEM_MONITOR_ROOM = "system_monitor"
+
+# リクエストにクライアントIDを保存するキー（古いaiohttpでは文字列キーを使用）
+CLIENT_ID_KEY = web.RequestKey("client_id", str) if hasattr(web, "RequestKey") else "client_id"
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class AsyncChatServer:
+    """
+    非同期チャットサーバーを構成するクラス。
+
+    aiohttpのWebアプリケーションにREST APIと静的ファイルを登録し、
+    Socket.IOのAsyncServerをアタッチします。
+    """
+
+    def __init__(
+        self,
+        ollama_client: Union[AsyncOllamaClient, AsyncOllamaPool],
+        session_manager: Optional[SessionManager] = None,
+        stream_flush_interval: float = 0.03,
+        stream_flush_max_bytes: int = 1024,
+        context_response_reserve: float = 0.25,
+        system_monitor_interval: float = 1.0,
+        scheduler: Optional[AsyncGenerationScheduler] = None,
+        keep_alive_policy: Optional[KeepAlivePolicy] = None,
+        preload_on_select: bool = True,
+        pinned_retry_interval: float = 30.0,
+        chat_api_mode: str = "chat",
+        batch_job_dir: str = "batch_jobs",
+        batch_max_workers: int = 8,
+        batch_default_workers: int = 2,
+    ):
+        """
+        AsyncChatServerクラスのコンストラクタ。
+
+        Args:
+            ollama_client: 非同期ollamaクライアントまたはプール
+            session_manager: セッション管理（省略時は既定の設定で作成）
+            stream_flush_interval: チャンクをまとめて送信する間隔の秒数（デフォルト: 0.03）
+            stream_flush_max_bytes: まとめたチャンクを即座に送信するバイト数（デフォルト: 1024）
+            context_response_reserve: コンテキスト長のうち応答の生成用に確保する割合（デフォルト: 0.25）
+            system_monitor_interval: 起動中のモデルとGPU情報のサンプリング間隔の秒数（デフォルト: 1.0）
+            scheduler: モデルごとの同時実行数を制限するスケジューラ（省略時は既定の設定で作成）
+            keep_alive_policy: モデルごとのkeep_aliveと固定モデルの設定（省略時はollamaサーバーの設定に従う）
+            preload_on_select: モデルの選択時にモデルを事前ロードするかどうか（デフォルト: True）
+            pinned_retry_interval: 固定モデルのロードを再び試すまでの秒数（デフォルト: 30.0）
+            chat_api_mode: 応答の生成に使用するAPI。"generate"では前回のコンテキストに続けて生成する（デフォルト: "chat"）
+            batch_job_dir: バッチジョブのファイルを保存するディレクトリ（デフォルト: "batch_jobs"）
+            batch_max_workers: 1つのバッチジョブのワーカー数の上限（デフォルト: 8）
+            batch_default_workers: ワーカー数を省略したバッチジョブのワーカー数（デフォルト: 2）
+        """
+        self.ollama_client = ollama_client
+        self.session_manager = (
+            session_manager if session_manager is not None else SessionManager(default_params=DEFAULT_MODEL_PARAMS)
+        )
+        self.stream_flush_interval = stream_flush_interval
+        self.stream_flush_max_bytes = stream_flush_max_bytes
+        self.context_response_reserve = context_response_reserve
+        self.emit_stats = EmitStats()
+        self.scheduler = scheduler or AsyncGenerationScheduler()
+        self.keep_alive_policy = keep_alive_policy or KeepAlivePolicy()
+        self.preload_on_select = preload_on_select
+        self.chat_api_mode = chat_api_mode
+        self.model_warmer = AsyncModelWarmer(
+            lambda model, keep_alive: ollama_client.preload_model(model, keep_alive=keep_alive),
+            self.keep_alive_policy,
+            retry_interval=pinned_retry_interval,
+        )
+        self.batch_runner = AsyncBatchRunner(
+            ollama_client,
+            self.scheduler,
+            batch_job_dir,
+            max_workers=batch_max_workers,
+            default_workers=batch_default_workers,
+            keep_alive_policy=self.keep_alive_policy,
+        )
+        self.system_monitor = AsyncSystemMonitor(
+            {"running_models": self._running_models, "gpus": ollama_client.get_gpu_info},
+            interval=system_monitor_interval,
+            on_change=lambda changed: self.emit_to("system_update", changed, SYSTEM_MONITOR_ROOM),
+        )
+        self.templates = jinja2.Environment(
+            loader=jinja2.FileSystemLoader(os.path.join(BASE_DIR, "templates")),
+            autoescape=True,
+        )
+        self.templates.globals["url_for"] = lambda endpoint, filename: f"/static/{filename}"
+
+        self.sio = socketio.AsyncServer(
+            async_mode="aiohttp", client_manager=AsyncEmitStatsManager(self.emit_stats), serializer=MeasuredPacket
+        )
+        self.app = web.Application(middlewares=[self._client_id_middleware])
+        self.sio.attach(self.app)
+        self._register_routes()
+        self._register_events()
+        self.app.on_startup.append(self._on_startup)
+        self.app.on_cleanup.append(self._on_cleanup)
+
+    # ---- 共通処理 ----
+
+    @web.middleware
+    async def _client_id_middleware(self, request: "web.Request", handler):
+        """
+        クライアントIDのCookieが発行されていることを保証するミドルウェア。
+        """
+        client_id = request.cookies.get(CLIENT_ID_COOKIE)
+        if not client_id:
+            client_id = uuid.uuid4().hex
+        request[CLIENT_ID_KEY] = client_id
+
+        response = await handler(request)
+        if request.cookies.get(CLIENT_ID_COOKIE) != client_id:
+            response.set_cookie(CLIENT_ID_COOKIE, client_id, httponly=True, samesite="Lax")
+        return response
+
+    async def emit_to(self, event: str, data: Dict[str, Any], room: str) -> None:
+        """
+        指定したsidまたはルームにのみイベントを送信し、送信量を記録します。
+
+        Args:
+            event: イベント名
+            data: 送信するデータ
+            room: 送信先のsidまたはルーム名
+        """
+        with EMIT_DURATION.time(event=event):
+            await self.sio.emit(event, data, to=room)
+        self.emit_stats.record(event, room, take_encoded_size())
+
+    def conditional_json_response(self, request: "web.Request", payload: Dict[str, Any]) -> "web.Response":
+        """
+        内容から算出したETagを付けたJSONレスポンスを作成します。
+
+        リクエストのIf-None-Matchが一致する場合は本文のない304レスポンスを返します。
+
+        Args:
+            request: リクエスト
+            payload: レスポンスのデータ
+
+        Returns:
+            web.Response: JSONレスポンスまたは304レスポンス
+        """
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        etag = hashlib.sha1(body).hexdigest()
+        if etag in request.headers.get("If-None-Match", "").replace('"', "").split(", "):
+            response = web.Response(status=304)
+        else:
+            response = web.Response(body=body, content_type="application/json")
+        response.headers["ETag"] = f'"{etag}"'
+        # ブラウザには毎回ETagで再検証させる
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+    async def _running_models(self):
+        # 取得のたびにロードされていない固定モデルの事前ロードを開始する
+        return self.model_warmer.observe(await self.ollama_client.list_running_models())
+
+    async def _on_startup(self, app) -> None:
+        # サーバーの停止で中断していたバッチジョブを再開する
+        await self.batch_runner.recover()
+
+    async def _on_cleanup(self, app) -> None:
+        await self.batch_runner.close()
+        await self.system_monitor.stop()
+        await self.model_warmer.close()
+        await self.ollama_client.close()
+        if self.session_manager.store is not None:
+            # 書き込み待ちのメッセージの保存を待つため、スレッドプールで閉じる
+            await asyncio.get_running_loop().run_in_executor(None, self.session_manager.store.close)
+
+    # ---- REST API ----
+
+    def _register_routes(self) -> None:
+        """
+        REST APIと静的ファイルのルートを登録します。
+        """
+        routes = self.app.router
+        routes.add_get("/", self.index)
+        routes.add_static("/static", os.path.join(BASE_DIR, "static"))
+        routes.add_get("/api/models", self.get_models)
+        routes.add_get("/api/running_models", self.get_running_models)
+        routes.add_post("/api/kill_model", self.kill_model)
+        routes.add_get("/api/gpu_info", self.get_gpu_info)
+        routes.add_get("/api/pool_stats", self.get_pool_stats)
+        routes.add_get("/api/cache_stats", self.get_cache_stats)
+        routes.add_get("/api/capabilities", self.get_capabilities)
+        routes.add_get("/api/scheduler_stats", self.get_scheduler_stats)
+        routes.add_get("/api/warmup_stats", self.get_warmup_stats)
+        routes.add_get("/api/emit_stats", self.get_emit_stats)
+        routes.add_get("/metrics", self.get_metrics)
+        routes.add_get("/api/conversations/{conversation_id}/messages", self.get_conversation_messages)
+        routes.add_post("/api/select_model", self.select_model)
+        routes.add_get("/api/model_params", self.get_model_params)
+        routes.add_post("/api/model_params", self.update_model_params)
+        routes.add_post("/api/batch_jobs", self.create_batch_job)
+        routes.add_get("/api/batch_jobs", self.list_batch_jobs)
+        routes.add_get("/api/batch_jobs/{job_id}", self.get_batch_job)
+        routes.add_get("/api/batch_jobs/{job_id}/results", self.get_batch_job_results)
+        routes.add_post("/api/batch_jobs/{job_id}/cancel", self.cancel_batch_job)
+        routes.add_post("/api/batch_jobs/{job_id}/resume", self.resume_batch_job)
+
+    async def index(self, request: "web.Request") -> "web.Response":
+        """
+        メインページを表示します。
+        """
+        html = self.templates.get_template("index.html").render()
+        return web.Response(text=html, content_type="text/html")
+
+    async def get_models(self, request: "web.Request") -> "web.Response":
+        """
+        利用可能なモデルの一覧を取得します。クエリパラメータ refresh でキャッシュを破棄します。
+        """
+        if request.query.get("refresh"):
+            self.ollama_client.invalidate_cache()
+        return self.conditional_json_response(request, {"models": await self.ollama_client.list_models()})
+
+    async def get_running_models(self, request: "web.Request") -> "web.Response":
+        """
+        現在起動中のモデルの一覧を取得します。
+        """
+        return self.conditional_json_response(request, {"models": await self.system_monitor.get("running_models")})
+
+    async def kill_model(self, request: "web.Request") -> "web.Response":
+        """
+        指定したモデルを終了します。
+        """
+        data = await request.json()
+        model_id = data.get("id")
+
+        if not model_id:
+            return web.json_response({"success": False, "error": "モデルIDが指定されていません"}, status=400)
+
+        success = await self.ollama_client.kill_model(model_id)
+        self.system_monitor.invalidate("running_models")
+        return web.json_response({"success": success})
+
+    async def get_gpu_info(self, request: "web.Request") -> "web.Response":
+        """
+        GPUの情報と使用率を取得します。
+        """
+        return self.conditional_json_response(request, {"gpus": await self.system_monitor.get("gpus")})
+
+    async def get_pool_stats(self, request: "web.Request") -> "web.Response":
+        """
+        ollamaサーバーへのHTTPコネクションプールの統計情報を取得します。
+        """
+        return web.json_response({"stats": self.ollama_client.get_pool_stats()})
+
+    async def get_cache_stats(self, request: "web.Request") -> "web.Response":
+        """
+        モデル一覧とモデル情報のキャッシュの統計情報を取得します。
+        """
+        return web.json_response({"stats": self.ollama_client.get_cache_stats()})
+
+    async def get_capabilities(self, request: "web.Request") -> "web.Response":
+        """
+        ollamaサーバーのバージョンと、操作ごとに使用している取得方法を取得します。
+        """
+        return web.json_response(await self.ollama_client.get_capabilities())
+
+    async def get_scheduler_stats(self, request: "web.Request") -> "web.Response":
+        """
+        モデルごとの実行中の生成と待ち行列の統計情報を取得します。
+        """
+        return web.json_response({"stats": self.scheduler.stats()})
+
+    async def get_warmup_stats(self, request: "web.Request") -> "web.Response":
+        """
+        固定モデルと事前ロードの状態を取得します。
+        """
+        return web.json_response({"stats": self.model_warmer.stats()})
+
+    async def get_emit_stats(self, request: "web.Request") -> "web.Response":
+        """
+        Socket.IOの送信量の統計情報を取得します。
+        """
+        return web.json_response({"stats": self.emit_stats.snapshot()})
+
+    async def get_metrics(self, request: "web.Request") -> "web.Response":
+        """
+        応答の生成、待ち行列、Socket.IOの送信、ollamaへのリクエストの所要時間をPrometheusのテキスト形式で取得します。
+        """
+        update_scheduler_gauges(self.scheduler.stats())
+        # aiohttpのcontent_type引数にはcharsetなどのパラメータを含められないため、ヘッダーで指定する
+        return web.Response(body=REGISTRY.render().encode("utf-8"), headers={"Content-Type": CONTENT_TYPE})
+
+    async def select_model(self, request: "web.Request") -> "web.Response":
+        """
+        モデルを選択します。
+        """
+        data = await request.json()
+        model_name = data.get("model")
+
+        if not model_name:
+            return web.json_response({"success": False, "error": "モデル名が指定されていません"}, status=400)
+
+        chat_session = await self.session_manager.aget(request[CLIENT_ID_KEY])
+        chat_session.model = model_name
+        chat_session.clear()
+
+        # 最初のメッセージでロードを待たないように、バックグラウンドでモデルをロードする
+        preloading = False
+        if self.preload_on_select and data.get("preload", True):
+            preloading = self.model_warmer.warm(model_name) is not None
+
+        model_info = await self.ollama_client.get_model_info(model_name)
+        return web.json_response(
+            {
+                "success": True,
+                "model": model_name,
+                "model_info": model_info,
+                "preloading": preloading,
+                "conversation_id": chat_session.conversation_id,
+            }
+        )
+
+    async def get_conversation_messages(self, request: "web.Request") -> "web.Response":
+        """
+        会話のメッセージを新しいものから1ページずつ取得します。
+        """
+        store = self.session_manager.store
+        if store is None:
+            return web.json_response({"error": "会話の履歴を保存していません"}, status=404)
+        try:
+            before, limit = parse_page_params(request.query.get("before"), request.query.get("limit"))
+        except ValueError as e:
+            return web.json_response({"error": str(e)}, status=400)
+        # SQLiteの読み出しでイベントループを止めないよう、スレッドプールで実行する
+        page = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: store.page(request.match_info["conversation_id"], before=before, limit=limit)
+        )
+        return web.json_response(page)
+
+    async def get_model_params(self, request: "web.Request") -> "web.Response":
+        """
+        現在のモデルパラメータを取得します。
+        """
+        chat_session = await self.session_manager.aget(request[CLIENT_ID_KEY])
+        return web.json_response({"params": chat_session.params})
+
+    async def update_model_params(self, request: "web.Request") -> "web.Response":
+        """
+        モデルパラメータを更新します。
+        """
+        data = await request.json()
+        chat_session = await self.session_manager.aget(request[CLIENT_ID_KEY])
+        model_params = apply_model_params(chat_session.params, data.get("params", {}))
+        return web.json_response({"success": True, "params": model_params})
+
+    async def create_batch_job(self, request: "web.Request") -> "web.Response":
+        """
+        JSONL形式のプロンプト（multipartの"file"または本文）からバッチジョブを作成して実行を開始します。
+        """
+        if request.content_type == "multipart/form-data":
+            upload = (await request.post()).get("file")
+            data = upload.file.read() if isinstance(upload, web.FileField) else b""
+        else:
+            data = await request.read()
+        try:
+            job = await self.batch_runner.submit(data, request.query.get("workers"))
+        except ValueError as e:
+            return web.json_response({"error": str(e)}, status=400)
+        return web.json_response({"job": job.status()}, status=202)
+
+    async def list_batch_jobs(self, request: "web.Request") -> "web.Response":
+        """
+        バッチジョブの一覧を作成の新しい順に取得します。
+        """
+        return web.json_response({"jobs": self.batch_runner.list_status()})
+
+    async def get_batch_job(self, request: "web.Request") -> "web.Response":
+        """
+        バッチジョブの進捗とスループットを取得します。
+        """
+        job = self.batch_runner.get(request.match_info["job_id"])
+        if job is None:
+            return web.json_response({"error": "ジョブが見つかりません"}, status=404)
+        return web.json_response({"job": job.status()})
+
+    async def get_batch_job_results(self, request: "web.Request") -> "web.StreamResponse":
+        """
+        バッチジョブのそれまでに完了した結果をJSONL形式で取得します。
+        """
+        job = self.batch_runner.get(request.match_info["job_id"])
+        if job is None:
+            return web.json_response({"error": "ジョブが見つかりません"}, status=404)
+        if not os.path.exists(job.output_path):
+            return web.Response(body=b"", content_type="application/x-ndjson")
+        return web.FileResponse(job.output_path, headers={"Content-Type": "application/x-ndjson"})
+
+    async def cancel_batch_job(self, request: "web.Request") -> "web.Response":
+        """
+        バッチジョブを中止します。中止までに成功した結果は残り、再開できます。
+        """
+        job = self.batch_runner.cancel(request.match_info["job_id"])
+        if job is None:
+            return web.json_response({"error": "ジョブが見つかりません"}, status=404)
+        return web.json_response({"job": job.status()})
+
+    async def resume_batch_job(self, request: "web.Request") -> "web.Response":
+        """
+        中止、失敗、停止したバッチジョブを、成功していないプロンプトから再開します。
+        """
+        try:
+            job = self.batch_runner.resume(request.match_info["job_id"])
+        except ValueError as e:
+            return web.json_response({"error": str(e)}, status=409)
+        if job is None:
+            return web.json_response({"error": "ジョブが見つかりません"}, status=404)
+        return web.json_response({"job": job.status()}, status=202)
+
+    # ---- Socket.IO ----
+
+    def _register_events(self) -> None:
+        """
+        Socket.IOのイベントハンドラを登録します。
+        """
+        self.sio.on("connect", self.handle_connect)
+        self.sio.on("disconnect", self.handle_disconnect)
+        self.sio.on("send_message", self.handle_message)
+        self.sio.on("stop_generation", self.handle_stop_generation)
+        self.sio.on("join_conversation", self.handle_join_conversation)
+        self.sio.on("leave_conversation", self.handle_leave_conversation)
+        self.sio.on("subscribe_system_updates", self.handle_subscribe_system_updates)
+        self.sio.on("unsubscribe_system_updates", self.handle_unsubscribe_system_updates)
+
+    async def handle_connect(self, sid: str, environ: Dict[str, Any], auth: Any = None) -> None:
+        """
+        クライアントの接続を処理します。
+
+        CookieのクライアントIDをセッションIDとして保存し、会話のルームに参加させます。
+        """
+        cookie = SimpleCookie(environ.get("HTTP_COOKIE", ""))
+        client_id = cookie[CLIENT_ID_COOKIE].value if CLIENT_ID_COOKIE in cookie else None
+        session_id = client_id or sid
+        await self.sio.save_session(sid, {"session_id": session_id, "has_cookie": client_id is not None})
+
+        chat_session = await self.session_manager.aget(session_id)
+        await self.sio.enter_room(sid, chat_session.conversation_id)
+        await self.emit_to("session_info", {"conversation_id": chat_session.conversation_id, "model": chat_session.model}, sid)
+
+    async def handle_disconnect(self, sid: str, *args) -> None:
+        """
+        クライアントの切断を処理します。切断した接続が開始した応答の生成は中止します。
+        """
+        sio_session = await self.sio.get_session(sid)
+        session_id = sio_session.get("session_id")
+        if session_id in self.session_manager:
+            (await self.session_manager.aget(session_id)).cancel_generation(owner=sid)
+        if not sio_session.get("has_cookie"):
+            self.session_manager.remove(sid)
+
+    async def handle_stop_generation(self, sid: str, *args) -> None:
+        """
+        クライアントのセッションで実行中の応答の生成を中止します。
+        """
+        sio_session = await self.sio.get_session(sid)
+        (await self.session_manager.aget(sio_session["session_id"])).cancel_generation()
+
+    async def handle_join_conversation(self, sid: str, data: Dict[str, Any]) -> None:
+        """
+        他のクライアントの会話を閲覧するためにルームへ参加します。
+        """
+        conversation_id = (data or {}).get("conversation_id")
+        if conversation_id:
+            await self.sio.enter_room(sid, conversation_id)
+
+    async def handle_leave_conversation(self, sid: str, data: Dict[str, Any]) -> None:
+        """
+        閲覧していた会話のルームから退出します。
+        """
+        conversation_id = (data or {}).get("conversation_id")
+        if conversation_id:
+            await self.sio.leave_room(sid, conversation_id)
+
+    async def handle_subscribe_system_updates(self, sid: str, *args) -> None:
+        """
+        起動中のモデルとGPU情報の更新の購読を開始します。
+        """
+        self.system_monitor.start()
+        snapshot = {key: await self.system_monitor.get(key) for key in self.system_monitor.sources}
+        await self.sio.enter_room(sid, SYSTEM_MONITOR_ROOM)
+        await self.emit_to("system_update", snapshot, sid)
+
+    async def handle_unsubscribe_system_updates(self, sid: str, *args) -> None:
+        """
+        起動中のモデルとGPU情報の更新の購読を終了します。
+        """
+        await self.sio.leave_room(sid, SYSTEM_MONITOR_ROOM)
+
+    async def handle_message(self, sid: str, data: Dict[str, Any]) -> None:
+        """
+        クライアントからのメッセージを処理します。
+
+        Args:
+            sid: 送信元の接続のsid
+            data: クライアントから送信されたメッセージデータ
+                - message: ユーザーが入力したメッセージ
+        """
+        user_message = data.get("message", "")
+        sio_session = await self.sio.get_session(sid)
+        session_id = sio_session["session_id"]
+        chat_session = await self.session_manager.aget(session_id)
+        current_model = chat_session.model
+        model_params = dict(chat_session.params)
+
+        room = chat_session.conversation_id
+        await self.sio.enter_room(sid, room)
+
+        # モデルが選択されていない場合はオウム返し
+        if current_model is None:
+            chat_session.add_message("user", user_message)
+            chat_session.add_message("assistant", user_message)
+            await self.emit_to("receive_message", {"sender": "assistant", "message": user_message}, room)
+            return
+
+        coalescer = AsyncChunkCoalescer(
+            lambda text: self.emit_to("receive_chunk", {"content": text}, room),
+            interval=self.stream_flush_interval,
+            max_bytes=self.stream_flush_max_bytes,
+        )
+
+        # stop_generationイベントや切断で生成を中止できるように記録する
+        cancel_token = chat_session.begin_generation(sid)
+        ticket = None
+        timer = None
+        # メトリクスのラベルはスケジューラと揃えてタグ付きのモデル名にする
+        model_label = normalize_model_name(current_model)
+
+        try:
+            # モデルの同時実行数に空きがなければ待ち行列で順番を待つ（待機中の順番をクライアントに通知）
+            with QUEUE_WAIT.time(model=model_label):
+                ticket = await self.scheduler.acquire(
+                    current_model,
+                    session_id,
+                    on_queued=lambda position: self.emit_to(
+                        "status_update",
+                        {"status": "queued", "position": position, "message": f"順番待ち中（{position}番目）"},
+                        room,
+                    ),
+                    cancel_token=cancel_token,
+                )
+            if ticket is None:
+                await self.finish_cancelled_generation(chat_session, "", coalescer, room)
+                return
+
+            # メッセージをセッションに追加（受け付けられなかったメッセージは履歴に残さない）
+            chat_session.add_message("user", user_message)
+
+            history_budget = int(model_params["context_length"] * (1.0 - self.context_response_reserve))
+
+            await self.emit_to("status_update", {"status": "thinking", "message": "考え中..."}, room)
+
+            # 最初のトークンまでの時間と生成全体の時間を計測する
+            timer = GenerationTimer(model_label)
+
+            def on_chunk(chunk: str):
+                timer.on_chunk(chunk)
+                return coalescer.add(chunk)
+
+            # generateモードでは前回のコンテキストに続けて新しいメッセージだけを評価させる
+            pending = None
+            if self.chat_api_mode == "generate":
+                pending = chat_session.get_pending_prompt(current_model, max_context_tokens=history_budget)
+            if pending is not None:
+                stream = self.ollama_client.generate_stream(
+                    model=current_model,
+                    **pending,
+                    options=to_ollama_options(model_params),
+                    callback=on_chunk,
+                    cancel_token=cancel_token,
+                    keep_alive=self.keep_alive_policy.for_model(current_model),
+                )
+            else:
+                stream = self.ollama_client.chat_stream(
+                    model=current_model,
+                    messages=chat_session.get_context_window(history_budget),
+                    options=to_ollama_options(model_params),
+                    callback=on_chunk,
+                    cancel_token=cancel_token,
+                    keep_alive=self.keep_alive_policy.for_model(current_model),
+                )
+
+            async for response_chunk in stream:
+                # 中止された場合は途中までの応答をセッションに記録する
+                if response_chunk.get("cancelled", False):
+                    timer.finish("cancelled")
+                    await self.finish_cancelled_generation(chat_session, response_chunk["message"]["content"], coalescer, room)
+                    break
+
+                if response_chunk.get("done", False):
+                    timer.finish("completed", response_chunk)
+                    assistant_message = response_chunk.get("message", {}).get("content", "")
+                    if not assistant_message:
+                        assistant_message = "申し訳ありませんが、応答を生成できませんでした。"
+
+                    chat_session.add_message("assistant", assistant_message)
+                    if response_chunk.get("context"):
+                        chat_session.set_context(current_model, response_chunk["context"])
+
+                    await coalescer.close()
+                    await self.emit_to("receive_message", {"sender": "assistant", "message": assistant_message}, room)
+                    await self.emit_to("status_update", {"status": "ready", "message": "準備完了"}, room)
+                    break
+        except QueueFull as e:
+            GENERATIONS.inc(model=model_label, outcome="rejected")
+            await coalescer.close()
+            error_message = f"混雑しているため受け付けられませんでした。{e.retry_after}秒後に再度お試しください"
+            await self.emit_to("receive_message", {"sender": "system", "message": error_message}, room)
+            await self.emit_to(
+                "status_update", {"status": "rejected", "retry_after": e.retry_after, "message": "混雑しています"}, room
+            )
+        except Exception as e:
+            await coalescer.close()
+            error_message = f"エラーが発生しました: {str(e)}"
+            await self.emit_to("receive_message", {"sender": "system", "message": error_message}, room)
+            await self.emit_to("status_update", {"status": "error", "message": "エラーが発生しました"}, room)
+        finally:
+            # 完了や中止を記録せずに終わった生成（例外など）は失敗として記録する
+            if timer is not None:
+                timer.finish("error")
+            if ticket is not None:
+                self.scheduler.release(ticket)
+            chat_session.end_generation(cancel_token)
+
+    async def finish_cancelled_generation(
+        self, chat_session: ChatSession, partial: str, coalescer: AsyncChunkCoalescer, room: str
+    ) -> None:
+        """
+        中止された生成の途中までの応答をセッションに記録し、クライアントに通知します。
+
+        Args:
+            chat_session: 生成を実行していたチャットセッション
+            partial: 中止までに生成された応答
+            coalescer: 送信待ちのチャンクを保持しているAsyncChunkCoalescer
+            room: 送信先のルーム名
+        """
+        if partial:
+            chat_session.add_message("assistant", partial)
+        await coalescer.close()
+        if partial:
+            await self.emit_to("receive_message", {"sender": "assistant", "message": partial, "cancelled": True}, room)
+        else:
+            await self.emit_to("receive_message", {"sender": "system", "message": "応答の生成を停止しました"}, room)
+        await self.emit_to("status_update", {"status": "ready", "message": "生成を停止しました"}, room)
+
+
+def create_app(ollama_client: Union[AsyncOllamaClient, AsyncOllamaPool, None] = None) -> "web.Application":
+    """
+    環境変数の設定から非同期サーバーのWebアプリケーションを作成します。
+
+    Args:
+        ollama_client: 非同期ollamaクライアントまたはプール（省略時は環境変数の設定で作成）
+
+    Returns:
+        web.Application: aiohttpのWebアプリケーション
+    """
+    if ollama_client is None:
+        # temperatureが0のチャットの応答を、同じリクエストに対してollamaを呼ばずに返すキャッシュ（既定では無効）
+        response_cache = (
+            ResponseCache(
+                memory_max_bytes=int(os.environ.get("RESPONSE_CACHE_MEMORY_BYTES", 64 * 1024 * 1024)),
+                disk_dir=os.environ.get("RESPONSE_CACHE_DIR") or None,
+                disk_max_bytes=int(os.environ.get("RESPONSE_CACHE_DISK_BYTES", 1024 * 1024 * 1024)),
+                ttl=float(os.environ.get("RESPONSE_CACHE_TTL", 86400.0)),
+            )
+            if os.environ.get("RESPONSE_CACHE", "false").lower() == "true"
+            else None
+        )
+        # 意味の近い質問に対して生成を行わずに応答を返すキャッシュ（既定では無効、NumPyが必要）
+        semantic_cache = (
+            SemanticCache(
+                os.environ.get("SEMANTIC_CACHE_EMBED_MODEL", "nomic-embed-text"),
+                threshold=float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", 0.95)),
+                max_entries=int(os.environ.get("SEMANTIC_CACHE_MAX_ENTRIES", 1000)),
+                ttl=float(os.environ.get("SEMANTIC_CACHE_TTL", 86400.0)),
+            )
+            if os.environ.get("SEMANTIC_CACHE", "false").lower() == "true"
+            else None
+        )
+        client_options = dict(
+            limit_per_host=int(os.environ.get("OLLAMA_POOL_MAXSIZE", 10)),
+            connect_timeout=float(os.environ.get("OLLAMA_CONNECT_TIMEOUT", 5.0)),
+            read_timeout=float(os.environ.get("OLLAMA_READ_TIMEOUT", 300.0)),
+            gpu_backend=os.environ.get("GPU_TELEMETRY_BACKEND", "auto"),
+            models_cache_ttl=float(os.environ.get("MODELS_CACHE_TTL", 30.0)),
+            model_info_cache_ttl=float(os.environ.get("MODEL_INFO_CACHE_TTL", 300.0)),
+            cache_stale_ttl=float(os.environ.get("CACHE_STALE_TTL", 300.0)),
+            capability_ttl=float(os.environ.get("CAPABILITY_TTL", 300.0)),
+            response_cache=response_cache,
+            semantic_cache=semantic_cache,
+        )
+        # 複数のollamaサーバーに負荷を分散する場合はカンマ区切りで指定する
+        hosts = [host.strip() for host in os.environ.get("OLLAMA_HOSTS", "").split(",") if host.strip()]
+        if hosts:
+            ollama_client = AsyncOllamaPool(
+                hosts,
+                failure_threshold=int(os.environ.get("OLLAMA_POOL_FAILURE_THRESHOLD", 3)),
+                eject_seconds=float(os.environ.get("OLLAMA_POOL_EJECT_SECONDS", 30.0)),
+                **client_options,
+            )
+        else:
+            ollama_client = AsyncOllamaClient(host=os.environ.get("OLLAMA_HOST", "http://localhost:11434"), **client_options)
+
+    server = AsyncChatServer(
+        ollama_client,
+        session_manager=SessionManager(
+            max_sessions=int(os.environ.get("SESSION_MAX_COUNT", 1000)),
+            idle_ttl=float(os.environ.get("SESSION_IDLE_TTL", 3600.0)),
+            default_params=DEFAULT_MODEL_PARAMS,
+            store=create_conversation_store(
+                os.environ.get("CONVERSATION_STORE", "sqlite").lower(), os.environ.get("CONVERSATION_DB", "conversations.db")
+            ),
+            max_resident_messages=int(os.environ.get("CONVERSATION_RESIDENT_MESSAGES", 200)),
+        ),
+        stream_flush_interval=float(os.environ.get("STREAM_FLUSH_INTERVAL_MS", 30)) / 1000.0,
+        stream_flush_max_bytes=int(os.environ.get("STREAM_FLUSH_MAX_BYTES", 1024)),
+        context_response_reserve=float(os.environ.get("CONTEXT_RESPONSE_RESERVE", 0.25)),
+        system_monitor_interval=float(os.environ.get("SYSTEM_MONITOR_INTERVAL", 1.0)),
+        scheduler=AsyncGenerationScheduler(
+            max_concurrent_per_model=int(os.environ.get("GENERATION_MAX_CONCURRENT", 4)),
+            model_limits=parse_model_limits(os.environ.get("GENERATION_MODEL_LIMITS", "")),
+            max_queue=int(os.environ.get("GENERATION_QUEUE_SIZE", 32)),
+            max_queue_per_user=int(os.environ.get("GENERATION_QUEUE_PER_USER", 4)),
+            backends=len(ollama_client.members) if isinstance(ollama_client, AsyncOllamaPool) else 1,
+        ),
+        keep_alive_policy=KeepAlivePolicy(
+            default=parse_keep_alive(os.environ.get("OLLAMA_KEEP_ALIVE")),
+            per_model=parse_model_keep_alive(os.environ.get("MODEL_KEEP_ALIVE", "")),
+            pinned=[name.strip() for name in os.environ.get("PINNED_MODELS", "").split(",") if name.strip()],
+        ),
+        preload_on_select=os.environ.get("PRELOAD_ON_SELECT", "true").lower() == "true",
+        pinned_retry_interval=float(os.environ.get("PINNED_MODELS_RETRY_INTERVAL", 30.0)),
+        chat_api_mode=os.environ.get("CHAT_API_MODE", "chat").lower(),
+        batch_job_dir=os.environ.get("BATCH_JOB_DIR", "batch_jobs"),
+        batch_max_workers=int(os.environ.get("BATCH_MAX_WORKERS", 8)),
+        batch_default_workers=int(os.environ.get("BATCH_DEFAULT_WORKERS", 2)),
+    )
+    return server.app
+
+
+def main():
+    """
+    非同期サーバーを起動します。
+    """
+    host = os.environ.get("HOST", "127.0.0.1")
+    port = int(os.environ.get("PORT", 5000))
+
+    configure_logging()
+    logger.info("ollama簡易クライアントを非同期モードで起動しています...")
+    logger.info("サーバーアドレス: http://%s:%s", host, port)
+    logger.info(
+        "ollamaサーバー: %s", os.environ.get("OLLAMA_HOSTS") or os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+    )
+
+    web.run_app(create_app(), host=host, port=port)
+
+
+if __name__ == "__main__":
+    main()
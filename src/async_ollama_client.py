@@ -0,0 +1,742 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+ollamaサーバーと非同期に通信するモジュール。
+
+このモジュールはaiohttpを使用して、OllamaClientと同じ機能を非同期APIとして提供します。
+1つのイベントループで多数のストリーミング応答を同時に処理できます。
+"""
+
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple, Union
+
+from src.cancellation import CancellationToken
+from src.capabilities import NoStrategySucceeded, StrategyNegotiator
+from src.gpu_telemetry import GpuTelemetryBackend
+from src.log_utils import LazyPayload
+from src.metrics import track_backend
+from src.ndjson import STREAM_CHUNK_SIZE, aiter_chat_chunks
+from src.ollama_client import (
+    OllamaClient,
+    TextAccumulator,
+    cancelled_chunk,
+    parse_models_response,
+    parse_ollama_list_output,
+    parse_ollama_ps_output,
+    parse_running_models_response,
+)
+from src.response_cache import ResponseCache, find_model_digest, is_deterministic, replay_chunks, response_cache_key
+from src.semantic_cache import SemanticCache, SemanticQuery, semantic_scope
+from src.ttl_cache import FRESH, STALE, TTLCache
+
+# aiohttpがなくてもインポートできるようにする
+try:
+    import aiohttp
+
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    aiohttp = None
+    AIOHTTP_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncOllamaClient:
+    """
+    ollamaサーバーと非同期に通信するクラス。
+
+    OllamaClientと同じメソッドをコルーチンとして提供します。chat_streamは非同期ジェネレータです。
+    HTTP接続はaiohttpのコネクションプールで共有されます。
+    """
+
+    def __init__(
+        self,
+        host: str = "http://localhost:11434",
+        limit: int = 100,
+        limit_per_host: int = 10,
+        keepalive_timeout: float = 30.0,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 300.0,
+        gpu_backend: Union[str, GpuTelemetryBackend] = "auto",
+        models_cache_ttl: float = 30.0,
+        model_info_cache_ttl: float = 300.0,
+        cache_stale_ttl: float = 300.0,
+        capability_ttl: float = 300.0,
+        response_cache: Optional[ResponseCache] = None,
+        semantic_cache: Optional[SemanticCache] = None,
+    ):
+        """
+        AsyncOllamaClientクラスのコンストラクタ。
+
+        Args:
+            host: ollamaサーバーのホスト（デフォルト: http://localhost:11434）
+            limit: 全体の最大同時接続数（デフォルト: 100）
+            limit_per_host: ホストごとの最大同時接続数。0は無制限（デフォルト: 10、同期版のpool_maxsizeと同じ）
+            keepalive_timeout: アイドル接続を保持する秒数（デフォルト: 30.0）
+            connect_timeout: 接続タイムアウト秒（デフォルト: 5.0）
+            read_timeout: 読み取りタイムアウト秒（デフォルト: 300.0）
+            gpu_backend: GPU情報を取得するバックエンドまたはその名前（デフォルト: auto）
+            models_cache_ttl: モデル一覧をキャッシュする秒数。0でキャッシュしない（デフォルト: 30.0）
+            model_info_cache_ttl: モデル情報をキャッシュする秒数。0でキャッシュしない（デフォルト: 300.0）
+            cache_stale_ttl: 期限切れ後も古い値を返しながら取得し直す秒数（デフォルト: 300.0）
+            capability_ttl: 成功した取得方法を記録しておく秒数。経過後は最初の方法から試し直す（デフォルト: 300.0）
+            response_cache: temperatureが0のチャットの応答を保存するキャッシュ（省略時はキャッシュしない）
+            semantic_cache: 意味の近い質問の応答を返すキャッシュ（省略時は使用しない）
+
+        Raises:
+            ImportError: aiohttpがインストールされていない場合
+        """
+        if not AIOHTTP_AVAILABLE:
+            raise ImportError("AsyncOllamaClientを使用するにはaiohttpをインストールしてください（pip install .[async]）")
+
+        self.host = host.rstrip("/")
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = aiohttp.ClientTimeout(connect=connect_timeout, sock_read=read_timeout)
+        self._session: Optional["aiohttp.ClientSession"] = None
+        # GPU情報の取得はollamaと無関係な同期処理のため、同期クライアントに委譲する
+        self._sync_client: Optional[OllamaClient] = None
+        self.gpu_backend = gpu_backend
+        self.models_cache = TTLCache(models_cache_ttl, stale_ttl=cache_stale_ttl, max_entries=1)
+        self.model_info_cache = TTLCache(model_info_cache_ttl, stale_ttl=cache_stale_ttl)
+        self.negotiator = StrategyNegotiator(ttl=capability_ttl)
+        self.response_cache = response_cache
+        self.semantic_cache = semantic_cache
+
+    async def _get_session(self) -> "aiohttp.ClientSession":
+        """
+        共有HTTPセッションを取得します。初回呼び出し時に実行中のイベントループ上で作成します。
+
+        Returns:
+            aiohttp.ClientSession: 共有HTTPセッション
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    async def close(self) -> None:
+        """
+        HTTPセッションを閉じ、プール内の接続とGPUバックエンドを解放します。
+        """
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        if self._sync_client is not None:
+            self._sync_client.close()
+            self._sync_client = None
+
+    async def __aenter__(self) -> "AsyncOllamaClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """
+        HTTPコネクションプールの統計情報を取得します。
+
+        Returns:
+            Dict[str, Any]: 接続数の上限と現在の接続数
+        """
+        if self._session is None or self._session.closed:
+            return {"limit": self.limit, "limit_per_host": self.limit_per_host, "acquired": 0, "idle": 0}
+
+        connector = self._session.connector
+        acquired = len(getattr(connector, "_acquired", ()))
+        idle = sum(len(conns) for conns in getattr(connector, "_conns", {}).values())
+        return {"limit": self.limit, "limit_per_host": self.limit_per_host, "acquired": acquired, "idle": idle}
+
+    def invalidate_cache(self, model_name: Optional[str] = None) -> None:
+        """
+        モデル一覧とモデル情報のキャッシュを破棄します。
+
+        Args:
+            model_name: モデル情報を破棄するモデル名（省略時はすべてのモデル情報を破棄）
+        """
+        self.models_cache.invalidate()
+        self.model_info_cache.invalidate(model_name)
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """
+        モデル一覧とモデル情報、応答のキャッシュの統計情報を取得します。
+
+        Returns:
+            Dict[str, Any]: キャッシュごとの統計
+        """
+        stats = {"models": self.models_cache.stats(), "model_info": self.model_info_cache.stats()}
+        if self.response_cache is not None:
+            stats["responses"] = self.response_cache.stats()
+        if self.semantic_cache is not None:
+            stats["semantic"] = self.semantic_cache.stats()
+        return stats
+
+    async def _get_cached(self, cache: TTLCache, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        キャッシュから値を取得します。古い値の場合はそれを返し、タスクで取得し直します。
+
+        取得に失敗した場合の空の結果はキャッシュしません。
+
+        Args:
+            cache: 使用するキャッシュ
+            key: キー
+            loader: 値を取得するコルーチン関数
+
+        Returns:
+            Any: 値
+        """
+        if not cache.enabled:
+            return await loader()
+
+        value, state = cache.lookup(key)
+        if state == FRESH:
+            return value
+        if state == STALE:
+            if cache.begin_refresh(key):
+                asyncio.ensure_future(self._refresh_cache(cache, key, loader))
+            return value
+
+        generation = cache.generation
+        value = await loader()
+        if value:
+            cache.put(key, value, generation)
+        return value
+
+    async def _refresh_cache(self, cache: TTLCache, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> None:
+        """
+        キャッシュの値を取得し直します。
+        """
+        try:
+            generation = cache.generation
+            value = await loader()
+            if value:
+                cache.put(key, value, generation)
+        except Exception as e:
+            logger.warning("キャッシュの更新に失敗しました: %s", e)
+        finally:
+            cache.end_refresh(key)
+
+    async def _run_command(self, *cmd: str) -> str:
+        """
+        コマンドを非同期に実行し、標準出力を返します。
+
+        Args:
+            *cmd: 実行するコマンドと引数
+
+        Returns:
+            str: 標準出力
+        """
+        process = await asyncio.create_subprocess_exec(*cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        stdout, _ = await process.communicate()
+        if process.returncode != 0:
+            raise RuntimeError(f"コマンドの実行に失敗しました: {' '.join(cmd)}")
+        return stdout.decode("utf-8", errors="replace")
+
+    async def list_models(self) -> List[Dict[str, Any]]:
+        """
+        利用可能なモデルの一覧を取得します。結果はmodels_cache_ttl秒間キャッシュされます。
+
+        Returns:
+            List[Dict[str, Any]]: モデル情報のリスト
+        """
+        return await self._get_cached(self.models_cache, "models", self._fetch_models)
+
+    async def _fetch_models(self) -> List[Dict[str, Any]]:
+        """
+        ollamaサーバーからモデルの一覧を取得します。
+
+        HTTP API、コマンドラインのうち前回成功した方法を最初に使用します。
+
+        Returns:
+            List[Dict[str, Any]]: モデル情報のリスト
+        """
+        try:
+            with track_backend("list_models"):
+                return await self.negotiator.run_async(
+                    "list_models",
+                    [
+                        ("http", lambda: self._get_json("/api/tags", parse_models_response)),
+                        ("cli", self._list_models_cli),
+                    ],
+                )
+        except NoStrategySucceeded as e:
+            logger.warning("モデル一覧の取得に失敗しました: %s", e)
+            return []
+
+    async def _list_models_cli(self) -> List[Dict[str, Any]]:
+        """
+        コマンドライン（ollama list）の出力からモデルの一覧を取得します。
+        """
+        return parse_ollama_list_output(await self._run_command("ollama", "list"))
+
+    async def _get_json(self, path: str, parse: Callable[[Any], Any]) -> Any:
+        """
+        GETリクエストを送信し、応答のJSONを解析します。
+
+        Args:
+            path: APIのパス
+            parse: デコードしたJSONを受け取る関数
+
+        Returns:
+            Any: parseの戻り値
+        """
+        session = await self._get_session()
+        async with session.get(f"{self.host}{path}") as response:
+            response.raise_for_status()
+            data = await response.json()
+        return parse(data)
+
+    async def list_running_models(self) -> List[Dict[str, Any]]:
+        """
+        現在起動中のモデルの一覧を取得します。
+
+        Returns:
+            List[Dict[str, Any]]: 起動中のモデル情報のリスト
+        """
+        try:
+            with track_backend("list_running_models"):
+                return await self.negotiator.run_async(
+                    "list_running_models",
+                    [
+                        ("http", lambda: self._get_json("/api/ps", parse_running_models_response)),
+                        ("cli", self._list_running_models_cli),
+                    ],
+                )
+        except NoStrategySucceeded as e:
+            logger.warning("起動中のモデル一覧の取得に失敗しました: %s", e)
+            return []
+
+    async def fetch_ps(self) -> Dict[str, Any]:
+        """
+        /api/ps の応答をそのまま取得します。AsyncOllamaPoolのヘルスチェックで使用します。
+
+        Returns:
+            Dict[str, Any]: /api/ps の応答
+
+        Raises:
+            aiohttp.ClientError: 接続に失敗した場合やエラーの応答の場合
+        """
+        with track_backend("ps"):
+            return await self._get_json("/api/ps", lambda data: data)
+
+    async def _list_running_models_cli(self) -> List[Dict[str, Any]]:
+        """
+        コマンドライン（ollama ps）の出力から起動中のモデルの一覧を取得します。
+        """
+        return parse_ollama_ps_output(await self._run_command("ollama", "ps"))
+
+    async def kill_model(self, model_id: str) -> bool:
+        """
+        指定したモデルを終了します。
+
+        /api/stop（名前、ID）、/api/kill、コマンドラインのうち前回成功した方法を最初に使用します。
+
+        Args:
+            model_id: 終了するモデルのID（または名前）
+
+        Returns:
+            bool: 終了に成功した場合はTrue、失敗した場合はFalse
+        """
+        # 起動中のモデル一覧を取得して、IDからモデル名を特定
+        model_name = model_id
+        for model in await self.list_running_models():
+            if model.get("id", "").startswith(model_id) or model.get("model", "") == model_id:
+                model_name = model.get("model", model_id)
+                break
+
+        try:
+            with track_backend("kill_model"):
+                await self.negotiator.run_async(
+                    "kill_model",
+                    [
+                        ("stop-by-name", lambda: self._post_kill("/api/stop", {"name": model_name})),
+                        ("stop-by-id", lambda: self._post_kill("/api/stop", {"id": model_id})),
+                        ("kill", lambda: self._post_kill("/api/kill", {"id": model_id})),
+                        ("cli", lambda: self._run_command("ollama", "stop", model_name)),
+                    ],
+                )
+        except NoStrategySucceeded as e:
+            logger.warning("モデルの終了に失敗しました: %s", e)
+            return False
+
+        self.invalidate_cache(model_name)
+        return True
+
+    async def _post_kill(self, path: str, payload: Dict[str, Any]) -> None:
+        """
+        モデル終了APIを呼び出します。
+        """
+        session = await self._get_session()
+        async with session.post(f"{self.host}{path}", json=payload) as response:
+            response.raise_for_status()
+
+    async def get_server_version(self) -> Optional[str]:
+        """
+        ollamaサーバーのバージョンを取得します。
+
+        Returns:
+            Optional[str]: バージョン。取得できない場合はNone
+        """
+        try:
+            with track_backend("version"):
+                return await self._get_json("/api/version", lambda data: data.get("version"))
+        except Exception as e:
+            logger.warning("ollamaサーバーのバージョンの取得に失敗しました: %s", e)
+            return None
+
+    async def get_capabilities(self) -> Dict[str, Any]:
+        """
+        ollamaサーバーのバージョンと、操作ごとに使用している取得方法を取得します。
+
+        Returns:
+            Dict[str, Any]: バージョンと操作名ごとの方法の名前
+        """
+        return {"version": await self.get_server_version(), "strategies": self.negotiator.report()}
+
+    async def get_gpu_info(self) -> List[Dict[str, Any]]:
+        """
+        GPUの情報と使用率を取得します。
+
+        バックエンドの初回の読み取りは値が揃うまで待つことがあるため、スレッドプールで実行します。
+
+        Returns:
+            List[Dict[str, Any]]: GPU情報のリスト
+        """
+        if self._sync_client is None:
+            self._sync_client = OllamaClient(host=self.host, gpu_backend=self.gpu_backend)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._sync_client.get_gpu_info)
+
+    async def embed(self, model: str, text: str) -> Optional[List[float]]:
+        """
+        /api/embeddings でテキストの埋め込みベクトルを取得します。
+
+        Args:
+            model: 埋め込みに使用するモデル名
+            text: 埋め込むテキスト
+
+        Returns:
+            Optional[List[float]]: 埋め込みベクトル。取得できない場合はNone
+        """
+        try:
+            session = await self._get_session()
+            with track_backend("embeddings"):
+                async with session.post(f"{self.host}/api/embeddings", json={"model": model, "prompt": text}) as response:
+                    response.raise_for_status()
+                    data = await response.json()
+            return data.get("embedding") or None
+        except Exception as e:
+            logger.warning("モデル %s による埋め込みの取得に失敗しました: %s", model, e)
+            return None
+
+    async def preload_model(self, model: str, keep_alive: Optional[Union[str, int]] = None) -> bool:
+        """
+        プロンプトのない /api/generate を送信して、モデルをメモリにロードします。
+
+        Args:
+            model: ロードするモデル名
+            keep_alive: モデルをメモリに保持する時間（例: "30m"、-1で無期限、省略時はサーバーの設定）
+
+        Returns:
+            bool: ロードに成功した場合はTrue
+        """
+        payload: Dict[str, Any] = {"model": model, "stream": False}
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        try:
+            session = await self._get_session()
+            with track_backend("preload"):
+                async with session.post(f"{self.host}/api/generate", json=payload) as response:
+                    response.raise_for_status()
+            return True
+        except Exception as e:
+            logger.warning("モデル %s のロードに失敗しました: %s", model, e)
+            return False
+
+    async def get_model_info(self, model_name: str) -> Dict[str, Any]:
+        """
+        指定したモデルの情報を取得します。結果はmodel_info_cache_ttl秒間キャッシュされます。
+
+        Args:
+            model_name: モデル名
+
+        Returns:
+            Dict[str, Any]: モデル情報
+        """
+        return await self._get_cached(self.model_info_cache, model_name, lambda: self._fetch_model_info(model_name))
+
+    async def _fetch_model_info(self, model_name: str) -> Dict[str, Any]:
+        """
+        ollamaサーバーから指定したモデルの情報を取得します。
+
+        Args:
+            model_name: モデル名
+
+        Returns:
+            Dict[str, Any]: モデル情報
+        """
+        try:
+            session = await self._get_session()
+            with track_backend("get_model_info"):
+                async with session.post(f"{self.host}/api/show", json={"name": model_name}) as response:
+                    response.raise_for_status()
+                    return await response.json()
+        except Exception as e:
+            logger.warning("モデル情報の取得に失敗しました: %s", e)
+            return {}
+
+    def chat_stream(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        context: Optional[List[int]] = None,
+        options: Optional[Dict[str, Any]] = None,
+        callback: Optional[Callable[[str], Any]] = None,
+        cancel_token: Optional[CancellationToken] = None,
+        keep_alive: Optional[Union[str, int]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        チャットを実行し、ストリーミングレスポンスを非同期に返します。
+
+        Args:
+            model: 使用するモデル名
+            messages: メッセージのリスト
+            context: コンテキスト（省略可）
+            options: オプション（省略可）
+            callback: 各チャンクを受け取るコールバック関数。コルーチン関数も指定可能（省略可）
+            cancel_token: 生成の中止を伝えるトークン。中止されると応答を閉じ、
+                それまでの応答を含む "cancelled": True の最後のチャンクを返します（省略可）
+            keep_alive: 応答後にモデルをメモリに保持する時間（例: "30m"、-1で無期限、省略時はサーバーの設定）
+
+        Yields:
+            Dict[str, Any]: チャットの応答（チャンク単位）。最後のチャンクには完全な応答が含まれます。
+                キャッシュした応答を返した場合、最後のチャンクは "cached": True
+        """
+        opts = options or {}
+        payload = {"model": model, "messages": messages, "options": opts}
+        if context:
+            payload["context"] = context
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+
+        # 非同期ジェネレータをそのまま返し、呼び出し側が途中で閉じたときに応答も閉じられるようにする
+        stream = self._stream(f"{self.host}/api/chat", payload, callback, cancel_token)
+        use_response_cache = self.response_cache is not None and is_deterministic(opts)
+        if not use_response_cache and (self.semantic_cache is None or context):
+            return stream
+        return self._cached_stream(model, messages, opts, context, stream, callback, cancel_token)
+
+    async def _cached_stream(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        options: Dict[str, Any],
+        context: Optional[List[int]],
+        stream: AsyncIterator[Dict[str, Any]],
+        callback: Optional[Callable[[str], Any]],
+        cancel_token: Optional[CancellationToken],
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        応答のキャッシュか意味の近い質問の応答があればそれを返し、
+        なければollamaの応答を返しながら完了した応答を保存します。
+        """
+        try:
+            cache_key, semantic_query, cached = await self._lookup_cached(model, messages, options, context)
+            if cached is not None:
+                full_content = TextAccumulator()
+                for chunk in replay_chunks(cached):
+                    if cancel_token is not None and cancel_token.cancelled:
+                        yield cancelled_chunk(full_content.getvalue())
+                        return
+                    if not chunk["done"]:
+                        content = chunk["message"]["content"]
+                        full_content.append(content)
+                        if callback:
+                            result = callback(content)
+                            if asyncio.iscoroutine(result):
+                                await result
+                    yield chunk
+                return
+
+            async for chunk in stream:
+                # 中止されずに完了した応答だけを保存する
+                if chunk.get("done") and not chunk.get("cancelled") and chunk["message"]["content"]:
+                    if cache_key is not None:
+                        await self._call_response_cache(self.response_cache.put, cache_key, chunk)
+                    if semantic_query is not None:
+                        self.semantic_cache.put(semantic_query, chunk)
+                yield chunk
+        finally:
+            await stream.aclose()
+
+    async def _lookup_cached(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        options: Dict[str, Any],
+        context: Optional[List[int]],
+    ) -> Tuple[Optional[str], Optional[SemanticQuery], Optional[Dict[str, Any]]]:
+        """
+        応答のキャッシュを参照し、なければ意味の近い質問の応答を探します（OllamaClient._lookup_cachedと同じ）。
+        """
+        cache_key = await self._response_cache_key(model, messages, options, context)
+        cached = await self._call_response_cache(self.response_cache.get, cache_key) if cache_key is not None else None
+        semantic_query = None
+        if cached is None and self.semantic_cache is not None and not context:
+            scope = semantic_scope(model, messages)
+            vector = await self.embed(self.semantic_cache.embedding_model, scope[1]) if scope is not None else None
+            if vector is not None:
+                semantic_query = SemanticQuery(scope[0], vector)
+                cached = self.semantic_cache.lookup(semantic_query)
+        return cache_key, semantic_query, cached
+
+    async def _response_cache_key(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        options: Dict[str, Any],
+        context: Optional[List[int]],
+    ) -> Optional[str]:
+        """
+        応答のキャッシュのキーを作成します。キャッシュが無効な場合、決定的なオプションでない場合、
+        モデルのダイジェストがわからない場合はNoneを返します。
+        """
+        if self.response_cache is None or not is_deterministic(options):
+            return None
+        digest = find_model_digest(await self.list_models(), model)
+        if digest is None:
+            return None
+        return response_cache_key(model, digest, messages, options, context)
+
+    async def _call_response_cache(self, method: Callable[..., Any], *args: Any) -> Any:
+        """
+        応答のキャッシュのメソッドを呼び出します。ディスクを読み書きする場合は別スレッドで実行します。
+        """
+        if self.response_cache.disk is None:
+            return method(*args)
+        return await asyncio.get_running_loop().run_in_executor(None, method, *args)
+
+    def generate_stream(
+        self,
+        model: str,
+        prompt: str,
+        context: Optional[List[int]] = None,
+        system: Optional[str] = None,
+        options: Optional[Dict[str, Any]] = None,
+        callback: Optional[Callable[[str], Any]] = None,
+        cancel_token: Optional[CancellationToken] = None,
+        keep_alive: Optional[Union[str, int]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        前回の応答のコンテキストに続けて /api/generate で応答を生成し、ストリーミングレスポンスを非同期に返します。
+
+        Args:
+            model: 使用するモデル名
+            prompt: 新しいユーザーのメッセージ
+            context: 前回の応答で返されたコンテキスト（省略時は新しい会話）
+            system: システムプロンプト（省略可）
+            options: オプション（省略可）
+            callback: 各チャンクを受け取るコールバック関数。コルーチン関数も指定可能（省略可）
+            cancel_token: 生成の中止を伝えるトークン（省略可）
+            keep_alive: 応答後にモデルをメモリに保持する時間（省略時はサーバーの設定）
+
+        Yields:
+            Dict[str, Any]: 応答（チャンク単位）。最後のチャンクの "context" に次の呼び出しで渡すコンテキストが含まれます
+        """
+        payload: Dict[str, Any] = {"model": model, "prompt": prompt, "options": options or {}}
+        if context:
+            payload["context"] = context
+        if system:
+            payload["system"] = system
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+
+        return self._stream(f"{self.host}/api/generate", payload, callback, cancel_token)
+
+    async def _stream(
+        self,
+        url: str,
+        payload: Dict[str, Any],
+        callback: Optional[Callable[[str], Any]],
+        cancel_token: Optional[CancellationToken],
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        ストリーミングのリクエストを送信し、応答をチャンク単位で返します（chat_streamとgenerate_streamで共有）。
+        """
+        logger.debug("HTTP APIリクエスト: %s, ペイロード: %s", url, LazyPayload(payload))
+        session = await self._get_session()
+        full_content = TextAccumulator()
+        # 所要時間は応答のヘッダーを受信するまで（エラーの応答はraise_for_statusが解放する）
+        with track_backend(url.rsplit("/", 1)[-1]):
+            response = await session.post(url, json=payload)
+            response.raise_for_status()
+        async with response:
+            # 中止されたら応答を閉じ、ollamaに生成を止めさせる（読み取りを待っているタスクも解放される）
+            if cancel_token is not None:
+                cancel_token.add_callback(response.close)
+
+            try:
+                async for content, done, json_obj in aiter_chat_chunks(response.content.iter_chunked(STREAM_CHUNK_SIZE)):
+                    if cancel_token is not None and cancel_token.cancelled:
+                        break
+
+                    full_content.append(content)
+
+                    # コールバック関数が指定されている場合は呼び出す
+                    if callback:
+                        result = callback(content)
+                        if asyncio.iscoroutine(result):
+                            await result
+
+                    if done:
+                        json_obj["message"]["content"] = full_content.getvalue()
+                        yield json_obj
+                        return
+
+                    yield json_obj
+            except Exception:
+                # 中止のために応答を閉じた場合の読み取りエラーは無視する
+                if cancel_token is None or not cancel_token.cancelled:
+                    raise
+
+        if cancel_token is not None and cancel_token.cancelled:
+            yield cancelled_chunk(full_content.getvalue())
+
+    async def chat(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        context: Optional[List[int]] = None,
+        options: Optional[Dict[str, Any]] = None,
+        keep_alive: Optional[Union[str, int]] = None,
+    ) -> Dict[str, Any]:
+        """
+        チャットを実行します。
+
+        Args:
+            model: 使用するモデル名
+            messages: メッセージのリスト
+            context: コンテキスト（省略可）
+            options: オプション（省略可）
+            keep_alive: 応答後にモデルをメモリに保持する時間（省略時はサーバーの設定）
+
+        Returns:
+            Dict[str, Any]: チャットの応答
+        """
+        try:
+            last_json_obj = None
+            async for json_obj in self.chat_stream(model, messages, context=context, options=options, keep_alive=keep_alive):
+                last_json_obj = json_obj
+
+            if last_json_obj and last_json_obj.get("done", False) and last_json_obj["message"]["content"]:
+                return last_json_obj
+            return {"message": {"role": "assistant", "content": "申し訳ありませんが、応答を生成できませんでした。"}}
+        except Exception as e:
+            logger.error("チャットの実行に失敗しました: %s", e)
+            return {"message": {"role": "assistant", "content": f"エラーが発生しました: {str(e)}"}}
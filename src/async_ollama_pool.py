@@ -0,0 +1,374 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+複数のollamaサーバーに非同期に負荷を分散するモジュール。
+
+このモジュールはOllamaPoolの非同期版を提供します。振り分け先の選択とホストごとの状態の記録は
+ollama_pool.pyのPoolRouterを共有し、通信にはAsyncOllamaClientを使用します。
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Union
+
+from src.async_ollama_client import AsyncOllamaClient
+from src.cancellation import CancellationToken
+from src.ollama_client import parse_running_models_response
+from src.ollama_pool import NoHealthyBackend, PoolMember, PoolRouter, normalize_model_name
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncOllamaPool:
+    """
+    複数のollamaサーバーに非同期に負荷を分散するクラス。
+
+    AsyncOllamaClientと同じメソッドを提供するため、async_app.pyではAsyncOllamaClientの代わりに使用できます。
+    ヘルスチェックはlist_running_modelsの呼び出し（AsyncSystemMonitorによる定期的な取得）で行います。
+    """
+
+    def __init__(
+        self,
+        hosts: List[str],
+        failure_threshold: int = 3,
+        eject_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+        **client_kwargs: Any,
+    ):
+        """
+        AsyncOllamaPoolクラスのコンストラクタ。
+
+        Args:
+            hosts: ollamaサーバーのホストのリスト
+            failure_threshold: 振り分けの対象から外すまでの連続失敗回数（デフォルト: 3）
+            eject_seconds: 振り分けの対象から外す秒数（デフォルト: 30.0）
+            clock: 現在時刻を返す関数（テスト用、デフォルト: time.monotonic）
+            **client_kwargs: 各ホストのAsyncOllamaClientに渡す引数
+        """
+        members = [PoolMember(host.rstrip("/"), AsyncOllamaClient(host=host, **client_kwargs)) for host in hosts]
+        self.router = PoolRouter(members, failure_threshold=failure_threshold, eject_seconds=eject_seconds, clock=clock)
+
+    @property
+    def members(self) -> List[PoolMember]:
+        """
+        プールに含まれるホストのリスト。
+        """
+        return self.router.members
+
+    async def _check_member(self, member: PoolMember) -> List[Dict[str, Any]]:
+        """
+        1つのホストの /api/ps を取得し、正常性とロード済みのモデルを更新します。
+        """
+        try:
+            data = await member.client.fetch_ps()
+        except Exception as e:
+            logger.warning("ollamaサーバー %s のヘルスチェックに失敗しました: %s", member.host, e)
+            self.router.update_health(member, error=e)
+            return []
+        self.router.update_health(member, data)
+        return [dict(model, host=member.host) for model in parse_running_models_response(data)]
+
+    async def check_health(self) -> List[Dict[str, Any]]:
+        """
+        すべてのホストの /api/ps を並行して取得し、正常性とロード済みのモデルを更新します。
+
+        Returns:
+            List[Dict[str, Any]]: 起動中のモデル情報のリスト（各要素に "host" を含む）
+        """
+        results = await asyncio.gather(*(self._check_member(member) for member in self.members))
+        return [model for models in results for model in models]
+
+    async def list_running_models(self) -> List[Dict[str, Any]]:
+        """
+        すべてのホストで起動中のモデルの一覧を取得します。あわせてヘルスチェックを行います。
+
+        Returns:
+            List[Dict[str, Any]]: 起動中のモデル情報のリスト（各要素に "host" を含む）
+        """
+        return await self.check_health()
+
+    async def list_models(self) -> List[Dict[str, Any]]:
+        """
+        振り分けの対象のホストで利用可能なモデルの一覧を取得します。同じ名前のモデルは1つにまとめます。
+
+        Returns:
+            List[Dict[str, Any]]: モデル情報のリスト
+        """
+        results = await asyncio.gather(*(member.client.list_models() for member in self.router.candidates()))
+        models: Dict[str, Dict[str, Any]] = {}
+        for member_models in results:
+            for model in member_models:
+                models.setdefault(model.get("name", ""), model)
+        return list(models.values())
+
+    async def get_model_info(self, model_name: str) -> Dict[str, Any]:
+        """
+        指定したモデルの情報を、モデルをロード済みのホストから優先して取得します。
+
+        Args:
+            model_name: モデル名
+
+        Returns:
+            Dict[str, Any]: モデル情報（取得できない場合は空）
+        """
+        for member in self.router.candidates(model_name):
+            model_info = await member.client.get_model_info(model_name)
+            if model_info:
+                return model_info
+        return {}
+
+    async def kill_model(self, model_id: str) -> bool:
+        """
+        指定したモデルを終了します。モデルをロード済みのホストがわかる場合はそのホストのみで終了します。
+
+        Args:
+            model_id: 終了するモデルのID（または名前）
+
+        Returns:
+            bool: いずれかのホストで終了に成功した場合はTrue
+        """
+        name = normalize_model_name(model_id)
+        members = [member for member in self.members if name in member.resident_models] or self.members
+        success = False
+        for member in members:
+            if await member.client.kill_model(model_id):
+                success = True
+                self.router.record_unloaded(member, model_id)
+        return success
+
+    def chat_stream(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        context: Optional[List[int]] = None,
+        options: Optional[Dict[str, Any]] = None,
+        callback: Optional[Callable[[str], Any]] = None,
+        cancel_token: Optional[CancellationToken] = None,
+        keep_alive: Optional[Union[str, int]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        モデルをロード済みで負荷の低いホストでチャットを実行し、ストリーミングレスポンスを非同期に返します。
+
+        最初のチャンクを受信する前に失敗した場合は次の候補のホストで再試行します。
+
+        Args:
+            model: 使用するモデル名
+            messages: メッセージのリスト
+            context: コンテキスト（省略可）
+            options: オプション（省略可）
+            callback: 各チャンクを受け取るコールバック関数。コルーチン関数も指定可能（省略可）
+            cancel_token: 生成の中止を伝えるトークン（省略可）
+            keep_alive: 応答後にモデルをメモリに保持する時間（省略時はサーバーの設定）
+
+        Returns:
+            AsyncIterator[Dict[str, Any]]: チャットの応答（チャンク単位）
+
+        Raises:
+            NoHealthyBackend: すべてのホストで最初のチャンクを受信する前に失敗した場合
+        """
+        return self._route_stream(
+            model,
+            cancel_token,
+            lambda client: client.chat_stream(
+                model,
+                messages,
+                context=context,
+                options=options,
+                callback=callback,
+                cancel_token=cancel_token,
+                keep_alive=keep_alive,
+            ),
+        )
+
+    def generate_stream(
+        self,
+        model: str,
+        prompt: str,
+        context: Optional[List[int]] = None,
+        system: Optional[str] = None,
+        options: Optional[Dict[str, Any]] = None,
+        callback: Optional[Callable[[str], Any]] = None,
+        cancel_token: Optional[CancellationToken] = None,
+        keep_alive: Optional[Union[str, int]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        モデルをロード済みで負荷の低いホストで、前回の応答のコンテキストに続けて応答を生成します。
+
+        コンテキストはモデルごとのトークン列のため、前回と異なるホストで生成しても続きになります。
+
+        Args:
+            model: 使用するモデル名
+            prompt: 新しいユーザーのメッセージ
+            context: 前回の応答で返されたコンテキスト（省略時は新しい会話）
+            system: システムプロンプト（省略可）
+            options: オプション（省略可）
+            callback: 各チャンクを受け取るコールバック関数。コルーチン関数も指定可能（省略可）
+            cancel_token: 生成の中止を伝えるトークン（省略可）
+            keep_alive: 応答後にモデルをメモリに保持する時間（省略時はサーバーの設定）
+
+        Returns:
+            AsyncIterator[Dict[str, Any]]: 応答（チャンク単位）
+
+        Raises:
+            NoHealthyBackend: すべてのホストで最初のチャンクを受信する前に失敗した場合
+        """
+        return self._route_stream(
+            model,
+            cancel_token,
+            lambda client: client.generate_stream(
+                model,
+                prompt,
+                context=context,
+                system=system,
+                options=options,
+                callback=callback,
+                cancel_token=cancel_token,
+                keep_alive=keep_alive,
+            ),
+        )
+
+    async def _route_stream(
+        self,
+        model: str,
+        cancel_token: Optional[CancellationToken],
+        open_stream: Callable[[Any], AsyncIterator[Dict[str, Any]]],
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        候補のホストの順にストリーミング応答を開始し、最初のチャンクを受信する前に失敗した場合は次のホストで再試行します。
+        """
+        errors = []
+        for member in self.router.candidates(model):
+            started = False
+            self.router.acquire(member)
+            try:
+                async for chunk in open_stream(member.client):
+                    started = True
+                    yield chunk
+            except Exception as e:
+                self.router.record_failure(member, e)
+                if started or (cancel_token is not None and cancel_token.cancelled):
+                    raise
+                logger.warning("ollamaサーバー %s でのチャットに失敗したため、次のホストで再試行します: %s", member.host, e)
+                errors.append(f"{member.host}: {e}")
+                continue
+            finally:
+                self.router.release(member)
+            self.router.record_success(member, model)
+            return
+        raise NoHealthyBackend(f"チャットを実行できるollamaサーバーがありません（{', '.join(errors)}）")
+
+    async def chat(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        context: Optional[List[int]] = None,
+        options: Optional[Dict[str, Any]] = None,
+        keep_alive: Optional[Union[str, int]] = None,
+    ) -> Dict[str, Any]:
+        """
+        モデルをロード済みで負荷の低いホストでチャットを実行します。
+
+        Args:
+            model: 使用するモデル名
+            messages: メッセージのリスト
+            context: コンテキスト（省略可）
+            options: オプション（省略可）
+            keep_alive: 応答後にモデルをメモリに保持する時間（省略時はサーバーの設定）
+
+        Returns:
+            Dict[str, Any]: チャットの応答
+        """
+        member = self.router.candidates(model)[0]
+        self.router.acquire(member)
+        try:
+            return await member.client.chat(model, messages, context=context, options=options, keep_alive=keep_alive)
+        finally:
+            self.router.release(member)
+
+    async def embed(self, model: str, text: str) -> Optional[List[float]]:
+        """
+        埋め込みのモデルをロード済みか、負荷の低いホストでテキストの埋め込みベクトルを取得します。
+
+        Args:
+            model: 埋め込みに使用するモデル名
+            text: 埋め込むテキスト
+
+        Returns:
+            Optional[List[float]]: 埋め込みベクトル。取得できない場合はNone
+        """
+        return await self.router.candidates(model)[0].client.embed(model, text)
+
+    async def preload_model(self, model: str, keep_alive: Optional[Union[str, int]] = None) -> bool:
+        """
+        モデルをロード済みか、負荷の低いホストでモデルをロードします。
+
+        Args:
+            model: ロードするモデル名
+            keep_alive: モデルをメモリに保持する時間（省略時はサーバーの設定）
+
+        Returns:
+            bool: ロードに成功した場合はTrue
+        """
+        member = self.router.candidates(model)[0]
+        if not await member.client.preload_model(model, keep_alive=keep_alive):
+            return False
+        self.router.record_success(member, model)
+        return True
+
+    async def get_gpu_info(self) -> List[Dict[str, Any]]:
+        """
+        GPUの情報と使用率を取得します（このマシンのGPUを最初のホストのクライアントで取得）。
+
+        Returns:
+            List[Dict[str, Any]]: GPU情報のリスト
+        """
+        return await self.members[0].client.get_gpu_info()
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """
+        ホストごとの状態とHTTPコネクションプールの統計情報を取得します。
+
+        Returns:
+            Dict[str, Any]: ホストごとの状態とプール統計
+        """
+        return {
+            "backends": self.router.status(),
+            "hosts": {member.host: member.client.get_pool_stats() for member in self.members},
+        }
+
+    def invalidate_cache(self, model_name: Optional[str] = None) -> None:
+        """
+        すべてのホストのモデル一覧とモデル情報のキャッシュを破棄します。
+
+        Args:
+            model_name: モデル情報を破棄するモデル名（省略時はすべてのモデル情報を破棄）
+        """
+        for member in self.members:
+            member.client.invalidate_cache(model_name)
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """
+        ホストごとのキャッシュの統計情報を取得します。
+
+        Returns:
+            Dict[str, Any]: ホストごとのキャッシュの統計
+        """
+        return {member.host: member.client.get_cache_stats() for member in self.members}
+
+    async def get_capabilities(self) -> Dict[str, Any]:
+        """
+        ホストごとのollamaサーバーのバージョンと使用している取得方法を取得します。
+
+        Returns:
+            Dict[str, Any]: ホストごとのバージョンと方法
+        """
+        results = await asyncio.gather(*(member.client.get_capabilities() for member in self.members))
+        return {"backends": [dict(result, host=member.host) for member, result in zip(self.members, results)]}
+
+    async def close(self) -> None:
+        """
+        すべてのホストのHTTPセッションを閉じます。
+        """
+        for member in self.members:
+            await member.client.close()
@@ -0,0 +1,859 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+プロンプトをまとめて実行するバッチジョブのモジュール。
+
+このモジュールはJSONL形式のプロンプト（1行ごとにmodel、messages、options）を受け取り、
+複数のワーカーでOllamaClientのchat_streamを実行して、完了した順に結果をJSONLファイルに書き出します。
+モデルごとの同時実行数は対話の生成と同じスケジューラで制限するため、バッチジョブが対話の生成を
+待たせ続けることはありません。結果のファイルがチェックポイントを兼ねるため、サーバーが停止しても
+成功した結果を残したまま途中から再開できます。
+"""
+
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Set
+
+from src.cancellation import CancellationToken
+from src.metrics import GenerationTimer
+from src.model_warmup import KeepAlivePolicy
+from src.ollama_pool import normalize_model_name
+from src.scheduler import AsyncGenerationScheduler, GenerationScheduler, QueueFull
+
+logger = logging.getLogger(__name__)
+
+# ジョブの状態
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+CANCELLED = "cancelled"
+FAILED = "failed"
+
+# スケジューラでバッチジョブを対話のユーザーと区別するための接頭辞
+BATCH_USER_PREFIX = "batch:"
+
+INPUT_FILE = "input.jsonl"
+OUTPUT_FILE = "output.jsonl"
+META_FILE = "job.json"
+
+# 結果の行に含める最後のチャンクの項目
+RESULT_FIELDS = ("done_reason", "prompt_eval_count", "eval_count", "total_duration", "eval_duration", "cached")
+
+
+def parse_batch_items(data: bytes) -> List[Dict[str, Any]]:
+    """
+    JSONL形式のプロンプトを解析します。
+
+    各行は {"id": 任意, "model": モデル名, "messages": メッセージのリスト, "options": オプション（省略可）} です。
+    idを省略した場合は行番号をidとします。
+
+    Args:
+        data: JSONL形式のプロンプト
+
+    Returns:
+        List[Dict[str, Any]]: id、model、messages、optionsを持つプロンプトのリスト
+
+    Raises:
+        ValueError: 解析できない行や必須の項目がない行、重複したidがある場合
+    """
+    try:
+        text = data.decode("utf-8")
+    except UnicodeDecodeError as e:
+        raise ValueError(f"UTF-8として読み込めません: {e}")
+
+    items = []
+    ids: Set[str] = set()
+    for number, line in enumerate(text.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            obj = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"{number}行目: JSONとして解析できません（{e}）")
+        if not isinstance(obj, dict) or not isinstance(obj.get("model"), str) or not obj["model"]:
+            raise ValueError(f"{number}行目: modelが指定されていません")
+        messages = obj.get("messages")
+        if (
+            not isinstance(messages, list)
+            or not messages
+            or not all(
+                isinstance(m, dict) and isinstance(m.get("role"), str) and isinstance(m.get("content"), str) for m in messages
+            )
+        ):
+            raise ValueError(f"{number}行目: messagesはroleとcontentを持つメッセージのリストで指定してください")
+        options = obj.get("options") or {}
+        if not isinstance(options, dict):
+            raise ValueError(f"{number}行目: optionsはオブジェクトで指定してください")
+        item_id = str(obj.get("id", number))
+        if item_id in ids:
+            raise ValueError(f"{number}行目: id {item_id} が重複しています")
+        ids.add(item_id)
+        items.append({"id": item_id, "model": obj["model"], "messages": messages, "options": options})
+
+    if not items:
+        raise ValueError("プロンプトがありません")
+    return items
+
+
+def parse_workers(value: Optional[str], default: int, max_workers: int) -> int:
+    """
+    ワーカー数のパラメータを解析します。
+
+    Args:
+        value: クエリパラメータの値（省略時はNone）
+        default: 省略時のワーカー数
+        max_workers: ワーカー数の上限
+
+    Returns:
+        int: ワーカー数
+
+    Raises:
+        ValueError: 値が整数でない場合や範囲外の場合
+    """
+    if value is None or value == "":
+        return min(default, max_workers)
+    try:
+        workers = int(value)
+    except ValueError:
+        raise ValueError("workersは整数で指定してください")
+    if not 1 <= workers <= max_workers:
+        raise ValueError(f"workersは1から{max_workers}の範囲で指定してください")
+    return workers
+
+
+def read_checkpoint(path: str) -> Set[str]:
+    """
+    結果のファイルから成功したプロンプトのidを読み込みます。
+
+    途中まで書き込まれた最後の行と失敗した結果の行は取り除いてファイルを書き直すため、
+    再開するとそれらのプロンプトをもう一度実行します。
+
+    Args:
+        path: 結果のファイル
+
+    Returns:
+        Set[str]: 成功したプロンプトのid
+    """
+    if not os.path.exists(path):
+        return set()
+    with open(path, "rb") as f:
+        data = f.read()
+
+    done: Set[str] = set()
+    kept = []
+    for line in data.splitlines(keepends=True):
+        if not line.endswith(b"\n"):
+            break
+        try:
+            result = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(result, dict) and "error" not in result and "id" in result:
+            done.add(str(result["id"]))
+            kept.append(line)
+
+    if sum(len(line) for line in kept) != len(data):
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.writelines(kept)
+        os.replace(temp_path, path)
+    return done
+
+
+class BatchJob:
+    """
+    1つのバッチジョブの状態と進捗を管理するクラス。
+
+    ジョブごとのディレクトリに入力（input.jsonl）、結果（output.jsonl）、状態（job.json）を保存します。
+    """
+
+    def __init__(self, job_id: str, directory: str, workers: int, created_at: Optional[float] = None):
+        """
+        BatchJobクラスのコンストラクタ。
+
+        Args:
+            job_id: ジョブID
+            directory: ジョブのファイルを保存するディレクトリ
+            workers: 同時に実行するワーカー数
+            created_at: 作成時刻（UNIX時間、省略時は現在時刻）
+        """
+        self.id = job_id
+        self.directory = directory
+        self.workers = workers
+        self.created_at = created_at if created_at is not None else time.time()
+        self.state = PENDING
+        self.error: Optional[str] = None
+        self.total = 0
+        # 再開前に成功していたプロンプトの数
+        self.resumed = 0
+        # 今回の実行で完了したプロンプトの数
+        self.completed = 0
+        self.failed = 0
+        self.generated_tokens = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._cancel_event = threading.Event()
+        self._tokens: Set[CancellationToken] = set()
+        self._lock = threading.Lock()
+        self._output = None
+
+    @property
+    def input_path(self) -> str:
+        return os.path.join(self.directory, INPUT_FILE)
+
+    @property
+    def output_path(self) -> str:
+        return os.path.join(self.directory, OUTPUT_FILE)
+
+    @property
+    def cancelled(self) -> bool:
+        """
+        中止を要求されたかどうか。
+        """
+        return self._cancel_event.is_set()
+
+    def save_meta(self) -> None:
+        """
+        ジョブの状態をjob.jsonに保存します。
+        """
+        meta = {
+            "id": self.id,
+            "workers": self.workers,
+            "created_at": self.created_at,
+            "state": self.state,
+            "error": self.error,
+        }
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(temp_path, os.path.join(self.directory, META_FILE))
+
+    @classmethod
+    def load(cls, directory: str) -> "BatchJob":
+        """
+        保存したジョブの状態を読み込みます。
+
+        Args:
+            directory: ジョブのディレクトリ
+
+        Returns:
+            BatchJob: 読み込んだジョブ
+
+        Raises:
+            OSError: job.jsonを読み込めない場合
+            ValueError: job.jsonを解析できない場合
+        """
+        with open(os.path.join(directory, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        job = cls(meta["id"], directory, int(meta["workers"]), created_at=meta.get("created_at"))
+        job.state = meta.get("state", PENDING)
+        job.error = meta.get("error")
+        return job
+
+    def begin(self) -> List[Dict[str, Any]]:
+        """
+        実行を開始し、まだ成功していないプロンプトを返します。
+
+        Returns:
+            List[Dict[str, Any]]: 実行するプロンプトのリスト
+
+        Raises:
+            OSError: ファイルを読み書きできない場合
+            ValueError: 入力を解析できない場合
+        """
+        with open(self.input_path, "rb") as f:
+            items = parse_batch_items(f.read())
+        done = read_checkpoint(self.output_path)
+        with self._lock:
+            self._cancel_event.clear()
+            self.total = len(items)
+            self.resumed = len(done)
+            self.completed = self.failed = self.generated_tokens = 0
+            self.started_at = time.monotonic()
+            self.finished_at = None
+            self.state = RUNNING
+            self.error = None
+            self._output = open(self.output_path, "ab")
+        self.save_meta()
+        return [item for item in items if item["id"] not in done]
+
+    def record(self, item: Dict[str, Any], chunk: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        """
+        1つのプロンプトの結果を結果のファイルに追記します。
+
+        Args:
+            item: 実行したプロンプト
+            chunk: 完全な応答を含む最後のチャンク（成功した場合）
+            error: エラーメッセージ（失敗した場合）
+        """
+        result: Dict[str, Any] = {"id": item["id"], "model": item["model"]}
+        if error is not None:
+            result["error"] = error
+        else:
+            result["message"] = chunk.get("message", {})
+            result.update({field: chunk[field] for field in RESULT_FIELDS if field in chunk})
+        line = json.dumps(result, ensure_ascii=False).encode("utf-8") + b"\n"
+        with self._lock:
+            # 1行ずつ書き出し、停止してもそれまでの結果が残るようにする
+            self._output.write(line)
+            self._output.flush()
+            if error is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+                self.generated_tokens += chunk.get("eval_count", 0)
+
+    def finish(self, error: Optional[str] = None) -> None:
+        """
+        実行を終了し、状態を保存します。
+
+        Args:
+            error: ジョブ全体が失敗した場合のエラーメッセージ（省略可）
+        """
+        with self._lock:
+            if self._output is not None:
+                self._output.close()
+                self._output = None
+            self.finished_at = time.monotonic()
+            if error is not None:
+                self.state = FAILED
+                self.error = error
+            else:
+                self.state = CANCELLED if self.cancelled else COMPLETED
+        try:
+            self.save_meta()
+        except OSError as e:
+            logger.warning("バッチジョブ %s の状態を保存できませんでした: %s", self.id, e)
+
+    def cancel(self) -> None:
+        """
+        ジョブを中止し、実行中の生成を止めます。中止までに成功した結果は残り、再開できます。
+        """
+        self._cancel_event.set()
+        with self._lock:
+            tokens = list(self._tokens)
+        for token in tokens:
+            token.cancel()
+
+    def wait_cancelled(self, timeout: float) -> bool:
+        """
+        中止されるまで最大timeout秒待ちます。
+
+        Returns:
+            bool: 中止された場合はTrue
+        """
+        return self._cancel_event.wait(timeout)
+
+    def track(self, token: CancellationToken) -> None:
+        """
+        実行中の生成のトークンを登録します。既に中止されている場合はすぐに中止します。
+        """
+        with self._lock:
+            self._tokens.add(token)
+        if self.cancelled:
+            token.cancel()
+
+    def untrack(self, token: CancellationToken) -> None:
+        with self._lock:
+            self._tokens.discard(token)
+
+    def status(self) -> Dict[str, Any]:
+        """
+        進捗とスループットを取得します。
+
+        Returns:
+            Dict[str, Any]: 状態、件数、経過時間、1秒あたりの件数とトークン数、残り時間の目安
+        """
+        with self._lock:
+            processed = self.completed + self.failed
+            if self.started_at is None:
+                elapsed = 0.0
+            else:
+                elapsed = (self.finished_at if self.finished_at is not None else time.monotonic()) - self.started_at
+            remaining = max(0, self.total - self.resumed - processed)
+            items_per_second = processed / elapsed if elapsed > 0 else 0.0
+            return {
+                "id": self.id,
+                "state": self.state,
+                "error": self.error,
+                "workers": self.workers,
+                "created_at": self.created_at,
+                "total": self.total,
+                "succeeded": self.resumed + self.completed,
+                "failed": self.failed,
+                "remaining": remaining,
+                "resumed": self.resumed,
+                "elapsed": round(elapsed, 3),
+                "items_per_second": round(items_per_second, 3),
+                "tokens_per_second": round(self.generated_tokens / elapsed, 3) if elapsed > 0 else 0.0,
+                "eta_seconds": round(remaining / items_per_second, 1)
+                if items_per_second > 0 and self.state == RUNNING
+                else None,
+            }
+
+
+class BatchJobManager:
+    """
+    バッチジョブの作成と一覧を管理するクラス。
+
+    実行の方法（スレッドまたはイベントループ）に依存しないため、BatchRunnerとAsyncBatchRunnerで共有します。
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_workers: int = 8,
+        default_workers: int = 2,
+        keep_alive_policy: Optional[KeepAlivePolicy] = None,
+    ):
+        """
+        BatchJobManagerクラスのコンストラクタ。
+
+        Args:
+            directory: ジョブのファイルを保存するディレクトリ（最初のジョブの作成時に作成）
+            max_workers: 1つのジョブのワーカー数の上限（デフォルト: 8）
+            default_workers: ワーカー数を省略した場合のワーカー数（デフォルト: 2）
+            keep_alive_policy: モデルごとのkeep_aliveの設定（省略時はollamaサーバーの設定に従う）
+        """
+        self.directory = directory
+        self.max_workers = max_workers
+        self.default_workers = default_workers
+        self.keep_alive_policy = keep_alive_policy or KeepAlivePolicy()
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, BatchJob] = {}
+
+    def create(self, data: bytes, workers: Optional[str] = None) -> BatchJob:
+        """
+        入力を検証してジョブを作成します。
+
+        Args:
+            data: JSONL形式のプロンプト
+            workers: ワーカー数のパラメータ（省略可）
+
+        Returns:
+            BatchJob: 作成したジョブ（まだ実行していない）
+
+        Raises:
+            ValueError: 入力やワーカー数が不正な場合
+        """
+        worker_count = parse_workers(workers, self.default_workers, self.max_workers)
+        parse_batch_items(data)
+        job_id = uuid.uuid4().hex
+        directory = os.path.join(self.directory, job_id)
+        os.makedirs(directory)
+        with open(os.path.join(directory, INPUT_FILE), "wb") as f:
+            f.write(data)
+        job = BatchJob(job_id, directory, worker_count)
+        job.save_meta()
+        with self._lock:
+            self._jobs[job_id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[BatchJob]:
+        """
+        ジョブを取得します。
+
+        Args:
+            job_id: ジョブID
+
+        Returns:
+            Optional[BatchJob]: ジョブ。存在しない場合はNone
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list_status(self) -> List[Dict[str, Any]]:
+        """
+        すべてのジョブの進捗を作成の新しい順に取得します。
+
+        Returns:
+            List[Dict[str, Any]]: ジョブごとの進捗
+        """
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.status() for job in sorted(jobs, key=lambda job: job.created_at, reverse=True)]
+
+    def _load_saved(self) -> List[BatchJob]:
+        """
+        ディレクトリに保存されたジョブを読み込んで登録し、実行中のまま停止していたジョブを返します。
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        interrupted = []
+        for name in sorted(os.listdir(self.directory)):
+            directory = os.path.join(self.directory, name)
+            if name in self._jobs or not os.path.isfile(os.path.join(directory, META_FILE)):
+                continue
+            try:
+                job = BatchJob.load(directory)
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning("バッチジョブ %s を読み込めませんでした: %s", name, e)
+                continue
+            with self._lock:
+                self._jobs[job.id] = job
+            if job.state in (PENDING, RUNNING):
+                interrupted.append(job)
+        return interrupted
+
+    @staticmethod
+    def _user(job: BatchJob) -> str:
+        return f"{BATCH_USER_PREFIX}{job.id}"
+
+
+class BatchRunner(BatchJobManager):
+    """
+    ジョブごとにスレッドのワーカーでプロンプトを実行するクラス（app.pyで使用）。
+    """
+
+    def __init__(self, ollama_client: Any, scheduler: GenerationScheduler, directory: str, **kwargs: Any):
+        """
+        BatchRunnerクラスのコンストラクタ。
+
+        Args:
+            ollama_client: ollamaクライアントまたはプール
+            scheduler: モデルごとの同時実行数を制限するスケジューラ（対話の生成と共有）
+            directory: ジョブのファイルを保存するディレクトリ
+            **kwargs: BatchJobManagerに渡す引数
+        """
+        super().__init__(directory, **kwargs)
+        self.ollama_client = ollama_client
+        self.scheduler = scheduler
+        self._threads: Dict[str, threading.Thread] = {}
+
+    def submit(self, data: bytes, workers: Optional[str] = None) -> BatchJob:
+        """
+        ジョブを作成して実行を開始します。
+
+        Args:
+            data: JSONL形式のプロンプト
+            workers: ワーカー数のパラメータ（省略可）
+
+        Returns:
+            BatchJob: 作成したジョブ
+
+        Raises:
+            ValueError: 入力やワーカー数が不正な場合
+        """
+        job = self.create(data, workers)
+        self._start(job)
+        return job
+
+    def resume(self, job_id: str) -> Optional[BatchJob]:
+        """
+        中止、失敗、停止したジョブを、成功していないプロンプトから再開します。
+
+        完了したジョブを再開すると、失敗したプロンプトだけをもう一度実行します。
+
+        Args:
+            job_id: ジョブID
+
+        Returns:
+            Optional[BatchJob]: 再開したジョブ。存在しない場合はNone
+
+        Raises:
+            ValueError: ジョブが実行中の場合
+        """
+        job = self.get(job_id)
+        if job is None:
+            return None
+        self._start(job)
+        return job
+
+    def cancel(self, job_id: str) -> Optional[BatchJob]:
+        """
+        ジョブを中止します。
+
+        Args:
+            job_id: ジョブID
+
+        Returns:
+            Optional[BatchJob]: 中止したジョブ。存在しない場合はNone
+        """
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+        return job
+
+    def recover(self) -> List[BatchJob]:
+        """
+        保存されたジョブを読み込み、サーバーの停止で中断していたジョブを再開します。
+
+        Returns:
+            List[BatchJob]: 再開したジョブ
+        """
+        interrupted = self._load_saved()
+        for job in interrupted:
+            logger.info("中断していたバッチジョブ %s を再開します", job.id)
+            self._start(job)
+        return interrupted
+
+    def join(self, job_id: str, timeout: Optional[float] = None) -> None:
+        """
+        ジョブの実行の終了を待ちます（テストやシャットダウン用）。
+        """
+        with self._lock:
+            thread = self._threads.get(job_id)
+        if thread is not None:
+            thread.join(timeout)
+
+    def _start(self, job: BatchJob) -> None:
+        thread = threading.Thread(target=self._run, args=(job,), name=f"batch-{job.id[:8]}", daemon=True)
+        with self._lock:
+            running = self._threads.get(job.id)
+            if running is not None and running.is_alive():
+                raise ValueError("ジョブは実行中です")
+            self._threads[job.id] = thread
+        thread.start()
+
+    def _run(self, job: BatchJob) -> None:
+        try:
+            items = job.begin()
+        except (OSError, ValueError) as e:
+            logger.error("バッチジョブ %s を開始できませんでした: %s", job.id, e)
+            job.finish(error=str(e))
+            return
+
+        pending = iter(items)
+        pending_lock = threading.Lock()
+
+        def work() -> None:
+            while not job.cancelled:
+                with pending_lock:
+                    item = next(pending, None)
+                if item is None:
+                    return
+                self._run_item(job, item)
+
+        workers = [
+            threading.Thread(target=work, name=f"batch-{job.id[:8]}-{i}", daemon=True)
+            for i in range(min(job.workers, len(items)))
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        job.finish()
+        logger.info("バッチジョブ %s が終了しました: %s", job.id, LazyStatus(job))
+
+    def _acquire(self, job: BatchJob, model: str, token: CancellationToken):
+        # 待ち行列が一杯の場合は目安の秒数だけ待ってから並び直す
+        while True:
+            try:
+                return self.scheduler.acquire(model, self._user(job), cancel_token=token)
+            except QueueFull as e:
+                if job.wait_cancelled(e.retry_after):
+                    return None
+
+    def _run_item(self, job: BatchJob, item: Dict[str, Any]) -> None:
+        token = CancellationToken()
+        job.track(token)
+        ticket = None
+        timer = None
+        try:
+            ticket = self._acquire(job, item["model"], token)
+            if ticket is None:
+                return
+            timer = GenerationTimer(normalize_model_name(item["model"]))
+            final = None
+            for chunk in self.ollama_client.chat_stream(
+                model=item["model"],
+                messages=item["messages"],
+                options=item["options"],
+                callback=timer.on_chunk,
+                cancel_token=token,
+                keep_alive=self.keep_alive_policy.for_model(item["model"]),
+            ):
+                final = chunk
+            # 中止された生成は記録せず、再開したときにもう一度実行する
+            if final is None or final.get("cancelled"):
+                timer.finish("cancelled")
+                return
+            timer.finish("completed", final)
+            job.record(item, final)
+        except Exception as e:
+            logger.warning("バッチジョブ %s のプロンプト %s の実行に失敗しました: %s", job.id, item["id"], e)
+            job.record(item, error=str(e))
+        finally:
+            if timer is not None:
+                timer.finish("error")
+            if ticket is not None:
+                self.scheduler.release(ticket)
+            job.untrack(token)
+
+
+class AsyncBatchRunner(BatchJobManager):
+    """
+    ジョブごとにイベントループ上のタスクのワーカーでプロンプトを実行するクラス（async_app.pyで使用）。
+    """
+
+    def __init__(self, ollama_client: Any, scheduler: AsyncGenerationScheduler, directory: str, **kwargs: Any):
+        """
+        AsyncBatchRunnerクラスのコンストラクタ。
+
+        Args:
+            ollama_client: 非同期ollamaクライアントまたはプール
+            scheduler: モデルごとの同時実行数を制限するスケジューラ（対話の生成と共有）
+            directory: ジョブのファイルを保存するディレクトリ
+            **kwargs: BatchJobManagerに渡す引数
+        """
+        super().__init__(directory, **kwargs)
+        self.ollama_client = ollama_client
+        self.scheduler = scheduler
+        self._tasks: Dict[str, "asyncio.Task"] = {}
+
+    async def submit(self, data: bytes, workers: Optional[str] = None) -> BatchJob:
+        """
+        ジョブを作成して実行を開始します（BatchRunner.submitと同じ）。
+        """
+        job = await asyncio.get_running_loop().run_in_executor(None, self.create, data, workers)
+        self._start(job)
+        return job
+
+    def resume(self, job_id: str) -> Optional[BatchJob]:
+        """
+        中止、失敗、停止したジョブを再開します（BatchRunner.resumeと同じ）。
+        """
+        job = self.get(job_id)
+        if job is None:
+            return None
+        self._start(job)
+        return job
+
+    def cancel(self, job_id: str) -> Optional[BatchJob]:
+        """
+        ジョブを中止します。
+        """
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+        return job
+
+    async def recover(self) -> List[BatchJob]:
+        """
+        保存されたジョブを読み込み、サーバーの停止で中断していたジョブを再開します。
+        """
+        interrupted = await asyncio.get_running_loop().run_in_executor(None, self._load_saved)
+        for job in interrupted:
+            logger.info("中断していたバッチジョブ %s を再開します", job.id)
+            self._start(job)
+        return interrupted
+
+    async def join(self, job_id: str) -> None:
+        """
+        ジョブの実行の終了を待ちます（テストやシャットダウン用）。
+        """
+        task = self._tasks.get(job_id)
+        if task is not None:
+            await asyncio.shield(task)
+
+    async def close(self) -> None:
+        """
+        実行中のジョブを中止して終了を待ちます。中止までに成功した結果は残り、次回の起動時に再開されます。
+        """
+        tasks = [task for task in self._tasks.values() if not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _start(self, job: BatchJob) -> None:
+        task = self._tasks.get(job.id)
+        if task is not None and not task.done():
+            raise ValueError("ジョブは実行中です")
+        self._tasks[job.id] = asyncio.get_running_loop().create_task(self._run(job))
+
+    async def _run(self, job: BatchJob) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            items = await loop.run_in_executor(None, job.begin)
+        except (OSError, ValueError) as e:
+            logger.error("バッチジョブ %s を開始できませんでした: %s", job.id, e)
+            await loop.run_in_executor(None, job.finish, str(e))
+            return
+
+        pending = iter(items)
+
+        async def work() -> None:
+            while not job.cancelled:
+                item = next(pending, None)
+                if item is None:
+                    return
+                await self._run_item(job, item)
+
+        try:
+            await asyncio.gather(*(work() for _ in range(min(job.workers, len(items)))))
+        except asyncio.CancelledError:
+            # シャットダウンでは状態を実行中のまま残し、次回の起動時に再開する
+            job.cancel()
+            job.finish()
+            job.state = RUNNING
+            job.save_meta()
+            raise
+        await loop.run_in_executor(None, job.finish)
+        logger.info("バッチジョブ %s が終了しました: %s", job.id, LazyStatus(job))
+
+    async def _acquire(self, job: BatchJob, model: str, token: CancellationToken):
+        while True:
+            try:
+                return await self.scheduler.acquire(model, self._user(job), cancel_token=token)
+            except QueueFull as e:
+                await asyncio.sleep(e.retry_after)
+                if job.cancelled:
+                    return None
+
+    async def _run_item(self, job: BatchJob, item: Dict[str, Any]) -> None:
+        token = CancellationToken()
+        job.track(token)
+        ticket = None
+        timer = None
+        try:
+            ticket = await self._acquire(job, item["model"], token)
+            if ticket is None:
+                return
+            timer = GenerationTimer(normalize_model_name(item["model"]))
+            final = None
+            stream = self.ollama_client.chat_stream(
+                model=item["model"],
+                messages=item["messages"],
+                options=item["options"],
+                callback=timer.on_chunk,
+                cancel_token=token,
+                keep_alive=self.keep_alive_policy.for_model(item["model"]),
+            )
+            async for chunk in stream:
+                final = chunk
+            if final is None or final.get("cancelled"):
+                timer.finish("cancelled")
+                return
+            timer.finish("completed", final)
+            job.record(item, final)
+        except Exception as e:
+            logger.warning("バッチジョブ %s のプロンプト %s の実行に失敗しました: %s", job.id, item["id"], e)
+            job.record(item, error=str(e))
+        finally:
+            if timer is not None:
+                timer.finish("error")
+            if ticket is not None:
+                self.scheduler.release(ticket)
+            job.untrack(token)
+
+
+class LazyStatus:
+    """
+    ログに出力するときだけジョブの進捗を文字列にするラッパー。
+    """
+
+    def __init__(self, job: BatchJob):
+        self.job = job
+
+    def __str__(self) -> str:
+        status = self.job.status()
+        return (
+            f"状態 {status['state']}、成功 {status['succeeded']}/{status['total']}件、失敗 {status['failed']}件、"
+            f"{status['items_per_second']}件/秒"
+        )
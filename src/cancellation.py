@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+応答の生成の中止を伝えるモジュール。
+
+このモジュールは生成を中止する側（stop_generationイベントや切断の処理）と、
+生成を実行している側（chat_stream）の間で中止を伝えるトークンを提供します。
+"""
+
+import logging
+import threading
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CancellationToken:
+    """
+    生成の中止を伝えるトークン。
+
+    中止されると登録されたコールバック（ollamaへのHTTPレスポンスを閉じる処理など）を呼び出し、
+    応答の待機中のスレッドやタスクもすぐに解放されるようにします。
+    """
+
+    def __init__(self, owner: Optional[str] = None):
+        """
+        CancellationTokenクラスのコンストラクタ。
+
+        Args:
+            owner: 生成を開始した接続のsid（切断時に中止する対象の判定に使用、省略可）
+        """
+        self.owner = owner
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+
+    @property
+    def cancelled(self) -> bool:
+        """
+        中止されたかどうか。
+        """
+        return self._event.is_set()
+
+    def cancel(self) -> bool:
+        """
+        生成を中止し、登録されたコールバックを呼び出します。
+
+        Returns:
+            bool: このトークンを初めて中止した場合はTrue
+        """
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning("生成の中止処理に失敗しました: %s", e)
+        return True
+
+    def add_callback(self, callback: Callable[[], None]) -> None:
+        """
+        中止されたときに呼び出すコールバックを登録します。既に中止されている場合はすぐに呼び出します。
+
+        Args:
+            callback: 引数のない関数
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+ollamaサーバーとの通信方法を選択するモジュール。
+
+このモジュールは操作ごとに複数の取得方法（ollama-python、HTTP API、コマンドライン）を順に試し、
+成功した方法を記録します。次回以降は記録した方法を最初に使用し、失敗した場合や
+一定時間が経過した場合のみ他の方法を試し直します。
+"""
+
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+
+class NoStrategySucceeded(Exception):
+    """
+    すべての方法が失敗した場合に送出される例外。
+    """
+
+    def __init__(self, operation: str, errors: List[Tuple[str, Exception]]):
+        """
+        NoStrategySucceededクラスのコンストラクタ。
+
+        Args:
+            operation: 操作名
+            errors: 方法の名前と発生した例外のリスト
+        """
+        self.operation = operation
+        self.errors = errors
+        details = ", ".join(f"{name}: {error}" for name, error in errors)
+        super().__init__(f"{operation} のすべての方法が失敗しました（{details}）")
+
+
+class StrategyNegotiator:
+    """
+    操作ごとに成功した方法を記録し、次回以降に優先して使用するクラス。
+
+    方法は (名前, 関数) のリストで渡し、関数は失敗時に例外を送出します。
+    """
+
+    def __init__(self, ttl: float = 300.0, clock: Callable[[], float] = time.monotonic):
+        """
+        StrategyNegotiatorクラスのコンストラクタ。
+
+        Args:
+            ttl: 記録した方法を有効とみなす秒数。経過後は最初の方法から試し直す（デフォルト: 300.0）
+            clock: 現在時刻を返す関数（テスト用、デフォルト: time.monotonic）
+        """
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        # 操作名 -> (方法の名前, 記録した時刻)
+        self._chosen: Dict[str, Tuple[str, float]] = {}
+        self.probe_count = 0
+
+    def preferred(self, operation: str) -> Optional[str]:
+        """
+        操作に対して記録されている方法を取得します。
+
+        Args:
+            operation: 操作名
+
+        Returns:
+            Optional[str]: 方法の名前。記録がないか期限切れの場合はNone
+        """
+        with self._lock:
+            chosen = self._chosen.get(operation)
+            if chosen is None or self._clock() - chosen[1] > self.ttl:
+                return None
+            return chosen[0]
+
+    def _begin(self, operation: str, strategies: Sequence[Tuple[str, Any]]) -> Tuple[Optional[str], List[Tuple[str, Any]]]:
+        """
+        記録されている方法を先頭にした試行順を作成します。
+
+        Returns:
+            Tuple[Optional[str], List[Tuple[str, Any]]]: 記録されている方法の名前と試行順
+        """
+        preferred = self.preferred(operation)
+        if preferred is None:
+            self.probe_count += 1
+        ordered = [strategy for strategy in strategies if strategy[0] == preferred]
+        ordered += [strategy for strategy in strategies if strategy[0] != preferred]
+        return preferred, ordered
+
+    def _succeeded(self, operation: str, name: str, preferred: Optional[str]) -> None:
+        """
+        成功した方法を記録します。
+
+        記録済みの方法が成功し続ける間は記録時刻を更新しないため、ttl秒ごとに最初の方法から試し直します。
+        """
+        if name != preferred:
+            with self._lock:
+                self._chosen[operation] = (name, self._clock())
+
+    def _failed(self, operation: str, name: str) -> None:
+        """
+        記録されている方法が失敗した場合に記録を破棄します。
+        """
+        with self._lock:
+            chosen = self._chosen.get(operation)
+            if chosen is not None and chosen[0] == name:
+                del self._chosen[operation]
+
+    def run(self, operation: str, strategies: Sequence[Tuple[str, Callable[[], Any]]]) -> Any:
+        """
+        記録されている方法から順に実行し、最初に成功した結果を返します。
+
+        Args:
+            operation: 操作名
+            strategies: 方法の名前と関数のリスト（記録がない場合に試す順序）
+
+        Returns:
+            Any: 成功した方法の戻り値
+
+        Raises:
+            NoStrategySucceeded: すべての方法が失敗した場合
+        """
+        preferred, ordered = self._begin(operation, strategies)
+        errors = []
+        for name, strategy in ordered:
+            try:
+                result = strategy()
+            except Exception as e:
+                errors.append((name, e))
+                self._failed(operation, name)
+                continue
+            self._succeeded(operation, name, preferred)
+            return result
+        raise NoStrategySucceeded(operation, errors)
+
+    async def run_async(self, operation: str, strategies: Sequence[Tuple[str, Callable[[], Awaitable[Any]]]]) -> Any:
+        """
+        runの非同期版。方法はコルーチン関数で指定します。
+
+        Args:
+            operation: 操作名
+            strategies: 方法の名前とコルーチン関数のリスト
+
+        Returns:
+            Any: 成功した方法の戻り値
+
+        Raises:
+            NoStrategySucceeded: すべての方法が失敗した場合
+        """
+        preferred, ordered = self._begin(operation, strategies)
+        errors = []
+        for name, strategy in ordered:
+            try:
+                result = await strategy()
+            except Exception as e:
+                errors.append((name, e))
+                self._failed(operation, name)
+                continue
+            self._succeeded(operation, name, preferred)
+            return result
+        raise NoStrategySucceeded(operation, errors)
+
+    def forget(self, operation: Optional[str] = None) -> None:
+        """
+        記録した方法を破棄します。
+
+        Args:
+            operation: 破棄する操作名（省略時はすべて）
+        """
+        with self._lock:
+            if operation is None:
+                self._chosen.clear()
+            else:
+                self._chosen.pop(operation, None)
+
+    def report(self) -> Dict[str, str]:
+        """
+        操作ごとに記録されている方法を取得します。
+
+        Returns:
+            Dict[str, str]: 操作名と方法の名前の辞書（期限切れのものを除く）
+        """
+        with self._lock:
+            now = self._clock()
+            return {operation: name for operation, (name, at) in self._chosen.items() if now - at <= self.ttl}
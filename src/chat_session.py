@@ -4,9 +4,16 @@
 チャットセッションを管理するモジュール。
 
 このモジュールはチャットの履歴やコンテキストを管理します。
+ストアを指定した場合はメッセージを追加するたびに保存し、メモリには直近のメッセージだけを保持します。
 """
 
-from typing import Dict, List, Literal
+import threading
+import uuid
+from typing import Any, Dict, List, Literal, Optional, Set, Tuple
+
+from src.cancellation import CancellationToken
+from src.conversation_store import ConversationStore
+from src.context_window import SlidingWindowStrategy, TrimStrategy, estimate_message_tokens
 
 
 class ChatSession:
@@ -14,37 +21,266 @@ class ChatSession:
     チャットセッションを管理するクラス。
 
     チャットの履歴やコンテキストを保持し、メッセージの追加や取得を行います。
+    セッションごとに選択中のモデルとモデルパラメータも保持します。
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        model: Optional[str] = None,
+        params: Optional[Dict[str, Any]] = None,
+        trim_strategy: Optional[TrimStrategy] = None,
+        store: Optional[ConversationStore] = None,
+        owner: Optional[str] = None,
+        max_resident_messages: Optional[int] = None,
+    ):
         """
         ChatSessionクラスのコンストラクタ。
 
         チャット履歴を初期化します。
+
+        Args:
+            model: 選択中のモデル名（省略可）
+            params: モデルパラメータ（省略可）
+            trim_strategy: 履歴を絞り込む戦略（省略時はSlidingWindowStrategy）
+            store: メッセージを保存するストア（省略時は保存しない）
+            owner: 会話を所有するクライアントID（ストアに記録する、省略可）
+            max_resident_messages: メモリに保持するメッセージ数の上限（省略時は無制限、固定されたメッセージは常に保持）
         """
         self.messages: List[Dict[str, str]] = []
+        # メッセージごとの会話内の通し番号（messagesと同じ順序）
+        self.seqs: List[int] = []
+        # 次に追加するメッセージの通し番号
+        self.next_seq = 0
+        # メッセージごとの推定トークン数（messagesと同じ順序）
+        self.token_counts: List[int] = []
+        self.total_tokens = 0
+        # 固定されたメッセージのインデックス
+        self.pinned: Set[int] = set()
+        self.trim_strategy = trim_strategy or SlidingWindowStrategy()
+        # Socket.IOのルーム名として使用する会話ID
+        self.conversation_id = uuid.uuid4().hex
+        self.model = model
+        self.params: Dict[str, Any] = dict(params or {})
+        # 複数のハンドラから同時に操作される場合に備えたロック
+        self.lock = threading.RLock()
+        # 実行中の応答の生成（stop_generationや切断時に中止する）
+        self.generations: List[CancellationToken] = []
+        # モデルごとの /api/generate が返したコンテキストと、それに含まれる履歴のメッセージ数
+        self.contexts: Dict[str, Tuple[List[int], int]] = {}
+        self.store = store
+        self.owner = owner
+        self.max_resident_messages = max_resident_messages
+        # 現在の会話をストアに記録したかどうか（最初のメッセージの追加時に記録する）
+        self._stored = False
+
+    def restore(self, conversation_id: str, messages: List[Dict[str, Any]]) -> None:
+        """
+        ストアから読み出した会話の直近のメッセージで履歴を置き換えます。
+
+        Args:
+            conversation_id: 会話ID
+            messages: ストアのload_messagesが返したメッセージのリスト（古い順）
+        """
+        with self.lock:
+            self._reset_locked(conversation_id)
+            for message in messages:
+                self._append_locked(message["role"], message["content"], message.get("pinned", False), message["seq"])
+            self.next_seq = messages[-1]["seq"] + 1 if messages else 0
+            self._stored = True
+            self._evict_locked()
 
-    def add_message(self, role: Literal["user", "assistant"], content: str) -> None:
+    def add_message(self, role: Literal["system", "user", "assistant"], content: str, pinned: bool = False) -> None:
         """
         チャット履歴にメッセージを追加します。
 
         Args:
-            role: メッセージの送信者（'user'または'assistant'）
+            role: メッセージの送信者（'system'、'user'または'assistant'）
             content: メッセージの内容
+            pinned: 履歴を絞り込む際に常に残すかどうか（デフォルト: False）
+        """
+        with self.lock:
+            seq = self.next_seq
+            self.next_seq += 1
+            self._append_locked(role, content, pinned, seq)
+            if self.store is not None:
+                if not self._stored:
+                    self.store.start_conversation(self.conversation_id, self.owner, self.model)
+                    self._stored = True
+                self.store.append(self.conversation_id, seq, role, content, pinned)
+            self._evict_locked()
+
+    def _append_locked(self, role: str, content: str, pinned: bool, seq: int) -> None:
+        """
+        ロック取得済みの状態でメモリの履歴にメッセージを追加します。
+        """
+        message = {"role": role, "content": content}
+        tokens = estimate_message_tokens(message)
+        if pinned:
+            self.pinned.add(len(self.messages))
+        self.messages.append(message)
+        self.seqs.append(seq)
+        self.token_counts.append(tokens)
+        self.total_tokens += tokens
+
+    def _evict_locked(self) -> None:
+        """
+        ロック取得済みの状態で、メモリに保持するメッセージ数の上限を超えた分を古いものから破棄します。
+
+        固定されたメッセージは破棄しません。破棄したメッセージはストアからページ単位で読み出せます。
         """
-        self.messages.append({"role": role, "content": content})
+        if self.max_resident_messages is None:
+            return
+        excess = len(self.messages) - self.max_resident_messages
+        if excess <= 0:
+            return
+        kept = []
+        for index in range(len(self.messages)):
+            if excess > 0 and index not in self.pinned:
+                excess -= 1
+                self.total_tokens -= self.token_counts[index]
+            else:
+                kept.append(index)
+        self.pinned = {position for position, index in enumerate(kept) if index in self.pinned}
+        self.messages = [self.messages[index] for index in kept]
+        self.seqs = [self.seqs[index] for index in kept]
+        self.token_counts = [self.token_counts[index] for index in kept]
 
     def get_messages(self) -> List[Dict[str, str]]:
         """
-        チャット履歴のすべてのメッセージを取得します。
+        メモリに保持しているチャット履歴のメッセージを取得します。
+
+        Returns:
+            List[Dict[str, str]]: チャット履歴のメッセージリスト（コピー）
+        """
+        with self.lock:
+            return list(self.messages)
+
+    def get_context_window(self, budget: int, strategy: Optional[TrimStrategy] = None) -> List[Dict[str, str]]:
+        """
+        トークン数の上限に収まるように絞り込んだチャット履歴を取得します。
+
+        Args:
+            budget: トークン数の上限
+            strategy: 絞り込みの戦略（省略時はセッションの戦略）
+
+        Returns:
+            List[Dict[str, str]]: 絞り込まれたメッセージリスト
+        """
+        with self.lock:
+            if self.total_tokens <= budget:
+                return list(self.messages)
+            messages = list(self.messages)
+            token_counts = list(self.token_counts)
+            pinned = set(self.pinned)
+
+        # 要約などで時間がかかる場合があるため、ロックを解放してから絞り込む
+        return (strategy or self.trim_strategy).trim(messages, token_counts, pinned, budget)
+
+    def set_context(self, model: str, context: List[int]) -> None:
+        """
+        応答の生成で返されたコンテキストを、現在の履歴のすべてのメッセージを含むものとして記録します。
+
+        応答のメッセージを履歴に追加した後に呼び出します。
+
+        Args:
+            model: 応答を生成したモデル名
+            context: ollamaが返したコンテキスト（トークン列）
+        """
+        with self.lock:
+            self.contexts[model] = (list(context), self.next_seq)
+
+    def get_pending_prompt(self, model: str, max_context_tokens: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        記録したコンテキストに続けて生成するためのプロンプトを取得します。
+
+        コンテキストの記録後に追加されたメッセージが新しいユーザーのメッセージ1件だけの場合に、
+        そのメッセージとコンテキストを返します。会話の最初の場合は先頭のシステムメッセージをsystemとして返します。
+        中止された応答が追加された場合など、コンテキストと履歴が一致しない場合や、
+        コンテキストがmax_context_tokensを超えた場合はNoneを返します（以降は履歴を絞り込んで送信します）。
+
+        Args:
+            model: 使用するモデル名
+            max_context_tokens: 続けて生成するコンテキストのトークン数の上限（省略可）
+
+        Returns:
+            Optional[Dict[str, Any]]: "prompt"、"context"、"system" を含む辞書。続けて生成できない場合はNone
+        """
+        with self.lock:
+            context, covered = self.contexts.get(model, (None, 0))
+            if context is not None and max_context_tokens is not None and len(context) > max_context_tokens:
+                return None
+            pending = [message for message, seq in zip(self.messages, self.seqs) if seq >= covered]
+            system = None
+            if context is None:
+                system_messages = []
+                while pending and pending[0]["role"] == "system":
+                    system_messages.append(pending[0]["content"])
+                    pending = pending[1:]
+                system = "\n\n".join(system_messages) or None
+            if len(pending) != 1 or pending[0]["role"] != "user":
+                return None
+            return {"prompt": pending[0]["content"], "context": context, "system": system}
+
+    def begin_generation(self, owner: Optional[str] = None) -> CancellationToken:
+        """
+        応答の生成の開始を記録し、中止を伝えるトークンを返します。
+
+        Args:
+            owner: 生成を開始した接続のsid（省略可）
+
+        Returns:
+            CancellationToken: 生成の中止を伝えるトークン。生成が終わったらend_generationに渡します
+        """
+        token = CancellationToken(owner)
+        with self.lock:
+            self.generations.append(token)
+        return token
+
+    def end_generation(self, token: CancellationToken) -> None:
+        """
+        応答の生成の終了を記録します。
+
+        Args:
+            token: begin_generationが返したトークン
+        """
+        with self.lock:
+            if token in self.generations:
+                self.generations.remove(token)
+
+    def cancel_generation(self, owner: Optional[str] = None) -> int:
+        """
+        実行中の応答の生成を中止します。
+
+        Args:
+            owner: 中止する生成を開始した接続のsid（省略時はすべて）
 
         Returns:
-            List[Dict[str, str]]: チャット履歴のメッセージリスト
+            int: 中止した生成の数
         """
-        return self.messages
+        with self.lock:
+            tokens = [token for token in self.generations if owner is None or token.owner == owner]
+        # コールバックでHTTPレスポンスを閉じるため、ロックを解放してから中止する
+        return sum(token.cancel() for token in tokens)
 
     def clear(self) -> None:
         """
-        チャット履歴をクリアします。
+        チャット履歴をクリアし、新しい会話IDで会話を始めます。
+
+        ストアに保存した以前の会話はそのまま残ります。
+        """
+        with self.lock:
+            self._reset_locked(uuid.uuid4().hex)
+
+    def _reset_locked(self, conversation_id: str) -> None:
+        """
+        ロック取得済みの状態で履歴を空にし、会話IDを設定します。
         """
+        self.conversation_id = conversation_id
         self.messages = []
+        self.seqs = []
+        self.next_seq = 0
+        self.token_counts = []
+        self.total_tokens = 0
+        self.pinned = set()
+        self.contexts = {}
+        self._stored = False
@@ -0,0 +1,326 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+ストリーミング応答のチャンクをまとめて送信するモジュール。
+
+このモジュールはトークン単位で届くチャンクをバッファリングし、
+一定時間またはバイト数ごとにまとめて送信します。
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ScheduledFlush:
+    """
+    FlushSchedulerに登録された送信予定。cancelで取り消せます。
+    """
+
+    __slots__ = ("deadline", "callback", "cancelled")
+
+    def __init__(self, deadline: float, callback: Callable[[], None]):
+        self.deadline = deadline
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        """
+        送信予定を取り消します。
+        """
+        self.cancelled = True
+
+
+class FlushScheduler:
+    """
+    複数のChunkCoalescerの遅延送信を1つのスレッドで実行するクラス。
+
+    送信予定を期限順のヒープで管理し、期限が来たものから順にコールバックを呼び出します。
+    ストリームの数や送信間隔に関係なくスレッドは1つだけです。
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        """
+        FlushSchedulerクラスのコンストラクタ。
+
+        Args:
+            clock: 現在時刻を返す関数（デフォルト: time.monotonic）
+        """
+        self._clock = clock
+        self._condition = threading.Condition()
+        self._heap: List[tuple] = []
+        self._counter = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+
+    def schedule(self, delay: float, callback: Callable[[], None]) -> ScheduledFlush:
+        """
+        delay秒後にコールバックを呼び出すよう登録します。初回の登録時にスレッドを開始します。
+
+        Args:
+            delay: 呼び出すまでの秒数
+            callback: 呼び出す関数
+
+        Returns:
+            ScheduledFlush: 取り消しに使用する送信予定
+        """
+        entry = ScheduledFlush(self._clock() + max(0.0, delay), callback)
+        with self._condition:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="chunk-flush-scheduler", daemon=True)
+                self._thread.start()
+            heapq.heappush(self._heap, (entry.deadline, next(self._counter), entry))
+            # 先頭が変わった場合のみ待機時間を計算し直す
+            if self._heap[0][2] is entry:
+                self._condition.notify()
+        return entry
+
+    def pending(self) -> int:
+        """
+        取り消されていない送信予定の数を取得します。
+        """
+        with self._condition:
+            return sum(1 for _, _, entry in self._heap if not entry.cancelled)
+
+    def _run(self) -> None:
+        """
+        スケジューラスレッドの本体。期限が来た送信予定のコールバックを呼び出します。
+        """
+        while True:
+            with self._condition:
+                while True:
+                    # 取り消された予定は先頭に来た時点で捨てる
+                    while self._heap and self._heap[0][2].cancelled:
+                        heapq.heappop(self._heap)
+                    if not self._heap:
+                        self._condition.wait()
+                        continue
+                    timeout = self._heap[0][0] - self._clock()
+                    if timeout <= 0:
+                        entry = heapq.heappop(self._heap)[2]
+                        break
+                    self._condition.wait(timeout)
+
+            try:
+                entry.callback()
+            except Exception as e:
+                logger.warning("チャンクの送信に失敗しました: %s", e)
+
+
+# すべてのChunkCoalescerで共有するスケジューラ
+_default_scheduler = FlushScheduler()
+
+
+class ChunkCoalescer:
+    """
+    チャンクをまとめて送信するクラス。
+
+    最初のチャンクは即座に送信し、以降のチャンクは前回の送信から interval 秒経過するか、
+    バッファが max_bytes に達した時点でまとめて送信します。新しいチャンクが届かない場合も
+    共有のFlushSchedulerによって interval 秒以内に送信されます。close を呼ぶと残りを即座に送信します。
+    """
+
+    def __init__(
+        self,
+        emit: Callable[[str], None],
+        interval: float = 0.03,
+        max_bytes: int = 1024,
+        clock: Callable[[], float] = time.monotonic,
+        scheduler: Optional[FlushScheduler] = None,
+    ):
+        """
+        ChunkCoalescerクラスのコンストラクタ。
+
+        Args:
+            emit: まとめたテキストを送信する関数
+            interval: 送信間隔の秒数。0以下の場合はチャンクごとに送信（デフォルト: 0.03）
+            max_bytes: バッファがこのバイト数に達したら即座に送信（デフォルト: 1024）
+            clock: 現在時刻を返す関数（テスト用、デフォルト: time.monotonic）
+            scheduler: 遅延送信を行うスケジューラ（省略時は全インスタンスで共有するスケジューラ）
+        """
+        self._emit = emit
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._lock = threading.RLock()
+        self._buffer: List[str] = []
+        self._buffer_bytes = 0
+        self._last_flush = None
+        self._scheduler = scheduler or _default_scheduler
+        self._pending: Optional[ScheduledFlush] = None
+        self._closed = False
+        # 統計情報
+        self.chunks_in = 0
+        self.frames_out = 0
+
+    def add(self, text: str) -> None:
+        """
+        チャンクを追加します。
+
+        Args:
+            text: 追加するテキスト
+        """
+        if not text:
+            return
+
+        with self._lock:
+            self.chunks_in += 1
+            self._buffer.append(text)
+            self._buffer_bytes += len(text.encode("utf-8"))
+
+            now = self._clock()
+            # 最初のチャンク、間隔の経過、バイト数の超過のいずれかで即座に送信
+            if (
+                self.interval <= 0
+                or self._last_flush is None
+                or now - self._last_flush >= self.interval
+                or self._buffer_bytes >= self.max_bytes
+            ):
+                self._flush_locked(now)
+            elif self._pending is None:
+                self._pending = self._scheduler.schedule(self.interval - (now - self._last_flush), self.flush)
+
+    def flush(self) -> None:
+        """
+        バッファ内のチャンクを即座に送信します。
+        """
+        with self._lock:
+            self._flush_locked(self._clock())
+
+    def close(self) -> None:
+        """
+        残りのチャンクを送信し、遅延送信の予定を取り消します。以降の送信は行われません。
+        """
+        with self._lock:
+            self._flush_locked(self._clock())
+            self._closed = True
+
+    def _flush_locked(self, now: float) -> None:
+        """
+        ロック取得済みの状態でバッファ内のチャンクを送信します。
+
+        送信順序を保つため、送信はロックを保持したまま行います。
+
+        Args:
+            now: 現在時刻
+        """
+        if self._pending is not None:
+            self._pending.cancel()
+            self._pending = None
+
+        if self._closed or not self._buffer:
+            return
+
+        text = "".join(self._buffer)
+        self._buffer = []
+        self._buffer_bytes = 0
+        self._last_flush = now
+        self.frames_out += 1
+        self._emit(text)
+
+
+class AsyncChunkCoalescer:
+    """
+    ChunkCoalescerの非同期版。非同期サーバー（async_app.py）で使用します。
+
+    送信関数はコルーチン関数で、addとcloseはイベントループ上で await して呼び出します。
+    遅延送信はスレッドを使わず loop.call_later で予約し、送信順序は asyncio.Lock で保ちます。
+    """
+
+    def __init__(
+        self,
+        emit: Callable[[str], Awaitable[None]],
+        interval: float = 0.03,
+        max_bytes: int = 1024,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        AsyncChunkCoalescerクラスのコンストラクタ。
+
+        Args:
+            emit: まとめたテキストを送信するコルーチン関数
+            interval: 送信間隔の秒数。0以下の場合はチャンクごとに送信（デフォルト: 0.03）
+            max_bytes: バッファがこのバイト数に達したら即座に送信（デフォルト: 1024）
+            clock: 現在時刻を返す関数（テスト用、デフォルト: time.monotonic）
+        """
+        self._emit = emit
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._lock = asyncio.Lock()
+        self._buffer: List[str] = []
+        self._buffer_bytes = 0
+        self._last_flush = None
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._flush_task: Optional["asyncio.Task"] = None
+        self._closed = False
+        # 統計情報
+        self.chunks_in = 0
+        self.frames_out = 0
+
+    async def add(self, text: str) -> None:
+        """
+        チャンクを追加します。
+
+        Args:
+            text: 追加するテキスト
+        """
+        if not text or self._closed:
+            return
+
+        self.chunks_in += 1
+        self._buffer.append(text)
+        self._buffer_bytes += len(text.encode("utf-8"))
+
+        now = self._clock()
+        # 最初のチャンク、間隔の経過、バイト数の超過のいずれかで即座に送信
+        if (
+            self.interval <= 0
+            or self._last_flush is None
+            or now - self._last_flush >= self.interval
+            or self._buffer_bytes >= self.max_bytes
+        ):
+            await self.flush()
+        elif self._handle is None:
+            loop = asyncio.get_running_loop()
+            self._handle = loop.call_later(self.interval - (now - self._last_flush), self._on_timer)
+
+    def _on_timer(self) -> None:
+        """
+        予約した時刻になったらバッファの送信を開始します。
+        """
+        self._handle = None
+        self._flush_task = asyncio.ensure_future(self.flush())
+
+    async def flush(self) -> None:
+        """
+        バッファ内のチャンクを即座に送信します。
+        """
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+        async with self._lock:
+            if self._closed or not self._buffer:
+                return
+            text = "".join(self._buffer)
+            self._buffer = []
+            self._buffer_bytes = 0
+            self._last_flush = self._clock()
+            self.frames_out += 1
+            await self._emit(text)
+
+    async def close(self) -> None:
+        """
+        残りのチャンクを送信し、遅延送信の予約を取り消します。以降の送信は行われません。
+        """
+        await self.flush()
+        if self._flush_task is not None:
+            await self._flush_task
+            self._flush_task = None
+        self._closed = True
@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+コンテキストウィンドウに収まるようにチャット履歴を絞り込むモジュール。
+
+このモジュールはメッセージのトークン数の推定と、
+トークン数の上限に収まるメッセージを選択する戦略を提供します。
+"""
+
+import hashlib
+import json
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, Dict, List, Sequence, Set, Tuple
+
+# メッセージごとのロールや区切りに相当するトークン数
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    テキストのおおよそのトークン数を推定します。
+
+    ASCII文字は約4文字で1トークン、日本語などの非ASCII文字は1文字で約1トークンとして計算します。
+
+    Args:
+        text: トークン数を推定するテキスト
+
+    Returns:
+        int: 推定トークン数
+    """
+    if not text:
+        return 0
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+def estimate_message_tokens(message: Dict[str, str]) -> int:
+    """
+    メッセージ1件のおおよそのトークン数を推定します。
+
+    Args:
+        message: メッセージ（role, content）
+
+    Returns:
+        int: 推定トークン数
+    """
+    return estimate_tokens(message.get("content", "")) + MESSAGE_OVERHEAD_TOKENS
+
+
+class TrimStrategy(ABC):
+    """
+    トークン数の上限に収まるメッセージを選択する戦略の基底クラス。
+    """
+
+    @abstractmethod
+    def trim(
+        self,
+        messages: Sequence[Dict[str, str]],
+        token_counts: Sequence[int],
+        pinned: Set[int],
+        budget: int,
+    ) -> List[Dict[str, str]]:
+        """
+        トークン数の上限に収まるメッセージを選択します。
+
+        Args:
+            messages: チャット履歴のメッセージ
+            token_counts: メッセージごとの推定トークン数
+            pinned: 固定されたメッセージのインデックス
+            budget: トークン数の上限
+
+        Returns:
+            List[Dict[str, str]]: 選択されたメッセージ（元の順序）
+        """
+
+
+def _select_recent(
+    messages: Sequence[Dict[str, str]],
+    token_counts: Sequence[int],
+    keep: Set[int],
+    budget: int,
+) -> Tuple[List[int], List[int]]:
+    """
+    必ず残すメッセージに加えて、新しいものから上限に収まるだけメッセージを選択します。
+
+    最新のメッセージは上限を超える場合でも必ず残します。
+
+    Args:
+        messages: チャット履歴のメッセージ
+        token_counts: メッセージごとの推定トークン数
+        keep: 必ず残すメッセージのインデックス
+        budget: トークン数の上限
+
+    Returns:
+        Tuple[List[int], List[int]]: 選択されたインデックスと、除外されたインデックス（いずれも昇順）
+    """
+    selected = set(keep)
+    used = sum(token_counts[i] for i in selected)
+    oldest_selected = len(messages)
+
+    for i in range(len(messages) - 1, -1, -1):
+        if i in selected:
+            continue
+        if used + token_counts[i] > budget and i != len(messages) - 1:
+            break
+        selected.add(i)
+        used += token_counts[i]
+        oldest_selected = i
+
+    dropped = [i for i in range(oldest_selected) if i not in selected]
+    return sorted(selected), dropped
+
+
+class SlidingWindowStrategy(TrimStrategy):
+    """
+    システムプロンプトと最新のメッセージを上限に収まるだけ残す戦略。
+    """
+
+    def trim(self, messages, token_counts, pinned, budget):
+        keep = {i for i, message in enumerate(messages) if message.get("role") == "system"}
+        selected, _ = _select_recent(messages, token_counts, keep, budget)
+        return [messages[i] for i in selected]
+
+
+class PinnedMessagesStrategy(TrimStrategy):
+    """
+    システムプロンプトと固定されたメッセージに加えて、最新のメッセージを上限に収まるだけ残す戦略。
+    """
+
+    def trim(self, messages, token_counts, pinned, budget):
+        keep = {i for i, message in enumerate(messages) if message.get("role") == "system"} | set(pinned)
+        selected, _ = _select_recent(messages, token_counts, keep, budget)
+        return [messages[i] for i in selected]
+
+
+class SummarizingStrategy(TrimStrategy):
+    """
+    上限に収まらない古いメッセージを要約して1件のシステムメッセージに置き換える戦略。
+
+    要約は summarize 関数（例: モデルに要約を依頼する関数）に委譲します。
+    要約は除外されたメッセージの内容のハッシュをキーにキャッシュするため、
+    1つのインスタンスを複数のセッションで共有しても他の会話の要約が使われることはありません。
+    """
+
+    def __init__(
+        self,
+        summarize: Callable[[List[Dict[str, str]]], str],
+        summary_budget: int = 256,
+        max_cache_entries: int = 128,
+    ):
+        """
+        SummarizingStrategyクラスのコンストラクタ。
+
+        Args:
+            summarize: 除外されたメッセージのリストを受け取り要約テキストを返す関数
+            summary_budget: 要約に割り当てるトークン数（デフォルト: 256）
+            max_cache_entries: キャッシュする要約の最大数（デフォルト: 128）
+        """
+        self.summarize = summarize
+        self.summary_budget = summary_budget
+        self.max_cache_entries = max_cache_entries
+        self._cache_lock = threading.Lock()
+        # 除外されたメッセージのハッシュ -> 要約（LRU）
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+
+    @staticmethod
+    def _cache_key(messages: Sequence[Dict[str, str]]) -> str:
+        """
+        メッセージのロールと内容からキャッシュのキーを算出します。
+
+        Args:
+            messages: 要約するメッセージ
+
+        Returns:
+            str: ロールと内容のSHA-256ハッシュ
+        """
+        pairs = [(message.get("role", ""), message.get("content", "")) for message in messages]
+        return hashlib.sha256(json.dumps(pairs, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def _get_summary(self, dropped_messages: List[Dict[str, str]]) -> str:
+        """
+        除外されたメッセージの要約を取得します。キャッシュにない場合は summarize を呼び出します。
+
+        Args:
+            dropped_messages: 除外されたメッセージ
+
+        Returns:
+            str: 要約テキスト
+        """
+        key = self._cache_key(dropped_messages)
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        # 要約には時間がかかるため、ロックを保持せずに呼び出す
+        summary = self.summarize(dropped_messages)
+        with self._cache_lock:
+            self._cache[key] = summary
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_cache_entries:
+                self._cache.popitem(last=False)
+        return summary
+
+    def trim(self, messages, token_counts, pinned, budget):
+        keep = {i for i, message in enumerate(messages) if message.get("role") == "system"} | set(pinned)
+        if sum(token_counts) <= budget:
+            return list(messages)
+
+        selected, dropped = _select_recent(messages, token_counts, keep, max(0, budget - self.summary_budget))
+        if not dropped:
+            return [messages[i] for i in selected]
+
+        summary_text = self._get_summary([messages[i] for i in dropped])
+        summary = {"role": "system", "content": f"これまでの会話の要約: {summary_text}"}
+        result = []
+        inserted = False
+        for i in selected:
+            if not inserted and messages[i].get("role") != "system":
+                result.append(summary)
+                inserted = True
+            result.append(messages[i])
+        if not inserted:
+            result.append(summary)
+        return result
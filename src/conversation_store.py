@@ -0,0 +1,412 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+会話の履歴を永続化するモジュール。
+
+このモジュールは会話のメッセージを追記のみで保存するストアを提供します。
+SQLiteのストアはWALモードで開き、書き込みを専用のスレッドでまとめてコミットするため、
+メッセージの追加は待ち行列に入れるだけで応答の生成を待たせません。
+古いメッセージはページ単位で読み出せるため、サーバーは直近のメッセージだけをメモリに保持します。
+"""
+
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 1ページのメッセージ数の既定値と上限
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    owner TEXT,
+    model TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS conversations_owner ON conversations (owner, created_at);
+CREATE TABLE IF NOT EXISTS messages (
+    conversation_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    pinned INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (conversation_id, seq)
+) WITHOUT ROWID;
+"""
+
+
+def parse_page_params(before: Optional[str], limit: Optional[str]) -> Tuple[Optional[int], int]:
+    """
+    ページ単位の取得のクエリパラメータを解析します。
+
+    Args:
+        before: この通し番号より前のメッセージを取得する（省略時は最新のメッセージから）
+        limit: 取得するメッセージ数（省略時はDEFAULT_PAGE_SIZE、最大MAX_PAGE_SIZE）
+
+    Returns:
+        Tuple[Optional[int], int]: beforeとlimit
+
+    Raises:
+        ValueError: 値が整数でない場合や範囲外の場合
+    """
+    try:
+        parsed_before = int(before) if before not in (None, "") else None
+        parsed_limit = int(limit) if limit not in (None, "") else DEFAULT_PAGE_SIZE
+    except ValueError:
+        raise ValueError("beforeとlimitには整数を指定してください")
+    if parsed_before is not None and parsed_before < 0:
+        raise ValueError("beforeには0以上の値を指定してください")
+    if not 1 <= parsed_limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limitには1から{MAX_PAGE_SIZE}までの値を指定してください")
+    return parsed_before, parsed_limit
+
+
+class ConversationStore(ABC):
+    """
+    会話の履歴を保存するストアの基底クラス。
+
+    メッセージは会話IDと会話内の通し番号（seq）で識別し、追記のみで保存します。
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def start_conversation(self, conversation_id: str, owner: Optional[str], model: Optional[str]) -> None:
+        """
+        会話を記録します。同じ会話IDで2回目以降に呼び出した場合は何もしません。
+
+        Args:
+            conversation_id: 会話ID
+            owner: 会話を所有するクライアントID
+            model: 会話で使用するモデル名
+        """
+
+    @abstractmethod
+    def append(self, conversation_id: str, seq: int, role: str, content: str, pinned: bool = False) -> None:
+        """
+        メッセージを追記します。
+
+        Args:
+            conversation_id: 会話ID
+            seq: 会話内の通し番号（0から始まる）
+            role: メッセージの送信者
+            content: メッセージの内容
+            pinned: 履歴を絞り込む際に常に残すかどうか
+        """
+
+    @abstractmethod
+    def load_messages(
+        self, conversation_id: str, before: Optional[int] = None, limit: Optional[int] = DEFAULT_PAGE_SIZE
+    ) -> List[Dict[str, Any]]:
+        """
+        通し番号がbeforeより前のメッセージのうち、新しいものからlimit件を古い順に取得します。
+
+        Args:
+            conversation_id: 会話ID
+            before: この通し番号より前のメッセージを取得する（省略時は最新のメッセージから）
+            limit: 取得するメッセージ数（Noneの場合はすべて）
+
+        Returns:
+            List[Dict[str, Any]]: "seq"、"role"、"content"、"pinned"、"created_at" を含むメッセージのリスト
+        """
+
+    @abstractmethod
+    def latest_conversation(self, owner: str) -> Optional[Dict[str, Any]]:
+        """
+        クライアントが最後に開始した会話を取得します。
+
+        Args:
+            owner: クライアントID
+
+        Returns:
+            Optional[Dict[str, Any]]: "id"、"owner"、"model"、"created_at" を含む会話。ない場合はNone
+        """
+
+    def page(self, conversation_id: str, before: Optional[int] = None, limit: int = DEFAULT_PAGE_SIZE) -> Dict[str, Any]:
+        """
+        メッセージを1ページ取得し、続きのページの有無とともに返します。
+
+        Args:
+            conversation_id: 会話ID
+            before: この通し番号より前のメッセージを取得する（省略時は最新のメッセージから）
+            limit: 取得するメッセージ数
+
+        Returns:
+            Dict[str, Any]: "conversation_id"、"messages"、"has_more"、"next_before"（次のページのbefore）を含む辞書
+        """
+        messages = self.load_messages(conversation_id, before=before, limit=limit + 1)
+        has_more = len(messages) > limit
+        if has_more:
+            messages = messages[1:]
+        return {
+            "conversation_id": conversation_id,
+            "messages": messages,
+            "has_more": has_more,
+            "next_before": messages[0]["seq"] if has_more else None,
+        }
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        書き込み待ちのメッセージを保存します。
+
+        Args:
+            timeout: 待機する最大の秒数（省略時は完了まで待つ）
+
+        Returns:
+            bool: 保存が完了した場合はTrue
+        """
+        return True
+
+    def close(self) -> None:
+        """
+        書き込み待ちのメッセージを保存し、ストアが保持しているリソースを解放します。
+        """
+
+
+class MemoryConversationStore(ConversationStore):
+    """
+    会話の履歴をメモリに保持するストア。再起動すると履歴は失われます。
+    """
+
+    name = "memory"
+
+    def __init__(self):
+        """
+        MemoryConversationStoreクラスのコンストラクタ。
+        """
+        self._lock = threading.Lock()
+        self._conversations: Dict[str, Dict[str, Any]] = {}
+        self._messages: Dict[str, Dict[int, Dict[str, Any]]] = {}
+
+    def start_conversation(self, conversation_id: str, owner: Optional[str], model: Optional[str]) -> None:
+        with self._lock:
+            self._conversations.setdefault(
+                conversation_id, {"id": conversation_id, "owner": owner, "model": model, "created_at": time.time()}
+            )
+
+    def append(self, conversation_id: str, seq: int, role: str, content: str, pinned: bool = False) -> None:
+        message = {"seq": seq, "role": role, "content": content, "pinned": bool(pinned), "created_at": time.time()}
+        with self._lock:
+            self._messages.setdefault(conversation_id, {}).setdefault(seq, message)
+
+    def load_messages(
+        self, conversation_id: str, before: Optional[int] = None, limit: Optional[int] = DEFAULT_PAGE_SIZE
+    ) -> List[Dict[str, Any]]:
+        with self._lock:
+            messages = self._messages.get(conversation_id, {})
+            seqs = sorted(seq for seq in messages if before is None or seq < before)
+            if limit is not None:
+                seqs = seqs[-limit:] if limit > 0 else []
+            return [dict(messages[seq]) for seq in seqs]
+
+    def latest_conversation(self, owner: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            # 開始した順（辞書の挿入順）で最後の会話を返す
+            for conversation in reversed(list(self._conversations.values())):
+                if conversation["owner"] == owner:
+                    return dict(conversation)
+        return None
+
+
+class SqliteConversationStore(ConversationStore):
+    """
+    会話の履歴をSQLiteのデータベースに保存するストア。
+
+    データベースはWALモードで開くため、書き込み中も読み出しを待たせません。
+    書き込みは専用のスレッドが待ち行列から最大batch_size件ずつ取り出し、1回のトランザクションでコミットします。
+    読み出しの前には書き込み待ちのメッセージを保存するため、追加したメッセージはすぐに読み出せます。
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str = "conversations.db", batch_size: int = 100, flush_interval: float = 0.05):
+        """
+        SqliteConversationStoreクラスのコンストラクタ。データベースを開き、書き込みスレッドを開始します。
+
+        Args:
+            path: データベースのファイルのパス（デフォルト: "conversations.db"）
+            batch_size: 1回のトランザクションで書き込む最大の件数（デフォルト: 100）
+            flush_interval: 書き込みをまとめるために続きを待つ最大の秒数（デフォルト: 0.05）
+
+        Raises:
+            ValueError: パスに ":memory:" を指定した場合（書き込みと読み出しで接続を分けるため）
+        """
+        if path == ":memory:":
+            raise ValueError("SqliteConversationStoreにはファイルのパスを指定してください")
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.batch_count = 0
+        self.write_count = 0
+        self._queue: "queue.Queue[Tuple[str, Any]]" = queue.Queue()
+        self._closed = False
+        self._close_lock = threading.Lock()
+
+        writer_connection = self._connect()
+        writer_connection.executescript(SCHEMA)
+        self._read_lock = threading.Lock()
+        self._reader = self._connect()
+        self._writer = threading.Thread(
+            target=self._write_loop, args=(writer_connection,), name="conversation-store-writer", daemon=True
+        )
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        WALモードでデータベースに接続します。
+        """
+        connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        # WALモードではNORMALでもコミット済みのデータはアプリケーションの異常終了で失われない
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def start_conversation(self, conversation_id: str, owner: Optional[str], model: Optional[str]) -> None:
+        self._queue.put(("conversation", (conversation_id, owner, model, time.time())))
+
+    def append(self, conversation_id: str, seq: int, role: str, content: str, pinned: bool = False) -> None:
+        self._queue.put(("message", (conversation_id, seq, role, content, int(bool(pinned)), time.time())))
+
+    def _write_loop(self, connection: sqlite3.Connection) -> None:
+        """
+        書き込みスレッドの本体。待ち行列の項目をまとめてコミットします。
+
+        Args:
+            connection: 書き込み用の接続
+        """
+        try:
+            while True:
+                batch = [self._queue.get()]
+                deadline = time.monotonic() + self.flush_interval
+                # 保存の完了を待っている呼び出し元や終了の指示がある場合は続きを待たない
+                while len(batch) < self.batch_size and batch[-1][0] not in ("flush", "close"):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(self._queue.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+                self._write_batch(connection, batch)
+                if any(kind == "close" for kind, _ in batch):
+                    return
+        finally:
+            connection.close()
+
+    def _write_batch(self, connection: sqlite3.Connection, batch: List[Tuple[str, Any]]) -> None:
+        """
+        会話とメッセージを1回のトランザクションで書き込み、保存の完了を待っている呼び出し元に通知します。
+
+        Args:
+            connection: 書き込み用の接続
+            batch: 待ち行列から取り出した項目のリスト
+        """
+        conversations = [value for kind, value in batch if kind == "conversation"]
+        messages = [value for kind, value in batch if kind == "message"]
+        if conversations or messages:
+            try:
+                connection.execute("BEGIN")
+                connection.executemany(
+                    "INSERT OR IGNORE INTO conversations (id, owner, model, created_at) VALUES (?, ?, ?, ?)", conversations
+                )
+                connection.executemany(
+                    "INSERT OR IGNORE INTO messages (conversation_id, seq, role, content, pinned, created_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    messages,
+                )
+                connection.execute("COMMIT")
+                self.batch_count += 1
+                self.write_count += len(conversations) + len(messages)
+            except sqlite3.Error:
+                logger.exception("会話の履歴の保存に失敗しました（%d件）", len(conversations) + len(messages))
+                if connection.in_transaction:
+                    connection.execute("ROLLBACK")
+        for kind, value in batch:
+            if kind == "flush":
+                value.set()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        if self._closed:
+            return True
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        return done.wait(timeout)
+
+    def load_messages(
+        self, conversation_id: str, before: Optional[int] = None, limit: Optional[int] = DEFAULT_PAGE_SIZE
+    ) -> List[Dict[str, Any]]:
+        self.flush()
+        query = "SELECT seq, role, content, pinned, created_at FROM messages WHERE conversation_id = ?"
+        params: List[Any] = [conversation_id]
+        if before is not None:
+            query += " AND seq < ?"
+            params.append(before)
+        query += " ORDER BY seq DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._read_lock:
+            rows = self._reader.execute(query, params).fetchall()
+        return [
+            {
+                "seq": row["seq"],
+                "role": row["role"],
+                "content": row["content"],
+                "pinned": bool(row["pinned"]),
+                "created_at": row["created_at"],
+            }
+            for row in reversed(rows)
+        ]
+
+    def latest_conversation(self, owner: str) -> Optional[Dict[str, Any]]:
+        self.flush()
+        with self._read_lock:
+            row = self._reader.execute(
+                "SELECT id, owner, model, created_at FROM conversations WHERE owner = ? ORDER BY created_at DESC LIMIT 1",
+                (owner,),
+            ).fetchone()
+        return dict(row) if row is not None else None
+
+    def close(self) -> None:
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._queue.put(("close", None))
+        self._writer.join()
+        with self._read_lock:
+            self._reader.close()
+
+
+def create_conversation_store(name: str = "sqlite", path: str = "conversations.db") -> ConversationStore:
+    """
+    会話の履歴を保存するストアを作成します。
+
+    Args:
+        name: ストア名（sqlite、memory）
+        path: SQLiteのデータベースのファイルのパス（デフォルト: "conversations.db"）
+
+    Returns:
+        ConversationStore: ストア
+
+    Raises:
+        ValueError: 未対応のストア名の場合
+    """
+    if name == "sqlite":
+        return SqliteConversationStore(path)
+    if name == "memory":
+        return MemoryConversationStore()
+    raise ValueError(f"未対応の会話のストア: {name}")
@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Socket.IOで送信したデータ量を計測するモジュール。
+
+このモジュールはイベントごと・接続ごとの送信メッセージ数とバイト数を集計します。
+送信バイト数はSocket.IOがエンコードしたパケットから取得し、送信先の接続数はルームへの参加と退出を
+追跡して求めるため、送信のたびにデータを再エンコードしたりルームの参加者を列挙したりしません。
+"""
+
+import contextvars
+import threading
+from typing import Any, Dict, Tuple
+
+import socketio
+from socketio import packet
+
+# 直前にエンコードしたパケットのバイト数（スレッドおよびasyncioのタスクごとに保持する）
+_encoded_size = contextvars.ContextVar("encoded_size", default=0)
+
+
+class MeasuredPacket(packet.Packet):
+    """
+    エンコードしたパケットのバイト数を記録するSocket.IOのパケットクラス。
+
+    サーバーのserializerに指定すると、送信ごとに1回だけ行われるエンコードの結果から送信量を取得できます。
+    """
+
+    def encode(self):
+        encoded_packet = super().encode()
+        parts = encoded_packet if isinstance(encoded_packet, list) else [encoded_packet]
+        _encoded_size.set(sum(len(part.encode("utf-8")) if isinstance(part, str) else len(part) for part in parts))
+        return encoded_packet
+
+
+def take_encoded_size() -> int:
+    """
+    現在のスレッドまたはタスクで直前にエンコードしたパケットのバイト数を取得し、0に戻します。
+
+    Returns:
+        int: パケットのバイト数（エンコードしていない場合は0）
+    """
+    size = _encoded_size.get()
+    _encoded_size.set(0)
+    return size
+
+
+class EmitStats:
+    """
+    Socket.IOの送信量を集計するクラス。
+
+    ルームごとに参加者数と1参加者あたりの累計送信量を保持し、接続（sid）ごとの送信量は参加中のルームの
+    累計と参加時点の累計の差から算出します。イベントごとの合計も保持します。
+    """
+
+    def __init__(self):
+        """
+        EmitStatsクラスのコンストラクタ。
+        """
+        self._lock = threading.Lock()
+        # ルームごとの参加者数（members）と1参加者あたりの累計送信メッセージ数とバイト数
+        self._rooms: Dict[str, Dict[str, int]] = {}
+        # 接続ごとの参加中のルームと、参加時点のルームの累計（メッセージ数, バイト数）
+        self._memberships: Dict[str, Dict[str, Tuple[int, int]]] = {}
+        # 接続ごとの退出したルームで受信した送信量
+        self._settled: Dict[str, Dict[str, int]] = {}
+        self._events: Dict[str, Dict[str, int]] = {}
+        self.total_messages = 0
+        self.total_bytes = 0
+
+    def enter(self, sid: str, room: str) -> None:
+        """
+        接続がルームに参加したことを記録します。
+
+        Args:
+            sid: 接続のsid
+            room: ルーム名
+        """
+        with self._lock:
+            memberships = self._memberships.setdefault(sid, {})
+            if room in memberships:
+                return
+            room_stats = self._rooms.setdefault(room, {"members": 0, "messages": 0, "bytes": 0})
+            room_stats["members"] += 1
+            memberships[room] = (room_stats["messages"], room_stats["bytes"])
+
+    def leave(self, sid: str, room: str) -> None:
+        """
+        接続がルームから退出したことを記録し、参加中に受信した送信量を接続の統計に加えます。
+
+        Args:
+            sid: 接続のsid
+            room: ルーム名
+        """
+        with self._lock:
+            memberships = self._memberships.get(sid)
+            if memberships is None or room not in memberships:
+                return
+            messages, size = self._release(room, memberships.pop(room))
+            settled = self._settled.setdefault(sid, {"messages": 0, "bytes": 0})
+            settled["messages"] += messages
+            settled["bytes"] += size
+
+    def _release(self, room: str, joined: Tuple[int, int]) -> Tuple[int, int]:
+        """
+        ルームの参加者を1人減らし、参加してから受信した送信量を返します。ロックを保持して呼び出します。
+
+        Args:
+            room: ルーム名
+            joined: 参加時点のルームの累計（メッセージ数, バイト数）
+
+        Returns:
+            Tuple[int, int]: 参加してから受信したメッセージ数とバイト数
+        """
+        room_stats = self._rooms[room]
+        received = (room_stats["messages"] - joined[0], room_stats["bytes"] - joined[1])
+        room_stats["members"] -= 1
+        if room_stats["members"] == 0:
+            del self._rooms[room]
+        return received
+
+    def record(self, event: str, room: str, size: int) -> int:
+        """
+        ルームへの送信を記録します。
+
+        Args:
+            event: イベント名
+            room: 送信先のsidまたはルーム名
+            size: 1接続あたりの送信バイト数
+
+        Returns:
+            int: 送信先の接続数
+        """
+        with self._lock:
+            room_stats = self._rooms.get(room)
+            if room_stats is None:
+                return 0
+            recipients = room_stats["members"]
+            room_stats["messages"] += 1
+            room_stats["bytes"] += size
+            event_stats = self._events.setdefault(event, {"messages": 0, "bytes": 0})
+            event_stats["messages"] += recipients
+            event_stats["bytes"] += size * recipients
+            self.total_messages += recipients
+            self.total_bytes += size * recipients
+        return recipients
+
+    def forget(self, sid: str) -> None:
+        """
+        切断された接続をすべてのルームから外し、統計を破棄します。合計値は保持されます。
+
+        Args:
+            sid: 破棄する接続のsid
+        """
+        with self._lock:
+            for room, joined in self._memberships.pop(sid, {}).items():
+                self._release(room, joined)
+            self._settled.pop(sid, None)
+
+    def get_connection_stats(self, sid: str) -> Dict[str, int]:
+        """
+        接続ごとの送信統計を取得します。
+
+        Args:
+            sid: 接続のsid
+
+        Returns:
+            Dict[str, int]: 送信メッセージ数とバイト数
+        """
+        with self._lock:
+            stats = dict(self._settled.get(sid, {"messages": 0, "bytes": 0}))
+            for room, (messages, size) in self._memberships.get(sid, {}).items():
+                stats["messages"] += self._rooms[room]["messages"] - messages
+                stats["bytes"] += self._rooms[room]["bytes"] - size
+            return stats
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        集計済みの送信統計を取得します。
+
+        sidは他の接続になりすますために使用できるため、接続ごとの統計は含めず接続数のみを返します。
+        接続ごとの統計はget_connection_statsで取得してください。
+
+        Returns:
+            Dict[str, Any]: 合計、イベントごとの送信統計と統計を保持している接続数
+        """
+        with self._lock:
+            return {
+                "total_messages": self.total_messages,
+                "total_bytes": self.total_bytes,
+                "events": {event: dict(stats) for event, stats in self._events.items()},
+                "connection_count": len(self._memberships.keys() | self._settled.keys()),
+            }
+
+
+class _RoomTrackingMixin:
+    """
+    ルームへの参加と退出をEmitStatsに通知するSocket.IOのクライアントマネージャーの共通処理。
+    """
+
+    def __init__(self, emit_stats: EmitStats):
+        """
+        コンストラクタ。
+
+        Args:
+            emit_stats: 参加と退出を記録するEmitStats
+        """
+        super().__init__()
+        self.emit_stats = emit_stats
+
+    def basic_enter_room(self, sid, namespace, room, eio_sid=None):
+        super().basic_enter_room(sid, namespace, room, eio_sid=eio_sid)
+        if namespace == "/" and room is not None:
+            self.emit_stats.enter(sid, room)
+
+    def basic_leave_room(self, sid, namespace, room):
+        super().basic_leave_room(sid, namespace, room)
+        if namespace == "/" and room is not None:
+            self.emit_stats.leave(sid, room)
+
+    def basic_disconnect(self, sid, namespace, **kwargs):
+        super().basic_disconnect(sid, namespace, **kwargs)
+        if namespace == "/":
+            self.emit_stats.forget(sid)
+
+
+class EmitStatsManager(_RoomTrackingMixin, socketio.Manager):
+    """
+    ルームへの参加と退出をEmitStatsに通知するSocket.IOのクライアントマネージャー。
+    """
+
+
+class AsyncEmitStatsManager(_RoomTrackingMixin, socketio.AsyncManager):
+    """
+    ルームへの参加と退出をEmitStatsに通知するSocket.IOの非同期クライアントマネージャー。
+    """
@@ -0,0 +1,382 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+GPUの情報と使用率を取得するモジュール。
+
+このモジュールはGPU情報の取得方法をバックエンドとして切り替えられるようにします。
+NVMLが利用できる場合はプロセス内で取得し、利用できない場合は常駐させた nvidia-smi の
+出力を読み取るため、取得のたびにプロセスを起動することはありません。
+"""
+
+import logging
+import platform
+import re
+import shutil
+import subprocess
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Sequence
+
+# pynvmlがなくてもインポートできるようにする
+try:
+    import pynvml
+
+    PYNVML_AVAILABLE = True
+except ImportError:
+    pynvml = None
+    PYNVML_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# nvidia-smiで取得する項目
+NVIDIA_SMI_QUERY = "index,name,utilization.gpu,memory.used,memory.total"
+
+
+def make_gpu_info(index: Any, name: str, utilization: float, memory_used: float, memory_total: float) -> Dict[str, Any]:
+    """
+    すべてのバックエンドで共通のGPU情報の辞書を作成します。
+
+    Args:
+        index: GPUの番号
+        name: GPU名
+        utilization: 使用率（%）
+        memory_used: 使用中のメモリ（MiB）
+        memory_total: 全メモリ（MiB）
+
+    Returns:
+        Dict[str, Any]: GPU情報
+    """
+    return {
+        "index": str(index),
+        "name": name,
+        "utilization": float(utilization),
+        "memory_used": float(memory_used),
+        "memory_total": float(memory_total),
+        "memory_used_percent": (memory_used / memory_total) * 100 if memory_total > 0 else 0,
+    }
+
+
+def parse_nvidia_smi_line(line: str) -> Optional[Dict[str, Any]]:
+    """
+    nvidia-smi の CSV 出力（noheader, nounits）の1行を解析します。
+
+    Args:
+        line: nvidia-smiの出力の1行
+
+    Returns:
+        Optional[Dict[str, Any]]: GPU情報。解析できない行の場合はNone
+    """
+    parts = line.strip().split(", ")
+    if len(parts) < 5:
+        return None
+    try:
+        return make_gpu_info(parts[0], parts[1], float(parts[2]), float(parts[3]), float(parts[4]))
+    except ValueError:
+        return None
+
+
+def parse_nvidia_smi_output(output: str) -> List[Dict[str, Any]]:
+    """
+    nvidia-smi の CSV 出力全体を解析します。
+
+    Args:
+        output: nvidia-smiの出力
+
+    Returns:
+        List[Dict[str, Any]]: GPU情報のリスト
+    """
+    gpus = []
+    for line in output.strip().split("\n"):
+        gpu = parse_nvidia_smi_line(line)
+        if gpu is not None:
+            gpus.append(gpu)
+    return gpus
+
+
+class GpuTelemetryBackend(ABC):
+    """
+    GPU情報を取得するバックエンドの基底クラス。
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def read(self) -> List[Dict[str, Any]]:
+        """
+        GPU情報を取得します。
+
+        Returns:
+            List[Dict[str, Any]]: GPU情報のリスト（make_gpu_infoの形式）
+        """
+
+    def close(self) -> None:
+        """
+        バックエンドが保持しているリソースを解放します。
+        """
+
+
+class NvmlBackend(GpuTelemetryBackend):
+    """
+    NVML（pynvml）を使用してプロセス内でGPU情報を取得するバックエンド。
+    """
+
+    name = "nvml"
+
+    def __init__(self):
+        """
+        NvmlBackendクラスのコンストラクタ。NVMLを初期化し、GPUのハンドルと名前を取得します。
+
+        Raises:
+            RuntimeError: pynvmlがインストールされていないか、NVMLを初期化できない場合
+        """
+        if not PYNVML_AVAILABLE:
+            raise RuntimeError("pynvmlがインストールされていません")
+        try:
+            pynvml.nvmlInit()
+        except Exception as e:
+            raise RuntimeError(f"NVMLの初期化に失敗しました: {e}")
+
+        self._lock = threading.Lock()
+        self._initialized = True
+        self._devices = []
+        for index in range(pynvml.nvmlDeviceGetCount()):
+            handle = pynvml.nvmlDeviceGetHandleByIndex(index)
+            name = pynvml.nvmlDeviceGetName(handle)
+            if isinstance(name, bytes):
+                name = name.decode("utf-8", errors="replace")
+            self._devices.append((index, name, handle))
+
+    def read(self) -> List[Dict[str, Any]]:
+        gpus = []
+        with self._lock:
+            for index, name, handle in self._devices:
+                utilization = pynvml.nvmlDeviceGetUtilizationRates(handle)
+                memory = pynvml.nvmlDeviceGetMemoryInfo(handle)
+                # nvidia-smiと同じMiB単位に揃える
+                gpus.append(make_gpu_info(index, name, utilization.gpu, memory.used / 1048576, memory.total / 1048576))
+        return gpus
+
+    def close(self) -> None:
+        with self._lock:
+            if self._initialized:
+                self._initialized = False
+                self._devices = []
+                pynvml.nvmlShutdown()
+
+
+class NvidiaSmiStreamBackend(GpuTelemetryBackend):
+    """
+    nvidia-smi を --loop-ms で常駐させ、出力される最新の値を返すバックエンド。
+
+    読み取りスレッドが出力を1行ずつ解析してGPUごとの最新値を保持するため、
+    read はプロセスを起動せずに値を返します。プロセスが終了した場合は次の read で再起動します。
+    """
+
+    name = "nvidia-smi"
+
+    def __init__(
+        self,
+        loop_ms: int = 1000,
+        command: Optional[Sequence[str]] = None,
+        first_sample_timeout: float = 5.0,
+        restart_interval: float = 10.0,
+    ):
+        """
+        NvidiaSmiStreamBackendクラスのコンストラクタ。
+
+        Args:
+            loop_ms: nvidia-smiが値を出力する間隔のミリ秒（デフォルト: 1000）
+            command: 実行するコマンド（テスト用、省略時はnvidia-smi）
+            first_sample_timeout: 最初の値を待つ秒数（デフォルト: 5.0）
+            restart_interval: プロセスが終了した場合に再起動するまでの最短の秒数（デフォルト: 10.0）
+        """
+        self.loop_ms = loop_ms
+        self.command = (
+            list(command)
+            if command
+            else [
+                "nvidia-smi",
+                f"--query-gpu={NVIDIA_SMI_QUERY}",
+                "--format=csv,noheader,nounits",
+                f"--loop-ms={loop_ms}",
+            ]
+        )
+        self.first_sample_timeout = first_sample_timeout
+        self.restart_interval = restart_interval
+        self._last_start: Optional[float] = None
+        self._lock = threading.Lock()
+        self._latest: Dict[str, Dict[str, Any]] = {}
+        self._first_sample = threading.Event()
+        self._process: Optional[subprocess.Popen] = None
+        self._reader: Optional[threading.Thread] = None
+        self.restart_count = 0
+
+    def _ensure_running(self) -> None:
+        """
+        nvidia-smiのプロセスと読み取りスレッドが動作していなければ開始します。
+        """
+        with self._lock:
+            if self._process is not None and self._process.poll() is None:
+                return
+            # 起動直後に終了し続ける場合に毎回プロセスを起動しないよう、再起動の間隔を空ける
+            now = time.monotonic()
+            if self._last_start is not None:
+                if now - self._last_start < self.restart_interval:
+                    return
+                self.restart_count += 1
+            self._last_start = now
+            self._process = subprocess.Popen(
+                self.command,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                bufsize=1,
+            )
+            self._reader = threading.Thread(
+                target=self._read_output, args=(self._process,), name="nvidia-smi-reader", daemon=True
+            )
+            self._reader.start()
+
+    def _read_output(self, process: subprocess.Popen) -> None:
+        """
+        読み取りスレッドの本体。nvidia-smiの出力を解析して最新値を更新します。
+
+        Args:
+            process: 出力を読み取るnvidia-smiのプロセス
+        """
+        for line in process.stdout:
+            gpu = parse_nvidia_smi_line(line)
+            if gpu is None:
+                continue
+            with self._lock:
+                self._latest[gpu["index"]] = gpu
+            self._first_sample.set()
+        # 値を出力せずに終了した場合も待機中のreadを解放する
+        self._first_sample.set()
+
+    def read(self) -> List[Dict[str, Any]]:
+        self._ensure_running()
+        self._first_sample.wait(self.first_sample_timeout)
+        with self._lock:
+            return [dict(gpu) for _, gpu in sorted(self._latest.items(), key=lambda item: int(item[0]))]
+
+    def close(self) -> None:
+        with self._lock:
+            process = self._process
+            self._process = None
+        if process is not None and process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=2.0)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+class AppleGpuBackend(GpuTelemetryBackend):
+    """
+    macOS（Apple Silicon）でioregとpowermetricsを使用してGPU情報を取得するバックエンド。
+
+    powermetricsには常駐モードがないため、取得のたびにプロセスを起動します。
+    """
+
+    name = "apple"
+
+    def read(self) -> List[Dict[str, Any]]:
+        try:
+            # まず、ioregを使用してGPUの名前を取得
+            result = subprocess.run(["ioreg", "-l", "-w", "0"], capture_output=True, text=True)
+
+            gpu_name = "Apple GPU"
+            for line in result.stdout.split("\n"):
+                if "model" in line.lower() and "gpu" in line.lower():
+                    match = re.search(r'"model"\s*=\s*"([^"]+)"', line)
+                    if match:
+                        gpu_name = match.group(1)
+                        break
+
+            # powermetrics を使用してGPUの使用率を取得
+            # 注意: これには管理者権限が必要な場合があります
+            result = subprocess.run(
+                ["sudo", "powermetrics", "--samplers", "gpu", "-n", "1", "-i", "100"], capture_output=True, text=True
+            )
+
+            gpu_util = 0
+            for line in result.stdout.split("\n"):
+                if "gpu active" in line.lower():
+                    match = re.search(r"(\d+)%", line)
+                    if match:
+                        gpu_util = float(match.group(1))
+                        break
+
+            # Apple GPUではメモリ使用量を取得できない
+            return [make_gpu_info("0", gpu_name, gpu_util, 0, 0)]
+        except Exception as e:
+            logger.warning("macOSでのGPU情報取得に失敗しました: %s", e)
+            return []
+
+
+class FakeGpuBackend(GpuTelemetryBackend):
+    """
+    設定された値を返すテスト用のバックエンド。
+    """
+
+    name = "fake"
+
+    def __init__(self, gpus: Optional[List[Dict[str, Any]]] = None):
+        """
+        FakeGpuBackendクラスのコンストラクタ。
+
+        Args:
+            gpus: 返すGPU情報のリスト（省略時は空）
+        """
+        self.gpus = list(gpus or [])
+        self.read_count = 0
+
+    def read(self) -> List[Dict[str, Any]]:
+        self.read_count += 1
+        return [dict(gpu) for gpu in self.gpus]
+
+
+def create_gpu_backend(name: str = "auto", loop_ms: int = 1000) -> Optional[GpuTelemetryBackend]:
+    """
+    GPU情報を取得するバックエンドを作成します。
+
+    auto の場合は NVML、nvidia-smi（常駐）、macOSの順に利用可能なものを選択します。
+
+    Args:
+        name: バックエンド名（auto、nvml、nvidia-smi、apple、fake、none）
+        loop_ms: nvidia-smiが値を出力する間隔のミリ秒（デフォルト: 1000）
+
+    Returns:
+        Optional[GpuTelemetryBackend]: バックエンド。利用可能なものがない場合はNone
+    """
+    if name == "none":
+        return None
+    if name == "fake":
+        return FakeGpuBackend()
+    if name == "apple":
+        return AppleGpuBackend()
+    if name == "nvidia-smi":
+        return NvidiaSmiStreamBackend(loop_ms=loop_ms)
+    if name == "nvml":
+        return NvmlBackend()
+    if name != "auto":
+        raise ValueError(f"未対応のGPUバックエンド: {name}")
+
+    system = platform.system()
+    if system in ("Windows", "Linux"):
+        if PYNVML_AVAILABLE:
+            try:
+                return NvmlBackend()
+            except RuntimeError as e:
+                logger.info("NVMLを使用できないため、nvidia-smiを使用します: %s", e)
+        if shutil.which("nvidia-smi"):
+            return NvidiaSmiStreamBackend(loop_ms=loop_ms)
+        logger.warning("nvidia-smiが見つかりません")
+        return None
+    if system == "Darwin":
+        return AppleGpuBackend()
+
+    logger.warning("未対応のOS: %s", system)
+    return None
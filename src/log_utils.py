@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+ログ出力を設定するモジュール。
+
+このモジュールは標準のloggingモジュールの設定（レベル、テキストまたはJSON形式）と、
+ollamaへのリクエストのペイロードをログに出力する際の省略と伏せ字を提供します。
+ペイロードの整形はログが実際に出力される場合にだけ行われるため、DEBUGレベルが無効な場合は
+会話履歴を文字列にする処理が発生しません。
+"""
+
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+# 各モジュールのロガーの親（src.app、src.ollama_client など）
+ROOT_LOGGER_NAME = "src"
+
+# ペイロードの出力方法（"redact"は本文を文字数に置き換える、"full"はそのまま出力する）
+PAYLOAD_MODES = ("redact", "full")
+
+# ログのペイロードの設定（configure_loggingで変更）
+payload_mode = "redact"
+payload_max_chars = 1000
+
+# LogRecordの標準の属性（JSON形式でextraとして出力しない）
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def truncate(text: str, max_chars: int) -> str:
+    """
+    文字列が長い場合は末尾を省略します。
+
+    Args:
+        text: 文字列
+        max_chars: 最大の文字数（0以下の場合は省略しない）
+
+    Returns:
+        str: 省略した文字列（省略した文字数を末尾に付ける）
+    """
+    if max_chars <= 0 or len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]}...（{len(text) - max_chars}文字省略）"
+
+
+def redact_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    ペイロードのメッセージ本文、プロンプト、コンテキストを文字数やトークン数に置き換えます。
+
+    Args:
+        payload: ollamaへのリクエストのペイロード
+
+    Returns:
+        Dict[str, Any]: 伏せ字にしたペイロード（元のペイロードは変更しない）
+    """
+    redacted = dict(payload)
+    if isinstance(payload.get("messages"), list):
+        redacted["messages"] = [
+            {"role": message.get("role"), "content": f"<{len(message.get('content') or '')}文字>"}
+            for message in payload["messages"]
+        ]
+    for key in ("prompt", "system"):
+        if isinstance(payload.get(key), str):
+            redacted[key] = f"<{len(payload[key])}文字>"
+    if isinstance(payload.get("context"), list):
+        redacted["context"] = f"<{len(payload['context'])}トークン>"
+    return redacted
+
+
+class LazyPayload:
+    """
+    ログが出力される場合にだけペイロードを整形するクラス。
+
+    logger.debug("...: %s", LazyPayload(payload)) のように引数として渡します。
+    """
+
+    __slots__ = ("payload",)
+
+    def __init__(self, payload: Any):
+        """
+        LazyPayloadクラスのコンストラクタ。
+
+        Args:
+            payload: ログに出力するペイロード（辞書の場合は設定に従って伏せ字にする）
+        """
+        self.payload = payload
+
+    def __str__(self) -> str:
+        payload = self.payload
+        if payload_mode != "full" and isinstance(payload, dict):
+            payload = redact_payload(payload)
+        try:
+            text = json.dumps(payload, ensure_ascii=False, default=str)
+        except (TypeError, ValueError):
+            text = repr(payload)
+        return truncate(text, payload_max_chars)
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    ログを1行のJSONとして出力するフォーマッタ。
+
+    extraで渡した値もキーとして出力します。
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(
+    level: Optional[str] = None,
+    fmt: Optional[str] = None,
+    payloads: Optional[str] = None,
+    max_payload_chars: Optional[int] = None,
+) -> logging.Logger:
+    """
+    アプリケーションのログ出力を設定します。引数を省略した場合は環境変数の値を使用します。
+
+    何度呼び出しても出力先は1つだけです。
+
+    Args:
+        level: ログレベル（LOG_LEVEL、デフォルト: "INFO"）
+        fmt: 出力形式。"text" または "json"（LOG_FORMAT、デフォルト: "text"）
+        payloads: ペイロードの出力方法。"redact" または "full"（LOG_PAYLOADS、デフォルト: "redact"）
+        max_payload_chars: ペイロードを省略するまでの文字数（LOG_PAYLOAD_MAX_CHARS、デフォルト: 1000）
+
+    Returns:
+        logging.Logger: 設定したロガー（src）
+    """
+    global payload_mode, payload_max_chars
+
+    level = (level or os.environ.get("LOG_LEVEL", "INFO")).upper()
+    fmt = (fmt or os.environ.get("LOG_FORMAT", "text")).lower()
+    payloads = (payloads or os.environ.get("LOG_PAYLOADS", "redact")).lower()
+    if max_payload_chars is None:
+        max_payload_chars = int(os.environ.get("LOG_PAYLOAD_MAX_CHARS", 1000))
+
+    payload_mode = payloads if payloads in PAYLOAD_MODES else "redact"
+    payload_max_chars = max_payload_chars
+
+    handler = logging.StreamHandler(sys.stderr)
+    if fmt == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    handler._ollama_client_handler = True
+
+    logger = logging.getLogger(ROOT_LOGGER_NAME)
+    for existing in list(logger.handlers):
+        if getattr(existing, "_ollama_client_handler", False):
+            logger.removeHandler(existing)
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    # ルートロガーに別の出力先が設定されていても重複して出力しない
+    logger.propagate = False
+    return logger
@@ -0,0 +1,435 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+応答の生成と通信の所要時間を計測し、Prometheusのテキスト形式で出力するモジュール。
+
+このモジュールはカウンタ、ゲージ、ヒストグラムと、それらをまとめて /metrics の応答として
+出力するレジストリを提供します。外部のライブラリには依存せず、スレッドとイベントループの
+どちらから記録しても安全です。
+"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# /metrics の応答のContent-Type
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 通信や待ち時間用のヒストグラムの区切り（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# 応答の生成全体の所要時間用の区切り（秒）
+GENERATION_BUCKETS = (0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+# 1秒あたりの生成トークン数用の区切り
+TOKENS_PER_SECOND_BUCKETS = (1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 50.0, 75.0, 100.0, 150.0, 250.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def format_value(value: float) -> str:
+    """
+    数値をPrometheusのテキスト形式で表します。
+    """
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def escape_label_value(value: str) -> str:
+    """
+    ラベルの値のバックスラッシュ、ダブルクォート、改行をエスケープします。
+    """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    """
+    ラベルを {name="value",...} の形式で表します（ラベルがない場合は空文字列）。
+    """
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label_value(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class _Metric:
+    """
+    ラベルの組み合わせごとに値を保持するメトリクスの基底クラス。
+    """
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: Dict[str, Any]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} のラベルは {self.labelnames} です（指定: {tuple(labels)}）")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        """
+        出力するサンプルを (名前, ラベル, 値) のリストで返します。
+        """
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        """
+        HELPとTYPEの行を含むテキスト形式の行を返します。
+        """
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(f"{name}{labels} {format_value(value)}" for name, labels, value in self.samples())
+        return lines
+
+
+class Counter(_Metric):
+    """
+    増加のみする値（リクエスト数、トークン数など）。
+    """
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        """
+        値を増やします。
+
+        Args:
+            amount: 増やす量（0以上、デフォルト: 1.0）
+            **labels: ラベルの値
+        """
+        if amount < 0:
+            raise ValueError("カウンタは減らせません")
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels: Any) -> float:
+        """
+        現在の値を取得します。
+        """
+        with self._lock:
+            return self._values.get(self._label_values(labels), 0.0)
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [(self.name, format_labels(self.labelnames, key), value) for key, value in items]
+
+
+class Gauge(_Metric):
+    """
+    増減する現在の値（実行中の生成の数、待ち行列の長さなど）。
+    """
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: Any) -> None:
+        """
+        値を設定します。
+
+        Args:
+            value: 値
+            **labels: ラベルの値
+        """
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def get(self, **labels: Any) -> float:
+        """
+        現在の値を取得します。
+        """
+        with self._lock:
+            return self._values.get(self._label_values(labels), 0.0)
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [(self.name, format_labels(self.labelnames, key), value) for key, value in items]
+
+
+class Histogram(_Metric):
+    """
+    観測値の分布（所要時間など）を区切りごとの累積数、合計、件数で保持します。
+    """
+
+    type_name = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # ラベルの組み合わせごとの [区切りごとの件数..., 合計, 件数]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        """
+        値を記録します。
+
+        Args:
+            value: 観測値
+            **labels: ラベルの値
+        """
+        key = self._label_values(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, clock: Callable[[], float] = time.perf_counter, **labels: Any) -> Iterator[None]:
+        """
+        withブロックの所要時間を記録します（例外が発生した場合も記録します）。
+
+        Args:
+            clock: 現在時刻を返す関数（デフォルト: time.perf_counter）
+            **labels: ラベルの値
+        """
+        start = clock()
+        try:
+            yield
+        finally:
+            self.observe(clock() - start, **labels)
+
+    def get_count(self, **labels: Any) -> int:
+        """
+        記録した件数を取得します。
+        """
+        with self._lock:
+            state = self._values.get(self._label_values(labels))
+            return int(state[-1]) if state else 0
+
+    def get_sum(self, **labels: Any) -> float:
+        """
+        記録した値の合計を取得します。
+        """
+        with self._lock:
+            state = self._values.get(self._label_values(labels))
+            return state[-2] if state else 0.0
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        samples = []
+        for key, state in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (math.inf,), state[: len(self.buckets)] + [state[-1]]):
+                cumulative = count if math.isinf(bound) else cumulative + count
+                labels = format_labels(self.labelnames + ("le",), key + (format_value(bound),))
+                samples.append((f"{self.name}_bucket", labels, cumulative))
+            samples.append((f"{self.name}_sum", format_labels(self.labelnames, key), state[-2]))
+            samples.append((f"{self.name}_count", format_labels(self.labelnames, key), state[-1]))
+        return samples
+
+
+class MetricsRegistry:
+    """
+    メトリクスをまとめてPrometheusのテキスト形式で出力するクラス。
+    """
+
+    def __init__(self):
+        """
+        MetricsRegistryクラスのコンストラクタ。
+        """
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"{metric.name} はすでに登録されています")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """
+        カウンタを作成して登録します。
+        """
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """
+        ゲージを作成して登録します。
+        """
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        """
+        ヒストグラムを作成して登録します。
+        """
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """
+        登録したすべてのメトリクスをPrometheusのテキスト形式で出力します。
+
+        Returns:
+            str: /metrics の応答の本文
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# アプリケーション全体で共有するレジストリ
+REGISTRY = MetricsRegistry()
+
+GENERATION_DURATION = REGISTRY.histogram(
+    "llm_generation_duration_seconds", "応答の生成の開始から完了までの時間", ["model"], GENERATION_BUCKETS
+)
+TIME_TO_FIRST_TOKEN = REGISTRY.histogram(
+    "llm_time_to_first_token_seconds", "応答の生成の開始から最初のトークンを受信するまでの時間", ["model"], LATENCY_BUCKETS
+)
+TOKENS_PER_SECOND = REGISTRY.histogram(
+    "llm_tokens_per_second", "ollamaが報告した1秒あたりの生成トークン数", ["model"], TOKENS_PER_SECOND_BUCKETS
+)
+PROMPT_EVAL_DURATION = REGISTRY.histogram(
+    "llm_prompt_eval_duration_seconds", "ollamaが報告したプロンプトの評価時間", ["model"], LATENCY_BUCKETS
+)
+EVAL_DURATION = REGISTRY.histogram(
+    "llm_eval_duration_seconds", "ollamaが報告した応答の生成時間", ["model"], GENERATION_BUCKETS
+)
+LOAD_DURATION = REGISTRY.histogram(
+    "llm_load_duration_seconds", "ollamaが報告したモデルのロード時間", ["model"], LATENCY_BUCKETS
+)
+PROMPT_TOKENS = REGISTRY.counter("llm_prompt_tokens_total", "ollamaが評価したプロンプトのトークン数", ["model"])
+GENERATED_TOKENS = REGISTRY.counter("llm_generated_tokens_total", "ollamaが生成したトークン数", ["model"])
+GENERATIONS = REGISTRY.counter(
+    "llm_generations_total", "応答の生成の件数（outcome: completed、cancelled、error、rejected）", ["model", "outcome"]
+)
+QUEUE_WAIT = REGISTRY.histogram(
+    "llm_queue_wait_seconds", "応答の生成の実行が許可されるまでの待ち時間", ["model"], LATENCY_BUCKETS
+)
+SCHEDULER_RUNNING = REGISTRY.gauge("llm_scheduler_running", "実行中の応答の生成の数", ["model"])
+SCHEDULER_QUEUED = REGISTRY.gauge("llm_scheduler_queued", "順番待ちの応答の生成の数", ["model"])
+EMIT_DURATION = REGISTRY.histogram("socketio_emit_duration_seconds", "Socket.IOのイベントの送信にかかった時間", ["event"])
+BACKEND_DURATION = REGISTRY.histogram(
+    "ollama_request_duration_seconds", "ollamaサーバーへのリクエストの所要時間", ["operation"], LATENCY_BUCKETS
+)
+BACKEND_ERRORS = REGISTRY.counter("ollama_request_errors_total", "ollamaサーバーへのリクエストの失敗数", ["operation"])
+RESPONSE_CACHE_REQUESTS = REGISTRY.counter(
+    "llm_response_cache_requests_total", "応答キャッシュの参照の件数（result: memory、disk、miss）", ["result"]
+)
+SEMANTIC_CACHE_REQUESTS = REGISTRY.counter(
+    "llm_semantic_cache_requests_total", "意味の近い質問の応答キャッシュの参照の件数（result: hit、miss）", ["result"]
+)
+
+
+@contextmanager
+def track_backend(operation: str, clock: Callable[[], float] = time.perf_counter) -> Iterator[None]:
+    """
+    ollamaサーバーへのリクエストの所要時間と失敗を記録します。
+
+    Args:
+        operation: 操作名（list_models、chat など）
+        clock: 現在時刻を返す関数（デフォルト: time.perf_counter）
+    """
+    start = clock()
+    try:
+        yield
+    except Exception:
+        BACKEND_ERRORS.inc(operation=operation)
+        raise
+    finally:
+        BACKEND_DURATION.observe(clock() - start, operation=operation)
+
+
+def update_scheduler_gauges(stats: Dict[str, Dict[str, Any]]) -> None:
+    """
+    スケジューラの統計情報からモデルごとの実行中と順番待ちの数を設定します。
+
+    Args:
+        stats: AdmissionQueue.stats() の結果
+    """
+    for model, model_stats in stats.items():
+        SCHEDULER_RUNNING.set(model_stats.get("running", 0), model=model)
+        SCHEDULER_QUEUED.set(model_stats.get("queued", 0), model=model)
+
+
+class GenerationTimer:
+    """
+    1回の応答の生成の所要時間を計測し、完了時にまとめて記録するクラス。
+    """
+
+    def __init__(self, model: str, clock: Callable[[], float] = time.perf_counter):
+        """
+        GenerationTimerクラスのコンストラクタ。計測を開始します。
+
+        Args:
+            model: 使用するモデル名
+            clock: 現在時刻を返す関数（デフォルト: time.perf_counter）
+        """
+        self.model = model
+        self._clock = clock
+        self.started_at = clock()
+        self.first_token_at: Optional[float] = None
+        self.finished = False
+
+    def on_chunk(self, content: str) -> None:
+        """
+        チャンクを受信したときに呼び出します。最初の本文を含むチャンクの時刻を記録します。
+
+        Args:
+            content: チャンクの本文
+        """
+        if content and self.first_token_at is None:
+            self.first_token_at = self._clock()
+
+    def finish(self, outcome: str, final_chunk: Optional[Dict[str, Any]] = None) -> None:
+        """
+        生成の終了を記録します。2回目以降の呼び出しは無視します。
+
+        Args:
+            outcome: 結果（completed、cancelled、error）
+            final_chunk: ollamaの最後のチャンク（prompt_eval_durationなどのナノ秒単位の値を含む、省略可）
+        """
+        if self.finished:
+            return
+        self.finished = True
+        model = self.model
+        GENERATIONS.inc(model=model, outcome=outcome)
+        GENERATION_DURATION.observe(self._clock() - self.started_at, model=model)
+        if self.first_token_at is not None:
+            TIME_TO_FIRST_TOKEN.observe(self.first_token_at - self.started_at, model=model)
+        if not final_chunk:
+            return
+
+        for key, histogram in (
+            ("prompt_eval_duration", PROMPT_EVAL_DURATION),
+            ("eval_duration", EVAL_DURATION),
+            ("load_duration", LOAD_DURATION),
+        ):
+            if final_chunk.get(key):
+                histogram.observe(final_chunk[key] / 1e9, model=model)
+        if final_chunk.get("prompt_eval_count"):
+            PROMPT_TOKENS.inc(final_chunk["prompt_eval_count"], model=model)
+        eval_count = final_chunk.get("eval_count")
+        if eval_count:
+            GENERATED_TOKENS.inc(eval_count, model=model)
+            if final_chunk.get("eval_duration"):
+                TOKENS_PER_SECOND.observe(eval_count / (final_chunk["eval_duration"] / 1e9), model=model)
@@ -0,0 +1,697 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+テストとベンチマーク用のollamaサーバーのモジュール。
+
+このモジュールは標準ライブラリのThreadingHTTPServerで、このアプリケーションが使用するollamaのAPI
+（/api/tags、/api/ps、/api/show、/api/chat、/api/generate、/api/stop、/api/embeddings、/api/version）を提供します。
+応答は質問から決まる決まった文で、トークンの生成速度、最初のトークンまでの時間、ゆらぎ、モデルのロード時間、
+エラーと切断の発生率を設定できるため、GPUのないマシンでもアプリケーション全体の負荷試験やベンチマークを
+再現性のある条件で実行できます。
+
+使い方:
+    python -m src.mock_ollama --port 11434 --tokens-per-second 30 --first-token-delay 0.2
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+VERSION = "0.6.0"
+
+DEFAULT_MODELS = ("llama2:latest", "mistral:latest", "nomic-embed-text:latest")
+
+# 応答の文に使う語。質問のハッシュで始まりの位置を決めて順に繰り返す
+VOCABULARY = ("これは", "モック", "サーバー", "の", "応答", "です", "。")
+
+# モックのモデルのサイズ（バイト）とコンテキスト長
+MODEL_SIZE = 3_825_819_519
+CONTEXT_LENGTH = 4096
+
+
+def full_model_name(name: str) -> str:
+    """
+    タグを省略したモデル名に ":latest" を付けます。
+    """
+    return name if ":" in name else f"{name}:latest"
+
+
+def model_digest(name: str) -> str:
+    """
+    モデル名から決まるダイジェストを作成します。
+    """
+    return hashlib.sha256(full_model_name(name).encode("utf-8")).hexdigest()
+
+
+def keep_alive_seconds(value: Any, default: float) -> float:
+    """
+    リクエストのkeep_aliveを秒数に変換します。
+
+    Args:
+        value: 秒数、または "30s"、"5m"、"1h" のような文字列（負の値は無期限、Noneは既定値）
+        default: 省略時の秒数
+
+    Returns:
+        float: 秒数（無期限の場合はinf）
+    """
+    if value is None:
+        return default
+    if isinstance(value, str):
+        units = {"s": 1, "m": 60, "h": 3600}
+        text = value.strip()
+        try:
+            seconds = float(text[:-1]) * units[text[-1]] if text and text[-1] in units else float(text)
+        except ValueError:
+            return default
+    else:
+        seconds = float(value)
+    return float("inf") if seconds < 0 else seconds
+
+
+def response_tokens(prompt: str, count: int) -> List[str]:
+    """
+    質問から決まる応答のトークンを作成します。
+
+    Args:
+        prompt: 質問
+        count: トークン数
+
+    Returns:
+        List[str]: トークンのリスト
+    """
+    start = zlib.crc32(prompt.encode("utf-8")) % len(VOCABULARY)
+    return [VOCABULARY[(start + i) % len(VOCABULARY)] for i in range(count)]
+
+
+def embedding_vector(text: str, dimension: int) -> List[float]:
+    """
+    文字の出現回数から決まる埋め込みベクトルを作成します。同じ文字を多く含む文ほど似たベクトルになります。
+
+    Args:
+        text: 埋め込むテキスト
+        dimension: ベクトルの次元数
+
+    Returns:
+        List[float]: 埋め込みベクトル
+    """
+    vector = [0.0] * dimension
+    for char in text:
+        vector[zlib.crc32(char.encode("utf-8")) % dimension] += 1.0
+    return vector
+
+
+def timestamp(offset: float = 0.0) -> str:
+    """
+    ollamaと同じ形式の時刻の文字列を作成します。
+    """
+    if offset == float("inf"):
+        offset = 10 * 365 * 86400.0
+    return (datetime.now(timezone.utc) + timedelta(seconds=offset)).isoformat().replace("+00:00", "Z")
+
+
+class MockOllamaServer:
+    """
+    テストとベンチマーク用のollamaサーバー。
+
+    start()でバックグラウンドのスレッドで起動し、urlをOllamaClientのhostに指定して使用します。
+    withブロックで使用すると、ブロックを抜けるときに停止します。
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        models: Iterable[str] = DEFAULT_MODELS,
+        tokens_per_second: float = 50.0,
+        first_token_delay: float = 0.05,
+        jitter: float = 0.0,
+        load_delay: float = 0.0,
+        error_rate: float = 0.0,
+        disconnect_rate: float = 0.0,
+        response_tokens: int = 32,
+        num_parallel: int = 4,
+        keep_alive: float = 300.0,
+        embedding_dimension: int = 32,
+        seed: Optional[int] = None,
+    ):
+        """
+        MockOllamaServerクラスのコンストラクタ。
+
+        Args:
+            host: 待ち受けるアドレス（デフォルト: "127.0.0.1"）
+            port: 待ち受けるポート。0の場合は空いているポートを使用（デフォルト: 0）
+            models: 提供するモデル名（デフォルト: llama2、mistral、nomic-embed-text）
+            tokens_per_second: 1秒あたりに生成するトークン数。0の場合は待たない（デフォルト: 50.0）
+            first_token_delay: 最初のトークンまでの秒数（プロンプトの評価時間、デフォルト: 0.05）
+            jitter: 待ち時間のゆらぎの割合。0.2の場合は待ち時間を0.8倍から1.2倍の間で変える（デフォルト: 0.0）
+            load_delay: ロードされていないモデルの最初の応答の前に待つ秒数（デフォルト: 0.0）
+            error_rate: 生成と埋め込みのリクエストにHTTP 500を返す割合（デフォルト: 0.0）
+            disconnect_rate: ストリーミング応答を途中で切断する割合（デフォルト: 0.0）
+            response_tokens: 応答のトークン数。optionsのnum_predictが優先される（デフォルト: 32）
+            num_parallel: モデルごとに同時に生成するリクエストの数。超えたリクエストは待たせる。0の場合は制限しない（デフォルト: 4）
+            keep_alive: リクエストでkeep_aliveを省略した場合にモデルをロードしておく秒数（デフォルト: 300.0）
+            embedding_dimension: 埋め込みベクトルの次元数（デフォルト: 32）
+            seed: ゆらぎ、エラー、切断の乱数のシード。指定すると同じ順序のリクエストで同じ結果になる（省略可）
+        """
+        self.models = {full_model_name(name): model_digest(name) for name in models}
+        self.tokens_per_second = tokens_per_second
+        self.first_token_delay = first_token_delay
+        self.jitter = jitter
+        self.load_delay = load_delay
+        self.error_rate = error_rate
+        self.disconnect_rate = disconnect_rate
+        self.response_tokens = response_tokens
+        self.num_parallel = num_parallel
+        self.keep_alive = keep_alive
+        self.embedding_dimension = embedding_dimension
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        # ロードしたモデル名 -> アンロードする時刻（time.monotonic）
+        self._loaded: Dict[str, float] = {}
+        self._slots: Dict[str, threading.BoundedSemaphore] = {}
+        # 統計情報
+        self._requests: Dict[str, int] = {}
+        self.tokens = 0
+        self.active = 0
+        self.loads = 0
+        self.injected_errors = 0
+        self.injected_disconnects = 0
+        self.client_disconnects = 0
+
+        handler = type("Handler", (MockOllamaHandler,), {"mock": self})
+        self._httpd = ThreadingHTTPServer((host, port), handler)
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """
+        サーバーのURL（例: "http://127.0.0.1:11434"）。
+        """
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockOllamaServer":
+        """
+        バックグラウンドのスレッドでサーバーを起動します。
+
+        Returns:
+            MockOllamaServer: 自身
+        """
+        # テストで停止を待たないように、停止の要求を確認する間隔を短くする
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, kwargs={"poll_interval": 0.05}, name="mock-ollama", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """
+        現在のスレッドでサーバーを実行します（コマンドライン用）。
+        """
+        self._httpd.serve_forever()
+
+    def stop(self) -> None:
+        """
+        サーバーを停止します。
+        """
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+
+    def __enter__(self) -> "MockOllamaServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        受信したリクエストと生成の統計情報を取得します。
+
+        Returns:
+            Dict[str, Any]: パスごとのリクエスト数、生成したトークン数、生成中のリクエスト数、
+                ロードの回数、発生させたエラーと切断の数、クライアントによる切断の数
+        """
+        with self._lock:
+            return {
+                "requests": dict(self._requests),
+                "tokens": self.tokens,
+                "active": self.active,
+                "loads": self.loads,
+                "injected_errors": self.injected_errors,
+                "injected_disconnects": self.injected_disconnects,
+                "client_disconnects": self.client_disconnects,
+            }
+
+    # ---- リクエストの処理から呼び出す処理 ----
+
+    def count_request(self, path: str) -> None:
+        with self._lock:
+            self._requests[path] = self._requests.get(path, 0) + 1
+
+    def find_model(self, name: Optional[str]) -> Optional[str]:
+        """
+        提供しているモデルの完全な名前を返します。提供していない場合はNone。
+        """
+        if not name:
+            return None
+        name = full_model_name(name)
+        return name if name in self.models else None
+
+    def chance(self, rate: float) -> bool:
+        """
+        rateの割合でTrueを返します。
+        """
+        if rate <= 0:
+            return False
+        with self._lock:
+            hit = self._random.random() < rate
+        return hit
+
+    def inject_error(self) -> bool:
+        """
+        error_rateの割合でエラーを発生させるかどうかを決めます。
+        """
+        if not self.chance(self.error_rate):
+            return False
+        with self._lock:
+            self.injected_errors += 1
+        return True
+
+    def vary(self, seconds: float) -> float:
+        """
+        待ち時間にゆらぎを加えます。
+        """
+        if seconds <= 0 or self.jitter <= 0:
+            return max(0.0, seconds)
+        with self._lock:
+            factor = 1.0 + self._random.uniform(-self.jitter, self.jitter)
+        return max(0.0, seconds * factor)
+
+    def running_models(self) -> List[Tuple[str, float]]:
+        """
+        ロードされているモデルとアンロードまでの秒数のリストを返します。
+        """
+        now = time.monotonic()
+        with self._lock:
+            for name in [name for name, expires in self._loaded.items() if expires <= now]:
+                del self._loaded[name]
+            return [(name, expires - now) for name, expires in self._loaded.items()]
+
+    def load(self, model: str, keep_alive: Any) -> int:
+        """
+        モデルをロードし、keep_alive秒後にアンロードするように記録します。
+
+        Returns:
+            int: ロードにかかった時間（ナノ秒）。既にロードされていた場合は0
+        """
+        seconds = keep_alive_seconds(keep_alive, self.keep_alive)
+        now = time.monotonic()
+        with self._lock:
+            loaded = self._loaded.get(model, 0.0) > now
+            if not loaded:
+                self.loads += 1
+        delay = 0.0
+        if not loaded:
+            delay = self.vary(self.load_delay)
+            time.sleep(delay)
+        with self._lock:
+            if seconds <= 0:
+                self._loaded.pop(model, None)
+            else:
+                self._loaded[model] = time.monotonic() + seconds
+        return int(delay * 1e9)
+
+    def unload(self, model: str) -> bool:
+        """
+        モデルをアンロードします。
+
+        Returns:
+            bool: ロードされていた場合はTrue
+        """
+        with self._lock:
+            return self._loaded.pop(model, None) is not None
+
+    def slot(self, model: str) -> Optional[threading.BoundedSemaphore]:
+        """
+        モデルの同時生成数を制限するセマフォを返します。制限しない場合はNone。
+        """
+        if self.num_parallel <= 0:
+            return None
+        with self._lock:
+            if model not in self._slots:
+                self._slots[model] = threading.BoundedSemaphore(self.num_parallel)
+            return self._slots[model]
+
+    def add_active(self, delta: int, tokens: int = 0) -> None:
+        with self._lock:
+            self.active += delta
+            self.tokens += tokens
+
+    def record_disconnect(self, injected: bool) -> None:
+        """
+        ストリーミング応答の切断を記録します。
+
+        Args:
+            injected: disconnect_rateによる切断の場合はTrue、クライアントによる切断の場合はFalse
+        """
+        with self._lock:
+            if injected:
+                self.injected_disconnects += 1
+            else:
+                self.client_disconnects += 1
+
+
+class MockOllamaHandler(BaseHTTPRequestHandler):
+    """
+    MockOllamaServerのリクエストを処理するハンドラ。
+
+    ストリーミング応答はチャンク形式で送信し、HTTP/1.1の接続を再利用できるようにします。
+    """
+
+    protocol_version = "HTTP/1.1"
+    mock: MockOllamaServer
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    # ---- 送信 ----
+
+    def send_json(self, payload: Any, status: int = 200) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status: int, message: str) -> None:
+        self.send_json({"error": message}, status=status)
+
+    def start_stream(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def write_line(self, payload: Dict[str, Any]) -> None:
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n"
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+    def end_stream(self) -> None:
+        self.wfile.write(b"0\r\n\r\n")
+
+    # ---- 受信 ----
+
+    def read_json(self) -> Optional[Dict[str, Any]]:
+        """
+        リクエストの本文をJSONとして読み込みます。解析できない場合は400を返してNoneを返します。
+        """
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError as e:
+            self.send_error_json(400, f"invalid JSON: {e}")
+            return None
+        if not isinstance(payload, dict):
+            self.send_error_json(400, "request body must be an object")
+            return None
+        return payload
+
+    def do_GET(self) -> None:
+        routes = {"/api/tags": self.handle_tags, "/api/ps": self.handle_ps, "/api/version": self.handle_version}
+        self.dispatch(routes)
+
+    def do_POST(self) -> None:
+        routes = {
+            "/api/show": self.handle_show,
+            "/api/chat": self.handle_chat,
+            "/api/generate": self.handle_generate,
+            "/api/stop": self.handle_stop,
+            "/api/embeddings": self.handle_embeddings,
+        }
+        self.dispatch(routes, with_body=True)
+
+    def dispatch(self, routes: Dict[str, Any], with_body: bool = False) -> None:
+        path = self.path.split("?", 1)[0]
+        self.mock.count_request(path)
+        handler = routes.get(path)
+        if handler is None:
+            self.send_error_json(404, "404 page not found")
+            return
+        if not with_body:
+            handler()
+            return
+        payload = self.read_json()
+        if payload is not None:
+            handler(payload)
+
+    # ---- API ----
+
+    def handle_version(self) -> None:
+        self.send_json({"version": VERSION})
+
+    def handle_tags(self) -> None:
+        models = [
+            {
+                "name": name,
+                "model": name,
+                "modified_at": "2024-01-01T00:00:00Z",
+                "size": MODEL_SIZE,
+                "digest": digest,
+                "details": {"format": "gguf", "family": "llama", "parameter_size": "7B", "quantization_level": "Q4_0"},
+            }
+            for name, digest in self.mock.models.items()
+        ]
+        self.send_json({"models": models})
+
+    def handle_ps(self) -> None:
+        models = [
+            {
+                "name": name,
+                "model": name,
+                "size": MODEL_SIZE,
+                "digest": self.mock.models[name],
+                "expires_at": timestamp(remaining),
+                "size_vram": 0,
+            }
+            for name, remaining in self.mock.running_models()
+        ]
+        self.send_json({"models": models})
+
+    def handle_show(self, payload: Dict[str, Any]) -> None:
+        model = self.mock.find_model(payload.get("model") or payload.get("name"))
+        if model is None:
+            self.send_error_json(404, f"model '{payload.get('model') or payload.get('name')}' not found")
+            return
+        self.send_json(
+            {
+                "modelfile": f"FROM {model}",
+                "parameters": "stop <|eot|>",
+                "template": "{{ .Prompt }}",
+                "details": {"format": "gguf", "family": "llama", "parameter_size": "7B", "quantization_level": "Q4_0"},
+                "model_info": {"general.architecture": "llama", "llama.context_length": CONTEXT_LENGTH},
+            }
+        )
+
+    def handle_stop(self, payload: Dict[str, Any]) -> None:
+        target = payload.get("name") or payload.get("model") or payload.get("id") or ""
+        for name, _ in self.mock.running_models():
+            if full_model_name(target) == name or (target and self.mock.models[name].startswith(target)):
+                self.mock.unload(name)
+                self.send_json({})
+                return
+        self.send_error_json(404, f"model '{target}' not found")
+
+    def handle_embeddings(self, payload: Dict[str, Any]) -> None:
+        model = self.mock.find_model(payload.get("model"))
+        if model is None:
+            self.send_error_json(404, f"model '{payload.get('model')}' not found")
+            return
+        if self.mock.inject_error():
+            self.send_error_json(500, "injected error")
+            return
+        self.mock.load(model, payload.get("keep_alive"))
+        self.send_json({"embedding": embedding_vector(str(payload.get("prompt", "")), self.mock.embedding_dimension)})
+
+    def handle_chat(self, payload: Dict[str, Any]) -> None:
+        messages = payload.get("messages") or []
+        prompt = "\n".join(str(message.get("content", "")) for message in messages if isinstance(message, dict))
+        self.generate(payload, prompt, chat=True)
+
+    def handle_generate(self, payload: Dict[str, Any]) -> None:
+        self.generate(payload, str(payload.get("prompt") or ""), chat=False)
+
+    # ---- 生成 ----
+
+    def generate(self, payload: Dict[str, Any], prompt: str, chat: bool) -> None:
+        """
+        /api/chatと/api/generateの応答を生成します。
+
+        プロンプトのない/api/generateはモデルのロード（keep_aliveが0の場合はアンロード）だけを行います。
+        """
+        model = self.mock.find_model(payload.get("model"))
+        if model is None:
+            self.send_error_json(404, f"model '{payload.get('model')}' not found, try pulling it first")
+            return
+        if not chat and not prompt:
+            if keep_alive_seconds(payload.get("keep_alive"), self.mock.keep_alive) <= 0:
+                self.mock.unload(model)
+                done_reason = "unload"
+            else:
+                self.mock.load(model, payload.get("keep_alive"))
+                done_reason = "load"
+            self.send_json(
+                {"model": model, "created_at": timestamp(), "response": "", "done": True, "done_reason": done_reason}
+            )
+            return
+        if self.mock.inject_error():
+            self.send_error_json(500, "injected error")
+            return
+
+        options = payload.get("options") or {}
+        num_predict = int(options.get("num_predict") or 0)
+        tokens = response_tokens(prompt, num_predict if num_predict > 0 else self.mock.response_tokens)
+        disconnect_at = len(tokens) // 2 if self.mock.chance(self.mock.disconnect_rate) else None
+
+        slot = self.mock.slot(model)
+        if slot is not None:
+            slot.acquire()
+        self.mock.add_active(1)
+        sent = 0
+        try:
+            started = time.monotonic()
+            load_duration = self.mock.load(model, payload.get("keep_alive"))
+            prompt_eval_started = time.monotonic()
+            deadline = prompt_eval_started + self.mock.vary(self.mock.first_token_delay)
+            interval = 1.0 / self.mock.tokens_per_second if self.mock.tokens_per_second > 0 else 0.0
+            stream = payload.get("stream", True)
+            if stream:
+                self.start_stream()
+            eval_started = None
+            for token in tokens:
+                # 予定の時刻まで待つことで、処理の遅れが積み重なっても平均の生成速度を保つ
+                delay = deadline - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                if eval_started is None:
+                    eval_started = time.monotonic()
+                if sent == disconnect_at:
+                    self.mock.record_disconnect(injected=True)
+                    self.close_connection = True
+                    return
+                if stream:
+                    self.write_line(self.chunk(model, token, chat))
+                sent += 1
+                deadline += self.mock.vary(interval)
+            finished = time.monotonic()
+            eval_started = eval_started or finished
+            final = self.chunk(model, "" if stream else "".join(tokens), chat)
+            final.update(
+                {
+                    "done": True,
+                    "done_reason": "length" if num_predict > 0 else "stop",
+                    "total_duration": int((finished - started) * 1e9),
+                    "load_duration": load_duration,
+                    "prompt_eval_count": max(1, len(prompt) // 4),
+                    "prompt_eval_duration": int((eval_started - prompt_eval_started) * 1e9),
+                    "eval_count": len(tokens),
+                    "eval_duration": int((finished - eval_started) * 1e9),
+                }
+            )
+            if not chat:
+                final["context"] = list(payload.get("context") or []) + [len(prompt), len(tokens)]
+            if stream:
+                self.write_line(final)
+                self.end_stream()
+            else:
+                self.send_json(final)
+        except (BrokenPipeError, ConnectionResetError):
+            # クライアントが生成を中止した
+            self.mock.record_disconnect(injected=False)
+            self.close_connection = True
+        finally:
+            self.mock.add_active(-1, sent)
+            if slot is not None:
+                slot.release()
+
+    @staticmethod
+    def chunk(model: str, content: str, chat: bool) -> Dict[str, Any]:
+        chunk: Dict[str, Any] = {"model": model, "created_at": timestamp()}
+        if chat:
+            chunk["message"] = {"role": "assistant", "content": content}
+        else:
+            chunk["response"] = content
+        chunk["done"] = False
+        return chunk
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    コマンドラインの引数を解析します。
+    """
+    parser = argparse.ArgumentParser(description="テストとベンチマーク用のollamaサーバー")
+    parser.add_argument("--host", default="127.0.0.1", help="待ち受けるアドレス（デフォルト: 127.0.0.1）")
+    parser.add_argument("--port", type=int, default=11434, help="待ち受けるポート（デフォルト: 11434）")
+    parser.add_argument("--models", default=",".join(DEFAULT_MODELS), help="提供するモデル名（カンマ区切り）")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="1秒あたりのトークン数（0で待たない）")
+    parser.add_argument("--first-token-delay", type=float, default=0.05, help="最初のトークンまでの秒数")
+    parser.add_argument("--jitter", type=float, default=0.0, help="待ち時間のゆらぎの割合（例: 0.2）")
+    parser.add_argument("--load-delay", type=float, default=0.0, help="モデルのロードの秒数")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="HTTP 500を返す割合")
+    parser.add_argument("--disconnect-rate", type=float, default=0.0, help="ストリーミング応答を途中で切断する割合")
+    parser.add_argument("--response-tokens", type=int, default=32, help="応答のトークン数")
+    parser.add_argument("--num-parallel", type=int, default=4, help="モデルごとの同時生成数（0で制限しない）")
+    parser.add_argument("--keep-alive", type=float, default=300.0, help="モデルをロードしておく秒数")
+    parser.add_argument("--seed", type=int, default=None, help="乱数のシード")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    コマンドラインからサーバーを起動します。
+    """
+    from src.log_utils import configure_logging
+
+    args = parse_args(argv)
+    configure_logging()
+    server = MockOllamaServer(
+        host=args.host,
+        port=args.port,
+        models=[name.strip() for name in args.models.split(",") if name.strip()],
+        tokens_per_second=args.tokens_per_second,
+        first_token_delay=args.first_token_delay,
+        jitter=args.jitter,
+        load_delay=args.load_delay,
+        error_rate=args.error_rate,
+        disconnect_rate=args.disconnect_rate,
+        response_tokens=args.response_tokens,
+        num_parallel=args.num_parallel,
+        keep_alive=args.keep_alive,
+        seed=args.seed,
+    )
+    logger.info("モックのollamaサーバーを起動しました: %s", server.url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
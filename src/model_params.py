@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+モデルパラメータを扱うモジュール。
+
+このモジュールはモデルパラメータの既定値、検証、ollamaのオプションへの変換を提供します。
+"""
+
+from typing import Any, Dict
+
+# モデルパラメータの既定値（セッションごとにコピーして使用）
+DEFAULT_MODEL_PARAMS = {"temperature": 0.7, "top_p": 0.9, "top_k": 40, "context_length": 4096, "repeat_penalty": 1.1}
+
+
+def apply_model_params(model_params: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    値を検証して範囲内に制限したうえで、モデルパラメータを更新します。
+
+    Args:
+        model_params: 更新対象のモデルパラメータ
+        params: クライアントから送信されたパラメータ
+
+    Returns:
+        Dict[str, Any]: 更新後のモデルパラメータ（model_paramsと同じオブジェクト）
+    """
+    if "temperature" in params:
+        temp = float(params["temperature"])
+        model_params["temperature"] = max(0.0, min(1.0, temp))
+
+    if "top_p" in params:
+        top_p = float(params["top_p"])
+        model_params["top_p"] = max(0.0, min(1.0, top_p))
+
+    if "top_k" in params:
+        top_k = int(params["top_k"])
+        model_params["top_k"] = max(1, top_k)
+
+    if "context_length" in params:
+        ctx_len = int(params["context_length"])
+        model_params["context_length"] = max(512, min(32768, ctx_len))
+
+    if "repeat_penalty" in params:
+        penalty = float(params["repeat_penalty"])
+        model_params["repeat_penalty"] = max(1.0, min(2.0, penalty))
+
+    return model_params
+
+
+def to_ollama_options(model_params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    モデルパラメータをollamaのチャットAPIのオプションに変換します。
+
+    Args:
+        model_params: モデルパラメータ
+
+    Returns:
+        Dict[str, Any]: ollamaのオプション
+    """
+    return {
+        "temperature": model_params["temperature"],
+        "top_p": model_params["top_p"],
+        "top_k": model_params["top_k"],
+        "num_ctx": model_params["context_length"],
+        "repeat_penalty": model_params["repeat_penalty"],
+    }
@@ -0,0 +1,320 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+モデルの事前ロードとメモリ保持時間（keep_alive）を管理するモジュール。
+
+このモジュールはモデルごとのkeep_aliveの設定と、常にメモリにロードしておくモデル（固定モデル）を
+管理します。モデルの選択時や固定モデルがロードされていない場合は、バックグラウンドでモデルを
+ロードし、最初のメッセージでモデルのロードを待たないようにします。
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Union
+
+from src.ollama_pool import normalize_model_name
+
+logger = logging.getLogger(__name__)
+
+# keep_aliveの値（"30m" などの期間の文字列、または秒数。-1は無期限）
+KeepAlive = Union[str, int]
+
+
+def parse_keep_alive(value: Optional[str]) -> Optional[KeepAlive]:
+    """
+    環境変数のkeep_aliveの値を解析します。
+
+    Args:
+        value: "30m" などの期間の文字列、秒数、または -1（空の場合はNone）
+
+    Returns:
+        Optional[KeepAlive]: 数値の場合はint、それ以外は文字列のまま
+    """
+    if value is None or not value.strip():
+        return None
+    value = value.strip()
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def parse_model_keep_alive(value: str) -> Dict[str, KeepAlive]:
+    """
+    "モデル名=keep_alive" をカンマ区切りで並べた文字列を解析します。
+
+    Args:
+        value: 例: "llama2=1h,mistral:7b=5m"
+
+    Returns:
+        Dict[str, KeepAlive]: タグ付きのモデル名とkeep_aliveの辞書
+    """
+    policies = {}
+    for item in value.split(","):
+        if "=" not in item:
+            continue
+        name, keep_alive = item.rsplit("=", 1)
+        parsed = parse_keep_alive(keep_alive)
+        if parsed is not None:
+            policies[normalize_model_name(name.strip())] = parsed
+    return policies
+
+
+class KeepAlivePolicy:
+    """
+    モデルごとのkeep_aliveと固定モデルを管理するクラス。
+    """
+
+    def __init__(
+        self,
+        default: Optional[KeepAlive] = None,
+        per_model: Optional[Dict[str, KeepAlive]] = None,
+        pinned: Iterable[str] = (),
+    ):
+        """
+        KeepAlivePolicyクラスのコンストラクタ。
+
+        Args:
+            default: モデルごとの設定がない場合のkeep_alive（省略時はollamaサーバーの設定）
+            per_model: モデル名とkeep_aliveの辞書（省略可）
+            pinned: 常にメモリにロードしておくモデル名（keep_aliveは無期限）
+        """
+        self.default = default
+        self.per_model = {normalize_model_name(name): keep_alive for name, keep_alive in (per_model or {}).items()}
+        self.pinned = [normalize_model_name(name) for name in pinned]
+
+    def for_model(self, model: str) -> Optional[KeepAlive]:
+        """
+        モデルのkeep_aliveを取得します。固定モデルは無期限（-1）です。
+
+        Args:
+            model: モデル名
+
+        Returns:
+            Optional[KeepAlive]: keep_alive（Noneの場合はollamaサーバーの設定に従う）
+        """
+        name = normalize_model_name(model)
+        if name in self.pinned:
+            return -1
+        return self.per_model.get(name, self.default)
+
+    def missing_pinned(self, running_models: List[Dict[str, Any]]) -> List[str]:
+        """
+        起動中のモデルの一覧に含まれていない固定モデルを取得します。
+
+        Args:
+            running_models: 起動中のモデル情報のリスト
+
+        Returns:
+            List[str]: ロードされていない固定モデル名のリスト
+        """
+        running = {normalize_model_name(model.get("model") or model.get("name", "")) for model in running_models}
+        return [name for name in self.pinned if name not in running]
+
+
+class _WarmupState:
+    """
+    ロード中のモデルと、固定モデルのロードを最後に試した時刻を管理します（同期版と非同期版で共有）。
+    """
+
+    def __init__(self, retry_interval: float, clock: Callable[[], float]):
+        self.retry_interval = retry_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._loading: Set[str] = set()
+        self._last_attempt: Dict[str, float] = {}
+        self.preload_count = 0
+
+    def begin(self, model: str, throttle: bool = False) -> bool:
+        """
+        モデルのロードを開始してよいか確認し、ロード中として記録します。
+
+        Args:
+            model: モデル名
+            throttle: retry_interval秒以内に試したモデルを除外するかどうか
+
+        Returns:
+            bool: ロードを開始してよい場合はTrue
+        """
+        name = normalize_model_name(model)
+        with self._lock:
+            now = self._clock()
+            if name in self._loading:
+                return False
+            if throttle and now - self._last_attempt.get(name, float("-inf")) < self.retry_interval:
+                return False
+            self._loading.add(name)
+            self._last_attempt[name] = now
+            self.preload_count += 1
+            return True
+
+    def end(self, model: str) -> None:
+        with self._lock:
+            self._loading.discard(normalize_model_name(model))
+
+    def loading(self) -> List[str]:
+        with self._lock:
+            return sorted(self._loading)
+
+
+class ModelWarmer:
+    """
+    モデルをバックグラウンドのスレッドでロードするクラス（app.pyで使用）。
+    """
+
+    def __init__(
+        self,
+        preload: Callable[[str, Optional[KeepAlive]], bool],
+        policy: KeepAlivePolicy,
+        retry_interval: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        ModelWarmerクラスのコンストラクタ。
+
+        Args:
+            preload: モデル名とkeep_aliveを受け取ってモデルをロードする関数（例: OllamaClient.preload_model）
+            policy: keep_aliveと固定モデルの設定
+            retry_interval: 固定モデルのロードを再び試すまでの秒数（デフォルト: 30.0）
+            clock: 現在時刻を返す関数（テスト用、デフォルト: time.monotonic）
+        """
+        self.preload = preload
+        self.policy = policy
+        self.state = _WarmupState(retry_interval, clock)
+
+    def warm(self, model: str, throttle: bool = False) -> Optional[threading.Thread]:
+        """
+        モデルのロードをバックグラウンドで開始します。同じモデルをロード中の場合は何もしません。
+
+        Args:
+            model: モデル名
+            throttle: retry_interval秒以内に試したモデルを除外するかどうか（デフォルト: False）
+
+        Returns:
+            Optional[threading.Thread]: ロードを実行するスレッド（開始しなかった場合はNone）
+        """
+        if not self.state.begin(model, throttle):
+            return None
+        thread = threading.Thread(target=self._load, args=(model,), name="model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def _load(self, model: str) -> None:
+        try:
+            self.preload(model, self.policy.for_model(model))
+        except Exception as e:
+            logger.warning("モデル %s の事前ロードに失敗しました: %s", model, e)
+        finally:
+            self.state.end(model)
+
+    def observe(self, running_models: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        起動中のモデルの一覧を受け取り、ロードされていない固定モデルのロードを開始します。
+
+        SystemMonitorのデータソースをこの関数で包み、定期的な取得のたびに固定モデルを確認します。
+
+        Args:
+            running_models: 起動中のモデル情報のリスト
+
+        Returns:
+            List[Dict[str, Any]]: 受け取った一覧（そのまま返す）
+        """
+        for model in self.policy.missing_pinned(running_models):
+            self.warm(model, throttle=True)
+        return running_models
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        事前ロードの状態を取得します。
+
+        Returns:
+            Dict[str, Any]: 固定モデル、ロード中のモデル、ロードの回数
+        """
+        return {"pinned": self.policy.pinned, "loading": self.state.loading(), "preloads": self.state.preload_count}
+
+
+class AsyncModelWarmer:
+    """
+    ModelWarmerの非同期版。モデルをイベントループ上のタスクでロードします（async_app.pyで使用）。
+    """
+
+    def __init__(
+        self,
+        preload: Callable[[str, Optional[KeepAlive]], Awaitable[bool]],
+        policy: KeepAlivePolicy,
+        retry_interval: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        AsyncModelWarmerクラスのコンストラクタ。
+
+        Args:
+            preload: モデル名とkeep_aliveを受け取ってモデルをロードするコルーチン関数
+            policy: keep_aliveと固定モデルの設定
+            retry_interval: 固定モデルのロードを再び試すまでの秒数（デフォルト: 30.0）
+            clock: 現在時刻を返す関数（テスト用、デフォルト: time.monotonic）
+        """
+        self.preload = preload
+        self.policy = policy
+        self.state = _WarmupState(retry_interval, clock)
+        self._tasks: Set["asyncio.Task"] = set()
+
+    def warm(self, model: str, throttle: bool = False) -> Optional["asyncio.Task"]:
+        """
+        モデルのロードをタスクで開始します。同じモデルをロード中の場合は何もしません。
+
+        Args:
+            model: モデル名
+            throttle: retry_interval秒以内に試したモデルを除外するかどうか（デフォルト: False）
+
+        Returns:
+            Optional[asyncio.Task]: ロードを実行するタスク（開始しなかった場合はNone）
+        """
+        if not self.state.begin(model, throttle):
+            return None
+        task = asyncio.ensure_future(self._load(model))
+        # 実行中のタスクが破棄されないように参照を保持する
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _load(self, model: str) -> None:
+        try:
+            await self.preload(model, self.policy.for_model(model))
+        except Exception as e:
+            logger.warning("モデル %s の事前ロードに失敗しました: %s", model, e)
+        finally:
+            self.state.end(model)
+
+    def observe(self, running_models: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        ModelWarmer.observeの非同期版。イベントループ上で呼び出します。
+
+        Args:
+            running_models: 起動中のモデル情報のリスト
+
+        Returns:
+            List[Dict[str, Any]]: 受け取った一覧（そのまま返す）
+        """
+        for model in self.policy.missing_pinned(running_models):
+            self.warm(model, throttle=True)
+        return running_models
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        事前ロードの状態を取得します。
+
+        Returns:
+            Dict[str, Any]: 固定モデル、ロード中のモデル、ロードの回数
+        """
+        return {"pinned": self.policy.pinned, "loading": self.state.loading(), "preloads": self.state.preload_count}
+
+    async def close(self) -> None:
+        """
+        実行中のロードのタスクを取り消します。
+        """
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
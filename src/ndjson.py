@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+ollamaのストリーミング応答（NDJSON）を解析するモジュール。
+
+このモジュールは受信したバイト列を大きめのバッファ単位で受け取り、改行で分割して
+行ごとに文字列へデコードせずにJSONとして解析します。orjsonまたはmsgspecがインストール
+されている場合はそれを使用し、ない場合は標準のjsonモジュールを使用します。
+"""
+
+import json
+import logging
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# 高速なJSONライブラリがなくてもインポートできるようにする
+try:
+    import orjson
+
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgspec
+
+    MSGSPEC_AVAILABLE = True
+except ImportError:
+    msgspec = None
+    MSGSPEC_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# ストリーミング応答を読み取るバッファのバイト数（iter_linesの既定値は512）
+STREAM_CHUNK_SIZE = 16384
+
+
+def loads_stdlib(line: bytes) -> Any:
+    """
+    標準のjsonモジュールで1行を解析します。
+
+    json.loadsにbytesを渡すと文字コードの判定が入るため、UTF-8として先にデコードした方が速くなります。
+
+    Args:
+        line: NDJSONの1行
+
+    Returns:
+        Any: 解析したJSON
+    """
+    return json.loads(line.decode("utf-8"))
+
+
+# 使用するJSONライブラリ（orjson、msgspec、jsonの順に選択）と解析に失敗した場合の例外
+if ORJSON_AVAILABLE:
+    JSON_BACKEND = "orjson"
+    loads: Callable[[bytes], Any] = orjson.loads
+    DecodeError: Tuple[type, ...] = (orjson.JSONDecodeError,)
+elif MSGSPEC_AVAILABLE:
+    JSON_BACKEND = "msgspec"
+    loads = msgspec.json.decode
+    DecodeError = (msgspec.DecodeError,)
+else:
+    JSON_BACKEND = "json"
+    loads = loads_stdlib
+    DecodeError = (json.JSONDecodeError, UnicodeDecodeError)
+
+
+class NdjsonLineSplitter:
+    """
+    受信したバイト列を改行で分割して、完全な行だけを返すクラス。
+
+    行の途中で途切れたバイト列は次のfeedまで保持します。同期と非同期の両方の読み取りで使用します。
+    """
+
+    def __init__(self):
+        """
+        NdjsonLineSplitterクラスのコンストラクタ。
+        """
+        self._buffer = b""
+
+    def feed(self, data: bytes) -> List[bytes]:
+        """
+        バイト列を追加し、完全な行のリストを返します。
+
+        Args:
+            data: 受信したバイト列
+
+        Returns:
+            List[bytes]: 改行を含まない行のリスト（空行を除く）
+        """
+        if self._buffer:
+            data = self._buffer + data
+        lines = data.split(b"\n")
+        self._buffer = lines.pop()
+        return [line for line in lines if line and not line.isspace()]
+
+    def close(self) -> List[bytes]:
+        """
+        保持している最後の行を返します。ストリームの終了時に呼び出します。
+
+        Returns:
+            List[bytes]: 改行で終わっていなかった最後の行（ない場合は空）
+        """
+        line, self._buffer = self._buffer, b""
+        return [line] if line and not line.isspace() else []
+
+
+def iter_ndjson_lines(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """
+    バイト列のイテラブルから、NDJSONの行を順に返します。
+
+    Args:
+        chunks: 受信したバイト列のイテラブル（例: response.iter_content(STREAM_CHUNK_SIZE)）
+
+    Yields:
+        bytes: 改行を含まない行
+    """
+    splitter = NdjsonLineSplitter()
+    for chunk in chunks:
+        yield from splitter.feed(chunk)
+    yield from splitter.close()
+
+
+def parse_chat_line(line: bytes) -> Optional[Tuple[str, bool, Dict[str, Any]]]:
+    """
+    /api/chat のストリーミング応答の1行を解析し、本文と完了フラグを取り出します。
+
+    /api/generate の応答の行は "response" を /api/chat と同じ "message" に置き換えて返します。
+
+    Args:
+        line: NDJSONの1行
+
+    Returns:
+        Optional[Tuple[str, bool, Dict[str, Any]]]: (本文, 完了フラグ, 解析したJSON)。
+            本文を含まない行や解析できない行の場合はNone
+    """
+    try:
+        json_obj = loads(line)
+    except DecodeError as e:
+        logger.warning("JSONデコードエラー: %s", e)
+        return None
+    try:
+        if "message" not in json_obj and "response" in json_obj:
+            json_obj["message"] = {"role": "assistant", "content": json_obj.pop("response")}
+        content = json_obj["message"]["content"]
+    except (KeyError, TypeError):
+        return None
+    return content, bool(json_obj.get("done", False)), json_obj
+
+
+def iter_chat_chunks(chunks: Iterable[bytes]) -> Iterator[Tuple[str, bool, Dict[str, Any]]]:
+    """
+    /api/chat のストリーミング応答を解析し、本文を含む行を順に返します。
+
+    Args:
+        chunks: 受信したバイト列のイテラブル
+
+    Yields:
+        Tuple[str, bool, Dict[str, Any]]: (本文, 完了フラグ, 解析したJSON)
+    """
+    for line in iter_ndjson_lines(chunks):
+        parsed = parse_chat_line(line)
+        if parsed is not None:
+            yield parsed
+
+
+async def aiter_chat_chunks(chunks: AsyncIterable[bytes]) -> AsyncIterator[Tuple[str, bool, Dict[str, Any]]]:
+    """
+    iter_chat_chunksの非同期版。
+
+    Args:
+        chunks: 受信したバイト列の非同期イテラブル（例: response.content.iter_chunked(STREAM_CHUNK_SIZE)）
+
+    Yields:
+        Tuple[str, bool, Dict[str, Any]]: (本文, 完了フラグ, 解析したJSON)
+    """
+    splitter = NdjsonLineSplitter()
+    async for chunk in chunks:
+        for line in splitter.feed(chunk):
+            parsed = parse_chat_line(line)
+            if parsed is not None:
+                yield parsed
+    for line in splitter.close():
+        parsed = parse_chat_line(line)
+        if parsed is not None:
+            yield parsed
@@ -7,12 +7,22 @@ ollamaサーバーとの通信を担当するモジュール。
 モデルの一覧取得やチャット実行などの機能を提供します。
 """
 
-import json
+import logging
 import requests
-import re
 import subprocess
-import platform
-from typing import Dict, List, Any, Optional, Callable, Iterator
+import threading
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, Any, Optional, Callable, Iterator, Tuple, Union
+
+from src.cancellation import CancellationToken
+from src.capabilities import NoStrategySucceeded, StrategyNegotiator
+from src.gpu_telemetry import GpuTelemetryBackend, create_gpu_backend
+from src.log_utils import LazyPayload
+from src.metrics import track_backend
+from src.ndjson import STREAM_CHUNK_SIZE, iter_chat_chunks
+from src.response_cache import ResponseCache, find_model_digest, is_deterministic, replay_chunks, response_cache_key
+from src.semantic_cache import SemanticCache, SemanticQuery, semantic_scope
+from src.ttl_cache import TTLCache
 
 # テスト中にollamaパッケージがなくてもインポートできるようにする
 try:
@@ -40,6 +50,251 @@ except ImportError:
 
     ollama = DummyOllama()
 
+logger = logging.getLogger(__name__)
+
+
+def parse_models_response(data: Any) -> List[Dict[str, Any]]:
+    """
+    /api/tags の応答からモデル情報のリストを取り出します。
+
+    Args:
+        data: /api/tags の応答（JSONをデコードしたもの）
+
+    Returns:
+        List[Dict[str, Any]]: モデル情報のリスト
+    """
+    # レスポンスの形式を確認
+    if isinstance(data, dict) and "models" in data:
+        return data["models"]
+    elif isinstance(data, list):
+        return data
+    elif isinstance(data, dict):
+        # ollamaの新しいAPIでは、モデル一覧が{"model1": {...}, "model2": {...}}の形式で返される場合がある
+        return [{"name": name, "size": info.get("size", 0)} for name, info in data.items()]
+    else:
+        logger.warning("未知のHTTP APIレスポンス形式: %s", type(data))
+        return []
+
+
+def parse_running_models_response(data: Any) -> List[Dict[str, Any]]:
+    """
+    /api/ps の応答から起動中のモデル情報のリストを取り出します。
+
+    Args:
+        data: /api/ps の応答（JSONをデコードしたもの）
+
+    Returns:
+        List[Dict[str, Any]]: 起動中のモデル情報のリスト
+    """
+    # レスポンスの形式を確認
+    if isinstance(data, dict) and "processes" in data:
+        return data["processes"]
+    elif isinstance(data, dict) and "models" in data:
+        # 新しいAPIの形式に対応
+        models = data["models"]
+        # モデル情報を標準化
+        return [
+            {
+                "id": model.get("digest", "")[:12],  # digestの先頭12文字をIDとして使用
+                "model": model.get("name", "unknown"),
+            }
+            for model in models
+        ]
+    elif isinstance(data, list):
+        return data
+    else:
+        logger.warning("未知のHTTP APIレスポンス形式: %s", type(data))
+        return []
+
+
+def parse_ollama_list_output(output: str) -> List[Dict[str, Any]]:
+    """
+    `ollama list` コマンドの出力からモデル情報のリストを取り出します。
+
+    Args:
+        output: コマンドの標準出力
+
+    Returns:
+        List[Dict[str, Any]]: モデル情報のリスト
+    """
+    models = []
+    lines = output.strip().split("\n")
+    if len(lines) > 1:  # ヘッダー行をスキップ
+        for line in lines[1:]:
+            parts = line.split()
+            if len(parts) >= 3:
+                name = parts[0]
+                size_str = parts[2]
+                # サイズを数値に変換（例: "19 GB" -> 19000000000）
+                size = 0
+                try:
+                    size_val = float(size_str.split()[0])
+                    size_unit = size_str.split()[1].upper()
+                    if size_unit == "GB":
+                        size = int(size_val * 1024 * 1024 * 1024)
+                    elif size_unit == "MB":
+                        size = int(size_val * 1024 * 1024)
+                except Exception:
+                    pass
+                models.append({"name": name, "size": size})
+    return models
+
+
+def parse_ollama_ps_output(output: str) -> List[Dict[str, Any]]:
+    """
+    `ollama ps` コマンドの出力から起動中のモデル情報のリストを取り出します。
+
+    Args:
+        output: コマンドの標準出力
+
+    Returns:
+        List[Dict[str, Any]]: 起動中のモデル情報のリスト
+    """
+    models = []
+    lines = output.strip().split("\n")
+    if len(lines) > 1:  # ヘッダー行をスキップ
+        for line in lines[1:]:
+            parts = line.split()
+            if len(parts) >= 2:
+                model_name = parts[0]
+                model_id = parts[1]
+                models.append({"id": model_id, "model": model_name})
+    return models
+
+
+def cancelled_chunk(content: str) -> Dict[str, Any]:
+    """
+    生成を中止した場合にchat_streamが最後に返すチャンクを作成します。
+
+    Args:
+        content: 中止までに生成された応答
+
+    Returns:
+        Dict[str, Any]: 完了フラグと中止を示すフラグを含むチャンク
+    """
+    return {
+        "message": {"role": "assistant", "content": content},
+        "done": True,
+        "done_reason": "cancelled",
+        "cancelled": True,
+    }
+
+
+class TextAccumulator:
+    """
+    ストリーミング応答のチャンクを蓄積して1つの文字列に組み立てるクラス。
+
+    文字列の連結（+=）を繰り返すと応答の長さに対して二乗の時間がかかる場合があるため、
+    チャンクをリストに蓄積し、block_size個ごとに1つの文字列にまとめます。
+    時間は応答の長さに比例し、チャンクごとの文字列オブジェクトを保持し続けることもありません。
+    """
+
+    def __init__(self, block_size: int = 256):
+        """
+        TextAccumulatorクラスのコンストラクタ。
+
+        Args:
+            block_size: 1つの文字列にまとめるチャンクの数（デフォルト: 256）
+        """
+        self.block_size = block_size
+        self._blocks: List[str] = []
+        self._parts: List[str] = []
+
+    def append(self, text: str) -> None:
+        """
+        チャンクを追加します。
+
+        Args:
+            text: チャンクの文字列
+        """
+        self._parts.append(text)
+        if len(self._parts) >= self.block_size:
+            self._blocks.append("".join(self._parts))
+            self._parts.clear()
+
+    def getvalue(self) -> str:
+        """
+        これまでに追加したチャンクを結合した文字列を取得します。
+
+        Returns:
+            str: 結合した文字列
+        """
+        return "".join(self._blocks) + "".join(self._parts)
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """
+    コネクションプールを共有し、既定のタイムアウトを適用するHTTPアダプタ。
+
+    requestsのSessionにマウントして使用します。リクエストごとにタイムアウトが
+    指定されなかった場合は、コンストラクタで指定した既定値を適用します。
+    """
+
+    def __init__(self, timeout: Tuple[float, float], **kwargs):
+        """
+        PooledHTTPAdapterクラスのコンストラクタ。
+
+        Args:
+            timeout: 既定のタイムアウト（接続タイムアウト秒, 読み取りタイムアウト秒）
+            **kwargs: HTTPAdapterに渡す引数（pool_connections, pool_maxsize など）
+        """
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self.total_requests = 0
+        self.failed_requests = 0
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        """
+        リクエストを送信します。
+
+        Args:
+            request: 送信するPreparedRequest
+            **kwargs: HTTPAdapter.sendに渡す引数
+
+        Returns:
+            requests.Response: レスポンス
+        """
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        with self._lock:
+            self.total_requests += 1
+        try:
+            return super().send(request, **kwargs)
+        except Exception:
+            with self._lock:
+                self.failed_requests += 1
+            raise
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        コネクションプールの統計情報を取得します。
+
+        Returns:
+            Dict[str, Any]: リクエスト数とホストごとのプール状態
+        """
+        hosts = {}
+        pools = self.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            # プール内のキューにはNoneのプレースホルダーが含まれるため、実際の接続のみを数える
+            idle = sum(1 for conn in list(pool.pool.queue) if conn is not None) if pool.pool is not None else 0
+            hosts[f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+                "connections_created": pool.num_connections,
+                "requests": pool.num_requests,
+                "idle_connections": idle,
+                "maxsize": pool.pool.maxsize if pool.pool is not None else 0,
+            }
+
+        with self._lock:
+            return {
+                "total_requests": self.total_requests,
+                "failed_requests": self.failed_requests,
+                "hosts": hosts,
+            }
+
 
 class OllamaClient:
     """
@@ -48,100 +303,231 @@ class OllamaClient:
     ollamaサーバーとの通信を行い、モデルの一覧取得やチャット実行などの機能を提供します。
     """
 
-    def __init__(self, host: str = "http://localhost:11434"):
+    def __init__(
+        self,
+        host: str = "http://localhost:11434",
+        pool_connections: int = 10,
+        pool_maxsize: int = 10,
+        pool_block: bool = False,
+        keep_alive: bool = True,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 300.0,
+        max_retries: int = 0,
+        gpu_backend: Union[str, GpuTelemetryBackend] = "auto",
+        gpu_loop_ms: int = 1000,
+        models_cache_ttl: float = 30.0,
+        model_info_cache_ttl: float = 300.0,
+        cache_stale_ttl: float = 300.0,
+        capability_ttl: float = 300.0,
+        response_cache: Optional[ResponseCache] = None,
+        semantic_cache: Optional[SemanticCache] = None,
+    ):
         """
         OllamaClientクラスのコンストラクタ。
 
+        すべてのHTTPリクエストは1つのrequests.Sessionを共有し、
+        ホストごとのコネクションプールで接続を再利用します。
+
         Args:
             host: ollamaサーバーのホスト（デフォルト: http://localhost:11434）
+            pool_connections: キャッシュするホストごとのプール数（デフォルト: 10）
+            pool_maxsize: ホストごとに保持する最大接続数（デフォルト: 10）
+            pool_block: プールの接続が枯渇した場合に空きを待つかどうか（デフォルト: False）
+            keep_alive: HTTP keep-aliveを使用するかどうか（デフォルト: True）
+            connect_timeout: 接続タイムアウト秒（デフォルト: 5.0）
+            read_timeout: 読み取りタイムアウト秒（デフォルト: 300.0）
+            max_retries: 接続失敗時の再試行回数（デフォルト: 0）
+            gpu_backend: GPU情報を取得するバックエンドまたはその名前（デフォルト: auto）
+            gpu_loop_ms: nvidia-smiを常駐させる場合の取得間隔のミリ秒（デフォルト: 1000）
+            models_cache_ttl: モデル一覧をキャッシュする秒数。0でキャッシュしない（デフォルト: 30.0）
+            model_info_cache_ttl: モデル情報をキャッシュする秒数。0でキャッシュしない（デフォルト: 300.0）
+            cache_stale_ttl: 期限切れ後も古い値を返しながら取得し直す秒数（デフォルト: 300.0）
+            capability_ttl: 成功した取得方法を記録しておく秒数。経過後は最初の方法から試し直す（デフォルト: 300.0）
+            response_cache: temperatureが0のチャットの応答を保存するキャッシュ（省略時はキャッシュしない）
+            semantic_cache: 意味の近い質問の応答を返すキャッシュ（省略時は使用しない）
         """
         self.host = host.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
         # ollamaクライアントの設定
         if OLLAMA_AVAILABLE:
             ollama.host = host
 
+        # 共有HTTPセッションの設定
+        self.adapter = PooledHTTPAdapter(
+            timeout=self.timeout,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            max_retries=max_retries,
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        if not keep_alive:
+            self.session.headers["Connection"] = "close"
+
+        # GPU情報のバックエンドは初回の取得時に作成する
+        self._gpu_backend: Union[str, GpuTelemetryBackend, None] = gpu_backend
+        self._gpu_backend_lock = threading.Lock()
+        self.gpu_loop_ms = gpu_loop_ms
+
+        # 変化の少ないモデル一覧とモデル情報のキャッシュ
+        self.models_cache = TTLCache(models_cache_ttl, stale_ttl=cache_stale_ttl, max_entries=1)
+        self.model_info_cache = TTLCache(model_info_cache_ttl, stale_ttl=cache_stale_ttl)
+
+        # 操作ごとに成功した取得方法（ollama-python、HTTP API、コマンドライン）を記録する
+        self.negotiator = StrategyNegotiator(ttl=capability_ttl)
+
+        # 同じ入力に対するチャットの応答のキャッシュ（OllamaPoolではすべてのクライアントで共有する）
+        self.response_cache = response_cache
+        self.semantic_cache = semantic_cache
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """
+        HTTPコネクションプールの統計情報を取得します。
+
+        Returns:
+            Dict[str, Any]: リクエスト数とホストごとのプール状態
+        """
+        return self.adapter.get_stats()
+
+    def invalidate_cache(self, model_name: Optional[str] = None) -> None:
+        """
+        モデル一覧とモデル情報のキャッシュを破棄します。モデルの追加・削除・終了の後に呼び出します。
+
+        Args:
+            model_name: モデル情報を破棄するモデル名（省略時はすべてのモデル情報を破棄）
+        """
+        self.models_cache.invalidate()
+        self.model_info_cache.invalidate(model_name)
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """
+        モデル一覧とモデル情報、応答のキャッシュの統計情報を取得します。
+
+        Returns:
+            Dict[str, Any]: キャッシュごとの統計
+        """
+        stats = {"models": self.models_cache.stats(), "model_info": self.model_info_cache.stats()}
+        if self.response_cache is not None:
+            stats["responses"] = self.response_cache.stats()
+        if self.semantic_cache is not None:
+            stats["semantic"] = self.semantic_cache.stats()
+        return stats
+
+    def get_server_version(self) -> Optional[str]:
+        """
+        ollamaサーバーのバージョンを取得します。
+
+        Returns:
+            Optional[str]: バージョン。取得できない場合はNone
+        """
+        try:
+            with track_backend("version"):
+                response = self.session.get(f"{self.host}/api/version")
+                response.raise_for_status()
+            return response.json().get("version")
+        except Exception as e:
+            logger.warning("ollamaサーバーのバージョンの取得に失敗しました: %s", e)
+            return None
+
+    def get_capabilities(self) -> Dict[str, Any]:
+        """
+        ollamaサーバーのバージョンと、操作ごとに使用している取得方法を取得します。
+
+        Returns:
+            Dict[str, Any]: バージョンと操作名ごとの方法の名前
+        """
+        return {"version": self.get_server_version(), "strategies": self.negotiator.report()}
+
+    def close(self) -> None:
+        """
+        HTTPセッションを閉じ、プール内の接続とGPUバックエンドを解放します。
+        """
+        self.session.close()
+        with self._gpu_backend_lock:
+            if isinstance(self._gpu_backend, GpuTelemetryBackend):
+                self._gpu_backend.close()
+
     def list_models(self) -> List[Dict[str, Any]]:
         """
-        利用可能なモデルの一覧を取得します。
+        利用可能なモデルの一覧を取得します。結果はmodels_cache_ttl秒間キャッシュされます。
+
+        Returns:
+            List[Dict[str, Any]]: モデル情報のリスト
+        """
+        # 取得に失敗した場合の空の結果はキャッシュしない
+        return self.models_cache.get_or_load("models", self._fetch_models, should_cache=bool)
+
+    def _fetch_models(self) -> List[Dict[str, Any]]:
+        """
+        ollamaサーバーからモデルの一覧を取得します。
+
+        ollama-python、HTTP API、コマンドラインのうち前回成功した方法を最初に使用します。
 
         Returns:
             List[Dict[str, Any]]: モデル情報のリスト
         """
         try:
-            # まず、ollama-pythonを使用して試みる
-            try:
-                if OLLAMA_AVAILABLE:
-                    response = ollama.list()
-                    print(f"ollama.list() の応答: {response}")
-
-                    # レスポンスの形式を確認
-                    if isinstance(response, dict) and "models" in response:
-                        return response.get("models", [])
-                    elif isinstance(response, dict):
-                        # 新しいAPIの形式に対応
-                        print("新しいAPI形式を検出しました")
-                        return [{"name": name, "size": model.get("size", 0)} for name, model in response.items()]
-                    elif isinstance(response, list):
-                        # リスト形式の場合
-                        return response
-            except Exception as e:
-                print(f"ollama-pythonでのモデル一覧取得に失敗しました: {e}")
-
-            # 直接HTTPリクエストを送信
-            print("直接HTTPリクエストでモデル一覧を取得します")
-            url = f"{self.host}/api/tags"
-            response = requests.get(url)
-            response.raise_for_status()
-            data = response.json()
-            print(f"HTTP API応答: {data}")
-
-            # レスポンスの形式を確認
-            if "models" in data:
-                return data["models"]
-            elif isinstance(data, list):
-                return data
-            elif isinstance(data, dict):
-                # ollamaの新しいAPIでは、モデル一覧が{"model1": {...}, "model2": {...}}の形式で返される場合がある
-                return [{"name": name, "size": info.get("size", 0)} for name, info in data.items()]
-            else:
-                print(f"未知のHTTP APIレスポンス形式: {type(data)}")
-                return []
-        except Exception as e:
-            print(f"モデル一覧の取得に失敗しました: {e}")
-
-            # 最後の手段として、コマンドラインの出力からモデル一覧を取得
-            try:
-                import subprocess
-
-                result = subprocess.run(["ollama", "list"], capture_output=True, text=True)
-                output = result.stdout
-                print(f"ollama list コマンド出力: {output}")
-
-                # 出力を解析してモデル一覧を取得
-                models = []
-                lines = output.strip().split("\n")
-                if len(lines) > 1:  # ヘッダー行をスキップ
-                    for line in lines[1:]:
-                        parts = line.split()
-                        if len(parts) >= 3:
-                            name = parts[0]
-                            size_str = parts[2]
-                            # サイズを数値に変換（例: "19 GB" -> 19000000000）
-                            size = 0
-                            try:
-                                size_val = float(size_str.split()[0])
-                                size_unit = size_str.split()[1].upper()
-                                if size_unit == "GB":
-                                    size = int(size_val * 1024 * 1024 * 1024)
-                                elif size_unit == "MB":
-                                    size = int(size_val * 1024 * 1024)
-                            except Exception:
-                                pass
-                            models.append({"name": name, "size": size})
-                return models
-            except Exception as e:
-                print(f"コマンドラインからのモデル一覧取得に失敗しました: {e}")
-                return []
+            with track_backend("list_models"):
+                return self.negotiator.run(
+                    "list_models",
+                    [
+                        ("ollama-python", self._list_models_python),
+                        ("http", self._list_models_http),
+                        ("cli", self._list_models_cli),
+                    ],
+                )
+        except NoStrategySucceeded as e:
+            logger.warning("モデル一覧の取得に失敗しました: %s", e)
+            return []
+
+    def _list_models_python(self) -> List[Dict[str, Any]]:
+        """
+        ollama-pythonを使用してモデルの一覧を取得します。
+        """
+        if not OLLAMA_AVAILABLE:
+            raise RuntimeError("ollama-pythonがインストールされていません")
+
+        response = ollama.list()
+        logger.debug("ollama.list() の応答: %s", LazyPayload(response))
+
+        # レスポンスの形式を確認
+        if isinstance(response, dict) and "models" in response:
+            return response.get("models", [])
+        elif isinstance(response, dict):
+            # 新しいAPIの形式に対応
+            logger.debug("新しいAPI形式を検出しました")
+            return [{"name": name, "size": model.get("size", 0)} for name, model in response.items()]
+        elif isinstance(response, list):
+            # リスト形式の場合
+            return response
+        raise ValueError(f"ollama.list() の応答の形式が不明です: {type(response)}")
+
+    def _list_models_http(self) -> List[Dict[str, Any]]:
+        """
+        HTTP API（/api/tags）を使用してモデルの一覧を取得します。
+        """
+        url = f"{self.host}/api/tags"
+        response = self.session.get(url)
+        response.raise_for_status()
+        data = response.json()
+        logger.debug("HTTP API応答: %s", LazyPayload(data))
+
+        return parse_models_response(data)
+
+    def _list_models_cli(self) -> List[Dict[str, Any]]:
+        """
+        コマンドライン（ollama list）の出力からモデルの一覧を取得します。
+        """
+        result = subprocess.run(["ollama", "list"], capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"ollama list の実行に失敗しました: {result.stderr}")
+        output = result.stdout
+        logger.debug("ollama list コマンド出力: %s", output)
+
+        # 出力を解析してモデル一覧を取得
+        return parse_ollama_list_output(output)
 
     def list_running_models(self) -> List[Dict[str, Any]]:
         """
@@ -151,61 +537,62 @@ class OllamaClient:
             List[Dict[str, Any]]: 起動中のモデル情報のリスト
         """
         try:
-            # 直接HTTPリクエストを送信
-            url = f"{self.host}/api/ps"
-            response = requests.get(url)
+            with track_backend("list_running_models"):
+                return self.negotiator.run(
+                    "list_running_models",
+                    [("http", self._list_running_models_http), ("cli", self._list_running_models_cli)],
+                )
+        except NoStrategySucceeded as e:
+            logger.warning("起動中のモデル一覧の取得に失敗しました: %s", e)
+            return []
+
+    def _list_running_models_http(self) -> List[Dict[str, Any]]:
+        """
+        HTTP API（/api/ps）を使用して起動中のモデルの一覧を取得します。
+        """
+        url = f"{self.host}/api/ps"
+        response = self.session.get(url)
+        response.raise_for_status()
+        data = response.json()
+
+        logger.debug("起動中のモデル一覧の応答: %s", LazyPayload(data))
+
+        return parse_running_models_response(data)
+
+    def fetch_ps(self) -> Dict[str, Any]:
+        """
+        /api/ps の応答をそのまま取得します。OllamaPoolのヘルスチェックで使用します。
+
+        Returns:
+            Dict[str, Any]: /api/ps の応答
+
+        Raises:
+            requests.RequestException: 接続に失敗した場合やエラーの応答の場合
+        """
+        with track_backend("ps"):
+            response = self.session.get(f"{self.host}/api/ps")
             response.raise_for_status()
-            data = response.json()
-
-            print(f"起動中のモデル一覧の応答: {data}")
-
-            # レスポンスの形式を確認
-            if "processes" in data:
-                return data["processes"]
-            elif "models" in data:
-                # 新しいAPIの形式に対応
-                models = data["models"]
-                # モデル情報を標準化
-                return [
-                    {
-                        "id": model.get("digest", "")[:12],  # digestの先頭12文字をIDとして使用
-                        "model": model.get("name", "unknown"),
-                    }
-                    for model in models
-                ]
-            elif isinstance(data, list):
-                return data
-            else:
-                print(f"未知のHTTP APIレスポンス形式: {type(data)}")
-                return []
-        except Exception as e:
-            print(f"起動中のモデル一覧の取得に失敗しました: {e}")
-
-            # 最後の手段として、コマンドラインの出力から起動中のモデル一覧を取得
-            try:
-                result = subprocess.run(["ollama", "ps"], capture_output=True, text=True)
-                output = result.stdout
-                print(f"ollama ps コマンド出力: {output}")
-
-                # 出力を解析して起動中のモデル一覧を取得
-                models = []
-                lines = output.strip().split("\n")
-                if len(lines) > 1:  # ヘッダー行をスキップ
-                    for line in lines[1:]:
-                        parts = line.split()
-                        if len(parts) >= 2:
-                            model_name = parts[0]
-                            model_id = parts[1]
-                            models.append({"id": model_id, "model": model_name})
-                return models
-            except Exception as e:
-                print(f"コマンドラインからの起動中のモデル一覧取得に失敗しました: {e}")
-                return []
+        return response.json()
+
+    def _list_running_models_cli(self) -> List[Dict[str, Any]]:
+        """
+        コマンドライン（ollama ps）の出力から起動中のモデルの一覧を取得します。
+        """
+        result = subprocess.run(["ollama", "ps"], capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"ollama ps の実行に失敗しました: {result.stderr}")
+        output = result.stdout
+        logger.debug("ollama ps コマンド出力: %s", output)
+
+        # 出力を解析して起動中のモデル一覧を取得
+        return parse_ollama_ps_output(output)
 
     def kill_model(self, model_id: str) -> bool:
         """
         指定したモデルを終了します。
 
+        /api/stop（名前、ID）、/api/kill、コマンドラインのうち前回成功した方法を最初に使用します。
+
         Args:
             model_id: 終了するモデルのID（または名前）
 
@@ -221,68 +608,68 @@ class OllamaClient:
                     model_name = model.get("model", model_id)
                     break
         except Exception as e:
-            print(f"起動中のモデル一覧の取得に失敗しました: {e}")
+            logger.warning("起動中のモデル一覧の取得に失敗しました: %s", e)
 
         # モデル名が特定できなかった場合は、IDをそのまま使用
         if not model_name:
             model_name = model_id
-            print(f"モデル名が特定できなかったため、ID '{model_id}' をそのまま使用します")
+            logger.info("モデル名が特定できなかったため、ID '%s' をそのまま使用します", model_id)
 
-        # APIエンドポイントを試す
-        success = False
-
-        # /api/stop エンドポイントを試す（モデル名を使用）
         try:
-            url = f"{self.host}/api/stop"
-            payload = {"name": model_name}
-            print(f"モデル終了APIを試行中: {url}, ペイロード: {payload}")
-            response = requests.post(url, json=payload)
-            response.raise_for_status()
-            print(f"モデル終了APIが成功: {url}")
-            success = True
-        except Exception as e:
-            print(f"モデル終了API /api/stop (name) の呼び出しに失敗: {e}")
-
-            # /api/stop エンドポイントを試す（IDを使用）
-            try:
-                url = f"{self.host}/api/stop"
-                payload = {"id": model_id}
-                print(f"モデル終了APIを試行中: {url}, ペイロード: {payload}")
-                response = requests.post(url, json=payload)
-                response.raise_for_status()
-                print(f"モデル終了APIが成功: {url}")
-                success = True
-            except Exception as e:
-                print(f"モデル終了API /api/stop (id) の呼び出しに失敗: {e}")
-
-        # /api/kill エンドポイントを試す（後方互換性のため）
-        if not success:
-            try:
-                url = f"{self.host}/api/kill"
-                payload = {"id": model_id}
-                print(f"モデル終了APIを試行中: {url}, ペイロード: {payload}")
-                response = requests.post(url, json=payload)
-                response.raise_for_status()
-                print(f"モデル終了APIが成功: {url}")
-                success = True
-            except Exception as e:
-                print(f"モデル終了API /api/kill の呼び出しに失敗: {e}")
-
-        # コマンドラインでの終了を試みる
-        if not success:
-            try:
-                cmd = ["ollama", "stop", model_name]
-                print(f"コマンドラインでのモデル終了を試行中: {' '.join(cmd)}")
-                result = subprocess.run(cmd, capture_output=True, text=True)
-                if result.returncode == 0:
-                    print(f"コマンドラインでのモデル終了が成功: {' '.join(cmd)}")
-                    success = True
-                else:
-                    print(f"コマンドラインでのモデル終了に失敗: {result.stderr}")
-            except Exception as e:
-                print(f"コマンドラインでのモデル終了の実行に失敗: {e}")
-
-        return success
+            with track_backend("kill_model"):
+                self.negotiator.run(
+                    "kill_model",
+                    [
+                        ("stop-by-name", lambda: self._post_kill("/api/stop", {"name": model_name})),
+                        ("stop-by-id", lambda: self._post_kill("/api/stop", {"id": model_id})),
+                        # 後方互換性のため
+                        ("kill", lambda: self._post_kill("/api/kill", {"id": model_id})),
+                        ("cli", lambda: self._kill_model_cli(model_name)),
+                    ],
+                )
+        except NoStrategySucceeded as e:
+            logger.warning("モデルの終了に失敗しました: %s", e)
+            return False
+
+        self.invalidate_cache(model_name)
+        return True
+
+    def _post_kill(self, path: str, payload: Dict[str, Any]) -> None:
+        """
+        モデル終了APIを呼び出します。
+        """
+        url = f"{self.host}{path}"
+        logger.info("モデル終了APIを試行中: %s, ペイロード: %s", url, LazyPayload(payload))
+        response = self.session.post(url, json=payload)
+        response.raise_for_status()
+        logger.info("モデル終了APIが成功: %s", url)
+
+    def _kill_model_cli(self, model_name: str) -> None:
+        """
+        コマンドライン（ollama stop）でモデルを終了します。
+        """
+        cmd = ["ollama", "stop", model_name]
+        logger.info("コマンドラインでのモデル終了を試行中: %s", " ".join(cmd))
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"コマンドラインでのモデル終了に失敗: {result.stderr}")
+        logger.info("コマンドラインでのモデル終了が成功: %s", " ".join(cmd))
+
+    def get_gpu_backend(self) -> Optional[GpuTelemetryBackend]:
+        """
+        GPU情報を取得するバックエンドを取得します。初回呼び出し時に作成します。
+
+        Returns:
+            Optional[GpuTelemetryBackend]: バックエンド。利用可能なものがない場合はNone
+        """
+        with self._gpu_backend_lock:
+            if isinstance(self._gpu_backend, str):
+                try:
+                    self._gpu_backend = create_gpu_backend(self._gpu_backend, loop_ms=self.gpu_loop_ms)
+                except Exception as e:
+                    logger.warning("GPUバックエンドの作成に失敗しました: %s", e)
+                    self._gpu_backend = None
+            return self._gpu_backend
 
     def get_gpu_info(self) -> List[Dict[str, Any]]:
         """
@@ -292,140 +679,12 @@ class OllamaClient:
             List[Dict[str, Any]]: GPU情報のリスト
         """
         try:
-            # OSに応じてGPU情報を取得
-            system = platform.system()
-
-            if system == "Windows":
-                # Windowsの場合はnvidia-smiを使用
-                result = subprocess.run(
-                    [
-                        "nvidia-smi",
-                        "--query-gpu=index,name,utilization.gpu,memory.used,memory.total",
-                        "--format=csv,noheader,nounits",
-                    ],
-                    capture_output=True,
-                    text=True,
-                )
-
-                if result.returncode != 0:
-                    print(f"nvidia-smiの実行に失敗しました: {result.stderr}")
-                    return []
-
-                # 出力を解析してGPU情報を取得
-                gpus = []
-                lines = result.stdout.strip().split("\n")
-                for line in lines:
-                    parts = line.split(", ")
-                    if len(parts) >= 5:
-                        gpu_index = parts[0]
-                        gpu_name = parts[1]
-                        gpu_util = float(parts[2])
-                        gpu_mem_used = float(parts[3])
-                        gpu_mem_total = float(parts[4])
-
-                        gpus.append(
-                            {
-                                "index": gpu_index,
-                                "name": gpu_name,
-                                "utilization": gpu_util,
-                                "memory_used": gpu_mem_used,
-                                "memory_total": gpu_mem_total,
-                                "memory_used_percent": (gpu_mem_used / gpu_mem_total) * 100 if gpu_mem_total > 0 else 0,
-                            }
-                        )
-
-                return gpus
-
-            elif system == "Linux":
-                # Linuxの場合もnvidia-smiを使用
-                result = subprocess.run(
-                    [
-                        "nvidia-smi",
-                        "--query-gpu=index,name,utilization.gpu,memory.used,memory.total",
-                        "--format=csv,noheader,nounits",
-                    ],
-                    capture_output=True,
-                    text=True,
-                )
-
-                if result.returncode != 0:
-                    print(f"nvidia-smiの実行に失敗しました: {result.stderr}")
-                    return []
-
-                # 出力を解析してGPU情報を取得
-                gpus = []
-                lines = result.stdout.strip().split("\n")
-                for line in lines:
-                    parts = line.split(", ")
-                    if len(parts) >= 5:
-                        gpu_index = parts[0]
-                        gpu_name = parts[1]
-                        gpu_util = float(parts[2])
-                        gpu_mem_used = float(parts[3])
-                        gpu_mem_total = float(parts[4])
-
-                        gpus.append(
-                            {
-                                "index": gpu_index,
-                                "name": gpu_name,
-                                "utilization": gpu_util,
-                                "memory_used": gpu_mem_used,
-                                "memory_total": gpu_mem_total,
-                                "memory_used_percent": (gpu_mem_used / gpu_mem_total) * 100 if gpu_mem_total > 0 else 0,
-                            }
-                        )
-
-                return gpus
-
-            elif system == "Darwin":
-                # macOSの場合はMPSツールを使用（Apple Silicon用）
-                # 注意: これはApple Silicon搭載のMacでのみ動作します
-                try:
-                    # まず、ioregを使用してGPUの名前を取得
-                    result = subprocess.run(["ioreg", "-l", "-w", "0"], capture_output=True, text=True)
-
-                    gpu_name = "Apple GPU"
-                    for line in result.stdout.split("\n"):
-                        if "model" in line.lower() and "gpu" in line.lower():
-                            match = re.search(r'"model"\s*=\s*"([^"]+)"', line)
-                            if match:
-                                gpu_name = match.group(1)
-                                break
-
-                    # powermetrics を使用してGPUの使用率を取得
-                    # 注意: これには管理者権限が必要な場合があります
-                    result = subprocess.run(
-                        ["sudo", "powermetrics", "--samplers", "gpu", "-n", "1", "-i", "100"], capture_output=True, text=True
-                    )
-
-                    gpu_util = 0
-                    for line in result.stdout.split("\n"):
-                        if "gpu active" in line.lower():
-                            match = re.search(r"(\d+)%", line)
-                            if match:
-                                gpu_util = float(match.group(1))
-                                break
-
-                    return [
-                        {
-                            "index": "0",
-                            "name": gpu_name,
-                            "utilization": gpu_util,
-                            "memory_used": 0,  # Apple GPUではメモリ使用量を取得できない
-                            "memory_total": 0,
-                            "memory_used_percent": 0,
-                        }
-                    ]
-                except Exception as e:
-                    print(f"macOSでのGPU情報取得に失敗しました: {e}")
-                    return []
-
-            else:
-                print(f"未対応のOS: {system}")
+            backend = self.get_gpu_backend()
+            if backend is None:
                 return []
-
+            return backend.read()
         except Exception as e:
-            print(f"GPU情報の取得に失敗しました: {e}")
+            logger.warning("GPU情報の取得に失敗しました: %s", e)
             return []
 
     def chat_stream(
@@ -435,64 +694,225 @@ class OllamaClient:
         context: Optional[List[int]] = None,
         options: Optional[Dict[str, Any]] = None,
         callback: Optional[Callable[[str], None]] = None,
+        cancel_token: Optional[CancellationToken] = None,
+        keep_alive: Optional[Union[str, int]] = None,
     ) -> Iterator[Dict[str, Any]]:
         """
         チャットを実行し、ストリーミングレスポンスを返します。
 
+        cancel_tokenが中止されるとollamaへのHTTPレスポンスを閉じて生成を止め、
+        それまでの応答を含む "cancelled": True の最後のチャンクを返します。
+        応答のキャッシュにある場合や、意味の近い質問の応答がある場合は、
+        ollamaに送信せずにキャッシュした応答を同じ形式のチャンクで返します。
+
         Args:
             model: 使用するモデル名
             messages: メッセージのリスト
             context: コンテキスト（省略可）
             options: オプション（省略可）
             callback: 各チャンクを受け取るコールバック関数（省略可）
+            cancel_token: 生成の中止を伝えるトークン（省略可）
+            keep_alive: 応答後にモデルをメモリに保持する時間（例: "30m"、-1で無期限、省略時はサーバーの設定）
 
         Yields:
-            Dict[str, Any]: チャットの応答（チャンク単位）
+            Dict[str, Any]: チャットの応答（チャンク単位）。キャッシュした応答の最後のチャンクは "cached": True
         """
         # オプションの設定
         opts = options or {}
 
+        cache_key, semantic_query, cached = self._lookup_cached(model, messages, opts, context)
+        if cached is not None:
+            yield from self._replay(cached, callback, cancel_token)
+            return
+
         # 直接HTTPリクエストを使用してストリーミングレスポンスを処理
         url = f"{self.host}/api/chat"
         payload = {"model": model, "messages": messages, "options": opts}
         if context:
             payload["context"] = context
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
 
-        print(f"HTTP APIリクエスト: {url}, ペイロード: {payload}")
+        for chunk in self._stream(url, payload, callback, cancel_token):
+            # 中止されずに完了した応答だけを保存する
+            if chunk.get("done") and not chunk.get("cancelled"):
+                self._store_cached(cache_key, semantic_query, chunk)
+            yield chunk
 
-        # ストリーミングレスポンスを取得
-        response = requests.post(url, json=payload, stream=True)
-        response.raise_for_status()
+    def _lookup_cached(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        options: Dict[str, Any],
+        context: Optional[List[int]],
+    ) -> Tuple[Optional[str], Optional[SemanticQuery], Optional[Dict[str, Any]]]:
+        """
+        応答のキャッシュを参照し、なければ意味の近い質問の応答を探します。
 
-        # 完全なレスポンステキストを構築
-        full_content = ""
+        Returns:
+            Tuple[Optional[str], Optional[SemanticQuery], Optional[Dict[str, Any]]]:
+                応答のキャッシュのキー、意味の近い質問の検索条件（それぞれ使用しない場合はNone）、キャッシュした応答
+        """
+        cache_key = self._response_cache_key(model, messages, options, context)
+        cached = self.response_cache.get(cache_key) if cache_key is not None else None
+        semantic_query = None
+        if cached is None and self.semantic_cache is not None and not context:
+            scope = semantic_scope(model, messages)
+            vector = self.embed(self.semantic_cache.embedding_model, scope[1]) if scope is not None else None
+            if vector is not None:
+                semantic_query = SemanticQuery(scope[0], vector)
+                cached = self.semantic_cache.lookup(semantic_query)
+        return cache_key, semantic_query, cached
+
+    def _store_cached(self, cache_key: Optional[str], semantic_query: Optional[SemanticQuery], chunk: Dict[str, Any]) -> None:
+        """
+        完了した応答をキャッシュに保存します。本文が空の応答は保存しません。
+        """
+        if not chunk["message"]["content"]:
+            return
+        if cache_key is not None:
+            self.response_cache.put(cache_key, chunk)
+        if semantic_query is not None:
+            self.semantic_cache.put(semantic_query, chunk)
+
+    def _response_cache_key(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        options: Dict[str, Any],
+        context: Optional[List[int]],
+    ) -> Optional[str]:
+        """
+        応答のキャッシュのキーを作成します。
 
-        for line in response.iter_lines():
-            if line:
-                line_str = line.decode("utf-8")
+        Returns:
+            Optional[str]: キー。キャッシュが無効な場合、決定的なオプションでない場合、
+                モデルのダイジェストがわからない場合はNone
+        """
+        if self.response_cache is None or not is_deterministic(options):
+            return None
+        digest = find_model_digest(self.list_models(), model)
+        if digest is None:
+            return None
+        return response_cache_key(model, digest, messages, options, context)
+
+    def _replay(
+        self,
+        response: Dict[str, Any],
+        callback: Optional[Callable[[str], None]],
+        cancel_token: Optional[CancellationToken],
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        キャッシュした応答をストリーミングと同じ形式のチャンクで返します。
+        """
+        full_content = TextAccumulator()
+        for chunk in replay_chunks(response):
+            if cancel_token is not None and cancel_token.cancelled:
+                yield cancelled_chunk(full_content.getvalue())
+                return
+            if not chunk["done"]:
+                content = chunk["message"]["content"]
+                full_content.append(content)
+                if callback:
+                    callback(content)
+            yield chunk
+
+    def generate_stream(
+        self,
+        model: str,
+        prompt: str,
+        context: Optional[List[int]] = None,
+        system: Optional[str] = None,
+        options: Optional[Dict[str, Any]] = None,
+        callback: Optional[Callable[[str], None]] = None,
+        cancel_token: Optional[CancellationToken] = None,
+        keep_alive: Optional[Union[str, int]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        前回の応答のコンテキストに続けて /api/generate で応答を生成し、ストリーミングレスポンスを返します。
 
-                try:
-                    json_obj = json.loads(line_str)
+        履歴のメッセージを送り直さないため、ollamaは新しいプロンプトの分だけを評価します。
+        チャンクはchat_streamと同じ形式（"message"に本文）で返し、最後のチャンクの "context" に
+        次の呼び出しで渡すコンテキストが含まれます。
 
-                    if "message" in json_obj and "content" in json_obj["message"]:
-                        content = json_obj["message"]["content"]
-                        full_content += content
+        Args:
+            model: 使用するモデル名
+            prompt: 新しいユーザーのメッセージ
+            context: 前回の応答で返されたコンテキスト（省略時は新しい会話）
+            system: システムプロンプト（省略可）
+            options: オプション（省略可）
+            callback: 各チャンクを受け取るコールバック関数（省略可）
+            cancel_token: 生成の中止を伝えるトークン（省略可）
+            keep_alive: 応答後にモデルをメモリに保持する時間（省略時はサーバーの設定）
+
+        Yields:
+            Dict[str, Any]: 応答（チャンク単位）
+        """
+        url = f"{self.host}/api/generate"
+        payload: Dict[str, Any] = {"model": model, "prompt": prompt, "options": options or {}}
+        if context:
+            payload["context"] = context
+        if system:
+            payload["system"] = system
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+
+        yield from self._stream(url, payload, callback, cancel_token)
+
+    def _stream(
+        self,
+        url: str,
+        payload: Dict[str, Any],
+        callback: Optional[Callable[[str], None]],
+        cancel_token: Optional[CancellationToken],
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        ストリーミングのリクエストを送信し、応答をチャンク単位で返します（chat_streamとgenerate_streamで共有）。
+        """
+        logger.debug("HTTP APIリクエスト: %s, ペイロード: %s", url, LazyPayload(payload))
+
+        # ストリーミングレスポンスを取得（所要時間は応答のヘッダーを受信するまで）
+        with track_backend(url.rsplit("/", 1)[-1]):
+            response = self.session.post(url, json=payload, stream=True)
+            response.raise_for_status()
+
+        # 完全なレスポンステキストはチャンクを蓄積し、完了時に1回だけ結合する
+        full_content = TextAccumulator()
+
+        # 中止されたら応答を閉じ、ollamaに生成を止めさせる（読み取り中のスレッドもすぐに解放される）
+        if cancel_token is not None:
+            cancel_token.add_callback(response.close)
+
+        try:
+            # 大きめのバッファで読み取り、行ごとに文字列へデコードせずに解析する
+            for content, done, json_obj in iter_chat_chunks(response.iter_content(chunk_size=STREAM_CHUNK_SIZE)):
+                if cancel_token is not None and cancel_token.cancelled:
+                    break
+
+                full_content.append(content)
 
-                        # コールバック関数が指定されている場合は呼び出す
-                        if callback:
-                            callback(content)
+                # コールバック関数が指定されている場合は呼び出す
+                if callback:
+                    callback(content)
 
-                        # 完了フラグをチェック
-                        if json_obj.get("done", False):
-                            # 最終的なレスポンスを返す
-                            json_obj["message"]["content"] = full_content
-                            yield json_obj
-                            return
+                # 完了フラグをチェック
+                if done:
+                    # 最終的なレスポンスを返す
+                    json_obj["message"]["content"] = full_content.getvalue()
+                    yield json_obj
+                    return
 
-                        # 現在のチャンクを返す
-                        yield json_obj
-                except json.JSONDecodeError as e:
-                    print(f"JSONデコードエラー: {e}")
+                # 現在のチャンクを返す
+                yield json_obj
+        except Exception:
+            # 中止のために応答を閉じた場合の読み取りエラーは無視する
+            if cancel_token is None or not cancel_token.cancelled:
+                raise
+        finally:
+            response.close()
+
+        if cancel_token is not None and cancel_token.cancelled:
+            yield cancelled_chunk(full_content.getvalue())
 
     def chat(
         self,
@@ -500,6 +920,7 @@ class OllamaClient:
         messages: List[Dict[str, str]],
         context: Optional[List[int]] = None,
         options: Optional[Dict[str, Any]] = None,
+        keep_alive: Optional[Union[str, int]] = None,
     ) -> Dict[str, Any]:
         """
         チャットを実行します。
@@ -509,6 +930,7 @@ class OllamaClient:
             messages: メッセージのリスト
             context: コンテキスト（省略可）
             options: オプション（省略可）
+            keep_alive: 応答後にモデルをメモリに保持する時間（省略時はサーバーの設定）
 
         Returns:
             Dict[str, Any]: チャットの応答
@@ -517,53 +939,96 @@ class OllamaClient:
             # オプションの設定
             opts = options or {}
 
+            cache_key, semantic_query, cached = self._lookup_cached(model, messages, opts, context)
+            if cached is not None:
+                return dict(cached, cached=True)
+
             # 直接HTTPリクエストを使用してストリーミングレスポンスを処理
             url = f"{self.host}/api/chat"
             payload = {"model": model, "messages": messages, "options": opts}
             if context:
                 payload["context"] = context
+            if keep_alive is not None:
+                payload["keep_alive"] = keep_alive
 
-            print(f"HTTP APIリクエスト: {url}, ペイロード: {payload}")
+            logger.debug("HTTP APIリクエスト: %s, ペイロード: %s", url, LazyPayload(payload))
 
             # ストリーミングレスポンスを取得
-            response = requests.post(url, json=payload, stream=True)
-            response.raise_for_status()
+            with track_backend("chat"):
+                response = self.session.post(url, json=payload, stream=True)
+                response.raise_for_status()
 
-            # 完全なレスポンステキストを構築
-            full_content = ""
+            # 完全なレスポンステキストはチャンクを蓄積し、最後に1回だけ結合する
+            accumulator = TextAccumulator()
             last_json_obj = None
 
-            for line in response.iter_lines():
-                if line:
-                    line_str = line.decode("utf-8")
-
-                    try:
-                        json_obj = json.loads(line_str)
-                        last_json_obj = json_obj
-
-                        if "message" in json_obj and "content" in json_obj["message"]:
-                            content = json_obj["message"]["content"]
-                            full_content += content
-                    except json.JSONDecodeError as e:
-                        print(f"JSONデコードエラー: {e}")
+            for content, _, json_obj in iter_chat_chunks(response.iter_content(chunk_size=STREAM_CHUNK_SIZE)):
+                last_json_obj = json_obj
+                accumulator.append(content)
 
             # 空の応答の場合はデフォルトメッセージを設定
+            full_content = accumulator.getvalue()
             if not full_content:
                 full_content = "申し訳ありませんが、応答を生成できませんでした。"
 
             # 最後のJSONオブジェクトを更新して完全なコンテンツを含める
             if last_json_obj:
                 last_json_obj["message"]["content"] = full_content
+                if last_json_obj.get("done") and accumulator.getvalue():
+                    self._store_cached(cache_key, semantic_query, last_json_obj)
                 return last_json_obj
             else:
                 return {"message": {"role": "assistant", "content": full_content}}
         except Exception as e:
-            print(f"チャットの実行に失敗しました: {e}")
+            logger.error("チャットの実行に失敗しました: %s", e)
             return {"message": {"role": "assistant", "content": f"エラーが発生しました: {str(e)}"}}
 
+    def embed(self, model: str, text: str) -> Optional[List[float]]:
+        """
+        /api/embeddings でテキストの埋め込みベクトルを取得します。
+
+        Args:
+            model: 埋め込みに使用するモデル名
+            text: 埋め込むテキスト
+
+        Returns:
+            Optional[List[float]]: 埋め込みベクトル。取得できない場合はNone
+        """
+        try:
+            with track_backend("embeddings"):
+                response = self.session.post(f"{self.host}/api/embeddings", json={"model": model, "prompt": text})
+                response.raise_for_status()
+            return response.json().get("embedding") or None
+        except Exception as e:
+            logger.warning("モデル %s による埋め込みの取得に失敗しました: %s", model, e)
+            return None
+
+    def preload_model(self, model: str, keep_alive: Optional[Union[str, int]] = None) -> bool:
+        """
+        プロンプトのない /api/generate を送信して、モデルをメモリにロードします。
+
+        Args:
+            model: ロードするモデル名
+            keep_alive: モデルをメモリに保持する時間（例: "30m"、-1で無期限、省略時はサーバーの設定）
+
+        Returns:
+            bool: ロードに成功した場合はTrue
+        """
+        payload: Dict[str, Any] = {"model": model, "stream": False}
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        try:
+            with track_backend("preload"):
+                response = self.session.post(f"{self.host}/api/generate", json=payload)
+                response.raise_for_status()
+            return True
+        except Exception as e:
+            logger.warning("モデル %s のロードに失敗しました: %s", model, e)
+            return False
+
     def get_model_info(self, model_name: str) -> Dict[str, Any]:
         """
-        指定したモデルの情報を取得します。
+        指定したモデルの情報を取得します。結果はmodel_info_cache_ttl秒間キャッシュされます。
 
         Args:
             model_name: モデル名
@@ -571,21 +1036,45 @@ class OllamaClient:
         Returns:
             Dict[str, Any]: モデル情報
         """
-        try:
-            # ollama-pythonを使用
-            if OLLAMA_AVAILABLE:
-                try:
-                    response = ollama.show(model_name)
-                    return response
-                except Exception as e:
-                    print(f"ollama-pythonでのモデル情報取得に失敗しました: {e}")
+        return self.model_info_cache.get_or_load(model_name, lambda: self._fetch_model_info(model_name), should_cache=bool)
 
-            # 直接HTTPリクエストを送信
-            url = f"{self.host}/api/show"
-            payload = {"name": model_name}
-            response = requests.post(url, json=payload)
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            print(f"モデル情報の取得に失敗しました: {e}")
+    def _fetch_model_info(self, model_name: str) -> Dict[str, Any]:
+        """
+        ollamaサーバーから指定したモデルの情報を取得します。
+
+        Args:
+            model_name: モデル名
+
+        Returns:
+            Dict[str, Any]: モデル情報
+        """
+        try:
+            with track_backend("get_model_info"):
+                return self.negotiator.run(
+                    "get_model_info",
+                    [
+                        ("ollama-python", lambda: self._get_model_info_python(model_name)),
+                        ("http", lambda: self._get_model_info_http(model_name)),
+                    ],
+                )
+        except NoStrategySucceeded as e:
+            logger.warning("モデル情報の取得に失敗しました: %s", e)
             return {}
+
+    def _get_model_info_python(self, model_name: str) -> Dict[str, Any]:
+        """
+        ollama-pythonを使用してモデルの情報を取得します。
+        """
+        if not OLLAMA_AVAILABLE:
+            raise RuntimeError("ollama-pythonがインストールされていません")
+        return ollama.show(model_name)
+
+    def _get_model_info_http(self, model_name: str) -> Dict[str, Any]:
+        """
+        HTTP API（/api/show）を使用してモデルの情報を取得します。
+        """
+        url = f"{self.host}/api/show"
+        payload = {"name": model_name}
+        response = self.session.post(url, json=payload)
+        response.raise_for_status()
+        return response.json()
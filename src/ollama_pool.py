@@ -0,0 +1,604 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+複数のollamaサーバーに負荷を分散するモジュール。
+
+このモジュールは複数のホストのOllamaClientをまとめ、ホストごとの状態（正常性、実行中の応答数、
+/api/ps で取得したロード済みのモデル）を記録します。chat_streamはモデルをロード済みのホストのうち
+最も負荷の低いホストに送信し、ロード済みのホストがない場合は負荷の低いホストに配置します。
+連続して失敗したホストは一定時間振り分けの対象から外します（パッシブなヘルスチェック）。
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, Union
+
+from src.cancellation import CancellationToken
+from src.ollama_client import OllamaClient, parse_running_models_response
+
+logger = logging.getLogger(__name__)
+
+
+class NoHealthyBackend(Exception):
+    """
+    振り分け先のホストがない場合に送出される例外。
+    """
+
+
+def normalize_model_name(name: str) -> str:
+    """
+    タグを省略したモデル名に ":latest" を付けて、/api/ps のモデル名と比較できるようにします。
+
+    Args:
+        name: モデル名
+
+    Returns:
+        str: タグ付きのモデル名
+    """
+    return name if ":" in name else f"{name}:latest"
+
+
+def parse_resident_models(data: Any) -> Tuple[Set[str], int]:
+    """
+    /api/ps の応答からロード済みのモデル名とVRAMの使用量を取り出します。
+
+    Args:
+        data: /api/ps の応答（JSONをデコードしたもの）
+
+    Returns:
+        Tuple[Set[str], int]: タグ付きのモデル名の集合とVRAMの使用バイト数の合計
+    """
+    models = data.get("models", []) if isinstance(data, dict) else []
+    names = set()
+    vram = 0
+    for model in models:
+        name = model.get("name") or model.get("model")
+        if name:
+            names.add(normalize_model_name(name))
+        vram += int(model.get("size_vram", 0) or 0)
+    return names, vram
+
+
+class PoolMember:
+    """
+    プールに含まれる1つのホストとその状態。
+    """
+
+    def __init__(self, host: str, client: Any):
+        """
+        PoolMemberクラスのコンストラクタ。
+
+        Args:
+            host: ollamaサーバーのホスト
+            client: ホストに接続するクライアント（OllamaClientまたはAsyncOllamaClient）
+        """
+        self.host = host
+        self.client = client
+        # 直近のヘルスチェックが成功したかどうか（初回のチェックまでは正常とみなす）
+        self.healthy = True
+        self.in_flight = 0
+        self.resident_models: Set[str] = set()
+        self.vram_used = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.last_error: Optional[str] = None
+        self.requests = 0
+        self.failures = 0
+
+
+class PoolRouter:
+    """
+    ホストごとの状態を記録し、振り分け先を選択するクラス。
+
+    通信は行わないため、同期版のOllamaPoolと非同期版のAsyncOllamaPoolで共有します。
+    """
+
+    def __init__(
+        self,
+        members: List[PoolMember],
+        failure_threshold: int = 3,
+        eject_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        PoolRouterクラスのコンストラクタ。
+
+        Args:
+            members: ホストのリスト
+            failure_threshold: 振り分けの対象から外すまでの連続失敗回数（デフォルト: 3）
+            eject_seconds: 振り分けの対象から外す秒数（デフォルト: 30.0）
+            clock: 現在時刻を返す関数（テスト用、デフォルト: time.monotonic）
+        """
+        if not members:
+            raise ValueError("ホストを1つ以上指定してください")
+        self.members = members
+        self.failure_threshold = failure_threshold
+        self.eject_seconds = eject_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def _is_available(self, member: PoolMember, now: float) -> bool:
+        """
+        ホストが振り分けの対象かどうかを判定します。
+        """
+        return member.healthy and member.ejected_until <= now
+
+    def candidates(self, model: Optional[str] = None) -> List[PoolMember]:
+        """
+        振り分け先の候補を優先順に取得します。
+
+        モデルをロード済みのホストを実行中の応答数の少ない順に並べ、その後にその他のホストを
+        実行中の応答数とVRAMの使用量の少ない順に並べます。すべてのホストが対象外の場合は
+        すべてのホストを候補とし、復旧したホストを見つけられるようにします。
+
+        Args:
+            model: モデル名（省略時は負荷のみで並べる）
+
+        Returns:
+            List[PoolMember]: 振り分け先の候補
+        """
+        name = normalize_model_name(model) if model else None
+        with self._lock:
+            now = self._clock()
+            members = [member for member in self.members if self._is_available(member, now)] or list(self.members)
+            order = {id(member): index for index, member in enumerate(self.members)}
+            return sorted(
+                members,
+                key=lambda member: (
+                    name not in member.resident_models,
+                    member.in_flight,
+                    member.vram_used,
+                    order[id(member)],
+                ),
+            )
+
+    def acquire(self, member: PoolMember) -> None:
+        """
+        ホストへの応答の開始を記録します。
+        """
+        with self._lock:
+            member.in_flight += 1
+            member.requests += 1
+
+    def release(self, member: PoolMember) -> None:
+        """
+        ホストへの応答の終了を記録します。
+        """
+        with self._lock:
+            member.in_flight -= 1
+
+    def record_success(self, member: PoolMember, model: Optional[str] = None) -> None:
+        """
+        ホストへのリクエストの成功を記録します。
+
+        Args:
+            member: ホスト
+            model: 応答したモデル名。ロード済みのモデルとして記録する（省略可）
+        """
+        with self._lock:
+            member.consecutive_failures = 0
+            member.ejected_until = 0.0
+            if model:
+                member.resident_models.add(normalize_model_name(model))
+
+    def record_unloaded(self, member: PoolMember, model: str) -> None:
+        """
+        ホストでモデルが終了したことを記録します。
+
+        Args:
+            member: ホスト
+            model: 終了したモデル名
+        """
+        with self._lock:
+            member.resident_models.discard(normalize_model_name(model))
+
+    def record_failure(self, member: PoolMember, error: Exception) -> None:
+        """
+        ホストへのリクエストの失敗を記録し、連続失敗回数が閾値に達したら振り分けの対象から外します。
+
+        Args:
+            member: ホスト
+            error: 発生した例外
+        """
+        with self._lock:
+            member.failures += 1
+            member.consecutive_failures += 1
+            member.last_error = str(error)
+            if member.consecutive_failures >= self.failure_threshold:
+                member.ejected_until = self._clock() + self.eject_seconds
+                ejected = True
+            else:
+                ejected = False
+        if ejected:
+            logger.warning("ollamaサーバー %s を%s秒間振り分けの対象から外します: %s", member.host, self.eject_seconds, error)
+
+    def update_health(self, member: PoolMember, ps_data: Any = None, error: Optional[Exception] = None) -> None:
+        """
+        ヘルスチェック（/api/ps の取得）の結果を記録します。
+
+        Args:
+            member: ホスト
+            ps_data: /api/ps の応答（成功した場合）
+            error: 発生した例外（失敗した場合）
+        """
+        with self._lock:
+            if error is not None:
+                member.healthy = False
+                member.last_error = str(error)
+                return
+            member.healthy = True
+            member.resident_models, member.vram_used = parse_resident_models(ps_data)
+
+    def status(self) -> List[Dict[str, Any]]:
+        """
+        ホストごとの状態を取得します。
+
+        Returns:
+            List[Dict[str, Any]]: ホスト、正常性、実行中の応答数、ロード済みのモデルなどの辞書のリスト
+        """
+        with self._lock:
+            now = self._clock()
+            return [
+                {
+                    "host": member.host,
+                    "healthy": member.healthy,
+                    "available": self._is_available(member, now),
+                    "ejected_for": max(0.0, member.ejected_until - now),
+                    "in_flight": member.in_flight,
+                    "resident_models": sorted(member.resident_models),
+                    "vram_used": member.vram_used,
+                    "requests": member.requests,
+                    "failures": member.failures,
+                    "last_error": member.last_error,
+                }
+                for member in self.members
+            ]
+
+
+class OllamaPool:
+    """
+    複数のollamaサーバーに負荷を分散するクラス。
+
+    OllamaClientと同じメソッドを提供するため、app.pyではOllamaClientの代わりに使用できます。
+    ヘルスチェックはlist_running_modelsの呼び出し（SystemMonitorによる定期的な取得）で行います。
+    """
+
+    def __init__(
+        self,
+        hosts: List[str],
+        failure_threshold: int = 3,
+        eject_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+        **client_kwargs: Any,
+    ):
+        """
+        OllamaPoolクラスのコンストラクタ。
+
+        Args:
+            hosts: ollamaサーバーのホストのリスト
+            failure_threshold: 振り分けの対象から外すまでの連続失敗回数（デフォルト: 3）
+            eject_seconds: 振り分けの対象から外す秒数（デフォルト: 30.0）
+            clock: 現在時刻を返す関数（テスト用、デフォルト: time.monotonic）
+            **client_kwargs: 各ホストのOllamaClientに渡す引数
+        """
+        members = [PoolMember(host.rstrip("/"), OllamaClient(host=host, **client_kwargs)) for host in hosts]
+        self.router = PoolRouter(members, failure_threshold=failure_threshold, eject_seconds=eject_seconds, clock=clock)
+
+    @property
+    def members(self) -> List[PoolMember]:
+        """
+        プールに含まれるホストのリスト。
+        """
+        return self.router.members
+
+    def check_health(self) -> List[Dict[str, Any]]:
+        """
+        すべてのホストの /api/ps を取得し、正常性とロード済みのモデルを更新します。
+
+        Returns:
+            List[Dict[str, Any]]: 起動中のモデル情報のリスト（各要素に "host" を含む）
+        """
+        running_models = []
+        for member in self.members:
+            try:
+                data = member.client.fetch_ps()
+            except Exception as e:
+                logger.warning("ollamaサーバー %s のヘルスチェックに失敗しました: %s", member.host, e)
+                self.router.update_health(member, error=e)
+                continue
+            self.router.update_health(member, data)
+            running_models += [dict(model, host=member.host) for model in parse_running_models_response(data)]
+        return running_models
+
+    def list_running_models(self) -> List[Dict[str, Any]]:
+        """
+        すべてのホストで起動中のモデルの一覧を取得します。あわせてヘルスチェックを行います。
+
+        Returns:
+            List[Dict[str, Any]]: 起動中のモデル情報のリスト（各要素に "host" を含む）
+        """
+        return self.check_health()
+
+    def list_models(self) -> List[Dict[str, Any]]:
+        """
+        振り分けの対象のホストで利用可能なモデルの一覧を取得します。同じ名前のモデルは1つにまとめます。
+
+        Returns:
+            List[Dict[str, Any]]: モデル情報のリスト
+        """
+        models: Dict[str, Dict[str, Any]] = {}
+        for member in self.router.candidates():
+            for model in member.client.list_models():
+                models.setdefault(model.get("name", ""), model)
+        return list(models.values())
+
+    def get_model_info(self, model_name: str) -> Dict[str, Any]:
+        """
+        指定したモデルの情報を、モデルをロード済みのホストから優先して取得します。
+
+        Args:
+            model_name: モデル名
+
+        Returns:
+            Dict[str, Any]: モデル情報（取得できない場合は空）
+        """
+        for member in self.router.candidates(model_name):
+            model_info = member.client.get_model_info(model_name)
+            if model_info:
+                return model_info
+        return {}
+
+    def kill_model(self, model_id: str) -> bool:
+        """
+        指定したモデルを終了します。モデルをロード済みのホストがわかる場合はそのホストのみで終了します。
+
+        Args:
+            model_id: 終了するモデルのID（または名前）
+
+        Returns:
+            bool: いずれかのホストで終了に成功した場合はTrue
+        """
+        name = normalize_model_name(model_id)
+        members = [member for member in self.members if name in member.resident_models] or self.members
+        success = False
+        for member in members:
+            if member.client.kill_model(model_id):
+                success = True
+                self.router.record_unloaded(member, model_id)
+        return success
+
+    def chat_stream(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        context: Optional[List[int]] = None,
+        options: Optional[Dict[str, Any]] = None,
+        callback: Optional[Callable[[str], None]] = None,
+        cancel_token: Optional[CancellationToken] = None,
+        keep_alive: Optional[Union[str, int]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        モデルをロード済みで負荷の低いホストでチャットを実行し、ストリーミングレスポンスを返します。
+
+        最初のチャンクを受信する前に失敗した場合は次の候補のホストで再試行します。
+
+        Args:
+            model: 使用するモデル名
+            messages: メッセージのリスト
+            context: コンテキスト（省略可）
+            options: オプション（省略可）
+            callback: 各チャンクを受け取るコールバック関数（省略可）
+            cancel_token: 生成の中止を伝えるトークン（省略可）
+            keep_alive: 応答後にモデルをメモリに保持する時間（省略時はサーバーの設定）
+
+        Yields:
+            Dict[str, Any]: チャットの応答（チャンク単位）
+
+        Raises:
+            NoHealthyBackend: すべてのホストで最初のチャンクを受信する前に失敗した場合
+        """
+        yield from self._route_stream(
+            model,
+            cancel_token,
+            lambda client: client.chat_stream(
+                model,
+                messages,
+                context=context,
+                options=options,
+                callback=callback,
+                cancel_token=cancel_token,
+                keep_alive=keep_alive,
+            ),
+        )
+
+    def generate_stream(
+        self,
+        model: str,
+        prompt: str,
+        context: Optional[List[int]] = None,
+        system: Optional[str] = None,
+        options: Optional[Dict[str, Any]] = None,
+        callback: Optional[Callable[[str], None]] = None,
+        cancel_token: Optional[CancellationToken] = None,
+        keep_alive: Optional[Union[str, int]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        モデルをロード済みで負荷の低いホストで、前回の応答のコンテキストに続けて応答を生成します。
+
+        コンテキストはモデルごとのトークン列のため、前回と異なるホストで生成しても続きになります。
+
+        Args:
+            model: 使用するモデル名
+            prompt: 新しいユーザーのメッセージ
+            context: 前回の応答で返されたコンテキスト（省略時は新しい会話）
+            system: システムプロンプト（省略可）
+            options: オプション（省略可）
+            callback: 各チャンクを受け取るコールバック関数（省略可）
+            cancel_token: 生成の中止を伝えるトークン（省略可）
+            keep_alive: 応答後にモデルをメモリに保持する時間（省略時はサーバーの設定）
+
+        Yields:
+            Dict[str, Any]: 応答（チャンク単位）
+
+        Raises:
+            NoHealthyBackend: すべてのホストで最初のチャンクを受信する前に失敗した場合
+        """
+        yield from self._route_stream(
+            model,
+            cancel_token,
+            lambda client: client.generate_stream(
+                model,
+                prompt,
+                context=context,
+                system=system,
+                options=options,
+                callback=callback,
+                cancel_token=cancel_token,
+                keep_alive=keep_alive,
+            ),
+        )
+
+    def _route_stream(
+        self,
+        model: str,
+        cancel_token: Optional[CancellationToken],
+        open_stream: Callable[[Any], Iterator[Dict[str, Any]]],
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        候補のホストの順にストリーミング応答を開始し、最初のチャンクを受信する前に失敗した場合は次のホストで再試行します。
+        """
+        errors = []
+        for member in self.router.candidates(model):
+            started = False
+            self.router.acquire(member)
+            try:
+                for chunk in open_stream(member.client):
+                    started = True
+                    yield chunk
+            except Exception as e:
+                self.router.record_failure(member, e)
+                if started or (cancel_token is not None and cancel_token.cancelled):
+                    raise
+                logger.warning("ollamaサーバー %s でのチャットに失敗したため、次のホストで再試行します: %s", member.host, e)
+                errors.append(f"{member.host}: {e}")
+                continue
+            finally:
+                self.router.release(member)
+            self.router.record_success(member, model)
+            return
+        raise NoHealthyBackend(f"チャットを実行できるollamaサーバーがありません（{', '.join(errors)}）")
+
+    def chat(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        context: Optional[List[int]] = None,
+        options: Optional[Dict[str, Any]] = None,
+        keep_alive: Optional[Union[str, int]] = None,
+    ) -> Dict[str, Any]:
+        """
+        モデルをロード済みで負荷の低いホストでチャットを実行します。
+
+        Args:
+            model: 使用するモデル名
+            messages: メッセージのリスト
+            context: コンテキスト（省略可）
+            options: オプション（省略可）
+            keep_alive: 応答後にモデルをメモリに保持する時間（省略時はサーバーの設定）
+
+        Returns:
+            Dict[str, Any]: チャットの応答
+        """
+        member = self.router.candidates(model)[0]
+        self.router.acquire(member)
+        try:
+            return member.client.chat(model, messages, context=context, options=options, keep_alive=keep_alive)
+        finally:
+            self.router.release(member)
+
+    def embed(self, model: str, text: str) -> Optional[List[float]]:
+        """
+        埋め込みのモデルをロード済みか、負荷の低いホストでテキストの埋め込みベクトルを取得します。
+
+        Args:
+            model: 埋め込みに使用するモデル名
+            text: 埋め込むテキスト
+
+        Returns:
+            Optional[List[float]]: 埋め込みベクトル。取得できない場合はNone
+        """
+        return self.router.candidates(model)[0].client.embed(model, text)
+
+    def preload_model(self, model: str, keep_alive: Optional[Union[str, int]] = None) -> bool:
+        """
+        モデルをロード済みか、負荷の低いホストでモデルをロードします。
+
+        Args:
+            model: ロードするモデル名
+            keep_alive: モデルをメモリに保持する時間（省略時はサーバーの設定）
+
+        Returns:
+            bool: ロードに成功した場合はTrue
+        """
+        member = self.router.candidates(model)[0]
+        if not member.client.preload_model(model, keep_alive=keep_alive):
+            return False
+        self.router.record_success(member, model)
+        return True
+
+    def get_gpu_info(self) -> List[Dict[str, Any]]:
+        """
+        GPUの情報と使用率を取得します（このマシンのGPUを最初のホストのクライアントで取得）。
+
+        Returns:
+            List[Dict[str, Any]]: GPU情報のリスト
+        """
+        return self.members[0].client.get_gpu_info()
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """
+        ホストごとの状態とHTTPコネクションプールの統計情報を取得します。
+
+        Returns:
+            Dict[str, Any]: ホストごとの状態とプール統計
+        """
+        return {
+            "backends": self.router.status(),
+            "hosts": {member.host: member.client.get_pool_stats() for member in self.members},
+        }
+
+    def invalidate_cache(self, model_name: Optional[str] = None) -> None:
+        """
+        すべてのホストのモデル一覧とモデル情報のキャッシュを破棄します。
+
+        Args:
+            model_name: モデル情報を破棄するモデル名（省略時はすべてのモデル情報を破棄）
+        """
+        for member in self.members:
+            member.client.invalidate_cache(model_name)
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """
+        ホストごとのキャッシュの統計情報を取得します。
+
+        Returns:
+            Dict[str, Any]: ホストごとのキャッシュの統計
+        """
+        return {member.host: member.client.get_cache_stats() for member in self.members}
+
+    def get_capabilities(self) -> Dict[str, Any]:
+        """
+        ホストごとのollamaサーバーのバージョンと使用している取得方法を取得します。
+
+        Returns:
+            Dict[str, Any]: ホストごとのバージョンと方法
+        """
+        return {"backends": [dict(member.client.get_capabilities(), host=member.host) for member in self.members]}
+
+    def close(self) -> None:
+        """
+        すべてのホストのHTTPセッションを閉じます。
+        """
+        for member in self.members:
+            member.client.close()
@@ -0,0 +1,477 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+同じ入力に対するチャットの応答をキャッシュするモジュール。
+
+このモジュールは、モデルのダイジェスト、メッセージ、オプションが完全に一致するリクエストの応答を
+メモリ（LRU）とディスクの2段のキャッシュに保存します。temperatureが0の決定的なリクエストだけを対象とし、
+キャッシュした応答はストリーミングと同じ形式のチャンクとして返し直すため、UIの処理は変わりません。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from src.metrics import RESPONSE_CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+# getが返した応答の取得元
+MEMORY = "memory"
+DISK = "disk"
+MISS = "miss"
+
+# キャッシュした応答を返し直すときの1チャンクあたりの文字数
+REPLAY_CHUNK_CHARS = 32
+
+# 応答のうちキャッシュに保存する項目（所要時間やトークン数は返し直した応答では意味がないため除く）
+CACHED_FIELDS = ("model", "created_at", "done_reason")
+
+
+def is_deterministic(options: Optional[Dict[str, Any]]) -> bool:
+    """
+    同じ入力に対して同じ応答が生成されるオプションかどうかを判定します。
+
+    Args:
+        options: ollamaに渡すオプション
+
+    Returns:
+        bool: temperatureが0の場合はTrue
+    """
+    temperature = (options or {}).get("temperature")
+    try:
+        return temperature is not None and float(temperature) == 0.0
+    except (TypeError, ValueError):
+        return False
+
+
+def find_model_digest(models: List[Dict[str, Any]], model: str) -> Optional[str]:
+    """
+    モデル一覧から指定したモデルのダイジェストを取り出します。
+
+    Args:
+        models: list_modelsの結果
+        model: モデル名（タグを省略した場合は ":latest" として扱う）
+
+    Returns:
+        Optional[str]: ダイジェスト。モデルが見つからない場合やダイジェストがない場合はNone
+    """
+    names = {model, model if ":" in model else f"{model}:latest"}
+    for entry in models:
+        if entry.get("name") in names or entry.get("model") in names:
+            return entry.get("digest") or entry.get("id") or None
+    return None
+
+
+def response_cache_key(
+    model: str,
+    digest: str,
+    messages: List[Dict[str, Any]],
+    options: Optional[Dict[str, Any]],
+    context: Optional[List[int]] = None,
+) -> str:
+    """
+    リクエストの内容からキャッシュのキーを作成します。
+
+    キーの順序や空白に左右されないよう、正規化したJSONのSHA-256をキーとします。
+    keep_aliveは応答に影響しないため含めません。
+
+    Args:
+        model: モデル名
+        digest: モデルのダイジェスト。同じ名前のモデルが更新された場合に別のキーになります
+        messages: メッセージのリスト
+        options: オプション
+        context: コンテキスト（省略可）
+
+    Returns:
+        str: 16進数のキー
+    """
+    canonical = json.dumps(
+        {"model": model, "digest": digest, "messages": messages, "options": options or {}, "context": context or []},
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def cacheable_response(chunk: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    ストリーミングの最後のチャンクから、キャッシュに保存する応答を作成します。
+
+    Args:
+        chunk: 完全な応答を含む最後のチャンク
+
+    Returns:
+        Dict[str, Any]: 保存する応答
+    """
+    response = {field: chunk[field] for field in CACHED_FIELDS if field in chunk}
+    message = chunk.get("message") or {}
+    response["message"] = {"role": message.get("role", "assistant"), "content": message.get("content", "")}
+    response["done"] = True
+    return response
+
+
+def replay_chunks(response: Dict[str, Any], chunk_chars: int = REPLAY_CHUNK_CHARS) -> Iterator[Dict[str, Any]]:
+    """
+    キャッシュした応答を、ストリーミングと同じ形式のチャンクに分けて返します。
+
+    Args:
+        response: キャッシュした応答
+        chunk_chars: 1チャンクあたりの文字数（デフォルト: 32）
+
+    Yields:
+        Dict[str, Any]: 途中のチャンクと、完全な応答を含み "cached": True の最後のチャンク
+    """
+    message = response["message"]
+    content = message["content"]
+    for start in range(0, len(content), chunk_chars):
+        yield {
+            "model": response.get("model"),
+            "message": {"role": message["role"], "content": content[start : start + chunk_chars]},
+            "done": False,
+        }
+    yield dict(response, message=dict(message), done=True, cached=True)
+
+
+class MemoryTier:
+    """
+    メモリ上のLRUキャッシュ。保存した応答の合計バイト数が上限を超えると、最も古く使われたものから破棄します。
+    """
+
+    def __init__(self, max_bytes: int, ttl: float, clock: Callable[[], float] = time.time):
+        """
+        MemoryTierクラスのコンストラクタ。
+
+        Args:
+            max_bytes: 保存する応答の合計バイト数の上限
+            ttl: 応答を保持する秒数
+            clock: 現在時刻を返す関数（テスト用、デフォルト: time.time）
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        # キー -> (JSONにした応答, 保存時刻)。値を共有しないよう、取得のたびにデコードする
+        self._entries: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self.total_bytes = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        応答を取得します。
+
+        Args:
+            key: キー
+
+        Returns:
+            Optional[bytes]: JSONにした応答。ない場合や期限切れの場合はNone
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._clock() - entry[1] > self.ttl:
+                self._remove_locked(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: str, data: bytes, stored_at: Optional[float] = None) -> None:
+        """
+        応答を保存します。上限より大きい応答は保存しません。
+
+        Args:
+            key: キー
+            data: JSONにした応答
+            stored_at: 保存時刻（ディスクから移す場合に元の時刻を引き継ぐ、省略時は現在時刻）
+        """
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            self._remove_locked(key)
+            self._entries[key] = (data, self._clock() if stored_at is None else stored_at)
+            self.total_bytes += len(data)
+            while self.total_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove_locked(oldest)
+
+    def clear(self) -> None:
+        """
+        すべての応答を破棄します。
+        """
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def _remove_locked(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= len(entry[0])
+
+
+class DiskTier:
+    """
+    ディスク上のキャッシュ。応答を1件ずつJSONファイルに保存し、合計バイト数が上限を超えると
+    最も古く使われたものから削除します。ファイルは一時ファイルから置き換えて書き込むため、
+    途中で止まっても壊れたファイルは残りません。
+    """
+
+    def __init__(self, directory: str, max_bytes: int, ttl: float, clock: Callable[[], float] = time.time):
+        """
+        DiskTierクラスのコンストラクタ。既存のファイルがあれば引き継ぎます。
+
+        Args:
+            directory: 保存先のディレクトリ（存在しない場合は作成）
+            max_bytes: 保存するファイルの合計バイト数の上限
+            ttl: 応答を保持する秒数
+            clock: 現在時刻を返す関数（テスト用、デフォルト: time.time）
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        # キー -> ファイルのバイト数。最終使用時刻の古い順に並べる
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self.total_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._index)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _load_index(self) -> None:
+        """
+        ディレクトリ内のファイルを更新時刻の古い順に索引に登録します。
+        """
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if not name.endswith(".json"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, name[: -len(".json")], stat.st_size))
+        for _, key, size in sorted(files):
+            self._index[key] = size
+            self.total_bytes += size
+        self._evict_locked()
+
+    def get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        """
+        応答を取得します。
+
+        Args:
+            key: キー
+
+        Returns:
+            Optional[Tuple[bytes, float]]: JSONにした応答と保存時刻。ない場合や期限切れの場合はNone
+        """
+        with self._lock:
+            if key not in self._index:
+                return None
+            try:
+                with open(self._path(key), "rb") as f:
+                    record = json.loads(f.read())
+                stored_at = float(record["stored_at"])
+                data = json.dumps(record["response"], ensure_ascii=False).encode("utf-8")
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.warning("応答キャッシュのファイルを読み込めませんでした（%s）: %s", key, e)
+                self._remove_locked(key)
+                return None
+            if self._clock() - stored_at > self.ttl:
+                self._remove_locked(key)
+                return None
+            self._index.move_to_end(key)
+            return data, stored_at
+
+    def put(self, key: str, data: bytes) -> None:
+        """
+        応答を保存します。上限より大きい応答は保存しません。
+
+        Args:
+            key: キー
+            data: JSONにした応答
+        """
+        record = b'{"stored_at":' + repr(self._clock()).encode("ascii") + b',"response":' + data + b"}"
+        if len(record) > self.max_bytes:
+            return
+        path = self._path(key)
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+                try:
+                    with os.fdopen(fd, "wb") as f:
+                        f.write(record)
+                    os.replace(temp_path, path)
+                except BaseException:
+                    os.unlink(temp_path)
+                    raise
+            except OSError as e:
+                logger.warning("応答キャッシュのファイルを書き込めませんでした（%s）: %s", key, e)
+                return
+            self.total_bytes -= self._index.pop(key, 0)
+            self._index[key] = len(record)
+            self.total_bytes += len(record)
+            self._evict_locked()
+
+    def clear(self) -> None:
+        """
+        すべての応答のファイルを削除します。
+        """
+        with self._lock:
+            for key in list(self._index):
+                self._remove_locked(key)
+
+    def _remove_locked(self, key: str) -> None:
+        self.total_bytes -= self._index.pop(key, 0)
+        try:
+            os.unlink(self._path(key))
+        except OSError:
+            pass
+
+    def _evict_locked(self) -> None:
+        while self.total_bytes > self.max_bytes and self._index:
+            self._remove_locked(next(iter(self._index)))
+
+
+class ResponseCache:
+    """
+    チャットの応答の2段のキャッシュクラス。
+
+    先にメモリを参照し、なければディスクを参照します。ディスクで見つかった応答はメモリに移します。
+    ディスクの読み書きはブロックするため、イベントループからは別スレッドで呼び出してください。
+    """
+
+    def __init__(
+        self,
+        memory_max_bytes: int = 64 * 1024 * 1024,
+        disk_dir: Optional[str] = None,
+        disk_max_bytes: int = 1024 * 1024 * 1024,
+        ttl: float = 86400.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        ResponseCacheクラスのコンストラクタ。
+
+        Args:
+            memory_max_bytes: メモリに保存する応答の合計バイト数の上限（デフォルト: 64MiB）
+            disk_dir: ディスクのキャッシュの保存先。省略時はメモリだけを使用
+            disk_max_bytes: ディスクに保存する応答の合計バイト数の上限（デフォルト: 1GiB）
+            ttl: 応答を保持する秒数（デフォルト: 86400.0）
+            clock: 現在時刻を返す関数（テスト用、デフォルト: time.time）
+        """
+        self.ttl = ttl
+        self.memory = MemoryTier(memory_max_bytes, ttl, clock=clock)
+        self.disk = DiskTier(disk_dir, disk_max_bytes, ttl, clock=clock) if disk_dir else None
+        self._lock = threading.Lock()
+        # 統計情報
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def lookup(self, key: str) -> Tuple[Optional[Dict[str, Any]], str]:
+        """
+        応答とその取得元を取得します。
+
+        Args:
+            key: response_cache_keyで作成したキー
+
+        Returns:
+            Tuple[Optional[Dict[str, Any]], str]: 応答と取得元（MEMORY、DISK、MISS）。MISSの場合の応答はNone
+        """
+        data = self.memory.get(key)
+        result = MEMORY
+        if data is None and self.disk is not None:
+            found = self.disk.get(key)
+            if found is not None:
+                data, stored_at = found
+                self.memory.put(key, data, stored_at=stored_at)
+                result = DISK
+        if data is None:
+            result = MISS
+
+        with self._lock:
+            if result == MEMORY:
+                self.memory_hits += 1
+            elif result == DISK:
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+        RESPONSE_CACHE_REQUESTS.inc(result=result)
+        return (json.loads(data) if data is not None else None), result
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        応答を取得します。
+
+        Args:
+            key: response_cache_keyで作成したキー
+
+        Returns:
+            Optional[Dict[str, Any]]: 応答。ない場合はNone
+        """
+        return self.lookup(key)[0]
+
+    def put(self, key: str, chunk: Dict[str, Any]) -> None:
+        """
+        ストリーミングの最後のチャンクから応答を保存します。
+
+        Args:
+            key: response_cache_keyで作成したキー
+            chunk: 完全な応答を含む最後のチャンク
+        """
+        data = json.dumps(cacheable_response(chunk), ensure_ascii=False).encode("utf-8")
+        self.memory.put(key, data)
+        if self.disk is not None:
+            self.disk.put(key, data)
+        with self._lock:
+            self.stores += 1
+
+    def clear(self) -> None:
+        """
+        すべての応答を破棄します。
+        """
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        キャッシュの統計情報を取得します。
+
+        Returns:
+            Dict[str, Any]: 段ごとの件数とバイト数、ヒット数などの統計
+        """
+        with self._lock:
+            stats = {
+                "entries": len(self.memory),
+                "bytes": self.memory.total_bytes,
+                "hits": self.memory_hits + self.disk_hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "stores": self.stores,
+            }
+        if self.disk is not None:
+            stats["disk_entries"] = len(self.disk)
+            stats["disk_bytes"] = self.disk.total_bytes
+        return stats
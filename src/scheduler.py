@@ -0,0 +1,420 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+応答の生成の同時実行数を制御するモジュール。
+
+このモジュールはchat_streamの前段でモデルごとの同時実行数を制限し、上限を超えたリクエストを
+モデルごとの待ち行列に入れます。待ち行列はユーザーごとのFIFOを順番に取り出すため
+（ラウンドロビン）、1人のユーザーが大量に送信しても他のユーザーが待たされ続けることはありません。
+待ち行列が一杯の場合は再試行までの目安の秒数を付けて受け付けを拒否します。
+"""
+
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from src.cancellation import CancellationToken
+from src.ollama_pool import normalize_model_name
+
+# 待機中の状態
+QUEUED = "queued"
+ADMITTED = "admitted"
+CANCELLED = "cancelled"
+FINISHED = "finished"
+
+
+class QueueFull(Exception):
+    """
+    待ち行列が一杯で受け付けられない場合に送出される例外。
+    """
+
+    def __init__(self, model: str, retry_after: int, reason: str):
+        """
+        QueueFullクラスのコンストラクタ。
+
+        Args:
+            model: モデル名
+            retry_after: 再試行までの目安の秒数
+            reason: 拒否の理由
+        """
+        self.model = model
+        self.retry_after = retry_after
+        self.reason = reason
+        super().__init__(f"{model} の{reason}（{retry_after}秒後に再試行してください）")
+
+
+def parse_model_limits(value: str) -> Dict[str, int]:
+    """
+    "モデル名=同時実行数" をカンマ区切りで並べた文字列を解析します。
+
+    Args:
+        value: 例: "llama2=4,mistral:7b=1"
+
+    Returns:
+        Dict[str, int]: タグ付きのモデル名と同時実行数の辞書
+    """
+    limits = {}
+    for item in value.split(","):
+        if "=" not in item:
+            continue
+        name, limit = item.rsplit("=", 1)
+        limits[normalize_model_name(name.strip())] = int(limit)
+    return limits
+
+
+class Ticket:
+    """
+    1つの生成のリクエスト。待ち行列に入っている間の順番と、実行の許可の状態を保持します。
+    """
+
+    def __init__(self, model: str, user: str):
+        """
+        Ticketクラスのコンストラクタ。
+
+        Args:
+            model: モデル名
+            user: リクエストしたユーザー（セッションID）
+        """
+        self.model = normalize_model_name(model)
+        self.user = user
+        self.state = QUEUED
+        self.position = 0
+        self.admitted_at: Optional[float] = None
+        # 状態や順番が変化したときに待機中のスレッドやタスクを起こす関数（スケジューラが設定する）
+        self.wake: Callable[[], None] = lambda: None
+
+
+class _ModelQueue:
+    """
+    1つのモデルの実行中の数と、ユーザーごとの待ち行列。
+    """
+
+    def __init__(self, initial_duration: float):
+        self.running = 0
+        self.users: "OrderedDict[str, Deque[Ticket]]" = OrderedDict()
+        self.queued = 0
+        self.avg_duration = initial_duration
+        self.admitted = 0
+        self.rejected = 0
+
+
+class AdmissionQueue:
+    """
+    モデルごとの同時実行数と待ち行列を管理するクラス。
+
+    待機の方法（スレッドまたはイベントループ）に依存しないため、GenerationSchedulerと
+    AsyncGenerationSchedulerで共有します。状態が変化したチケットのリストを返し、呼び出し側が
+    ロックの外でwakeを呼び出します。
+    """
+
+    def __init__(
+        self,
+        max_concurrent_per_model: int = 4,
+        model_limits: Optional[Dict[str, int]] = None,
+        max_queue: int = 32,
+        max_queue_per_user: int = 4,
+        backends: int = 1,
+        initial_duration: float = 10.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        AdmissionQueueクラスのコンストラクタ。
+
+        Args:
+            max_concurrent_per_model: ollamaサーバー1台あたりのモデルごとの同時実行数（デフォルト: 4）
+            model_limits: モデルごとに同時実行数を変える場合のモデル名とサーバー1台あたりの同時実行数の辞書（省略可）
+            max_queue: モデルごとの待ち行列の最大数（デフォルト: 32）
+            max_queue_per_user: ユーザーごとにモデルの待ち行列に入れる最大数（デフォルト: 4）
+            backends: 生成を分散するollamaサーバーの数。同時実行数はサーバー数倍になる（デフォルト: 1）
+            initial_duration: 再試行までの秒数の見積もりに使う生成の所要時間の初期値（デフォルト: 10.0）
+            clock: 現在時刻を返す関数（テスト用、デフォルト: time.monotonic）
+        """
+        self.max_concurrent_per_model = max_concurrent_per_model
+        self.model_limits = {normalize_model_name(name): limit for name, limit in (model_limits or {}).items()}
+        self.max_queue = max_queue
+        self.max_queue_per_user = max_queue_per_user
+        self.backends = max(1, backends)
+        self.initial_duration = initial_duration
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._models: Dict[str, _ModelQueue] = {}
+
+    def limit(self, model: str) -> int:
+        """
+        モデルの同時実行数（サーバー1台あたりの同時実行数×サーバー数）を取得します。
+
+        Args:
+            model: モデル名
+
+        Returns:
+            int: 同時実行数
+        """
+        return self.model_limits.get(normalize_model_name(model), self.max_concurrent_per_model) * self.backends
+
+    def _queue(self, model: str) -> _ModelQueue:
+        queue = self._models.get(model)
+        if queue is None:
+            queue = self._models[model] = _ModelQueue(self.initial_duration)
+        return queue
+
+    def _retry_after(self, model: str, queue: _ModelQueue) -> int:
+        """
+        待ち行列が空くまでの目安の秒数を見積もります。
+        """
+        return max(1, math.ceil(queue.avg_duration * (queue.queued + 1) / max(1, self.limit(model))))
+
+    def _admit(self, ticket: Ticket, queue: _ModelQueue) -> None:
+        ticket.state = ADMITTED
+        ticket.position = 0
+        ticket.admitted_at = self._clock()
+        queue.running += 1
+        queue.admitted += 1
+
+    def _dispatch(self, model: str, queue: _ModelQueue) -> List[Ticket]:
+        """
+        空きがあれば待ち行列の先頭のユーザーから順に実行を許可し、残りのチケットの順番を更新します。
+
+        Returns:
+            List[Ticket]: 状態または順番が変化したチケット
+        """
+        changed = []
+        while queue.users and queue.running < self.limit(model):
+            user, tickets = next(iter(queue.users.items()))
+            ticket = tickets.popleft()
+            queue.queued -= 1
+            # 同じユーザーの次のリクエストは他のユーザーの後に回す
+            del queue.users[user]
+            if tickets:
+                queue.users[user] = tickets
+            self._admit(ticket, queue)
+            changed.append(ticket)
+
+        # ユーザーごとのFIFOを1件ずつ順番に取り出した順が待ち行列の順番になる
+        position = 0
+        lanes = [list(tickets) for tickets in queue.users.values()]
+        for depth in range(max((len(lane) for lane in lanes), default=0)):
+            for lane in lanes:
+                if depth < len(lane):
+                    position += 1
+                    if lane[depth].position != position:
+                        lane[depth].position = position
+                        changed.append(lane[depth])
+        return changed
+
+    def submit(self, ticket: Ticket) -> List[Ticket]:
+        """
+        リクエストを受け付けます。空きがあればすぐに実行を許可し、なければ待ち行列に入れます。
+
+        Args:
+            ticket: リクエスト
+
+        Returns:
+            List[Ticket]: 状態または順番が変化したチケット
+
+        Raises:
+            QueueFull: モデルの待ち行列またはユーザーの待ち行列が一杯の場合
+        """
+        with self._lock:
+            queue = self._queue(ticket.model)
+            if not queue.users and queue.running < self.limit(ticket.model):
+                self._admit(ticket, queue)
+                return [ticket]
+            if queue.queued >= self.max_queue:
+                queue.rejected += 1
+                raise QueueFull(ticket.model, self._retry_after(ticket.model, queue), "待ち行列が一杯です")
+            if len(queue.users.get(ticket.user, ())) >= self.max_queue_per_user:
+                queue.rejected += 1
+                raise QueueFull(ticket.model, self._retry_after(ticket.model, queue), "順番待ちのリクエストが多すぎます")
+            queue.users.setdefault(ticket.user, deque()).append(ticket)
+            queue.queued += 1
+            return self._dispatch(ticket.model, queue)
+
+    def finish(self, ticket: Ticket) -> List[Ticket]:
+        """
+        実行を許可したリクエストの終了を記録し、次のリクエストに実行を許可します。
+
+        Args:
+            ticket: 終了したリクエスト
+
+        Returns:
+            List[Ticket]: 状態または順番が変化したチケット
+        """
+        with self._lock:
+            if ticket.state != ADMITTED:
+                return []
+            queue = self._queue(ticket.model)
+            ticket.state = FINISHED
+            queue.running -= 1
+            # 所要時間の移動平均を再試行までの秒数の見積もりに使う
+            queue.avg_duration = 0.8 * queue.avg_duration + 0.2 * (self._clock() - ticket.admitted_at)
+            return self._dispatch(ticket.model, queue)
+
+    def withdraw(self, ticket: Ticket) -> List[Ticket]:
+        """
+        待ち行列に入っているリクエストを取り消します。実行を許可済みの場合は何もしません。
+
+        Args:
+            ticket: 取り消すリクエスト
+
+        Returns:
+            List[Ticket]: 状態または順番が変化したチケット（取り消したチケットを含む）
+        """
+        with self._lock:
+            if ticket.state != QUEUED:
+                return []
+            queue = self._queue(ticket.model)
+            tickets = queue.users.get(ticket.user)
+            if tickets is None or ticket not in tickets:
+                return []
+            tickets.remove(ticket)
+            if not tickets:
+                del queue.users[ticket.user]
+            queue.queued -= 1
+            ticket.state = CANCELLED
+            return [ticket] + self._dispatch(ticket.model, queue)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        モデルごとの実行中の数と待ち行列の統計情報を取得します。
+
+        Returns:
+            Dict[str, Any]: モデル名ごとの統計
+        """
+        with self._lock:
+            return {
+                model: {
+                    "limit": self.limit(model),
+                    "running": queue.running,
+                    "queued": queue.queued,
+                    "queued_users": len(queue.users),
+                    "admitted": queue.admitted,
+                    "rejected": queue.rejected,
+                    "avg_duration": round(queue.avg_duration, 3),
+                }
+                for model, queue in self._models.items()
+            }
+
+    @staticmethod
+    def _wake(changed: List[Ticket]) -> None:
+        for ticket in changed:
+            ticket.wake()
+
+
+class GenerationScheduler(AdmissionQueue):
+    """
+    スレッドで待機する版のスケジューラ（app.pyで使用）。
+    """
+
+    def acquire(
+        self,
+        model: str,
+        user: str,
+        on_queued: Optional[Callable[[int], None]] = None,
+        cancel_token: Optional[CancellationToken] = None,
+    ) -> Optional[Ticket]:
+        """
+        実行の許可を待ちます。待ち行列に入った場合は順番が変わるたびにon_queuedを呼び出します。
+
+        Args:
+            model: モデル名
+            user: リクエストしたユーザー（セッションID）
+            on_queued: 待ち行列での順番（1から）を受け取る関数（省略可）
+            cancel_token: 生成の中止を伝えるトークン。中止されると待ち行列から取り除く（省略可）
+
+        Returns:
+            Optional[Ticket]: 実行を許可されたチケット（終了時にreleaseに渡す）。待機中に中止された場合はNone
+
+        Raises:
+            QueueFull: 待ち行列が一杯の場合
+        """
+        ticket = Ticket(model, user)
+        signal = threading.Event()
+        ticket.wake = signal.set
+        self._wake(self.submit(ticket))
+        if cancel_token is not None:
+            cancel_token.add_callback(lambda: self._wake(self.withdraw(ticket)))
+
+        reported = 0
+        while ticket.state == QUEUED:
+            if on_queued is not None and ticket.position != reported:
+                reported = ticket.position
+                on_queued(reported)
+            signal.wait()
+            signal.clear()
+        return ticket if ticket.state == ADMITTED else None
+
+    def release(self, ticket: Ticket) -> None:
+        """
+        生成の終了を記録し、待ち行列の次のリクエストに実行を許可します。
+
+        Args:
+            ticket: acquireが返したチケット
+        """
+        self._wake(self.finish(ticket))
+
+
+class AsyncGenerationScheduler(AdmissionQueue):
+    """
+    イベントループ上で待機する版のスケジューラ（async_app.pyで使用）。
+    """
+
+    async def acquire(
+        self,
+        model: str,
+        user: str,
+        on_queued: Optional[Callable[[int], Any]] = None,
+        cancel_token: Optional[CancellationToken] = None,
+    ) -> Optional[Ticket]:
+        """
+        GenerationScheduler.acquireの非同期版。on_queuedにはコルーチン関数も指定できます。
+
+        Args:
+            model: モデル名
+            user: リクエストしたユーザー（セッションID）
+            on_queued: 待ち行列での順番（1から）を受け取る関数（省略可）
+            cancel_token: 生成の中止を伝えるトークン。中止されると待ち行列から取り除く（省略可）
+
+        Returns:
+            Optional[Ticket]: 実行を許可されたチケット（終了時にreleaseに渡す）。待機中に中止された場合はNone
+
+        Raises:
+            QueueFull: 待ち行列が一杯の場合
+        """
+        loop = asyncio.get_running_loop()
+        ticket = Ticket(model, user)
+        signal = asyncio.Event()
+        # 他のスレッドから起こされる場合もあるため、イベントループ上で設定する
+        ticket.wake = lambda: loop.call_soon_threadsafe(signal.set)
+        self._wake(self.submit(ticket))
+        if cancel_token is not None:
+            cancel_token.add_callback(lambda: self._wake(self.withdraw(ticket)))
+
+        reported = 0
+        try:
+            while ticket.state == QUEUED:
+                if on_queued is not None and ticket.position != reported:
+                    reported = ticket.position
+                    result = on_queued(reported)
+                    if asyncio.iscoroutine(result):
+                        await result
+                signal.clear()
+                if ticket.state == QUEUED:
+                    await signal.wait()
+        except asyncio.CancelledError:
+            # タスクが取り消された場合は待ち行列から取り除き、許可済みなら次のリクエストに譲る
+            self._wake(self.withdraw(ticket))
+            self.release(ticket)
+            raise
+        return ticket if ticket.state == ADMITTED else None
+
+    def release(self, ticket: Ticket) -> None:
+        """
+        生成の終了を記録し、待ち行列の次のリクエストに実行を許可します。
+
+        Args:
+            ticket: acquireが返したチケット
+        """
+        self._wake(self.finish(ticket))
@@ -0,0 +1,310 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+意味の近い質問に対してキャッシュした応答を返すモジュール。
+
+このモジュールは最後のユーザーのメッセージをollamaの埋め込み（/api/embeddings）でベクトルにし、
+モデル、システムプロンプト、それまでの会話が同じ範囲の中でコサイン類似度が閾値以上の質問を探します。
+見つかった場合は生成を行わずに、その質問に対する応答を返します。検索にはNumPyを使用します。
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from src.metrics import SEMANTIC_CACHE_REQUESTS
+from src.response_cache import cacheable_response
+
+# NumPyがなくてもインポートできるようにする
+try:
+    import numpy as np
+
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# 同じ質問とみなすコサイン類似度の既定の閾値
+DEFAULT_THRESHOLD = 0.95
+
+# 範囲ごとのベクトルの配列の最初の行数。足りなくなるとmax_entriesまで倍に広げる
+INITIAL_ROWS = 16
+
+
+def semantic_scope(model: str, messages: List[Dict[str, Any]]) -> Optional[Tuple[str, str]]:
+    """
+    メッセージのリストから、検索する範囲のキーと埋め込む質問を取り出します。
+
+    範囲のキーはモデル名、システムプロンプト、最後のメッセージより前の会話から作成するため、
+    同じ質問でも前提の異なる会話の応答は返しません。
+
+    Args:
+        model: モデル名（タグを省略した場合は ":latest" として扱う）
+        messages: メッセージのリスト
+
+    Returns:
+        Optional[Tuple[str, str]]: 範囲のキーと質問。最後のメッセージが空でないユーザーのメッセージでない場合はNone
+    """
+    if not messages or messages[-1].get("role") != "user":
+        return None
+    question = messages[-1].get("content") or ""
+    if not question.strip():
+        return None
+
+    system = [message.get("content", "") for message in messages[:-1] if message.get("role") == "system"]
+    history = [
+        {"role": message.get("role"), "content": message.get("content", "")}
+        for message in messages[:-1]
+        if message.get("role") != "system"
+    ]
+    canonical = json.dumps(
+        {"model": model if ":" in model else f"{model}:latest", "system": system, "history": history},
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest(), question
+
+
+class SemanticQuery:
+    """
+    検索する範囲のキーと、質問の埋め込みベクトルの組。
+    """
+
+    def __init__(self, scope: str, vector: Sequence[float]):
+        """
+        SemanticQueryクラスのコンストラクタ。
+
+        Args:
+            scope: semantic_scopeで作成した範囲のキー
+            vector: 質問の埋め込みベクトル
+        """
+        self.scope = scope
+        self.vector = vector
+
+
+class VectorIndex:
+    """
+    1つの範囲の質問のベクトルと応答を保持する索引。
+
+    ベクトルは長さを1に正規化して1つの配列に並べ、内積でまとめてコサイン類似度を計算します。
+    max_entriesに達した場合は最も古い行を上書きします。
+    """
+
+    def __init__(self, dimension: int, max_entries: int):
+        """
+        VectorIndexクラスのコンストラクタ。
+
+        Args:
+            dimension: ベクトルの次元数
+            max_entries: 保持する質問の最大数
+        """
+        self.max_entries = max_entries
+        rows = min(INITIAL_ROWS, max_entries)
+        self.vectors = np.zeros((rows, dimension), dtype=np.float32)
+        self.stored_at = np.zeros(rows, dtype=np.float64)
+        self.responses: List[bytes] = []
+
+    def __len__(self) -> int:
+        return len(self.responses)
+
+    def search(self, vector: "np.ndarray", oldest: float) -> Tuple[int, float]:
+        """
+        最も類似度の高い質問を探します。
+
+        Args:
+            vector: 正規化した質問のベクトル
+            oldest: これより前に保存した質問は期限切れとして除く
+
+        Returns:
+            Tuple[int, float]: 行番号と類似度。該当がない場合は (-1, -inf)
+        """
+        size = len(self.responses)
+        if size == 0:
+            return -1, float("-inf")
+        scores = self.vectors[:size] @ vector
+        scores[self.stored_at[:size] < oldest] = -np.inf
+        row = int(np.argmax(scores))
+        return row, float(scores[row])
+
+    def add(self, vector: "np.ndarray", data: bytes, now: float) -> None:
+        """
+        質問のベクトルと応答を追加します。
+
+        Args:
+            vector: 正規化した質問のベクトル
+            data: JSONにした応答
+            now: 保存時刻
+        """
+        size = len(self.responses)
+        if size < self.max_entries:
+            if size == len(self.vectors):
+                rows = min(size * 2, self.max_entries)
+                self.vectors = np.resize(self.vectors, (rows, self.vectors.shape[1]))
+                self.stored_at = np.resize(self.stored_at, rows)
+            row = size
+            self.responses.append(data)
+        else:
+            # 容量に達した場合は最も古い質問（期限切れを含む）を置き換える
+            row = int(np.argmin(self.stored_at))
+            self.responses[row] = data
+        self.vectors[row] = vector
+        self.stored_at[row] = now
+
+    def expire(self, oldest: float) -> None:
+        """
+        期限切れの質問を取り除きます。
+
+        Args:
+            oldest: これより前に保存した質問を取り除く
+        """
+        size = len(self.responses)
+        keep = np.nonzero(self.stored_at[:size] >= oldest)[0]
+        if len(keep) == size:
+            return
+        count = len(keep)
+        self.vectors[:count] = self.vectors[keep]
+        self.stored_at[:count] = self.stored_at[keep]
+        self.responses = [self.responses[row] for row in keep]
+
+
+class SemanticCache:
+    """
+    意味の近い質問の応答を返すキャッシュクラス。
+
+    範囲ごとにVectorIndexを持ち、範囲の数がmax_scopesを超えると最も古く使われた範囲から破棄します。
+    保存した応答はttl秒を過ぎると返しません。
+    """
+
+    def __init__(
+        self,
+        embedding_model: str,
+        threshold: float = DEFAULT_THRESHOLD,
+        max_entries: int = 1000,
+        max_scopes: int = 256,
+        ttl: float = 86400.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        SemanticCacheクラスのコンストラクタ。
+
+        Args:
+            embedding_model: 質問の埋め込みに使用するモデル名
+            threshold: 同じ質問とみなすコサイン類似度の閾値（デフォルト: 0.95）
+            max_entries: 範囲ごとに保持する質問の最大数（デフォルト: 1000）
+            max_scopes: 保持する範囲の最大数（デフォルト: 256）
+            ttl: 応答を保持する秒数（デフォルト: 86400.0）
+            clock: 現在時刻を返す関数（テスト用、デフォルト: time.time）
+
+        Raises:
+            ImportError: NumPyがインストールされていない場合
+        """
+        if not NUMPY_AVAILABLE:
+            raise ImportError("SemanticCacheを使用するにはNumPyをインストールしてください（pip install .[semantic]）")
+
+        self.embedding_model = embedding_model
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_scopes = max_scopes
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        # (範囲のキー, 次元数) -> 索引。埋め込みのモデルを変えても次元の異なるベクトルが混ざらない
+        self._indexes: "OrderedDict[Tuple[str, int], VectorIndex]" = OrderedDict()
+        # 統計情報
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> Optional["np.ndarray"]:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(array))
+        if array.ndim != 1 or norm == 0.0:
+            return None
+        return array / norm
+
+    def lookup(self, query: SemanticQuery) -> Optional[Dict[str, Any]]:
+        """
+        意味の近い質問の応答を取得します。
+
+        Args:
+            query: 範囲のキーと質問の埋め込みベクトル
+
+        Returns:
+            Optional[Dict[str, Any]]: 類似度（"similarity"）を付けた応答。閾値以上の質問がない場合はNone
+        """
+        vector = self._normalize(query.vector)
+        data, score = None, float("-inf")
+        with self._lock:
+            index = self._indexes.get((query.scope, len(vector))) if vector is not None else None
+            if index is not None:
+                self._indexes.move_to_end((query.scope, len(vector)))
+                row, score = index.search(vector, self._clock() - self.ttl)
+                if row >= 0 and score >= self.threshold:
+                    data = index.responses[row]
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if data is None:
+            SEMANTIC_CACHE_REQUESTS.inc(result="miss")
+            return None
+        SEMANTIC_CACHE_REQUESTS.inc(result="hit")
+        logger.debug("意味の近い質問の応答を返します（類似度: %.4f）", score)
+        return dict(json.loads(data), similarity=score)
+
+    def put(self, query: SemanticQuery, chunk: Dict[str, Any]) -> None:
+        """
+        ストリーミングの最後のチャンクから応答を保存します。
+
+        Args:
+            query: lookupに渡した範囲のキーと質問の埋め込みベクトル
+            chunk: 完全な応答を含む最後のチャンク
+        """
+        vector = self._normalize(query.vector)
+        if vector is None:
+            return
+        data = json.dumps(cacheable_response(chunk), ensure_ascii=False).encode("utf-8")
+        key = (query.scope, len(vector))
+        with self._lock:
+            now = self._clock()
+            index = self._indexes.get(key)
+            if index is None:
+                index = self._indexes[key] = VectorIndex(len(vector), self.max_entries)
+            else:
+                index.expire(now - self.ttl)
+            self._indexes.move_to_end(key)
+            index.add(vector, data, now)
+            while len(self._indexes) > self.max_scopes:
+                self._indexes.popitem(last=False)
+            self.stores += 1
+
+    def clear(self) -> None:
+        """
+        すべての応答を破棄します。
+        """
+        with self._lock:
+            self._indexes.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        キャッシュの統計情報を取得します。
+
+        Returns:
+            Dict[str, Any]: 範囲の数、質問の数、ヒット数などの統計
+        """
+        with self._lock:
+            return {
+                "scopes": len(self._indexes),
+                "entries": sum(len(index) for index in self._indexes.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+            }
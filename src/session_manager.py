@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+クライアントごとのチャットセッションを管理するモジュール。
+
+このモジュールはクライアントIDをキーとしてChatSessionを保持し、
+LRUとアイドルTTLによってメモリ使用量を制限します。
+会話のストアを指定した場合は、破棄されたセッションや再起動前のセッションを次のアクセス時に
+クライアントの最後の会話の直近のメッセージから復元します。
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from src.chat_session import ChatSession
+from src.conversation_store import ConversationStore
+
+
+class SessionManager:
+    """
+    クライアントごとのChatSessionを管理するクラス。
+
+    セッションは最終アクセス順に保持され、最大数を超えた場合は最も古いものから、
+    アイドル時間がTTLを超えた場合はアクセス時に破棄されます。すべての操作はスレッドセーフです。
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 1000,
+        idle_ttl: float = 3600.0,
+        default_params: Optional[Dict[str, Any]] = None,
+        clock: Callable[[], float] = time.monotonic,
+        store: Optional[ConversationStore] = None,
+        max_resident_messages: Optional[int] = None,
+    ):
+        """
+        SessionManagerクラスのコンストラクタ。
+
+        Args:
+            max_sessions: 保持する最大セッション数（デフォルト: 1000）
+            idle_ttl: セッションを破棄するまでのアイドル秒数（デフォルト: 3600.0）
+            default_params: 新規セッションに設定するモデルパラメータ（省略可）
+            clock: 現在時刻を返す関数（テスト用、デフォルト: time.monotonic）
+            store: 会話の履歴を保存するストア（省略時は保存しない）
+            max_resident_messages: セッションごとにメモリに保持するメッセージ数の上限（省略時は無制限）
+        """
+        self.max_sessions = max(1, max_sessions)
+        self.idle_ttl = idle_ttl
+        self.default_params = dict(default_params or {})
+        self._clock = clock
+        self.store = store
+        self.max_resident_messages = max_resident_messages
+        self._lock = threading.Lock()
+        # セッションID -> (ChatSession, 最終アクセス時刻)。先頭ほど古い
+        self._sessions: "OrderedDict[str, list]" = OrderedDict()
+        self.evicted_count = 0
+
+    def get(self, session_id: str) -> ChatSession:
+        """
+        セッションIDに対応するChatSessionを取得します。存在しない場合は作成します。
+
+        Args:
+            session_id: セッションID（Socket.IOのsidまたはCookieのクライアントID）
+
+        Returns:
+            ChatSession: 対応するチャットセッション
+        """
+        with self._lock:
+            chat_session = self._touch_locked(session_id)
+            if chat_session is not None:
+                return chat_session
+
+        # ストアの読み出しの間に他のセッションの取得を待たせないよう、ロックを解放してから作成する
+        return self._add(session_id, self._create_session(session_id))
+
+    async def aget(self, session_id: str) -> ChatSession:
+        """
+        getの非同期版。ストアからの復元（書き込み待ちの保存と読み出し）はイベントループを止めないよう
+        スレッドプールで実行します。保持しているセッションはそのまま返します。
+
+        Args:
+            session_id: セッションID（Socket.IOのsidまたはCookieのクライアントID）
+
+        Returns:
+            ChatSession: 対応するチャットセッション
+        """
+        with self._lock:
+            chat_session = self._touch_locked(session_id)
+            if chat_session is not None:
+                return chat_session
+
+        if self.store is None:
+            return self._add(session_id, self._create_session(session_id))
+        loop = asyncio.get_running_loop()
+        return self._add(session_id, await loop.run_in_executor(None, self._create_session, session_id))
+
+    def _add(self, session_id: str, chat_session: ChatSession) -> ChatSession:
+        """
+        作成したセッションを登録します。作成中に他の呼び出しが登録していた場合はそちらを返します。
+
+        Args:
+            session_id: セッションID
+            chat_session: 作成したチャットセッション
+
+        Returns:
+            ChatSession: 登録されているチャットセッション
+        """
+        with self._lock:
+            existing = self._touch_locked(session_id)
+            if existing is not None:
+                return existing
+            self._sessions[session_id] = [chat_session, self._clock()]
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evicted_count += 1
+            return chat_session
+
+    def _touch_locked(self, session_id: str) -> Optional[ChatSession]:
+        """
+        ロック取得済みの状態で期限切れのセッションを破棄し、セッションが存在すれば最終アクセス時刻を更新して返します。
+        """
+        now = self._clock()
+        self._evict_expired_locked(now)
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        entry[1] = now
+        self._sessions.move_to_end(session_id)
+        return entry[0]
+
+    def _create_session(self, session_id: str) -> ChatSession:
+        """
+        新しいChatSessionを作成します。ストアにクライアントの会話があれば直近のメッセージを復元します。
+
+        Args:
+            session_id: セッションID
+
+        Returns:
+            ChatSession: 作成したチャットセッション
+        """
+        chat_session = ChatSession(
+            params=self.default_params, store=self.store, owner=session_id, max_resident_messages=self.max_resident_messages
+        )
+        if self.store is None:
+            return chat_session
+        conversation = self.store.latest_conversation(session_id)
+        if conversation is not None:
+            chat_session.model = conversation.get("model")
+            chat_session.restore(
+                conversation["id"], self.store.load_messages(conversation["id"], limit=self.max_resident_messages)
+            )
+        return chat_session
+
+    def remove(self, session_id: str) -> bool:
+        """
+        セッションを破棄します。
+
+        Args:
+            session_id: 破棄するセッションID
+
+        Returns:
+            bool: セッションが存在して破棄した場合はTrue
+        """
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def evict_expired(self) -> int:
+        """
+        アイドル時間がTTLを超えたセッションを破棄します。
+
+        Returns:
+            int: 破棄したセッション数
+        """
+        with self._lock:
+            return self._evict_expired_locked(self._clock())
+
+    def _evict_expired_locked(self, now: float) -> int:
+        """
+        ロック取得済みの状態で期限切れのセッションを破棄します。
+
+        セッションは最終アクセス順に並んでいるため、先頭から期限切れでなくなるまで破棄します。
+
+        Args:
+            now: 現在時刻
+
+        Returns:
+            int: 破棄したセッション数
+        """
+        evicted = 0
+        while self._sessions:
+            session_id, entry = next(iter(self._sessions.items()))
+            if now - entry[1] <= self.idle_ttl:
+                break
+            del self._sessions[session_id]
+            evicted += 1
+        self.evicted_count += evicted
+        return evicted
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        セッション管理の統計情報を取得します。
+
+        Returns:
+            Dict[str, Any]: 現在のセッション数、最大数、TTL、破棄数
+        """
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "idle_ttl": self.idle_ttl,
+                "evicted": self.evicted_count,
+            }
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            return session_id in self._sessions
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
@@ -27,6 +27,7 @@ const chatForm = document.getElementById('chat-form');
 const messageInput = document.getElementById('message-input');
 const chatMessages = document.getElementById('chat-messages');
 const sendButton = document.getElementById('send-button');
+const stopButton = document.getElementById('stop-button');
 const statusText = document.getElementById('status-text');
 const statusDot = document.querySelector('.status-dot');
 
@@ -61,8 +62,14 @@ let modelParams = {
     repeat_penalty: 1.1
 };
 
-// サイドバー更新用のタイマーID
-let sidebarUpdateTimerId = null;
+// サイドバーの更新を購読しているかどうか（再接続時に購読し直すために保持）
+let sidebarUpdatesEnabled = false;
+
+// 表示中の会話と、読み込み済みの最も古いメッセージの通し番号（古いメッセージはスクロールで読み込む）
+let conversationId = null;
+let oldestLoadedSeq = null;
+let hasOlderMessages = false;
+let loadingOlderMessages = false;
 
 // デフォルトのパラメータ設定
 const defaultParams = {
@@ -198,6 +205,32 @@ async function fetchModelParams() {
     }
 }
 
+/**
+ * 起動中のモデル一覧を表示する関数
+ *
+ * @param {Array} models - 起動中のモデル情報の配列
+ * @returns {boolean} 起動中のモデルがある場合はtrue
+ */
+function renderRunningModels(models) {
+    if (models && models.length > 0) {
+        displayRunningModels(models);
+        displaySidebarRunningModels(models);
+        return true;
+    }
+    
+    runningModels.innerHTML = `
+        <div class="no-models-message">
+            <p>起動中のモデルがありません。</p>
+        </div>
+    `;
+    sidebarRunningModels.innerHTML = `
+        <div class="no-models-message">
+            <p>起動中のモデルがありません。</p>
+        </div>
+    `;
+    return false;
+}
+
 /**
  * 起動中のモデル一覧を取得する関数
  */
@@ -206,23 +239,7 @@ async function fetchRunningModels() {
         const response = await fetch('/api/running_models');
         const data = await response.json();
         
-        if (data.models && data.models.length > 0) {
-            displayRunningModels(data.models);
-            displaySidebarRunningModels(data.models);
-            return true;
-        } else {
-            runningModels.innerHTML = `
-                <div class="no-models-message">
-                    <p>起動中のモデルがありません。</p>
-                </div>
-            `;
-            sidebarRunningModels.innerHTML = `
-                <div class="no-models-message">
-                    <p>起動中のモデルがありません。</p>
-                </div>
-            `;
-            return false;
-        }
+        return renderRunningModels(data.models);
     } catch (error) {
         console.error('起動中のモデル一覧の取得に失敗しました:', error);
         runningModels.innerHTML = `
@@ -240,6 +257,32 @@ async function fetchRunningModels() {
     }
 }
 
+/**
+ * GPU情報を表示する関数
+ *
+ * @param {Array} gpus - GPU情報の配列
+ * @returns {boolean} GPU情報がある場合はtrue
+ */
+function renderGpuInfo(gpus) {
+    if (gpus && gpus.length > 0) {
+        displayGpuInfo(gpus);
+        displaySidebarGpuInfo(gpus);
+        return true;
+    }
+    
+    gpuInfo.innerHTML = `
+        <div class="no-gpu-message">
+            <p>GPU情報を取得できませんでした。GPUが搭載されていないか、ドライバが正しくインストールされていない可能性があります。</p>
+        </div>
+    `;
+    sidebarGpuInfo.innerHTML = `
+        <div class="no-gpu-message">
+            <p>GPU情報を取得できませんでした。</p>
+        </div>
+    `;
+    return false;
+}
+
 /**
  * GPU情報を取得する関数
  */
@@ -248,23 +291,7 @@ async function fetchGpuInfo() {
         const response = await fetch('/api/gpu_info');
         const data = await response.json();
         
-        if (data.gpus && data.gpus.length > 0) {
-            displayGpuInfo(data.gpus);
-            displaySidebarGpuInfo(data.gpus);
-            return true;
-        } else {
-            gpuInfo.innerHTML = `
-                <div class="no-gpu-message">
-                    <p>GPU情報を取得できませんでした。GPUが搭載されていないか、ドライバが正しくインストールされていない可能性があります。</p>
-                </div>
-            `;
-            sidebarGpuInfo.innerHTML = `
-                <div class="no-gpu-message">
-                    <p>GPU情報を取得できませんでした。</p>
-                </div>
-            `;
-            return false;
-        }
+        return renderGpuInfo(data.gpus);
     } catch (error) {
         console.error('GPU情報の取得に失敗しました:', error);
         gpuInfo.innerHTML = `
@@ -314,45 +341,41 @@ async function refreshModelManager() {
 async function updateSidebarInfo() {
     try {
         // 起動中のモデルとGPU情報を取得
-        const [modelsResult, gpuResult] = await Promise.all([
+        await Promise.all([
             fetchRunningModels(),
             fetchGpuInfo()
         ]);
-        
-        // どちらも失敗した場合は更新を停止
-        if (!modelsResult && !gpuResult) {
-            console.warn('サイドバー情報の更新に失敗しました。更新を停止します。');
-            stopSidebarUpdates();
-        }
     } catch (error) {
         console.error('サイドバー情報の更新に失敗しました:', error);
     }
 }
 
 /**
- * サイドバーの定期更新を開始する関数
+ * サイドバーの更新の購読を開始する関数
+ *
+ * サーバーが1つのスレッドで起動中のモデルとGPU情報を取得し、
+ * 値が変化したときのみ system_update イベントで送信します。
  */
 function startSidebarUpdates() {
-    // 既存のタイマーがあれば停止
-    if (sidebarUpdateTimerId) {
-        clearInterval(sidebarUpdateTimerId);
-    }
+    sidebarUpdatesEnabled = true;
     
     // 初回更新
     updateSidebarInfo();
     
-    // 1秒おきに更新
-    sidebarUpdateTimerId = setInterval(updateSidebarInfo, 1000);
+    // 変化の通知を購読
+    if (socket.connected) {
+        socket.emit('subscribe_system_updates');
+    }
 }
 
 /**
- * サイドバーの定期更新を停止する関数
+ * サイドバーの更新の購読を停止する関数
  */
 function stopSidebarUpdates() {
-    if (sidebarUpdateTimerId) {
-        clearInterval(sidebarUpdateTimerId);
-        sidebarUpdateTimerId = null;
+    if (sidebarUpdatesEnabled && socket.connected) {
+        socket.emit('unsubscribe_system_updates');
     }
+    sidebarUpdatesEnabled = false;
 }
 
 /**
@@ -570,6 +593,11 @@ async function selectModel(modelName) {
             currentModel = modelName;
             currentModelName.textContent = modelName;
             
+            // モデルを選択すると新しい会話になる
+            conversationId = data.conversation_id;
+            oldestLoadedSeq = null;
+            hasOlderMessages = false;
+            
             // モデル選択画面を閉じる
             modelSelection.style.display = 'none';
             
@@ -824,6 +852,8 @@ function setupEventListeners() {
         isProcessing = true;
         updateConnectionStatus('thinking');
         sendButton.disabled = true;
+        stopButton.disabled = false;
+        stopButton.style.display = 'inline-block';
         
         // サーバーにメッセージを送信
         socket.emit('send_message', { message });
@@ -833,50 +863,42 @@ function setupEventListeners() {
     });
     
     // サーバーからのチャンク受信イベントのリスナー
-    let currentAssistantMessage = null;
-    let currentMessageDiv = null;
+    let currentRenderer = null;
     
     socket.on('receive_chunk', (data) => {
-        const content = data.content;
-        
         // 最初のチャンクの場合、新しいメッセージ要素を作成
-        if (!currentAssistantMessage) {
-            currentAssistantMessage = '';
-            
+        if (!currentRenderer) {
             // メッセージ要素の作成
-            currentMessageDiv = document.createElement('div');
-            currentMessageDiv.classList.add('message');
-            currentMessageDiv.classList.add('assistant-message');
+            const messageDiv = document.createElement('div');
+            messageDiv.classList.add('message');
+            messageDiv.classList.add('assistant-message');
             
             // 送信者名を設定（現在のモデル名を使用）
-            currentMessageDiv.innerHTML = `
+            messageDiv.innerHTML = `
                 <div class="message-sender">${currentModel || 'モデル'}</div>
                 <div class="message-content"></div>
             `;
             
             // メッセージをチャット領域に追加
-            chatMessages.appendChild(currentMessageDiv);
+            chatMessages.appendChild(messageDiv);
+            currentRenderer = new StreamingMessageRenderer(messageDiv.querySelector('.message-content'));
         }
         
-        // メッセージにチャンクを追加
-        currentAssistantMessage += content;
-        
-        // メッセージの内容を更新
-        const messageContent = currentMessageDiv.querySelector('.message-content');
-        messageContent.innerHTML = escapeHtml(currentAssistantMessage);
-        
-        // 最新のメッセージが見えるようにスクロール
-        scrollToBottom();
+        // チャンクを追加（DOMへの反映は次の描画フレームでまとめて行う）
+        currentRenderer.append(data.content);
     });
     
     // サーバーからのメッセージ受信イベントのリスナー
     socket.on('receive_message', (data) => {
-        // ストリーミングの場合は、最終的なメッセージを表示
-        if (data.sender === 'assistant' && currentMessageDiv) {
-            // 既存のメッセージ要素を削除
-            currentMessageDiv = null;
-            currentAssistantMessage = null;
+        // ストリーミングの場合は、表示中のメッセージを確定する
+        if (data.sender === 'assistant' && currentRenderer) {
+            currentRenderer.finish();
+            currentRenderer = null;
         } else {
+            if (currentRenderer) {
+                currentRenderer.finish();
+                currentRenderer = null;
+            }
             // 通常のメッセージを表示
             addMessageToUI(data.sender, data.message);
         }
@@ -885,42 +907,318 @@ function setupEventListeners() {
         isProcessing = false;
         updateConnectionStatus('ready');
         sendButton.disabled = false;
+        stopButton.style.display = 'none';
         messageInput.focus();
     });
     
+    // 停止ボタンのクリックイベント（サーバーはollamaへの接続を閉じて生成を中止する）
+    stopButton.addEventListener('click', () => {
+        if (!isProcessing) return;
+        stopButton.disabled = true;
+        socket.emit('stop_generation');
+    });
+    
+    // 会話IDの通知のリスナー（会話が変わった場合は保存されている直近のメッセージを表示する）
+    socket.on('session_info', (data) => {
+        if (data.conversation_id === conversationId) return;
+        conversationId = data.conversation_id;
+        oldestLoadedSeq = null;
+        hasOlderMessages = false;
+        if (data.model) {
+            currentModel = data.model;
+            currentModelName.textContent = data.model;
+        }
+        loadConversationMessages(true);
+    });
+    
+    // 先頭付近までスクロールしたら古いメッセージを読み込む
+    chatMessages.addEventListener('scroll', () => {
+        if (chatMessages.scrollTop < 50 && hasOlderMessages && !loadingOlderMessages) {
+            loadConversationMessages(false);
+        }
+    });
+    
     // ステータス更新イベントのリスナー
     socket.on('status_update', (data) => {
         updateConnectionStatus(data.status, data.message);
     });
     
+    // 起動中のモデルとGPU情報の変化の通知を受信するリスナー（変化した項目のみ含まれる）
+    socket.on('system_update', (data) => {
+        if ('running_models' in data) {
+            renderRunningModels(data.running_models);
+        }
+        if ('gpus' in data) {
+            renderGpuInfo(data.gpus);
+        }
+    });
+    
     // 接続イベントのリスナー
     socket.on('connect', () => {
         updateConnectionStatus('connected');
+        
+        // 再接続時はサイドバーの更新を購読し直す
+        if (sidebarUpdatesEnabled) {
+            socket.emit('subscribe_system_updates');
+        }
     });
     
-    // 切断イベントのリスナー
+    // 切断イベントのリスナー（購読は再接続時に再開する）
     socket.on('disconnect', () => {
         updateConnectionStatus('disconnected');
-        
-        // サイドバーの定期更新を停止
-        stopSidebarUpdates();
     });
     
-    // ページを離れる前にサイドバーの定期更新を停止
+    // ページを離れる前にサイドバーの更新の購読を停止
     window.addEventListener('beforeunload', () => {
         stopSidebarUpdates();
     });
 }
 
 /**
- * UIにメッセージを追加する関数
+ * ストリーミング応答を少しずつ描画するクラス
+ *
+ * チャンクごとに全文をHTMLに変換し直すと応答の長さの二乗の処理が必要になるため、
+ * 確定したテキストとコードブロックはDOMに追記するだけにし、書き換えるのは
+ * 最後の閉じていないコードブロック（または末尾のバッククォート）だけにします。
+ * DOMへの反映はrequestAnimationFrameで描画フレームごとに1回にまとめます。
+ */
+class StreamingMessageRenderer {
+    /**
+     * @param {HTMLElement} container - 描画先の.message-content要素
+     */
+    constructor(container) {
+        this.container = container;
+        // これまでに受信したテキストと、そのうち確定してDOMに追記した位置
+        this.text = '';
+        this.frozenLength = 0;
+        // まだDOMに反映していないチャンク
+        this.pending = '';
+        this.frameRequested = false;
+        // 書き換え対象の末尾の要素
+        this.live = document.createElement('span');
+        this.container.appendChild(this.live);
+    }
+    
+    /**
+     * チャンクを追加し、次の描画フレームでの反映を予約する
+     *
+     * @param {string} content - チャンクの内容
+     */
+    append(content) {
+        if (!content) return;
+        this.pending += content;
+        if (!this.frameRequested) {
+            this.frameRequested = true;
+            requestAnimationFrame(() => this.flush(false));
+        }
+    }
+    
+    /**
+     * 残りのチャンクを反映し、閉じていないコードブロックも含めて確定する
+     */
+    finish() {
+        this.flush(true);
+    }
+    
+    /**
+     * 受信したチャンクをDOMに反映する
+     *
+     * @param {boolean} final - 応答の最後かどうか
+     */
+    flush(final) {
+        this.frameRequested = false;
+        if (!this.pending && !final) return;
+        
+        // レイアウトの読み取りは書き込みの前に1回だけ行う
+        const stickToBottom = isNearBottom();
+        
+        this.text += this.pending;
+        this.pending = '';
+        this.freezeCompletedBlocks();
+        this.renderTail(final);
+        
+        if (stickToBottom) {
+            chatMessages.scrollTop = chatMessages.scrollHeight;
+        }
+    }
+    
+    /**
+     * 閉じたコードブロックと、その前のテキストを確定してDOMに追記する
+     */
+    freezeCompletedBlocks() {
+        // escapeHtmlのprocessCodeBlocksと同じパターン
+        const codeBlockRegex = /```(\w*)\n([\s\S]*?)\n```/g;
+        const tail = this.text.slice(this.frozenLength);
+        let consumed = 0;
+        let match;
+        while ((match = codeBlockRegex.exec(tail)) !== null) {
+            this.freeze(createTextFragment(tail.slice(consumed, match.index)));
+            this.freeze(createCodeBlockElement(match[1], match[2]));
+            consumed = match.index + match[0].length;
+        }
+        this.frozenLength += consumed;
+    }
+    
+    /**
+     * 確定していない末尾のテキストを描画する
+     *
+     * 閉じていないコードブロックの開始より前と、末尾のバッククォートより前のテキストは
+     * この先変わらないため確定し、残りだけを書き換え対象の要素に描画します。
+     *
+     * @param {boolean} final - 応答の最後かどうか
+     */
+    renderTail(final) {
+        const tail = this.text.slice(this.frozenLength);
+        if (final) {
+            // 閉じていないコードブロックはescapeHtmlと同じく通常のテキストとして表示する
+            this.freeze(createTextFragment(tail));
+            this.frozenLength = this.text.length;
+            this.live.remove();
+            return;
+        }
+        
+        const openBlock = /```(\w*)(\n|$)/.exec(tail);
+        let stableLength = openBlock ? openBlock.index : tail.replace(/`+$/, '').length;
+        if (stableLength > 0) {
+            this.freeze(createTextFragment(tail.slice(0, stableLength)));
+            this.frozenLength += stableLength;
+        }
+        
+        const rest = tail.slice(stableLength);
+        let liveNode;
+        if (openBlock && openBlock[2]) {
+            // 閉じていないコードブロックはその中身だけを描画し直す
+            liveNode = createCodeBlockElement(openBlock[1], rest.slice(openBlock[0].length));
+        } else {
+            liveNode = document.createTextNode(rest);
+        }
+        this.live.replaceChildren(liveNode);
+    }
+    
+    /**
+     * ノードを確定した部分として書き換え対象の要素の前に追加する
+     *
+     * @param {Node} node - 追加するノード
+     */
+    freeze(node) {
+        this.container.insertBefore(node, this.live);
+    }
+}
+
+/**
+ * テキストを改行で<br>に区切ったDocumentFragmentを作成する関数
+ *
+ * @param {string} text - テキスト
+ * @returns {DocumentFragment} テキストノードと<br>要素
+ */
+function createTextFragment(text) {
+    const fragment = document.createDocumentFragment();
+    text.split('\n').forEach((line, index) => {
+        if (index > 0) {
+            fragment.appendChild(document.createElement('br'));
+        }
+        if (line) {
+            fragment.appendChild(document.createTextNode(line));
+        }
+    });
+    return fragment;
+}
+
+/**
+ * コードブロックの要素を作成する関数（processCodeBlocksと同じ構造）
+ *
+ * @param {string} language - 言語名（空の場合は「コード」）
+ * @param {string} code - コード
+ * @returns {HTMLElement} コードブロックの要素
+ */
+function createCodeBlockElement(language, code) {
+    const block = document.createElement('div');
+    block.classList.add('code-block');
+    
+    const header = document.createElement('div');
+    header.classList.add('code-header');
+    const languageLabel = document.createElement('span');
+    languageLabel.classList.add('code-language');
+    languageLabel.textContent = language || 'コード';
+    const copyButton = document.createElement('button');
+    copyButton.classList.add('copy-code-btn');
+    copyButton.textContent = 'コピー';
+    copyButton.addEventListener('click', () => copyCode(copyButton));
+    header.appendChild(languageLabel);
+    header.appendChild(copyButton);
+    
+    const pre = document.createElement('pre');
+    const codeElement = document.createElement('code');
+    codeElement.classList.add(language ? `language-${language}` : 'language-code');
+    codeElement.textContent = code;
+    pre.appendChild(codeElement);
+    
+    block.appendChild(header);
+    block.appendChild(pre);
+    return block;
+}
+
+/**
+ * チャットメッセージ領域が最下部付近まで表示されているかを判定する関数
+ *
+ * @returns {boolean} 最下部から一定の範囲内であればtrue
+ */
+function isNearBottom() {
+    return chatMessages.scrollHeight - chatMessages.scrollTop - chatMessages.clientHeight < 80;
+}
+
+/**
+ * 会話のメッセージを1ページ読み込んで表示する関数
+ *
+ * @param {boolean} initial - 直近のページを読み込む場合はtrue（表示中のメッセージを置き換える）
+ */
+async function loadConversationMessages(initial) {
+    if (!conversationId) return;
+    const requestedConversation = conversationId;
+    loadingOlderMessages = true;
+    try {
+        const params = new URLSearchParams({ limit: 50 });
+        if (!initial && oldestLoadedSeq !== null) {
+            params.set('before', oldestLoadedSeq);
+        }
+        const response = await fetch(`/api/conversations/${encodeURIComponent(requestedConversation)}/messages?${params}`);
+        if (!response.ok) return;
+        const data = await response.json();
+        // 読み込み中に別の会話に切り替わった場合は表示しない
+        if (requestedConversation !== conversationId || data.messages.length === 0) return;
+        
+        if (initial) {
+            chatMessages.innerHTML = '';
+        }
+        // 先頭に追加しても表示中の位置が変わらないようにスクロール位置を補正する
+        const previousHeight = chatMessages.scrollHeight;
+        const fragment = document.createDocumentFragment();
+        data.messages.forEach((message) => {
+            fragment.appendChild(createMessageElement(message.role, message.content));
+        });
+        chatMessages.insertBefore(fragment, chatMessages.firstChild);
+        chatMessages.scrollTop += chatMessages.scrollHeight - previousHeight;
+        
+        oldestLoadedSeq = data.messages[0].seq;
+        hasOlderMessages = data.has_more;
+        if (initial) {
+            scrollToBottom();
+        }
+    } catch (error) {
+        console.error('会話の履歴の取得に失敗しました:', error);
+    } finally {
+        loadingOlderMessages = false;
+    }
+}
+
+/**
+ * メッセージ要素を作成する関数
  *
  * @param {string} sender - メッセージの送信者（'user'または'assistant'または'system'）
  * @param {string} message - メッセージの内容
- * @returns {HTMLElement} 追加されたメッセージ要素
+ * @returns {HTMLElement} 作成したメッセージ要素
  */
-function addMessageToUI(sender, message) {
-    // メッセージ要素の作成
+function createMessageElement(sender, message) {
     const div = document.createElement('div');
     div.classList.add('message');
     div.classList.add(`${sender}-message`);
@@ -938,6 +1236,19 @@ function addMessageToUI(sender, message) {
         <div class="message-sender">${senderName}</div>
         <div class="message-content">${escapeHtml(message)}</div>
     `;
+    return div;
+}
+
+/**
+ * UIにメッセージを追加する関数
+ *
+ * @param {string} sender - メッセージの送信者（'user'または'assistant'または'system'）
+ * @param {string} message - メッセージの内容
+ * @returns {HTMLElement} 追加されたメッセージ要素
+ */
+function addMessageToUI(sender, message) {
+    // メッセージ要素の作成
+    const div = createMessageElement(sender, message);
     
     // メッセージをチャット領域に追加
     chatMessages.appendChild(div);
@@ -1049,12 +1360,12 @@ function copyCode(button) {
 /**
  * 接続状態の表示を更新する関数
  *
- * @param {string} status - 状態（'connected', 'disconnected', 'thinking', 'ready', 'error'）
+ * @param {string} status - 状態（'connected', 'disconnected', 'queued', 'thinking', 'ready', 'rejected', 'error'）
  * @param {string} message - 表示するメッセージ（省略可）
  */
 function updateConnectionStatus(status, message) {
     // すべてのステータスクラスを削除
-    statusDot.classList.remove('connected', 'disconnected', 'thinking', 'error', 'ready');
+    statusDot.classList.remove('connected', 'disconnected', 'queued', 'thinking', 'error', 'rejected', 'ready');
     
     // 状態に応じたクラスを追加
     statusDot.classList.add(status);
@@ -1070,6 +1381,9 @@ function updateConnectionStatus(status, message) {
             case 'disconnected':
                 statusText.textContent = '接続が切断されました';
                 break;
+            case 'queued':
+                statusText.textContent = '順番待ち中...';
+                break;
             case 'thinking':
                 statusText.textContent = '考え中...';
                 break;
@@ -1079,6 +1393,9 @@ function updateConnectionStatus(status, message) {
             case 'error':
                 statusText.textContent = 'エラーが発生しました';
                 break;
+            case 'rejected':
+                statusText.textContent = '混雑しています';
+                break;
             default:
                 statusText.textContent = status;
         }
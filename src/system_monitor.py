@@ -0,0 +1,374 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+起動中のモデルとGPUの状態をバックグラウンドで取得するモジュール。
+
+このモジュールは1つのサンプリングスレッドで定期的に状態を取得してキャッシュし、
+値が変化した場合のみ購読者に差分を通知します。
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SystemMonitor:
+    """
+    起動中のモデルとGPUの状態を定期的に取得してキャッシュするクラス。
+
+    REST APIはキャッシュから応答し、キャッシュが古い場合のみ同期的に取得します。
+    同じ項目の同期取得は同時に1回だけ実行され、他の呼び出しはその結果を共有します。
+    """
+
+    def __init__(
+        self,
+        sources: Dict[str, Callable[[], Any]],
+        interval: float = 1.0,
+        on_change: Optional[Callable[[Dict[str, Any]], None]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        SystemMonitorクラスのコンストラクタ。
+
+        Args:
+            sources: 項目名と値を取得する関数の辞書（例: {"running_models": client.list_running_models}）
+            interval: サンプリング間隔の秒数（デフォルト: 1.0）
+            on_change: 値が変化した項目の辞書を受け取る関数（省略可）
+            clock: 現在時刻を返す関数（テスト用、デフォルト: time.monotonic）
+        """
+        self.sources = dict(sources)
+        self.interval = interval
+        self.on_change = on_change
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._key_locks = {key: threading.Lock() for key in self.sources}
+        # 項目名 -> (値, 取得時刻)
+        self._cache: Dict[str, tuple] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self.sample_count = 0
+
+    @property
+    def running(self) -> bool:
+        """
+        サンプリングスレッドが実行中かどうか。
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """
+        サンプリングスレッドを開始します。既に実行中の場合は何もしません。
+        """
+        with self._lock:
+            if self.running:
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="system-monitor", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        サンプリングスレッドを停止します。
+
+        Args:
+            timeout: スレッドの終了を待つ秒数（省略時は終了まで待つ）
+        """
+        self._stop_event.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        self._thread = None
+
+    def _run(self) -> None:
+        """
+        サンプリングスレッドの本体。interval秒ごとにすべての項目を取得します。
+        """
+        while not self._stop_event.is_set():
+            started = self._clock()
+            try:
+                self.sample()
+            except Exception as e:
+                logger.warning("システム状態の取得に失敗しました: %s", e)
+            elapsed = self._clock() - started
+            self._stop_event.wait(max(0.0, self.interval - elapsed))
+
+    def sample(self) -> Dict[str, Any]:
+        """
+        すべての項目を取得してキャッシュを更新し、変化した項目を通知します。
+
+        Returns:
+            Dict[str, Any]: 前回から値が変化した項目の辞書
+        """
+        changed = {}
+        for key in self.sources:
+            value, is_changed = self._refresh(key)
+            if is_changed:
+                changed[key] = value
+
+        self.sample_count += 1
+        if changed and self.on_change is not None:
+            self.on_change(changed)
+        return changed
+
+    def _refresh(self, key: str):
+        """
+        項目の値を取得してキャッシュを更新します。
+
+        Args:
+            key: 項目名
+
+        Returns:
+            tuple: 取得した値と、前回から変化したかどうか
+        """
+        value = self.sources[key]()
+        with self._lock:
+            previous = self._cache.get(key)
+            self._cache[key] = (value, self._clock())
+        return value, previous is None or previous[0] != value
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Any:
+        """
+        項目の値を取得します。キャッシュが max_age 秒より古い場合は同期的に取得します。
+
+        Args:
+            key: 項目名
+            max_age: キャッシュを有効とみなす秒数（省略時はサンプリング間隔の2倍）
+
+        Returns:
+            Any: 項目の値
+        """
+        if max_age is None:
+            max_age = self.interval * 2
+
+        cached = self._get_fresh(key, max_age)
+        if cached is not None:
+            return cached[0]
+
+        # 同じ項目の取得は1回にまとめ、待っていた呼び出しは更新されたキャッシュを使う
+        with self._key_locks[key]:
+            cached = self._get_fresh(key, max_age)
+            if cached is not None:
+                return cached[0]
+            value, is_changed = self._refresh(key)
+
+        if is_changed and self.on_change is not None:
+            self.on_change({key: value})
+        return value
+
+    def _get_fresh(self, key: str, max_age: float) -> Optional[tuple]:
+        """
+        有効期限内のキャッシュを取得します。
+
+        Args:
+            key: 項目名
+            max_age: キャッシュを有効とみなす秒数
+
+        Returns:
+            Optional[tuple]: (値, 取得時刻)。キャッシュがないか古い場合はNone
+        """
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached is not None and self._clock() - cached[1] <= max_age:
+            return cached
+        return None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        キャッシュされているすべての項目の値を取得します。
+
+        Returns:
+            Dict[str, Any]: 項目名と値の辞書
+        """
+        with self._lock:
+            return {key: value for key, (value, _) in self._cache.items()}
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        """
+        キャッシュを破棄します。
+
+        Args:
+            key: 破棄する項目名（省略時はすべて）
+        """
+        with self._lock:
+            if key is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(key, None)
+
+
+class AsyncSystemMonitor:
+    """
+    SystemMonitorの非同期版。非同期サーバー（async_app.py）で使用します。
+
+    サンプリングはイベントループ上のタスクで行い、データソースと通知関数はコルーチン関数です。
+    同じ項目の取得は asyncio.Lock によって同時に1回だけ実行されます。
+    """
+
+    def __init__(
+        self,
+        sources: Dict[str, Callable[[], Awaitable[Any]]],
+        interval: float = 1.0,
+        on_change: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        AsyncSystemMonitorクラスのコンストラクタ。
+
+        Args:
+            sources: 項目名と値を取得するコルーチン関数の辞書
+            interval: サンプリング間隔の秒数（デフォルト: 1.0）
+            on_change: 値が変化した項目の辞書を受け取るコルーチン関数（省略可）
+            clock: 現在時刻を返す関数（テスト用、デフォルト: time.monotonic）
+        """
+        self.sources = dict(sources)
+        self.interval = interval
+        self.on_change = on_change
+        self._clock = clock
+        self._key_locks: Dict[str, asyncio.Lock] = {}
+        # 項目名 -> (値, 取得時刻)
+        self._cache: Dict[str, tuple] = {}
+        self._task: Optional["asyncio.Task"] = None
+        self.sample_count = 0
+
+    @property
+    def running(self) -> bool:
+        """
+        サンプリングタスクが実行中かどうか。
+        """
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """
+        サンプリングタスクを開始します。既に実行中の場合は何もしません。
+        """
+        if not self.running:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        """
+        サンプリングタスクを停止します。
+        """
+        task = self._task
+        self._task = None
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self) -> None:
+        """
+        サンプリングタスクの本体。interval秒ごとにすべての項目を取得します。
+        """
+        while True:
+            started = self._clock()
+            try:
+                await self.sample()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("システム状態の取得に失敗しました: %s", e)
+            await asyncio.sleep(max(0.0, self.interval - (self._clock() - started)))
+
+    def _lock_for(self, key: str) -> asyncio.Lock:
+        """
+        項目ごとのロックを取得します。イベントループ上で作成するため遅延して生成します。
+        """
+        lock = self._key_locks.get(key)
+        if lock is None:
+            lock = self._key_locks[key] = asyncio.Lock()
+        return lock
+
+    async def _refresh(self, key: str):
+        """
+        項目の値を取得してキャッシュを更新します。
+
+        Args:
+            key: 項目名
+
+        Returns:
+            tuple: 取得した値と、前回から変化したかどうか
+        """
+        value = await self.sources[key]()
+        previous = self._cache.get(key)
+        self._cache[key] = (value, self._clock())
+        return value, previous is None or previous[0] != value
+
+    async def sample(self) -> Dict[str, Any]:
+        """
+        すべての項目を取得してキャッシュを更新し、変化した項目を通知します。
+
+        Returns:
+            Dict[str, Any]: 前回から値が変化した項目の辞書
+        """
+        changed = {}
+        for key in self.sources:
+            async with self._lock_for(key):
+                value, is_changed = await self._refresh(key)
+            if is_changed:
+                changed[key] = value
+
+        self.sample_count += 1
+        if changed and self.on_change is not None:
+            await self.on_change(changed)
+        return changed
+
+    async def get(self, key: str, max_age: Optional[float] = None) -> Any:
+        """
+        項目の値を取得します。キャッシュが max_age 秒より古い場合は取得し直します。
+
+        Args:
+            key: 項目名
+            max_age: キャッシュを有効とみなす秒数（省略時はサンプリング間隔の2倍）
+
+        Returns:
+            Any: 項目の値
+        """
+        if max_age is None:
+            max_age = self.interval * 2
+
+        cached = self._get_fresh(key, max_age)
+        if cached is not None:
+            return cached[0]
+
+        async with self._lock_for(key):
+            cached = self._get_fresh(key, max_age)
+            if cached is not None:
+                return cached[0]
+            value, is_changed = await self._refresh(key)
+
+        if is_changed and self.on_change is not None:
+            await self.on_change({key: value})
+        return value
+
+    def _get_fresh(self, key: str, max_age: float) -> Optional[tuple]:
+        """
+        有効期限内のキャッシュを取得します。
+        """
+        cached = self._cache.get(key)
+        if cached is not None and self._clock() - cached[1] <= max_age:
+            return cached
+        return None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        キャッシュされているすべての項目の値を取得します。
+        """
+        return {key: value for key, (value, _) in self._cache.items()}
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        """
+        キャッシュを破棄します。
+
+        Args:
+            key: 破棄する項目名（省略時はすべて）
+        """
+        if key is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(key, None)
@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+有効期限付きのキャッシュを提供するモジュール。
+
+このモジュールはモデル一覧やモデル情報のように変化の少ない応答をキャッシュします。
+有効期限が切れた後も一定時間は古い値を返しつつ、バックグラウンドで取得し直します（stale-while-revalidate）。
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# lookupが返すキャッシュの状態
+FRESH = "fresh"
+STALE = "stale"
+MISS = "miss"
+
+
+class TTLCache:
+    """
+    有効期限付きのキャッシュクラス。
+
+    値は ttl 秒間は新しいものとして扱い、その後 stale_ttl 秒間は古い値を返しながら取得し直します。
+    同じキーの取得は同時に1回だけ実行されます。
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        stale_ttl: float = 0.0,
+        max_entries: int = 256,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        TTLCacheクラスのコンストラクタ。
+
+        Args:
+            ttl: 値を新しいものとして扱う秒数。0以下の場合はキャッシュしない
+            stale_ttl: 有効期限が切れた後に古い値を返す秒数（デフォルト: 0.0）
+            max_entries: 保持するキーの最大数。超えた場合は最も古く使われたものから破棄（デフォルト: 256）
+            clock: 現在時刻を返す関数（テスト用、デフォルト: time.monotonic）
+        """
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        # キー -> (値, 保存時刻)
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+        self._refreshing: set = set()
+        # invalidateのたびに増やし、破棄より前に開始した取得の結果を保存しないようにする
+        self._generation = 0
+        # 統計情報
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        """
+        キャッシュが有効かどうか。
+        """
+        return self.ttl > 0
+
+    def lookup(self, key: Hashable, record: bool = True) -> Tuple[Any, str]:
+        """
+        キャッシュされた値とその状態を取得します。
+
+        Args:
+            key: キー
+            record: 統計情報に記録するかどうか（デフォルト: True）
+
+        Returns:
+            Tuple[Any, str]: 値と状態（FRESH、STALE、MISS）。MISSの場合の値はNone
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += record
+                return None, MISS
+            age = self._clock() - entry[1]
+            if age <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += record
+                return entry[0], FRESH
+            if age <= self.ttl + self.stale_ttl:
+                self._entries.move_to_end(key)
+                self.stale_hits += record
+                return entry[0], STALE
+            del self._entries[key]
+            self.misses += record
+            return None, MISS
+
+    def put(self, key: Hashable, value: Any, generation: Optional[int] = None) -> None:
+        """
+        値を保存します。
+
+        Args:
+            key: キー
+            value: 保存する値
+            generation: 取得を開始した時点のgeneration。その後にinvalidateされていれば保存しない（省略可）
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = (value, self._clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """
+        キャッシュを破棄します。
+
+        Args:
+            key: 破棄するキー（省略時はすべて）
+        """
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    @property
+    def generation(self) -> int:
+        """
+        キャッシュの破棄の回数。取得の開始時に保持し、putに渡します。
+        """
+        with self._lock:
+            return self._generation
+
+    def begin_refresh(self, key: Hashable) -> bool:
+        """
+        バックグラウンドでの取得を開始してよいか確認し、取得中として記録します。
+
+        Args:
+            key: キー
+
+        Returns:
+            bool: 同じキーを取得中でなければTrue
+        """
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def end_refresh(self, key: Hashable) -> None:
+        """
+        バックグラウンドでの取得の完了を記録します。
+
+        Args:
+            key: キー
+        """
+        with self._lock:
+            self._refreshing.discard(key)
+
+    def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Any],
+        should_cache: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """
+        キャッシュから値を取得します。ない場合は loader で取得して保存します。
+
+        古い値がある場合はそれを返し、バックグラウンドのスレッドで取得し直します。
+
+        Args:
+            key: キー
+            loader: 値を取得する関数
+            should_cache: 取得した値を保存するかどうかを判定する関数（省略時はすべて保存）
+
+        Returns:
+            Any: 値
+        """
+        if not self.enabled:
+            return loader()
+
+        value, state = self.lookup(key)
+        if state == FRESH:
+            return value
+        if state == STALE:
+            if self.begin_refresh(key):
+                threading.Thread(
+                    target=self._refresh, args=(key, loader, should_cache), name="ttl-cache-refresh", daemon=True
+                ).start()
+            return value
+
+        # 同じキーの取得は1回にまとめ、待っていた呼び出しは保存された値を使う
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            value, state = self.lookup(key, record=False)
+            if state != MISS:
+                return value
+            generation = self.generation
+            value = loader()
+            if should_cache is None or should_cache(value):
+                self.put(key, value, generation)
+            return value
+
+    def _refresh(self, key: Hashable, loader: Callable[[], Any], should_cache: Optional[Callable[[Any], bool]]) -> None:
+        """
+        バックグラウンドで値を取得し直して保存します。
+
+        Args:
+            key: キー
+            loader: 値を取得する関数
+            should_cache: 取得した値を保存するかどうかを判定する関数
+        """
+        try:
+            generation = self.generation
+            value = loader()
+            if should_cache is None or should_cache(value):
+                self.put(key, value, generation)
+        except Exception as e:
+            logger.warning("キャッシュの更新に失敗しました: %s", e)
+        finally:
+            self.end_refresh(key)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        キャッシュの統計情報を取得します。
+
+        Returns:
+            Dict[str, Any]: キー数とヒット数などの統計
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+            }
@@ -2,3 +2,6 @@ import sys
 import os
 
 sys.path.insert(0, os.getcwd())
+
+# テスト中は会話の履歴のデータベースのファイルを作成しない
+os.environ.setdefault("CONVERSATION_STORE", "memory")
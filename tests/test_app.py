@@ -4,10 +4,12 @@
 Flaskアプリケーションのテストモジュール。
 """
 
+import os
+import time
 import pytest
 import json
 from unittest.mock import patch
-from src.app import app
+from src.app import app, model_warmer, session_manager, system_monitor
 
 
 @pytest.fixture
@@ -17,6 +19,8 @@ def client():
     """
     app.config["TESTING"] = True
     app.config["WTF_CSRF_ENABLED"] = False  # CSRFを無効化
+    # テスト間でキャッシュされたシステム状態を共有しないようにする
+    system_monitor.invalidate()
     with app.test_client() as client:
         yield client
 
@@ -57,6 +61,37 @@ def test_get_models_route(mock_list_models, client):
     mock_list_models.assert_called_once()
 
 
+@patch("src.app.ollama_client._fetch_models")
+def test_get_models_route_is_cached_with_etag(mock_fetch_models, client):
+    """
+    モデル一覧がキャッシュされ、ETagが一致する場合は304を返すことをテストします。
+
+    Args:
+        mock_fetch_models: ollama_client._fetch_modelsのモック
+        client: テスト用のFlaskクライアント
+    """
+    from src.app import ollama_client
+
+    ollama_client.invalidate_cache()
+    mock_fetch_models.return_value = [{"name": "llama2", "size": 1}]
+
+    first = client.get("/api/models")
+    second = client.get("/api/models", headers={"If-None-Match": first.headers["ETag"]})
+
+    assert first.status_code == 200
+    assert second.status_code == 304
+    assert second.data == b""
+    mock_fetch_models.assert_called_once()
+
+    # refreshを指定するとキャッシュを破棄して取得し直す
+    mock_fetch_models.return_value = [{"name": "mistral", "size": 2}]
+    third = client.get("/api/models?refresh=1", headers={"If-None-Match": first.headers["ETag"]})
+    assert third.status_code == 200
+    assert json.loads(third.data)["models"] == [{"name": "mistral", "size": 2}]
+    assert mock_fetch_models.call_count == 2
+    ollama_client.invalidate_cache()
+
+
 @patch("src.app.ollama_client.list_running_models")
 def test_get_running_models_route(mock_list_running_models, client):
     """
@@ -175,13 +210,15 @@ def test_get_gpu_info_route(mock_get_gpu_info, client):
     mock_get_gpu_info.assert_called_once()
 
 
+@patch("src.app.ollama_client.preload_model")
 @patch("src.app.ollama_client.get_model_info")
-def test_select_model_route_success(mock_get_model_info, client):
+def test_select_model_route_success(mock_get_model_info, mock_preload_model, client):
     """
     モデル選択ルートの成功テスト。
 
     Args:
         mock_get_model_info: ollama_client.get_model_infoのモック
+        mock_preload_model: ollama_client.preload_modelのモック
         client: テスト用のFlaskクライアント
     """
     # モックの設定
@@ -197,8 +234,21 @@ def test_select_model_route_success(mock_get_model_info, client):
     assert data["success"] is True
     assert data["model"] == "llama2"
     assert data["model_info"] == mock_model_info
+    assert data["preloading"] is True
     mock_get_model_info.assert_called_once_with("llama2")
 
+    # バックグラウンドの事前ロードの完了を待つ
+    while model_warmer.stats()["loading"]:
+        time.sleep(0.01)
+    mock_preload_model.assert_called_once_with("llama2", keep_alive=None)
+
+    # preloadにfalseを指定した場合は事前ロードしない
+    response = client.post(
+        "/api/select_model", data=json.dumps({"model": "llama2", "preload": False}), content_type="application/json"
+    )
+    assert json.loads(response.data)["preloading"] is False
+    assert mock_preload_model.call_count == 1
+
 
 def test_select_model_route_failure(client):
     """
@@ -294,3 +344,548 @@ def test_update_model_params_validation(client):
     assert data["params"]["top_k"] == 1  # 最小値に制限
     assert data["params"]["context_length"] == 512  # 最小値に制限
     assert data["params"]["repeat_penalty"] == 2.0  # 最大値に制限
+
+
+@patch("src.app.ollama_client.get_pool_stats")
+def test_get_pool_stats_route(mock_get_pool_stats, client):
+    """
+    コネクションプール統計取得ルートのテスト。
+
+    Args:
+        mock_get_pool_stats: ollama_client.get_pool_statsのモック
+        client: テスト用のFlaskクライアント
+    """
+    # モックの設定
+    mock_stats = {"total_requests": 3, "failed_requests": 0, "hosts": {}}
+    mock_get_pool_stats.return_value = mock_stats
+
+    # テスト実行
+    response = client.get("/api/pool_stats")
+
+    # 検証
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data["stats"] == mock_stats
+    mock_get_pool_stats.assert_called_once()
+
+
+def test_secret_key_is_not_a_fixed_default():
+    """
+    SECRET_KEYが未設定の場合に固定の既定値ではなくランダムな鍵が使用されることをテストします。
+    """
+    if "SECRET_KEY" in os.environ:
+        pytest.skip("SECRET_KEYが環境変数で設定されています")
+
+    assert app.config["SECRET_KEY"] != "your-secret-key"
+    assert len(app.config["SECRET_KEY"]) == 64
+
+
+def test_model_params_are_isolated_per_client():
+    """
+    モデルパラメータがクライアントごとに独立していることをテストします。
+    """
+    app.config["TESTING"] = True
+    with app.test_client() as client_a, app.test_client() as client_b:
+        client_a.post("/api/model_params", data=json.dumps({"params": {"temperature": 0.1}}), content_type="application/json")
+
+        data_a = json.loads(client_a.get("/api/model_params").data)
+        data_b = json.loads(client_b.get("/api/model_params").data)
+
+        assert data_a["params"]["temperature"] == 0.1
+        assert data_b["params"]["temperature"] == 0.7
+
+
+@patch("src.app.ollama_client.get_model_info")
+def test_select_model_is_isolated_per_client(mock_get_model_info):
+    """
+    モデル選択とチャット履歴がクライアントごとに独立していることをテストします。
+
+    Args:
+        mock_get_model_info: ollama_client.get_model_infoのモック
+    """
+    from src.app import socketio
+
+    mock_get_model_info.return_value = {}
+    app.config["TESTING"] = True
+    with app.test_client() as client_a, app.test_client() as client_b:
+        client_a.post("/api/select_model", data=json.dumps({"model": "llama2"}), content_type="application/json")
+        client_b.get("/")
+
+        socket_b = socketio.test_client(app, flask_test_client=client_b)
+        socket_b.emit("send_message", {"message": "echo"})
+        received = socket_b.get_received()
+        socket_b.disconnect()
+
+        # モデル未選択のクライアントBはオウム返しになる
+        messages = [r["args"][0]["message"] for r in received if r["name"] == "receive_message"]
+        assert messages == ["echo"]
+
+        with client_a.session_transaction() as sess_a, client_b.session_transaction() as sess_b:
+            session_a = session_manager.get(sess_a["client_id"])
+            session_b = session_manager.get(sess_b["client_id"])
+
+        assert session_a.model == "llama2"
+        assert session_a.get_messages() == []
+        assert session_b.model is None
+        assert [m["content"] for m in session_b.get_messages()] == ["echo", "echo"]
+
+
+def test_sid_session_removed_on_disconnect():
+    """
+    Cookieを持たない接続のセッションが切断時に破棄されることをテストします。
+    """
+    from src.app import socketio
+
+    before = len(session_manager)
+    socket_client = socketio.test_client(app)
+    socket_client.emit("send_message", {"message": "hello"})
+    assert len(session_manager) == before + 1
+
+    socket_client.disconnect()
+
+    assert len(session_manager) == before
+
+
+def test_messages_are_sent_only_to_own_conversation():
+    """
+    応答が送信元の会話のクライアントにのみ送信されることをテストします。
+    """
+    from src.app import socketio
+
+    socket_a = socketio.test_client(app)
+    socket_b = socketio.test_client(app)
+    socket_a.get_received()
+    socket_b.get_received()
+
+    socket_a.emit("send_message", {"message": "hello"})
+
+    received_a = [r["name"] for r in socket_a.get_received()]
+    received_b = socket_b.get_received()
+    assert "receive_message" in received_a
+    assert received_b == []
+
+    socket_a.disconnect()
+    socket_b.disconnect()
+
+
+def test_join_conversation_shares_messages():
+    """
+    会話に参加したクライアントが同じ応答を受信できることをテストします。
+    """
+    from src.app import socketio
+
+    socket_a = socketio.test_client(app)
+    socket_b = socketio.test_client(app)
+    session_info = [r for r in socket_a.get_received() if r["name"] == "session_info"]
+    conversation_id = session_info[0]["args"][0]["conversation_id"]
+    socket_b.get_received()
+
+    socket_b.emit("join_conversation", {"conversation_id": conversation_id})
+    socket_a.emit("send_message", {"message": "hello"})
+
+    messages_b = [r["args"][0]["message"] for r in socket_b.get_received() if r["name"] == "receive_message"]
+    assert messages_b == ["hello"]
+
+    # 退出後は受信しない
+    socket_b.emit("leave_conversation", {"conversation_id": conversation_id})
+    socket_a.emit("send_message", {"message": "again"})
+    assert socket_b.get_received() == []
+
+    socket_a.disconnect()
+    socket_b.disconnect()
+
+
+def test_conversation_messages_are_paged(client):
+    """
+    会話のメッセージが新しいものから1ページずつ取得できることをテストします。
+
+    Args:
+        client: テスト用のFlaskクライアント
+    """
+    from src.app import socketio
+
+    socket_client = socketio.test_client(app, flask_test_client=client)
+    session_info = [r for r in socket_client.get_received() if r["name"] == "session_info"]
+    conversation_id = session_info[0]["args"][0]["conversation_id"]
+    for i in range(3):
+        socket_client.emit("send_message", {"message": f"m{i}"})
+    socket_client.disconnect()
+
+    response = client.get(f"/api/conversations/{conversation_id}/messages?limit=4")
+    page = json.loads(response.data)
+    assert response.status_code == 200
+    assert [message["seq"] for message in page["messages"]] == [2, 3, 4, 5]
+    assert [message["role"] for message in page["messages"]] == ["user", "assistant", "user", "assistant"]
+    assert page["has_more"] is True
+
+    older = json.loads(client.get(f"/api/conversations/{conversation_id}/messages?before={page['next_before']}").data)
+    assert [message["content"] for message in older["messages"]] == ["m0", "m0"]
+    assert older["has_more"] is False
+
+    assert client.get(f"/api/conversations/{conversation_id}/messages?limit=0").status_code == 400
+
+
+def test_get_emit_stats_route(client):
+    """
+    送信量統計取得ルートのテスト。
+
+    Args:
+        client: テスト用のFlaskクライアント
+    """
+    from src.app import emit_stats, socketio
+
+    before = emit_stats.snapshot()["total_bytes"]
+    socket_client = socketio.test_client(app, flask_test_client=client)
+    socket_client.emit("send_message", {"message": "hello"})
+
+    response = client.get("/api/emit_stats")
+
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data["stats"]["total_bytes"] > before
+    assert data["stats"]["events"]["receive_message"]["messages"] >= 1
+    assert data["stats"]["connection_count"] >= 1
+    assert "connections" not in data["stats"]
+    assert socketio.server.manager.sid_from_eio_sid(socket_client.eio_sid, "/") not in response.get_data(as_text=True)
+    socket_client.disconnect()
+
+
+@patch("src.app.ollama_client.get_model_info")
+@patch("src.app.ollama_client.chat_stream")
+def test_send_message_streams_coalesced_chunks(mock_chat_stream, mock_get_model_info, client):
+    """
+    ストリーミング応答のチャンクがまとめて送信され、完了前にすべて送信されることをテストします。
+
+    Args:
+        mock_chat_stream: ollama_client.chat_streamのモック
+        mock_get_model_info: ollama_client.get_model_infoのモック
+        client: テスト用のFlaskクライアント
+    """
+    from src.app import socketio
+
+    tokens = ["こん", "にち", "は", "！"]
+
+    def fake_chat_stream(model, messages, options=None, callback=None, **kwargs):
+        for token in tokens:
+            callback(token)
+            yield {"message": {"role": "assistant", "content": token}, "done": False}
+        callback("")
+        yield {"message": {"role": "assistant", "content": "".join(tokens)}, "done": True}
+
+    mock_get_model_info.return_value = {}
+    mock_chat_stream.side_effect = fake_chat_stream
+    client.post("/api/select_model", data=json.dumps({"model": "llama2"}), content_type="application/json")
+
+    socket_client = socketio.test_client(app, flask_test_client=client)
+    socket_client.get_received()
+    socket_client.emit("send_message", {"message": "こんにちは"})
+    received = socket_client.get_received()
+    socket_client.disconnect()
+
+    names = [r["name"] for r in received]
+    chunks = [r["args"][0]["content"] for r in received if r["name"] == "receive_chunk"]
+    assert "".join(chunks) == "こんにちは！"
+    assert chunks[0] == "こん"  # 最初のチャンクは即座に送信される
+    assert len(chunks) < len(tokens)
+    assert names.index("receive_message") > max(i for i, name in enumerate(names) if name == "receive_chunk")
+
+
+@patch("src.app.ollama_client.get_model_info")
+@patch("src.app.ollama_client.chat_stream")
+def test_metrics_route_records_generation(mock_chat_stream, mock_get_model_info, client):
+    """
+    /metrics で応答の生成の件数、トークン数、待ち時間、送信時間がPrometheusの形式で取得できることをテストします。
+
+    Args:
+        mock_chat_stream: ollama_client.chat_streamのモック
+        mock_get_model_info: ollama_client.get_model_infoのモック
+        client: テスト用のFlaskクライアント
+    """
+    from src.app import socketio
+    from src.metrics import GENERATIONS, GENERATED_TOKENS
+
+    def fake_chat_stream(model, messages, options=None, callback=None, **kwargs):
+        callback("こんにちは")
+        yield {"message": {"role": "assistant", "content": "こんにちは"}, "done": False}
+        yield {
+            "message": {"role": "assistant", "content": "こんにちは"},
+            "done": True,
+            "eval_count": 5,
+            "eval_duration": 500_000_000,
+        }
+
+    mock_get_model_info.return_value = {}
+    mock_chat_stream.side_effect = fake_chat_stream
+    client.post("/api/select_model", data=json.dumps({"model": "metrics-model"}), content_type="application/json")
+    before = GENERATIONS.get(model="metrics-model:latest", outcome="completed")
+    before_tokens = GENERATED_TOKENS.get(model="metrics-model:latest")
+
+    socket_client = socketio.test_client(app, flask_test_client=client)
+    socket_client.emit("send_message", {"message": "こんにちは"})
+    socket_client.disconnect()
+
+    response = client.get("/metrics")
+    body = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    assert GENERATIONS.get(model="metrics-model:latest", outcome="completed") == before + 1
+    assert GENERATED_TOKENS.get(model="metrics-model:latest") == before_tokens + 5
+    assert "# TYPE llm_generation_duration_seconds histogram" in body
+    assert 'llm_queue_wait_seconds_count{model="metrics-model:latest"}' in body
+    assert 'llm_scheduler_running{model="metrics-model:latest"} 0' in body
+    assert 'socketio_emit_duration_seconds_count{event="receive_message"}' in body
+
+
+@patch("src.app.ollama_client.get_model_info")
+@patch("src.app.ollama_client.chat_stream")
+def test_send_message_trims_history_to_context_length(mock_chat_stream, mock_get_model_info, client):
+    """
+    コンテキスト長に収まるように絞り込まれた履歴がollamaに送信されることをテストします。
+
+    Args:
+        mock_chat_stream: ollama_client.chat_streamのモック
+        mock_get_model_info: ollama_client.get_model_infoのモック
+        client: テスト用のFlaskクライアント
+    """
+    from src.app import socketio
+
+    mock_get_model_info.return_value = {}
+    mock_chat_stream.return_value = iter([{"message": {"role": "assistant", "content": "ok"}, "done": True}])
+    client.post("/api/select_model", data=json.dumps({"model": "llama2"}), content_type="application/json")
+    client.post("/api/model_params", data=json.dumps({"params": {"context_length": 512}}), content_type="application/json")
+
+    with client.session_transaction() as sess:
+        chat_session = session_manager.get(sess["client_id"])
+    for i in range(200):
+        chat_session.add_message("user" if i % 2 == 0 else "assistant", "x" * 40)
+
+    socket_client = socketio.test_client(app, flask_test_client=client)
+    socket_client.emit("send_message", {"message": "最新の質問"})
+    socket_client.disconnect()
+
+    sent_messages = mock_chat_stream.call_args[1]["messages"]
+    assert len(sent_messages) < len(chat_session.get_messages())
+    assert sent_messages[-1]["content"] == "最新の質問"
+    assert sum(len(m["content"]) for m in sent_messages) // 4 <= 512
+
+
+@patch("src.app.ollama_client.get_gpu_info")
+@patch("src.app.ollama_client.list_running_models")
+def test_system_updates_are_cached_and_pushed(mock_list_running_models, mock_get_gpu_info, client):
+    """
+    起動中のモデルとGPU情報がキャッシュから返され、購読者に変化のみが送信されることをテストします。
+
+    Args:
+        mock_list_running_models: ollama_client.list_running_modelsのモック
+        mock_get_gpu_info: ollama_client.get_gpu_infoのモック
+        client: テスト用のFlaskクライアント
+    """
+    from src.app import socketio
+
+    mock_list_running_models.return_value = [{"id": "abc123", "model": "llama2"}]
+    mock_get_gpu_info.return_value = []
+
+    # 複数回のリクエストでもollamaへの問い合わせは1回
+    for _ in range(3):
+        response = client.get("/api/running_models")
+        assert json.loads(response.data)["models"] == mock_list_running_models.return_value
+    mock_list_running_models.assert_called_once()
+
+    subscriber = socketio.test_client(app)
+    other = socketio.test_client(app)
+    subscriber.get_received()
+    other.get_received()
+    with patch.object(system_monitor, "start"):
+        subscriber.emit("subscribe_system_updates")
+    initial = [r["args"][0] for r in subscriber.get_received() if r["name"] == "system_update"]
+    assert initial == [{"running_models": mock_list_running_models.return_value, "gpus": []}]
+
+    # 変化した項目のみ購読者に送信される
+    mock_get_gpu_info.return_value = [{"index": "0", "utilization": 10.0}]
+    system_monitor.sample()
+    updates = [r["args"][0] for r in subscriber.get_received() if r["name"] == "system_update"]
+    assert updates == [{"gpus": mock_get_gpu_info.return_value}]
+    assert other.get_received() == []
+
+    subscriber.emit("unsubscribe_system_updates")
+    mock_get_gpu_info.return_value = []
+    system_monitor.sample()
+    assert subscriber.get_received() == []
+
+    subscriber.disconnect()
+    other.disconnect()
+
+
+@patch("src.app.ollama_client.get_model_info")
+@patch("src.app.ollama_client.chat_stream")
+def test_stop_generation_records_partial_reply(mock_chat_stream, mock_get_model_info, client):
+    """
+    stop_generationイベントで生成が中止され、途中までの応答がセッションに記録されることをテストします。
+
+    Args:
+        mock_chat_stream: ollama_client.chat_streamのモック
+        mock_get_model_info: ollama_client.get_model_infoのモック
+        client: テスト用のFlaskクライアント
+    """
+    from src.app import socketio
+
+    def fake_chat_stream(model, messages, options=None, callback=None, cancel_token=None, **kwargs):
+        for token in ["途中", "まで"]:
+            callback(token)
+            yield {"message": {"role": "assistant", "content": token}, "done": False}
+        # 生成中にクライアントが停止を要求する
+        socket_client.emit("stop_generation")
+        assert cancel_token.cancelled
+        yield {"message": {"role": "assistant", "content": "途中まで"}, "done": True, "cancelled": True}
+
+    mock_get_model_info.return_value = {}
+    mock_chat_stream.side_effect = fake_chat_stream
+    client.post("/api/select_model", data=json.dumps({"model": "llama2"}), content_type="application/json")
+
+    socket_client = socketio.test_client(app, flask_test_client=client)
+    socket_client.get_received()
+    socket_client.emit("send_message", {"message": "長い質問"})
+    received = socket_client.get_received()
+    socket_client.disconnect()
+
+    messages = [r["args"][0] for r in received if r["name"] == "receive_message"]
+    statuses = [r["args"][0]["message"] for r in received if r["name"] == "status_update"]
+    assert messages == [{"sender": "assistant", "message": "途中まで", "cancelled": True}]
+    assert statuses[-1] == "生成を停止しました"
+
+    with client.session_transaction() as sess:
+        chat_session = session_manager.get(sess["client_id"])
+    assert chat_session.get_messages()[-1] == {"role": "assistant", "content": "途中まで"}
+    assert chat_session.generations == []
+
+
+@patch("src.app.ollama_client.get_model_info")
+@patch("src.app.ollama_client.chat_stream")
+def test_send_message_rejected_when_queue_is_full(mock_chat_stream, mock_get_model_info, client):
+    """
+    モデルの同時実行数と待ち行列が一杯の場合に、再試行までの秒数を付けて拒否されることをテストします。
+
+    Args:
+        mock_chat_stream: ollama_client.chat_streamのモック
+        mock_get_model_info: ollama_client.get_model_infoのモック
+        client: テスト用のFlaskクライアント
+    """
+    from src.app import socketio
+    from src.scheduler import GenerationScheduler, Ticket
+
+    mock_get_model_info.return_value = {}
+    client.post("/api/select_model", data=json.dumps({"model": "llama2"}), content_type="application/json")
+
+    # 他のユーザーの生成で同時実行数が埋まっている状態にする
+    scheduler = GenerationScheduler(max_concurrent_per_model=1, max_queue=0)
+    scheduler.submit(Ticket("llama2", "other-user"))
+
+    with patch("src.app.scheduler", scheduler):
+        socket_client = socketio.test_client(app, flask_test_client=client)
+        socket_client.get_received()
+        socket_client.emit("send_message", {"message": "こんにちは"})
+        received = socket_client.get_received()
+        socket_client.disconnect()
+
+    mock_chat_stream.assert_not_called()
+    messages = [r["args"][0] for r in received if r["name"] == "receive_message"]
+    statuses = [r["args"][0] for r in received if r["name"] == "status_update"]
+    assert messages[-1]["sender"] == "system"
+    assert "10秒後" in messages[-1]["message"]
+    assert statuses[-1] == {"status": "rejected", "retry_after": 10, "message": "混雑しています"}
+
+    with client.session_transaction() as sess:
+        chat_session = session_manager.get(sess["client_id"])
+    # 受け付けられなかったメッセージは履歴に残さない
+    assert chat_session.get_messages() == []
+    assert chat_session.generations == []
+
+
+@patch("src.app.ollama_client.get_model_info")
+@patch("src.app.ollama_client.chat_stream")
+@patch("src.app.ollama_client.generate_stream")
+def test_generate_mode_continues_from_context(mock_generate_stream, mock_chat_stream, mock_get_model_info, client):
+    """
+    generateモードでは前回のコンテキストに続けて新しいメッセージだけが送信されることをテストします。
+
+    Args:
+        mock_generate_stream: ollama_client.generate_streamのモック
+        mock_chat_stream: ollama_client.chat_streamのモック
+        mock_get_model_info: ollama_client.get_model_infoのモック
+        client: テスト用のFlaskクライアント
+    """
+    from src.app import socketio
+
+    def fake_generate_stream(model, prompt, context=None, system=None, **kwargs):
+        yield {"message": {"role": "assistant", "content": "はい"}, "done": True, "context": (context or []) + [len(prompt)]}
+
+    mock_get_model_info.return_value = {}
+    mock_generate_stream.side_effect = fake_generate_stream
+    client.post("/api/select_model", data=json.dumps({"model": "llama2", "preload": False}), content_type="application/json")
+
+    socket_client = socketio.test_client(app, flask_test_client=client)
+    with patch("src.app.chat_api_mode", "generate"):
+        socket_client.emit("send_message", {"message": "こんにちは"})
+        socket_client.emit("send_message", {"message": "元気？"})
+    socket_client.disconnect()
+
+    calls = mock_generate_stream.call_args_list
+    assert [c.kwargs["prompt"] for c in calls] == ["こんにちは", "元気？"]
+    assert calls[0].kwargs["context"] is None
+    assert calls[1].kwargs["context"] == [5]
+    mock_chat_stream.assert_not_called()
+
+
+@patch("src.app.ollama_client.chat_stream")
+def test_batch_job_routes(mock_chat_stream, client, tmp_path, monkeypatch):
+    """
+    バッチジョブの作成、進捗と結果の取得、中止と再開のルートをテストします。
+
+    Args:
+        mock_chat_stream: ollama_client.chat_streamのモック
+        client: テスト用のFlaskクライアント
+        tmp_path: ジョブのファイルを保存する一時ディレクトリ
+        monkeypatch: batch_runnerの保存先を差し替えるフィクスチャ
+    """
+    from io import BytesIO
+
+    from src.app import batch_runner
+
+    monkeypatch.setattr(batch_runner, "directory", str(tmp_path))
+
+    def fake_chat_stream(model, messages, callback=None, **kwargs):
+        callback("はい")
+        yield {"model": model, "message": {"role": "assistant", "content": "はい"}, "done": True, "eval_count": 1}
+
+    mock_chat_stream.side_effect = fake_chat_stream
+    lines = [json.dumps({"id": str(i), "model": "llama2", "messages": [{"role": "user", "content": "hi"}]}) for i in range(3)]
+
+    response = client.post(
+        "/api/batch_jobs?workers=2",
+        data={"file": (BytesIO("\n".join(lines).encode("utf-8")), "prompts.jsonl")},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 202
+    job_id = response.get_json()["job"]["id"]
+    batch_runner.join(job_id, timeout=10)
+
+    job = client.get(f"/api/batch_jobs/{job_id}").get_json()["job"]
+    assert job["state"] == "completed"
+    assert job["succeeded"] == 3
+    assert job_id in [job["id"] for job in client.get("/api/batch_jobs").get_json()["jobs"]]
+
+    results = client.get(f"/api/batch_jobs/{job_id}/results")
+    assert results.mimetype == "application/x-ndjson"
+    assert sorted(json.loads(line)["id"] for line in results.data.splitlines()) == ["0", "1", "2"]
+    results.close()
+
+    assert client.post(f"/api/batch_jobs/{job_id}/cancel").status_code == 200
+    assert client.post(f"/api/batch_jobs/{job_id}/resume").status_code == 202
+    batch_runner.join(job_id, timeout=10)
+    assert mock_chat_stream.call_count == 3
+
+    assert client.post("/api/batch_jobs", data=b"{broken").status_code == 400
+    assert client.post("/api/batch_jobs?workers=100", data=lines[0]).status_code == 400
+    assert client.get("/api/batch_jobs/unknown").status_code == 404
+    assert client.post("/api/batch_jobs/unknown/resume").status_code == 404
@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+非同期サーバーモジュールのテストモジュール。
+"""
+
+import asyncio
+import json
+
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+
+import socketio  # noqa: E402
+from aiohttp.test_utils import TestServer  # noqa: E402
+from yarl import URL  # noqa: E402
+
+from src.async_app import CLIENT_ID_COOKIE, create_app  # noqa: E402
+from src.async_ollama_client import AsyncOllamaClient  # noqa: E402
+from tests.test_async_ollama_client import create_fake_ollama  # noqa: E402
+
+
+def run_with_app(test_coro, requests_log=None):
+    """
+    テスト用のollamaサーバーと非同期サーバーを起動してテストを実行します。
+
+    Args:
+        test_coro: (base_url, http_session) を受け取るコルーチン関数
+        requests_log: ollamaサーバーが受信したリクエストを記録するリスト（省略可）
+    """
+
+    async def runner():
+        ollama_server = TestServer(create_fake_ollama([] if requests_log is None else requests_log))
+        await ollama_server.start_server()
+        app_server = TestServer(create_app(AsyncOllamaClient(host=str(ollama_server.make_url("")))))
+        await app_server.start_server()
+        base_url = str(app_server.make_url("")).rstrip("/")
+        try:
+            async with aiohttp.ClientSession(cookie_jar=aiohttp.CookieJar(unsafe=True)) as http_session:
+                await test_coro(base_url, http_session)
+        finally:
+            await app_server.close()
+            await ollama_server.close()
+
+    asyncio.run(runner())
+
+
+def test_index_and_rest_api():
+    """
+    メインページとREST APIをテストします。
+    """
+
+    async def check(base_url, http):
+        async with http.get(f"{base_url}/") as response:
+            assert response.status == 200
+            assert "ollama" in await response.text()
+            assert CLIENT_ID_COOKIE in response.cookies
+
+        async with http.get(f"{base_url}/api/models") as response:
+            assert (await response.json())["models"] == [{"name": "llama2", "size": 1}]
+            etag = response.headers["ETag"]
+
+        async with http.get(f"{base_url}/api/models", headers={"If-None-Match": etag}) as response:
+            assert response.status == 304
+
+        async with http.get(f"{base_url}/api/cache_stats") as response:
+            assert (await response.json())["stats"]["models"]["hits"] == 1
+
+        async with http.post(f"{base_url}/api/model_params", json={"params": {"temperature": 2.0}}) as response:
+            assert (await response.json())["params"]["temperature"] == 1.0
+
+        async with http.get(f"{base_url}/api/model_params") as response:
+            assert (await response.json())["params"]["temperature"] == 1.0
+
+        async with http.post(f"{base_url}/api/select_model", json={}) as response:
+            assert response.status == 400
+
+    run_with_app(check)
+
+
+def test_send_message_streams_reply():
+    """
+    Socket.IOでメッセージを送信するとストリーミング応答が返されることをテストします。
+    """
+
+    async def check(base_url, http):
+        async with http.post(f"{base_url}/api/select_model", json={"model": "llama2"}) as response:
+            data = await response.json()
+            assert data["success"] is True
+            assert data["preloading"] is True
+        cookie = http.cookie_jar.filter_cookies(URL(base_url))[CLIENT_ID_COOKIE].value
+
+        events = []
+        finished = asyncio.Event()
+        sio = socketio.AsyncClient()
+
+        @sio.on("*")
+        async def on_event(event, data):
+            events.append((event, data))
+            if event == "status_update" and data["status"] == "ready":
+                finished.set()
+
+        await sio.connect(base_url, headers={"Cookie": f"{CLIENT_ID_COOKIE}={cookie}"}, transports=["websocket"])
+        await sio.emit("send_message", {"message": "こんにちは"})
+        await asyncio.wait_for(finished.wait(), 5)
+        async with http.get(f"{base_url}/api/emit_stats") as response:
+            stats_text = await response.text()
+        assert sio.sid not in stats_text
+        async with http.get(f"{base_url}/api/scheduler_stats") as response:
+            scheduler_stats = (await response.json())["stats"]["llama2:latest"]
+        assert scheduler_stats["admitted"] == 1
+        assert scheduler_stats["running"] == 0
+        async with http.get(f"{base_url}/api/warmup_stats") as response:
+            assert (await response.json())["stats"]["preloads"] == 1
+        async with http.get(f"{base_url}/metrics") as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            metrics_text = await response.text()
+        assert 'llm_generations_total{model="llama2:latest",outcome="completed"}' in metrics_text
+        assert 'ollama_request_duration_seconds_count{operation="chat"}' in metrics_text
+        conversation_id = next(data["conversation_id"] for event, data in events if event == "session_info")
+        async with http.get(f"{base_url}/api/conversations/{conversation_id}/messages") as response:
+            page = await response.json()
+        assert [message["role"] for message in page["messages"]] == ["user", "assistant"]
+        assert page["has_more"] is False
+        await sio.disconnect()
+
+        assert json.loads(stats_text)["stats"]["events"]["receive_message"]["messages"] >= 1
+        chunks = "".join(data["content"] for event, data in events if event == "receive_chunk")
+        messages = [data["message"] for event, data in events if event == "receive_message"]
+        assert chunks == "こんにちは"
+        assert messages == ["こんにちは"]
+
+    run_with_app(check)
+
+
+def test_stop_generation():
+    """
+    stop_generationイベントでollamaへの接続が閉じられ、途中までの応答が通知されることをテストします。
+    """
+
+    async def check(base_url, http):
+        async with http.post(f"{base_url}/api/select_model", json={"model": "slow"}) as response:
+            assert (await response.json())["success"] is True
+        cookie = http.cookie_jar.filter_cookies(URL(base_url))[CLIENT_ID_COOKIE].value
+
+        events = []
+        first_chunk = asyncio.Event()
+        finished = asyncio.Event()
+        sio = socketio.AsyncClient()
+
+        @sio.on("*")
+        async def on_event(event, data):
+            events.append((event, data))
+            if event == "receive_chunk":
+                first_chunk.set()
+            if event == "status_update" and data["status"] == "ready":
+                finished.set()
+
+        await sio.connect(base_url, headers={"Cookie": f"{CLIENT_ID_COOKIE}={cookie}"}, transports=["websocket"])
+        await sio.emit("send_message", {"message": "長い質問"})
+        await asyncio.wait_for(first_chunk.wait(), 5)
+        await sio.emit("stop_generation")
+        await asyncio.wait_for(finished.wait(), 2)
+        await sio.disconnect()
+
+        messages = [data for event, data in events if event == "receive_message"]
+        assert messages[-1]["cancelled"] is True
+        assert messages[-1]["message"].startswith("tok ")
+
+    run_with_app(check)
+
+
+def test_subscribe_system_updates():
+    """
+    起動中のモデルとGPU情報の購読で現在の状態が送信されることをテストします。
+    """
+
+    async def check(base_url, http):
+        async with http.get(f"{base_url}/api/running_models") as response:
+            assert (await response.json())["models"] == [{"id": "abcdef123456", "model": "llama2"}]
+
+        received = asyncio.Event()
+        updates = []
+        sio = socketio.AsyncClient()
+
+        @sio.on("system_update")
+        async def on_update(data):
+            updates.append(data)
+            received.set()
+
+        await sio.connect(base_url, transports=["websocket"])
+        await sio.emit("subscribe_system_updates")
+        await asyncio.wait_for(received.wait(), 5)
+        await sio.disconnect()
+
+        assert updates[0]["running_models"] == [{"id": "abcdef123456", "model": "llama2"}]
+        assert "gpus" in updates[0]
+
+    run_with_app(check)
+
+
+def test_generate_mode_continues_from_context(monkeypatch):
+    """
+    CHAT_API_MODE=generateでは2回目以降の応答が前回のコンテキストに続けて生成されることをテストします。
+    """
+    monkeypatch.setenv("CHAT_API_MODE", "generate")
+    requests_log = []
+
+    async def check(base_url, http):
+        async with http.post(f"{base_url}/api/select_model", json={"model": "llama2", "preload": False}) as response:
+            assert (await response.json())["success"] is True
+        cookie = http.cookie_jar.filter_cookies(URL(base_url))[CLIENT_ID_COOKIE].value
+
+        messages = []
+        received = asyncio.Queue()
+        sio = socketio.AsyncClient()
+
+        @sio.on("receive_message")
+        async def on_message(data):
+            messages.append(data["message"])
+            await received.put(data)
+
+        await sio.connect(base_url, headers={"Cookie": f"{CLIENT_ID_COOKIE}={cookie}"}, transports=["websocket"])
+        for text in ["こんにちは", "元気？"]:
+            await sio.emit("send_message", {"message": text})
+            await asyncio.wait_for(received.get(), 5)
+        await sio.disconnect()
+
+        assert messages == ["続きです", "続きです"]
+
+    run_with_app(check, requests_log)
+
+    generates = [payload for method, path, payload in requests_log if path == "/api/generate"]
+    assert [payload["prompt"] for payload in generates] == ["こんにちは", "元気？"]
+    assert "context" not in generates[0]
+    assert generates[1]["context"] == [5, 0]
+    assert not any(path == "/api/chat" for _, path, _ in requests_log)
+
+
+def test_batch_job_routes(monkeypatch, tmp_path):
+    """
+    バッチジョブを作成し、ollamaサーバーで生成した結果をJSONL形式で取得できることをテストします。
+    """
+    monkeypatch.setenv("BATCH_JOB_DIR", str(tmp_path))
+    lines = [json.dumps({"id": str(i), "model": "llama2", "messages": [{"role": "user", "content": "hi"}]}) for i in range(3)]
+
+    async def check(base_url, http):
+        async with http.post(f"{base_url}/api/batch_jobs?workers=2", data="\n".join(lines).encode("utf-8")) as response:
+            assert response.status == 202
+            job_id = (await response.json())["job"]["id"]
+
+        for _ in range(100):
+            async with http.get(f"{base_url}/api/batch_jobs/{job_id}") as response:
+                job = (await response.json())["job"]
+            if job["state"] == "completed":
+                break
+            await asyncio.sleep(0.05)
+        assert job["succeeded"] == 3
+
+        async with http.get(f"{base_url}/api/batch_jobs/{job_id}/results") as response:
+            assert response.content_type == "application/x-ndjson"
+            results = [json.loads(line) for line in (await response.text()).splitlines()]
+        assert sorted(result["id"] for result in results) == ["0", "1", "2"]
+        assert results[0]["message"]["content"] == "こんにちは"
+
+        form = aiohttp.FormData()
+        form.add_field("file", b"{broken", filename="prompts.jsonl")
+        async with http.post(f"{base_url}/api/batch_jobs", data=form) as response:
+            assert response.status == 400
+        async with http.get(f"{base_url}/api/batch_jobs/unknown") as response:
+            assert response.status == 404
+
+    run_with_app(check)
@@ -0,0 +1,371 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+AsyncOllamaClientクラスのテストモジュール。
+"""
+
+import asyncio
+import json
+
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+
+from aiohttp import web  # noqa: E402
+from aiohttp.test_utils import TestServer  # noqa: E402
+
+from src.async_ollama_client import AsyncOllamaClient  # noqa: E402
+
+
+def create_fake_ollama(requests_log):
+    """
+    テスト用のollamaサーバーを作成します。
+
+    Args:
+        requests_log: 受信したリクエストを記録するリスト
+
+    Returns:
+        web.Application: テスト用のollamaサーバー
+    """
+
+    async def tags(request):
+        requests_log.append(("GET", "/api/tags", None))
+        return web.json_response({"models": [{"name": "llama2", "size": 1}]})
+
+    async def ps(request):
+        requests_log.append(("GET", "/api/ps", None))
+        return web.json_response({"models": [{"name": "llama2", "digest": "abcdef1234567890"}]})
+
+    async def show(request):
+        payload = await request.json()
+        requests_log.append(("POST", "/api/show", payload))
+        return web.json_response({"template": "..."})
+
+    async def stop(request):
+        payload = await request.json()
+        requests_log.append(("POST", "/api/stop", payload))
+        return web.json_response({})
+
+    async def version(request):
+        requests_log.append(("GET", "/api/version", None))
+        return web.json_response({"version": "0.5.7"})
+
+    async def generate(request):
+        payload = await request.json()
+        requests_log.append(("POST", "/api/generate", payload))
+        if "prompt" not in payload:
+            # プロンプトのないリクエストはモデルのロードのみ
+            return web.json_response({"model": payload["model"], "response": "", "done": True, "done_reason": "load"})
+        response = web.StreamResponse()
+        response.content_type = "application/x-ndjson"
+        await response.prepare(request)
+        for token in ["続き", "です"]:
+            await response.write((json.dumps({"response": token, "done": False}) + "\n").encode("utf-8"))
+        context = payload.get("context", []) + [len(payload["prompt"]), 0]
+        done = {"response": "", "done": True, "context": context}
+        await response.write((json.dumps(done) + "\n").encode("utf-8"))
+        await response.write_eof()
+        return response
+
+    async def chat(request):
+        payload = await request.json()
+        requests_log.append(("POST", "/api/chat", payload))
+        response = web.StreamResponse()
+        response.content_type = "application/x-ndjson"
+        await response.prepare(request)
+        if payload["model"] == "slow":
+            # 接続が閉じられるまでゆっくりとトークンを送り続ける
+            try:
+                for _ in range(100):
+                    line = {"message": {"role": "assistant", "content": "tok "}, "done": False}
+                    await response.write((json.dumps(line) + "\n").encode("utf-8"))
+                    await asyncio.sleep(0.05)
+            except (ConnectionResetError, asyncio.CancelledError):
+                requests_log.append(("DISCONNECT", "/api/chat", None))
+                raise
+            return response
+        for token in ["こん", "にち", "は"]:
+            line = {"message": {"role": "assistant", "content": token}, "done": False}
+            await response.write((json.dumps(line) + "\n").encode("utf-8"))
+        done = {"message": {"role": "assistant", "content": ""}, "done": True, "eval_count": 3}
+        await response.write((json.dumps(done) + "\n").encode("utf-8"))
+        await response.write_eof()
+        return response
+
+    async def embeddings(request):
+        payload = await request.json()
+        requests_log.append(("POST", "/api/embeddings", payload))
+        # 文字の種類の数を並べた簡単なベクトル（似た文は似たベクトルになる）
+        return web.json_response({"embedding": [payload["prompt"].count(char) for char in "空海青赤い"]})
+
+    app = web.Application()
+    app.router.add_get("/api/tags", tags)
+    app.router.add_get("/api/ps", ps)
+    app.router.add_post("/api/show", show)
+    app.router.add_post("/api/stop", stop)
+    app.router.add_post("/api/chat", chat)
+    app.router.add_post("/api/generate", generate)
+    app.router.add_post("/api/embeddings", embeddings)
+    app.router.add_get("/api/version", version)
+    return app
+
+
+def run_with_server(test_coro):
+    """
+    テスト用のollamaサーバーを起動してテストを実行します。
+
+    Args:
+        test_coro: (client, requests_log) を受け取るコルーチン関数
+    """
+
+    async def runner():
+        requests_log = []
+        server = TestServer(create_fake_ollama(requests_log))
+        await server.start_server()
+        client = AsyncOllamaClient(host=str(server.make_url("")))
+        try:
+            await test_coro(client, requests_log)
+        finally:
+            await client.close()
+            await server.close()
+
+    asyncio.run(runner())
+
+
+def test_init():
+    """
+    AsyncOllamaClientの初期化をテストします。
+    """
+    client = AsyncOllamaClient(host="http://custom-host:11434/", limit=5, connect_timeout=1.0, read_timeout=2.0)
+
+    assert client.host == "http://custom-host:11434"
+    assert client.limit == 5
+    assert client.limit_per_host == 10
+    assert client.timeout.connect == 1.0
+    assert client.timeout.sock_read == 2.0
+    assert client.get_pool_stats()["acquired"] == 0
+
+
+def test_list_models_and_running_models():
+    """
+    list_modelsとlist_running_modelsメソッドをテストします。
+    """
+
+    async def check(client, requests_log):
+        assert await client.list_models() == [{"name": "llama2", "size": 1}]
+        assert await client.list_running_models() == [{"id": "abcdef123456", "model": "llama2"}]
+        # 接続がプールに戻されていることを確認
+        assert client.get_pool_stats()["idle"] >= 1
+
+    run_with_server(check)
+
+
+def test_get_model_info_and_kill_model():
+    """
+    get_model_infoとkill_modelメソッドをテストします。
+    """
+
+    async def check(client, requests_log):
+        assert await client.get_model_info("llama2") == {"template": "..."}
+        assert await client.kill_model("abcdef") is True
+        assert ("POST", "/api/stop", {"name": "llama2"}) in requests_log
+
+    run_with_server(check)
+
+
+def test_get_capabilities():
+    """
+    get_capabilitiesがサーバーのバージョンと記録した方法を返すことをテストします。
+    """
+
+    async def check(client, requests_log):
+        await client.list_running_models()
+        await client.kill_model("abcdef")
+        assert await client.get_capabilities() == {
+            "version": "0.5.7",
+            "strategies": {"list_running_models": "http", "kill_model": "stop-by-name"},
+        }
+
+    run_with_server(check)
+
+
+def test_chat_stream_cancel():
+    """
+    生成を中止するとollamaへの接続が閉じられ、途中までの応答が返されることをテストします。
+    """
+    from src.cancellation import CancellationToken
+
+    async def check(client, requests_log):
+        token = CancellationToken()
+        chunks = []
+        started = asyncio.get_running_loop().time()
+        async for chunk in client.chat_stream("slow", [], cancel_token=token):
+            chunks.append(chunk)
+            if len(chunks) == 2:
+                asyncio.get_running_loop().call_later(0.02, token.cancel)
+
+        assert asyncio.get_running_loop().time() - started < 2.0
+        assert chunks[-1]["cancelled"] is True
+        assert chunks[-1]["message"]["content"].startswith("tok tok ")
+        for _ in range(40):
+            if ("DISCONNECT", "/api/chat", None) in requests_log:
+                break
+            await asyncio.sleep(0.05)
+        assert ("DISCONNECT", "/api/chat", None) in requests_log
+
+    run_with_server(check)
+
+
+def test_chat_stream():
+    """
+    chat_streamが非同期ジェネレータとしてチャンクを返すことをテストします。
+    """
+
+    async def check(client, requests_log):
+        received = []
+
+        async def callback(content):
+            received.append(content)
+
+        chunks = []
+        async for chunk in client.chat_stream(
+            "llama2", [{"role": "user", "content": "hi"}], options={"temperature": 0.1}, callback=callback
+        ):
+            chunks.append(chunk)
+
+        assert [c["message"]["content"] for c in chunks] == ["こん", "にち", "は", "こんにちは"]
+        assert chunks[-1]["done"] is True
+        assert received == ["こん", "にち", "は", ""]
+        assert requests_log[-1][2]["options"] == {"temperature": 0.1}
+
+    run_with_server(check)
+
+
+def test_preload_model_and_keep_alive():
+    """
+    preload_modelがプロンプトのない /api/generate を送信し、keep_aliveがチャットのリクエストに含まれることをテストします。
+    """
+
+    async def check(client, requests_log):
+        assert await client.preload_model("llama2", keep_alive="30m") is True
+        assert requests_log[-1] == ("POST", "/api/generate", {"model": "llama2", "stream": False, "keep_alive": "30m"})
+
+        async for _ in client.chat_stream("llama2", [], keep_alive=-1):
+            pass
+        assert requests_log[-1][2]["keep_alive"] == -1
+
+        await client.chat("llama2", [])
+        assert "keep_alive" not in requests_log[-1][2]
+
+    run_with_server(check)
+
+
+def test_generate_stream_with_context():
+    """
+    generate_streamがコンテキストとシステムプロンプトを送信し、chat_streamと同じ形式のチャンクを返すことをテストします。
+    """
+
+    async def check(client, requests_log):
+        chunks = [chunk async for chunk in client.generate_stream("llama2", "元気？", context=[7, 8], system="sys")]
+
+        assert [c["message"]["content"] for c in chunks] == ["続き", "です", "続きです"]
+        assert chunks[-1]["context"] == [7, 8, 3, 0]
+        payload = requests_log[-1][2]
+        assert payload["context"] == [7, 8]
+        assert payload["system"] == "sys"
+        assert "messages" not in payload
+
+    run_with_server(check)
+
+
+def test_concurrent_chat_streams():
+    """
+    複数のストリーミング応答を同時に処理できることをテストします。
+    """
+
+    async def check(client, requests_log):
+        results = await asyncio.gather(*[client.chat("llama2", [{"role": "user", "content": str(i)}]) for i in range(20)])
+
+        assert all(r["message"]["content"] == "こんにちは" for r in results)
+        assert len([r for r in requests_log if r[1] == "/api/chat"]) == 20
+
+    run_with_server(check)
+
+
+def test_chat_error():
+    """
+    サーバーに接続できない場合にchatがエラーメッセージを返すことをテストします。
+    """
+
+    async def check():
+        client = AsyncOllamaClient(host="http://127.0.0.1:9", connect_timeout=0.5)
+        try:
+            result = await client.chat("llama2", [{"role": "user", "content": "hi"}])
+        finally:
+            await client.close()
+        assert "エラーが発生しました" in result["message"]["content"]
+
+    asyncio.run(check())
+
+
+def test_chat_stream_replays_cached_response(tmp_path):
+    """
+    temperatureが0のチャットの応答がキャッシュされ、2回目はollamaに送信せずに返されることをテストします。
+    """
+    from src.response_cache import ResponseCache
+
+    async def check(client, requests_log):
+        client.response_cache = ResponseCache(disk_dir=str(tmp_path))
+
+        async def fetch_models():
+            return [{"name": "llama2:latest", "digest": "sha256:aaa"}]
+
+        client._fetch_models = fetch_models
+        messages = [{"role": "user", "content": "hi"}]
+
+        first = [chunk async for chunk in client.chat_stream("llama2", messages, options={"temperature": 0})]
+
+        received = []
+
+        async def callback(content):
+            received.append(content)
+
+        second = [
+            chunk async for chunk in client.chat_stream("llama2", messages, options={"temperature": 0}, callback=callback)
+        ]
+
+        assert [entry[1] for entry in requests_log].count("/api/chat") == 1
+        assert first[-1]["message"]["content"] == "こんにちは"
+        assert second[-1]["message"]["content"] == "こんにちは"
+        assert second[-1]["cached"] is True
+        assert "".join(received) == "こんにちは"
+        assert client.get_cache_stats()["responses"]["disk_entries"] == 1
+
+    run_with_server(check)
+
+
+def test_chat_stream_returns_semantically_cached_reply():
+    """
+    意味の近い質問にはollamaで生成せずにキャッシュした応答が返されることをテストします。
+    """
+    pytest.importorskip("numpy")
+    from src.semantic_cache import SemanticCache
+
+    async def check(client, requests_log):
+        client.semantic_cache = SemanticCache("nomic-embed-text", threshold=0.95)
+
+        async def ask(question):
+            return [chunk async for chunk in client.chat_stream("llama2", [{"role": "user", "content": question}])]
+
+        first = await ask("空は青い")
+        similar = await ask("空は青いの？")
+        different = await ask("海は赤い")
+
+        assert "cached" not in first[-1]
+        assert similar[-1]["cached"] is True
+        assert similar[-1]["message"]["content"] == "こんにちは"
+        assert "cached" not in different[-1]
+        assert [entry[1] for entry in requests_log].count("/api/chat") == 2
+        assert [entry[1] for entry in requests_log].count("/api/embeddings") == 3
+
+    run_with_server(check)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+AsyncOllamaPoolクラスのテストモジュール。
+"""
+
+import asyncio
+import socket
+
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+
+from aiohttp.test_utils import TestServer  # noqa: E402
+
+from src.async_ollama_pool import AsyncOllamaPool  # noqa: E402
+from tests.test_async_ollama_client import create_fake_ollama  # noqa: E402
+
+
+def unused_url():
+    """
+    接続を受け付けないホストのURLを取得します。
+
+    Returns:
+        str: 使用されていないポートのURL
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}"
+
+
+def run_with_pool(test_coro):
+    """
+    停止中のホストと2つのテスト用のollamaサーバーでプールを作成してテストを実行します。
+
+    Args:
+        test_coro: (pool, requests_logs) を受け取るコルーチン関数
+    """
+
+    async def runner():
+        requests_logs = [[], []]
+        servers = [TestServer(create_fake_ollama(log)) for log in requests_logs]
+        for server in servers:
+            await server.start_server()
+        pool = AsyncOllamaPool([unused_url()] + [str(server.make_url("")) for server in servers], connect_timeout=1.0)
+        try:
+            await test_coro(pool, requests_logs)
+        finally:
+            await pool.close()
+            for server in servers:
+                await server.close()
+
+    asyncio.run(runner())
+
+
+def test_check_health_and_running_models():
+    """
+    ヘルスチェックで停止中のホストが対象外になり、起動中のモデルにホストが付くことをテストします。
+    """
+
+    async def check(pool, requests_logs):
+        models = await pool.list_running_models()
+
+        assert [model["host"] for model in models] == [pool.members[1].host, pool.members[2].host]
+        status = pool.get_pool_stats()["backends"]
+        assert [s["healthy"] for s in status] == [False, True, True]
+        assert status[1]["resident_models"] == ["llama2:latest"]
+
+    run_with_pool(check)
+
+
+def test_chat_stream_skips_unreachable_host():
+    """
+    接続できないホストを飛ばして、ロード済みで負荷の低いホストでチャットを実行することをテストします。
+    """
+
+    async def check(pool, requests_logs):
+        # ヘルスチェック前は停止中のホストも候補になるが、最初のチャンクの前に失敗するため次のホストで再試行する
+        chunks = [chunk async for chunk in pool.chat_stream("llama2", [{"role": "user", "content": "こんにちは"}])]
+        assert chunks[-1]["message"]["content"] == "こんにちは"
+        assert pool.members[0].failures == 1
+        assert [entry for entry in requests_logs[0] if entry[1] == "/api/chat"] != []
+
+        # 同時に実行した応答は2つのサーバーに分散される
+        await pool.check_health()
+
+        async def consume():
+            return [chunk async for chunk in pool.chat_stream("llama2", [])]
+
+        await asyncio.gather(consume(), consume())
+        chat_counts = [len([entry for entry in log if entry[1] == "/api/chat"]) for log in requests_logs]
+        assert chat_counts == [2, 1]
+        assert all(member.in_flight == 0 for member in pool.members)
+
+    run_with_pool(check)
+
+
+def test_list_models_and_capabilities():
+    """
+    モデルの一覧とバージョンがホストごとにまとめられることをテストします。
+    """
+
+    async def check(pool, requests_logs):
+        await pool.check_health()
+        assert await pool.list_models() == [{"name": "llama2", "size": 1}]
+        capabilities = await pool.get_capabilities()
+        assert [backend["version"] for backend in capabilities["backends"]] == [None, "0.5.7", "0.5.7"]
+
+    run_with_pool(check)
@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+batch_jobsモジュールのテストモジュール。
+"""
+
+import asyncio
+import json
+import os
+import threading
+
+import pytest
+
+from src.batch_jobs import (
+    CANCELLED,
+    COMPLETED,
+    RUNNING,
+    AsyncBatchRunner,
+    BatchJob,
+    BatchRunner,
+    parse_batch_items,
+    parse_workers,
+    read_checkpoint,
+)
+from src.scheduler import AsyncGenerationScheduler, GenerationScheduler
+
+
+def prompt_line(item_id, model="llama2", content="こんにちは"):
+    """
+    JSONLの1行のプロンプトを作成します。
+    """
+    return json.dumps({"id": item_id, "model": model, "messages": [{"role": "user", "content": content}]})
+
+
+def final_chunk(model, content):
+    """
+    ollamaの最後のチャンクを作成します。
+    """
+    return {"model": model, "message": {"role": "assistant", "content": content}, "done": True, "eval_count": 2}
+
+
+class FakeClient:
+    """
+    質問をそのまま返すテスト用のollamaクライアント。
+
+    modelが"broken"の場合は例外を送出し、blockがセットされている間は中止されるまで生成を続けます。
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.active = {}
+        self.max_active = {}
+        self.block = threading.Event()
+        self._lock = threading.Lock()
+
+    def chat_stream(self, model, messages, options=None, callback=None, cancel_token=None, keep_alive=None):
+        with self._lock:
+            self.calls.append(messages[-1]["content"])
+            self.active[model] = self.active.get(model, 0) + 1
+            self.max_active[model] = max(self.max_active.get(model, 0), self.active[model])
+        try:
+            if model == "broken":
+                raise RuntimeError("モデルが見つかりません")
+            while self.block.is_set() and not cancel_token.cancelled:
+                threading.Event().wait(0.01)
+            if cancel_token.cancelled:
+                yield {"model": model, "message": {"role": "assistant", "content": ""}, "done": True, "cancelled": True}
+                return
+            callback(messages[-1]["content"])
+            yield final_chunk(model, messages[-1]["content"])
+        finally:
+            with self._lock:
+                self.active[model] -= 1
+
+
+def read_results(job):
+    with open(job.output_path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_parse_batch_items():
+    """
+    プロンプトの解析で、idを省略した行に行番号が付き、不正な行が行番号付きで報告されることをテストします。
+    """
+    data = "\n".join(
+        [
+            prompt_line("a"),
+            "",
+            json.dumps({"model": "mistral", "messages": [{"role": "user", "content": "hi"}], "options": {"temperature": 0}}),
+        ]
+    ).encode("utf-8")
+
+    items = parse_batch_items(data)
+
+    assert [item["id"] for item in items] == ["a", "3"]
+    assert items[1]["options"] == {"temperature": 0}
+    assert items[0]["options"] == {}
+
+    with pytest.raises(ValueError, match="2行目"):
+        parse_batch_items(f"{prompt_line('a')}\n{{broken".encode("utf-8"))
+    with pytest.raises(ValueError, match="modelが指定されていません"):
+        parse_batch_items(json.dumps({"messages": []}).encode("utf-8"))
+    with pytest.raises(ValueError, match="messages"):
+        parse_batch_items(json.dumps({"model": "llama2", "messages": "hi"}).encode("utf-8"))
+    with pytest.raises(ValueError, match="重複"):
+        parse_batch_items(f"{prompt_line('a')}\n{prompt_line('a')}".encode("utf-8"))
+    with pytest.raises(ValueError, match="プロンプトがありません"):
+        parse_batch_items(b"\n\n")
+
+
+def test_parse_workers():
+    """
+    ワーカー数の省略時の既定値と範囲の検証をテストします。
+    """
+    assert parse_workers(None, 2, 8) == 2
+    assert parse_workers("", 4, 3) == 3
+    assert parse_workers("8", 2, 8) == 8
+    with pytest.raises(ValueError):
+        parse_workers("0", 2, 8)
+    with pytest.raises(ValueError):
+        parse_workers("9", 2, 8)
+    with pytest.raises(ValueError):
+        parse_workers("abc", 2, 8)
+
+
+def test_read_checkpoint_drops_partial_and_failed_lines(tmp_path):
+    """
+    チェックポイントの読み込みで、書きかけの最後の行と失敗した結果の行が取り除かれることをテストします。
+    """
+    path = os.path.join(str(tmp_path), "output.jsonl")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"id": "1", "message": {}}) + "\n")
+        f.write(json.dumps({"id": "2", "error": "失敗"}) + "\n")
+        f.write(json.dumps({"id": "3", "message": {}}) + "\n")
+        f.write('{"id": "4", "mess')
+
+    assert read_checkpoint(path) == {"1", "3"}
+    with open(path, encoding="utf-8") as f:
+        assert [json.loads(line)["id"] for line in f] == ["1", "3"]
+    assert read_checkpoint(os.path.join(str(tmp_path), "missing.jsonl")) == set()
+
+
+def test_runner_writes_results_and_limits_model_concurrency(tmp_path):
+    """
+    すべてのプロンプトの結果が書き出され、失敗したプロンプトがエラーとして記録され、
+    モデルごとの同時実行数がスケジューラの上限を超えないことをテストします。
+    """
+    client = FakeClient()
+    scheduler = GenerationScheduler(max_concurrent_per_model=4, model_limits={"mistral": 1})
+    runner = BatchRunner(client, scheduler, str(tmp_path), max_workers=4)
+    lines = [prompt_line(str(i), model="mistral" if i % 2 else "llama2", content=f"q{i}") for i in range(10)]
+    lines.append(prompt_line("x", model="broken"))
+
+    job = runner.submit("\n".join(lines).encode("utf-8"), workers="4")
+    runner.join(job.id, timeout=10)
+
+    status = job.status()
+    assert status["state"] == COMPLETED
+    assert status["total"] == 11
+    assert status["succeeded"] == 10
+    assert status["failed"] == 1
+    assert status["remaining"] == 0
+    assert status["eta_seconds"] is None
+    assert status["items_per_second"] > 0
+    assert client.max_active["mistral"] == 1
+
+    results = {result["id"]: result for result in read_results(job)}
+    assert results["3"]["message"]["content"] == "q3"
+    assert results["3"]["eval_count"] == 2
+    assert results["x"]["error"] == "モデルが見つかりません"
+    assert runner.list_status()[0]["id"] == job.id
+
+    with pytest.raises(ValueError):
+        runner.submit(b"{broken")
+
+
+def test_cancel_and_resume(tmp_path):
+    """
+    中止したジョブを再開すると、中止までに成功していないプロンプトだけが実行されることをテストします。
+    """
+    client = FakeClient()
+    runner = BatchRunner(client, GenerationScheduler(), str(tmp_path), max_workers=1)
+    job = runner.submit("\n".join(prompt_line(str(i), content=f"q{i}") for i in range(3)).encode("utf-8"))
+    runner.join(job.id, timeout=10)
+    assert job.status()["succeeded"] == 3
+
+    client.block.set()
+    job = runner.submit("\n".join(prompt_line(str(i), content=f"r{i}") for i in range(3)).encode("utf-8"), "1")
+    while not client.calls or client.calls[-1] != "r0":
+        threading.Event().wait(0.01)
+    runner.cancel(job.id)
+    runner.join(job.id, timeout=10)
+    assert job.state == CANCELLED
+    assert job.status()["succeeded"] == 0
+
+    client.block.clear()
+    runner.resume(job.id)
+    runner.join(job.id, timeout=10)
+    assert job.state == COMPLETED
+    assert [result["id"] for result in read_results(job)] == ["0", "1", "2"]
+
+
+def test_recover_resumes_interrupted_job(tmp_path):
+    """
+    実行中のまま停止したジョブが、新しいランナーの起動時に途中から再開されることをテストします。
+    """
+    directory = os.path.join(str(tmp_path), "job1")
+    os.makedirs(directory)
+    with open(os.path.join(directory, "input.jsonl"), "w", encoding="utf-8") as f:
+        f.write("\n".join(prompt_line(str(i), content=f"q{i}") for i in range(4)))
+    with open(os.path.join(directory, "output.jsonl"), "w", encoding="utf-8") as f:
+        f.write(json.dumps({"id": "0", "model": "llama2", "message": {"content": "q0"}}) + "\n")
+        f.write('{"id": "1", "model"')
+    job = BatchJob("job1", directory, workers=2)
+    job.state = RUNNING
+    job.save_meta()
+
+    client = FakeClient()
+    runner = BatchRunner(client, GenerationScheduler(), str(tmp_path))
+    assert [job.id for job in runner.recover()] == ["job1"]
+    runner.join("job1", timeout=10)
+
+    job = runner.get("job1")
+    assert sorted(client.calls) == ["q1", "q2", "q3"]
+    assert job.status()["resumed"] == 1
+    assert sorted(result["id"] for result in read_results(job)) == ["0", "1", "2", "3"]
+    assert BatchJob.load(directory).state == COMPLETED
+
+
+class FakeAsyncClient:
+    """
+    質問をそのまま返すテスト用の非同期ollamaクライアント。
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    async def _stream(self, model, messages):
+        self.calls.append(messages[-1]["content"])
+        await asyncio.sleep(0)
+        if model == "broken":
+            raise RuntimeError("モデルが見つかりません")
+        yield final_chunk(model, messages[-1]["content"])
+
+    def chat_stream(self, model, messages, options=None, callback=None, cancel_token=None, keep_alive=None):
+        return self._stream(model, messages)
+
+
+def test_async_runner(tmp_path):
+    """
+    非同期のランナーでもすべてのプロンプトの結果が書き出されることをテストします。
+    """
+
+    async def run():
+        client = FakeAsyncClient()
+        runner = AsyncBatchRunner(client, AsyncGenerationScheduler(), str(tmp_path))
+        lines = [prompt_line(str(i), content=f"q{i}") for i in range(5)] + [prompt_line("x", model="broken")]
+        job = await runner.submit("\n".join(lines).encode("utf-8"), "3")
+        await runner.join(job.id)
+        await runner.close()
+        return job
+
+    job = asyncio.run(run())
+
+    assert job.state == COMPLETED
+    assert job.status()["succeeded"] == 5
+    results = {result["id"]: result for result in read_results(job)}
+    assert results["4"]["message"]["content"] == "q4"
+    assert "error" in results["x"]
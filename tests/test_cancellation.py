@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+CancellationTokenクラスのテストモジュール。
+"""
+
+from src.cancellation import CancellationToken
+
+
+def test_cancel_runs_callbacks_once():
+    """
+    cancelで登録されたコールバックが1回だけ呼び出されることをテストします。
+    """
+    token = CancellationToken(owner="sid-1")
+    calls = []
+    token.add_callback(lambda: calls.append("close"))
+
+    assert token.cancelled is False
+    assert token.cancel() is True
+    assert token.cancel() is False
+    assert token.cancelled is True
+    assert calls == ["close"]
+    assert token.owner == "sid-1"
+
+
+def test_add_callback_after_cancel_runs_immediately():
+    """
+    中止後に登録したコールバックがすぐに呼び出されることをテストします。
+    """
+    token = CancellationToken()
+    token.cancel()
+    calls = []
+
+    token.add_callback(lambda: calls.append("close"))
+
+    assert calls == ["close"]
+
+
+def test_failing_callback_does_not_stop_others(caplog):
+    """
+    コールバックが例外を送出しても他のコールバックが呼び出されることをテストします。
+    """
+    token = CancellationToken()
+    calls = []
+
+    def failing():
+        raise RuntimeError("already closed")
+
+    token.add_callback(failing)
+    token.add_callback(lambda: calls.append("close"))
+    token.cancel()
+
+    assert calls == ["close"]
+    assert "already closed" in caplog.text
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+StrategyNegotiatorクラスのテストモジュール。
+"""
+
+import asyncio
+
+import pytest
+
+from src.capabilities import NoStrategySucceeded, StrategyNegotiator
+
+
+class FakeClock:
+    """
+    テスト用の手動で進める時計。
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_strategies(calls, failing=()):
+    """
+    呼び出しを記録する方法のリストを作成します。
+
+    Args:
+        calls: 呼び出された方法の名前を記録するリスト
+        failing: 失敗させる方法の名前
+
+    Returns:
+        list: 方法の名前と関数のリスト
+    """
+
+    def make(name):
+        def strategy():
+            calls.append(name)
+            if name in failing:
+                raise RuntimeError(f"{name} failed")
+            return name
+
+        return strategy
+
+    return [(name, make(name)) for name in ("python", "http", "cli")]
+
+
+def test_remembers_successful_strategy():
+    """
+    成功した方法が記録され、次回は失敗する方法を試さないことをテストします。
+    """
+    negotiator = StrategyNegotiator()
+    calls = []
+    strategies = make_strategies(calls, failing=("python",))
+
+    assert negotiator.run("list_models", strategies) == "http"
+    assert calls == ["python", "http"]
+
+    calls.clear()
+    assert negotiator.run("list_models", strategies) == "http"
+    assert calls == ["http"]
+    assert negotiator.report() == {"list_models": "http"}
+    assert negotiator.probe_count == 1
+
+
+def test_reprobes_when_preferred_strategy_fails():
+    """
+    記録した方法が失敗した場合に他の方法を試し、新しい方法を記録することをテストします。
+    """
+    negotiator = StrategyNegotiator()
+    calls = []
+    failing = set()
+
+    def make(name):
+        def strategy():
+            calls.append(name)
+            if name in failing:
+                raise RuntimeError(f"{name} failed")
+            return name
+
+        return strategy
+
+    strategies = [(name, make(name)) for name in ("python", "http", "cli")]
+    assert negotiator.run("op", strategies) == "python"
+
+    failing.add("python")
+    calls.clear()
+    assert negotiator.run("op", strategies) == "http"
+    assert calls == ["python", "http"]
+    assert negotiator.preferred("op") == "http"
+
+
+def test_reprobes_after_ttl():
+    """
+    ttl秒が経過した後は最初の方法から試し直すことをテストします。
+    """
+    clock = FakeClock()
+    negotiator = StrategyNegotiator(ttl=10.0, clock=clock)
+    calls = []
+    strategies = make_strategies(calls, failing=("python",))
+
+    negotiator.run("op", strategies)
+    clock.now = 5.0
+    negotiator.run("op", strategies)
+    assert negotiator.probe_count == 1
+
+    clock.now = 11.0
+    assert negotiator.preferred("op") is None
+    calls.clear()
+    negotiator.run("op", strategies)
+    assert calls == ["python", "http"]
+    assert negotiator.probe_count == 2
+
+
+def test_all_strategies_fail():
+    """
+    すべての方法が失敗した場合にNoStrategySucceededが送出され、記録されないことをテストします。
+    """
+    negotiator = StrategyNegotiator()
+    calls = []
+
+    with pytest.raises(NoStrategySucceeded) as exc_info:
+        negotiator.run("op", make_strategies(calls, failing=("python", "http", "cli")))
+
+    assert [name for name, _ in exc_info.value.errors] == ["python", "http", "cli"]
+    assert negotiator.report() == {}
+
+
+def test_forget():
+    """
+    forgetで記録が破棄されることをテストします。
+    """
+    negotiator = StrategyNegotiator()
+    negotiator.run("a", make_strategies([]))
+    negotiator.run("b", make_strategies([]))
+
+    negotiator.forget("a")
+    assert negotiator.report() == {"b": "python"}
+    negotiator.forget()
+    assert negotiator.report() == {}
+
+
+def test_run_async():
+    """
+    run_asyncでも成功した方法が記録されることをテストします。
+    """
+    negotiator = StrategyNegotiator()
+    calls = []
+
+    async def failing():
+        calls.append("http")
+        raise RuntimeError("http failed")
+
+    async def cli():
+        calls.append("cli")
+        return "cli"
+
+    async def check():
+        assert await negotiator.run_async("op", [("http", failing), ("cli", cli)]) == "cli"
+        assert await negotiator.run_async("op", [("http", failing), ("cli", cli)]) == "cli"
+
+    asyncio.run(check())
+    assert calls == ["http", "cli", "cli"]
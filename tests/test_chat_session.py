@@ -4,7 +4,11 @@
 ChatSessionクラスのテストモジュール。
 """
 
+import threading
+
 from src.chat_session import ChatSession
+from src.conversation_store import MemoryConversationStore
+from src.context_window import PinnedMessagesStrategy, TrimStrategy, estimate_message_tokens
 
 
 def test_init():
@@ -66,3 +70,221 @@ def test_clear():
     # メッセージをクリア
     session.clear()
     assert session.messages == []
+
+
+def test_init_with_model_and_params():
+    """
+    モデルとパラメータを指定した初期化をテストします。
+    """
+    params = {"temperature": 0.5}
+    session = ChatSession(model="llama2", params=params)
+
+    assert session.model == "llama2"
+    assert session.params == params
+    # 渡した辞書とは独立していることを確認
+    session.params["temperature"] = 0.1
+    assert params["temperature"] == 0.5
+
+
+def test_get_messages_returns_copy():
+    """
+    get_messagesメソッドが履歴のコピーを返すことをテストします。
+    """
+    session = ChatSession()
+    session.add_message("user", "こんにちは")
+
+    messages = session.get_messages()
+    messages.append({"role": "user", "content": "追加"})
+
+    assert len(session.messages) == 1
+
+
+def test_token_counts_are_tracked():
+    """
+    メッセージごとの推定トークン数が追跡されることをテストします。
+    """
+    session = ChatSession()
+    session.add_message("user", "abcd")
+    session.add_message("assistant", "こんにちは")
+
+    assert session.token_counts == [estimate_message_tokens(m) for m in session.messages]
+    assert session.total_tokens == sum(session.token_counts)
+
+    session.clear()
+    assert session.token_counts == []
+    assert session.total_tokens == 0
+    assert session.pinned == set()
+
+
+def test_get_context_window():
+    """
+    get_context_windowメソッドが上限に収まるように履歴を絞り込むことをテストします。
+    """
+    session = ChatSession()
+    session.add_message("system", "あなたは親切なアシスタントです。")
+    session.add_message("user", "最初の質問", pinned=True)
+    for i in range(20):
+        session.add_message("user" if i % 2 == 0 else "assistant", f"メッセージ{i}")
+
+    # 上限に収まる場合はすべてのメッセージを返す
+    assert session.get_context_window(session.total_tokens) == session.messages
+
+    budget = session.token_counts[0] + session.token_counts[-1] * 3
+    window = session.get_context_window(budget)
+    assert window[0]["role"] == "system"
+    assert [m["content"] for m in window[1:]] == ["メッセージ17", "メッセージ18", "メッセージ19"]
+
+    window = session.get_context_window(budget + session.token_counts[1], strategy=PinnedMessagesStrategy())
+    assert [m["content"] for m in window[1:]] == ["最初の質問", "メッセージ17", "メッセージ18", "メッセージ19"]
+
+
+def test_get_context_window_trims_without_holding_lock():
+    """
+    絞り込みの戦略がセッションのロックを保持せずに呼び出されることをテストします。
+    """
+    session = ChatSession()
+    for i in range(10):
+        session.add_message("user", f"メッセージ{i}")
+    lock_free = []
+
+    class RecordingStrategy(TrimStrategy):
+        def trim(self, messages, token_counts, pinned, budget):
+            # 別スレッドからロックを取得できれば、呼び出し元はロックを保持していない
+            def try_lock():
+                acquired = session.lock.acquire(timeout=1.0)
+                lock_free.append(acquired)
+                if acquired:
+                    session.lock.release()
+
+            thread = threading.Thread(target=try_lock)
+            thread.start()
+            thread.join()
+            return list(messages[-1:])
+
+    window = session.get_context_window(1, strategy=RecordingStrategy())
+
+    assert lock_free == [True]
+    assert window == [{"role": "user", "content": "メッセージ9"}]
+
+
+def test_cancel_generation_by_owner():
+    """
+    cancel_generationで指定した接続が開始した生成だけが中止されることをテストします。
+    """
+    chat_session = ChatSession()
+    token_a = chat_session.begin_generation("sid-a")
+    token_b = chat_session.begin_generation("sid-b")
+
+    assert chat_session.cancel_generation(owner="sid-a") == 1
+    assert token_a.cancelled is True
+    assert token_b.cancelled is False
+
+    assert chat_session.cancel_generation() == 1
+    assert token_b.cancelled is True
+
+    chat_session.end_generation(token_a)
+    chat_session.end_generation(token_b)
+    assert chat_session.generations == []
+    assert chat_session.cancel_generation() == 0
+
+
+def test_pending_prompt_continues_from_context():
+    """
+    記録したコンテキストに続けて生成するプロンプトが、新しいユーザーのメッセージ1件の場合だけ返されることをテストします。
+    """
+    chat_session = ChatSession()
+    chat_session.add_message("system", "日本語で答えてください", pinned=True)
+    chat_session.add_message("user", "こんにちは")
+
+    # 会話の最初はコンテキストなしで、システムメッセージをsystemとして返す
+    assert chat_session.get_pending_prompt("llama2") == {
+        "prompt": "こんにちは",
+        "context": None,
+        "system": "日本語で答えてください",
+    }
+
+    chat_session.add_message("assistant", "こんにちは！")
+    chat_session.set_context("llama2", [1, 2, 3])
+    assert chat_session.get_pending_prompt("llama2") is None
+
+    chat_session.add_message("user", "元気？")
+    assert chat_session.get_pending_prompt("llama2") == {"prompt": "元気？", "context": [1, 2, 3], "system": None}
+    # コンテキストはモデルごとに記録される
+    assert chat_session.get_pending_prompt("mistral") is None
+    # コンテキストが上限を超えた場合は続けて生成しない
+    assert chat_session.get_pending_prompt("llama2", max_context_tokens=2) is None
+
+    # 中止された応答が追加された場合は履歴とコンテキストが一致しない
+    chat_session.add_message("assistant", "途中")
+    chat_session.add_message("user", "続けて")
+    assert chat_session.get_pending_prompt("llama2") is None
+
+    chat_session.clear()
+    assert chat_session.contexts == {}
+
+
+def test_messages_are_stored_and_clear_starts_new_conversation():
+    """
+    追加したメッセージがストアに保存され、clearで新しい会話IDになることをテストします。
+    """
+    store = MemoryConversationStore()
+    chat_session = ChatSession(model="llama2", store=store, owner="client")
+    chat_session.add_message("user", "こんにちは")
+    chat_session.add_message("assistant", "こんにちは！")
+    first_id = chat_session.conversation_id
+
+    chat_session.clear()
+    chat_session.add_message("user", "次の会話")
+
+    assert chat_session.conversation_id != first_id
+    assert [message["content"] for message in store.load_messages(first_id)] == ["こんにちは", "こんにちは！"]
+    assert [message["seq"] for message in store.load_messages(chat_session.conversation_id)] == [0]
+    assert store.latest_conversation("client")["id"] == chat_session.conversation_id
+    assert store.latest_conversation("client")["model"] == "llama2"
+
+
+def test_resident_messages_are_bounded_and_keep_pinned():
+    """
+    メモリに保持するメッセージ数が上限を超えると、固定されていない古いメッセージから破棄されることをテストします。
+    """
+    chat_session = ChatSession(store=MemoryConversationStore(), max_resident_messages=3)
+    chat_session.add_message("system", "日本語で答えてください", pinned=True)
+    for i in range(4):
+        chat_session.add_message("user", f"m{i}")
+
+    assert [message["content"] for message in chat_session.get_messages()] == ["日本語で答えてください", "m2", "m3"]
+    assert chat_session.seqs == [0, 3, 4]
+    assert chat_session.pinned == {0}
+    assert chat_session.total_tokens == sum(chat_session.token_counts)
+    assert chat_session.next_seq == 5
+
+
+def test_pending_prompt_after_eviction():
+    """
+    古いメッセージを破棄した後も、記録したコンテキストに続けて生成できることをテストします。
+    """
+    chat_session = ChatSession(max_resident_messages=2)
+    chat_session.add_message("user", "こんにちは")
+    chat_session.add_message("assistant", "こんにちは！")
+    chat_session.set_context("llama2", [1, 2])
+    chat_session.add_message("user", "元気？")
+
+    assert chat_session.get_pending_prompt("llama2") == {"prompt": "元気？", "context": [1, 2], "system": None}
+
+
+def test_restore():
+    """
+    ストアから読み出したメッセージで履歴を復元し、続きの通し番号で保存することをテストします。
+    """
+    store = MemoryConversationStore()
+    store.start_conversation("c1", "client", "llama2")
+    store.append("c1", 0, "system", "日本語で", pinned=True)
+    store.append("c1", 1, "user", "こんにちは")
+
+    chat_session = ChatSession(store=store, owner="client")
+    chat_session.restore("c1", store.load_messages("c1"))
+    chat_session.add_message("assistant", "こんにちは！")
+
+    assert chat_session.conversation_id == "c1"
+    assert chat_session.pinned == {0}
+    assert [message["seq"] for message in store.load_messages("c1")] == [0, 1, 2]
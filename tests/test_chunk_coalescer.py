@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+ChunkCoalescerクラスのテストモジュール。
+"""
+
+import asyncio
+import threading
+
+from src.chunk_coalescer import AsyncChunkCoalescer, ChunkCoalescer, FlushScheduler
+
+
+class FakeClock:
+    """
+    テスト用の手動で進める時計。
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_first_chunk_is_sent_immediately():
+    """
+    最初のチャンクが即座に送信されることをテストします。
+    """
+    sent = []
+    coalescer = ChunkCoalescer(sent.append, interval=10.0, clock=FakeClock())
+
+    coalescer.add("Hello")
+
+    assert sent == ["Hello"]
+    coalescer.close()
+
+
+def test_chunks_are_coalesced_within_interval():
+    """
+    送信間隔内のチャンクがまとめて送信されることをテストします。
+    """
+    sent = []
+    clock = FakeClock()
+    coalescer = ChunkCoalescer(sent.append, interval=0.05, clock=clock)
+
+    coalescer.add("a")
+    clock.now = 0.01
+    coalescer.add("b")
+    clock.now = 0.02
+    coalescer.add("c")
+    assert sent == ["a"]
+
+    # 間隔が経過した後のチャンクでまとめて送信
+    clock.now = 0.06
+    coalescer.add("d")
+    assert sent == ["a", "bcd"]
+    assert coalescer.chunks_in == 4
+    assert coalescer.frames_out == 2
+    coalescer.close()
+
+
+def test_max_bytes_triggers_flush():
+    """
+    バッファがバイト数の上限に達した場合に即座に送信されることをテストします。
+    """
+    sent = []
+    clock = FakeClock()
+    coalescer = ChunkCoalescer(sent.append, interval=10.0, max_bytes=6, clock=clock)
+
+    coalescer.add("a")
+    coalescer.add("あ")  # 3バイト
+    assert sent == ["a"]
+    coalescer.add("い")  # 合計6バイト
+    assert sent == ["a", "あい"]
+    coalescer.close()
+
+
+def test_close_flushes_remaining():
+    """
+    closeで残りのチャンクが送信され、以降は送信されないことをテストします。
+    """
+    sent = []
+    coalescer = ChunkCoalescer(sent.append, interval=10.0, clock=FakeClock())
+
+    coalescer.add("a")
+    coalescer.add("b")
+    coalescer.close()
+    coalescer.flush()
+
+    assert sent == ["a", "b"]
+
+
+def test_zero_interval_disables_coalescing():
+    """
+    送信間隔が0の場合はチャンクごとに送信されることをテストします。
+    """
+    sent = []
+    coalescer = ChunkCoalescer(sent.append, interval=0, clock=FakeClock())
+
+    for text in ["a", "b", "", "c"]:
+        coalescer.add(text)
+
+    assert sent == ["a", "b", "c"]
+
+
+def test_timer_flushes_when_stream_stalls():
+    """
+    新しいチャンクが届かない場合もタイマーによって送信されることをテストします。
+    """
+    sent = []
+    event = threading.Event()
+
+    def emit(text):
+        sent.append(text)
+        if len(sent) == 2:
+            event.set()
+
+    coalescer = ChunkCoalescer(emit, interval=0.02)
+    coalescer.add("a")
+    coalescer.add("b")
+
+    assert event.wait(1.0)
+    assert sent == ["a", "b"]
+    coalescer.close()
+
+
+def test_coalescers_share_one_scheduler_thread():
+    """
+    複数のストリームの遅延送信が1つのスケジューラスレッドで行われることをテストします。
+    """
+    scheduler = FlushScheduler()
+    sent = []
+    done = threading.Event()
+    threads_before = threading.active_count()
+
+    def emit(text):
+        sent.append(text)
+        if len(sent) == 20:
+            done.set()
+
+    coalescers = [ChunkCoalescer(emit, interval=0.02, scheduler=scheduler) for _ in range(10)]
+    for coalescer in coalescers:
+        coalescer.add("a")
+        coalescer.add("b")
+
+    assert threading.active_count() <= threads_before + 1
+    assert done.wait(1.0)
+    assert sorted(sent) == ["a"] * 10 + ["b"] * 10
+    for coalescer in coalescers:
+        coalescer.close()
+
+
+def test_close_cancels_scheduled_flush():
+    """
+    closeで遅延送信の予定が取り消されることをテストします。
+    """
+    scheduler = FlushScheduler()
+    sent = []
+    coalescer = ChunkCoalescer(sent.append, interval=10.0, scheduler=scheduler)
+
+    coalescer.add("a")
+    coalescer.add("b")
+    assert scheduler.pending() == 1
+
+    coalescer.close()
+
+    assert scheduler.pending() == 0
+    assert sent == ["a", "b"]
+
+
+def test_async_coalescer_flushes_without_threads():
+    """
+    AsyncChunkCoalescerがスレッドを使わずに遅延送信し、closeで残りを送信することをテストします。
+    """
+    sent = []
+
+    async def emit(text):
+        sent.append(text)
+
+    async def scenario():
+        threads_before = threading.active_count()
+        coalescer = AsyncChunkCoalescer(emit, interval=0.02)
+        await coalescer.add("a")
+        await coalescer.add("b")
+        await coalescer.add("c")
+        assert sent == ["a"]
+        assert threading.active_count() == threads_before
+
+        # 新しいチャンクが届かなくても間隔が経過すれば送信される
+        await asyncio.sleep(0.05)
+        assert sent == ["a", "bc"]
+
+        await coalescer.add("d")
+        await coalescer.close()
+        await coalescer.add("e")
+        await asyncio.sleep(0.05)
+        return coalescer
+
+    coalescer = asyncio.run(scenario())
+
+    assert sent == ["a", "bc", "d"]
+    assert coalescer.chunks_in == 4
+    assert coalescer.frames_out == 3
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+コンテキストウィンドウの絞り込みのテストモジュール。
+"""
+
+import pytest
+
+from src.context_window import (
+    MESSAGE_OVERHEAD_TOKENS,
+    PinnedMessagesStrategy,
+    SlidingWindowStrategy,
+    SummarizingStrategy,
+    TrimStrategy,
+    estimate_message_tokens,
+    estimate_tokens,
+)
+
+
+def make_messages(count):
+    """
+    テスト用のメッセージを作成します。
+
+    Args:
+        count: 作成するユーザー・アシスタントのメッセージ数
+
+    Returns:
+        tuple: メッセージのリストと推定トークン数のリスト
+    """
+    messages = [{"role": "system", "content": "sys"}]
+    for i in range(count):
+        role = "user" if i % 2 == 0 else "assistant"
+        messages.append({"role": role, "content": f"m{i:03d}"})
+    return messages, [estimate_message_tokens(m) for m in messages]
+
+
+def test_estimate_tokens():
+    """
+    トークン数の推定をテストします。
+    """
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("abcde") == 2
+    assert estimate_tokens("こんにちは") == 5
+    assert estimate_tokens("abcdこんにちは") == 6
+    assert estimate_message_tokens({"role": "user", "content": "abcd"}) == 1 + MESSAGE_OVERHEAD_TOKENS
+
+
+def test_sliding_window_keeps_system_and_recent():
+    """
+    SlidingWindowStrategyがシステムプロンプトと最新のメッセージを残すことをテストします。
+    """
+    messages, counts = make_messages(10)
+    per_message = counts[1]
+
+    result = SlidingWindowStrategy().trim(messages, counts, set(), counts[0] + per_message * 3)
+
+    assert result[0]["role"] == "system"
+    assert [m["content"] for m in result[1:]] == ["m007", "m008", "m009"]
+
+
+def test_sliding_window_always_keeps_latest():
+    """
+    上限が小さすぎる場合でも最新のメッセージが残ることをテストします。
+    """
+    messages, counts = make_messages(4)
+
+    result = SlidingWindowStrategy().trim(messages, counts, set(), 1)
+
+    assert [m["content"] for m in result] == ["sys", "m003"]
+
+
+def test_pinned_messages_are_kept():
+    """
+    PinnedMessagesStrategyが固定されたメッセージを残すことをテストします。
+    """
+    messages, counts = make_messages(10)
+    per_message = counts[1]
+
+    result = PinnedMessagesStrategy().trim(messages, counts, {1}, counts[0] + per_message * 3)
+
+    assert [m["content"] for m in result] == ["sys", "m000", "m008", "m009"]
+
+
+def test_summarizing_strategy_replaces_old_messages():
+    """
+    SummarizingStrategyが古いメッセージを要約に置き換え、要約を再利用することをテストします。
+    """
+    messages, counts = make_messages(10)
+    per_message = counts[1]
+    calls = []
+
+    def summarize(dropped):
+        calls.append([m["content"] for m in dropped])
+        return "要約"
+
+    strategy = SummarizingStrategy(summarize, summary_budget=per_message)
+    budget = counts[0] + per_message * 4
+
+    result = strategy.trim(messages, counts, set(), budget)
+
+    assert result[0]["content"] == "sys"
+    assert result[1] == {"role": "system", "content": "これまでの会話の要約: 要約"}
+    assert [m["content"] for m in result[2:]] == ["m007", "m008", "m009"]
+    assert calls == [[f"m{i:03d}" for i in range(7)]]
+
+    # 除外されるメッセージが変わらなければ要約を再利用する
+    strategy.trim(messages, counts, set(), budget)
+    assert len(calls) == 1
+
+
+def test_summarizing_strategy_within_budget():
+    """
+    上限に収まる場合は要約しないことをテストします。
+    """
+    messages, counts = make_messages(2)
+
+    def summarize(dropped):
+        raise AssertionError("要約は呼び出されないはずです")
+
+    result = SummarizingStrategy(summarize).trim(messages, counts, set(), sum(counts))
+
+    assert result == messages
+
+
+def test_summarizing_strategy_cache_is_keyed_by_content():
+    """
+    同じ位置のメッセージが除外されても、内容が異なる会話では要約を再利用しないことをテストします。
+    """
+    calls = []
+
+    def summarize(dropped):
+        calls.append([m["content"] for m in dropped])
+        return dropped[0]["content"]
+
+    strategy = SummarizingStrategy(summarize, summary_budget=0)
+    messages_a, counts = make_messages(4)
+    messages_b = [dict(m, content=m["content"].replace("m", "x")) for m in messages_a]
+    budget = counts[0] + counts[-1]
+
+    result_a = strategy.trim(messages_a, counts, set(), budget)
+    result_b = strategy.trim(messages_b, counts, set(), budget)
+    strategy.trim(messages_a, counts, set(), budget)
+
+    assert result_a[1]["content"] == "これまでの会話の要約: m000"
+    assert result_b[1]["content"] == "これまでの会話の要約: x000"
+    assert len(calls) == 2
+
+
+def test_trim_strategy_is_abstract():
+    """
+    trimを実装しない戦略はインスタンス化できないことをテストします。
+    """
+
+    class IncompleteStrategy(TrimStrategy):
+        pass
+
+    with pytest.raises(TypeError):
+        IncompleteStrategy()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+conversation_storeモジュールのテストモジュール。
+"""
+
+import sqlite3
+
+import pytest
+
+from src.conversation_store import (
+    MAX_PAGE_SIZE,
+    MemoryConversationStore,
+    SqliteConversationStore,
+    create_conversation_store,
+    parse_page_params,
+)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    """
+    各ストアを提供するフィクスチャ。
+    """
+    if request.param == "memory":
+        store = MemoryConversationStore()
+    else:
+        store = SqliteConversationStore(str(tmp_path / "conversations.db"))
+    yield store
+    store.close()
+
+
+def test_parse_page_params():
+    """
+    ページのクエリパラメータの解析をテストします。
+    """
+    assert parse_page_params(None, None) == (None, 50)
+    assert parse_page_params("10", "20") == (10, 20)
+    for before, limit in (("a", None), ("-1", None), (None, "0"), (None, str(MAX_PAGE_SIZE + 1))):
+        with pytest.raises(ValueError):
+            parse_page_params(before, limit)
+
+
+def test_page_returns_newest_messages_first(store):
+    """
+    新しいメッセージから1ページずつ古い順で取得できることをテストします。
+    """
+    store.start_conversation("c1", "client", "llama2")
+    for seq in range(5):
+        store.append("c1", seq, "user", f"m{seq}")
+
+    first = store.page("c1", limit=2)
+    assert [message["content"] for message in first["messages"]] == ["m3", "m4"]
+    assert first["has_more"] is True
+    assert first["next_before"] == 3
+
+    second = store.page("c1", before=first["next_before"], limit=2)
+    assert [message["seq"] for message in second["messages"]] == [1, 2]
+
+    last = store.page("c1", before=second["next_before"], limit=2)
+    assert [message["seq"] for message in last["messages"]] == [0]
+    assert last["has_more"] is False
+    assert last["next_before"] is None
+
+    assert store.page("unknown")["messages"] == []
+
+
+def test_latest_conversation(store):
+    """
+    クライアントが最後に開始した会話が返されることをテストします。
+    """
+    assert store.latest_conversation("client") is None
+
+    store.start_conversation("c1", "client", "llama2")
+    store.start_conversation("c2", "client", "mistral")
+    store.start_conversation("c3", "other", "llama2")
+    store.start_conversation("c1", "client", "ignored")
+
+    latest = store.latest_conversation("client")
+    assert latest["id"] == "c2"
+    assert latest["model"] == "mistral"
+
+
+def test_sqlite_store_uses_wal_and_batches_writes(tmp_path):
+    """
+    SQLiteのストアがWALモードで開かれ、書き込みがまとめてコミットされることをテストします。
+    """
+    path = str(tmp_path / "conversations.db")
+    store = SqliteConversationStore(path, batch_size=1000, flush_interval=1.0)
+    store.start_conversation("c1", "client", "llama2")
+    for seq in range(100):
+        store.append("c1", seq, "user", f"m{seq}", pinned=seq == 0)
+
+    messages = store.load_messages("c1", limit=None)
+    assert len(messages) == 100
+    assert messages[0]["pinned"] is True
+    assert store.write_count == 101
+    assert store.batch_count < 5
+    store.close()
+
+    with sqlite3.connect(path) as connection:
+        assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_sqlite_store_persists_across_restarts(tmp_path):
+    """
+    閉じたデータベースを開き直しても会話が残っていることをテストします。
+    """
+    path = str(tmp_path / "conversations.db")
+    store = SqliteConversationStore(path)
+    store.start_conversation("c1", "client", "llama2")
+    store.append("c1", 0, "user", "こんにちは")
+    store.append("c1", 1, "assistant", "こんにちは！")
+    store.close()
+    store.close()
+
+    reopened = SqliteConversationStore(path)
+    assert reopened.latest_conversation("client")["id"] == "c1"
+    assert [message["content"] for message in reopened.load_messages("c1")] == ["こんにちは", "こんにちは！"]
+    reopened.close()
+
+
+def test_create_conversation_store(tmp_path):
+    """
+    名前からストアを作成できることをテストします。
+    """
+    assert isinstance(create_conversation_store("memory"), MemoryConversationStore)
+    sqlite_store = create_conversation_store("sqlite", str(tmp_path / "a.db"))
+    assert isinstance(sqlite_store, SqliteConversationStore)
+    sqlite_store.close()
+    with pytest.raises(ValueError):
+        create_conversation_store("unknown")
+    with pytest.raises(ValueError):
+        SqliteConversationStore(":memory:")
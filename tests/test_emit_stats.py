@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+EmitStatsクラスのテストモジュール。
+"""
+
+import asyncio
+
+from socketio import packet
+
+from src.emit_stats import AsyncEmitStatsManager, EmitStats, EmitStatsManager, MeasuredPacket, take_encoded_size
+
+
+def test_measured_packet_records_encoded_size():
+    """
+    エンコードしたパケットのバイト数が記録されることをテストします。
+    """
+    pkt = MeasuredPacket(packet.EVENT, data=["receive_chunk", {"content": "こんにちは"}])
+
+    encoded = pkt.encode()
+
+    assert take_encoded_size() == len(encoded.encode("utf-8"))
+    assert take_encoded_size() == 0
+
+
+def test_record_per_connection():
+    """
+    接続ごと・イベントごとに送信量が集計されることをテストします。
+    """
+    stats = EmitStats()
+    stats.enter("sid1", "sid1")
+    stats.enter("sid1", "room")
+    stats.enter("sid2", "room")
+
+    assert stats.record("receive_chunk", "room", 10) == 2
+    assert stats.record("receive_chunk", "sid1", 10) == 1
+    assert stats.record("receive_chunk", "nobody", 10) == 0
+
+    snapshot = stats.snapshot()
+    assert snapshot["total_messages"] == 3
+    assert snapshot["total_bytes"] == 30
+    assert snapshot["events"]["receive_chunk"] == {"messages": 3, "bytes": 30}
+    assert stats.get_connection_stats("sid1") == {"messages": 2, "bytes": 20}
+    assert stats.get_connection_stats("sid2") == {"messages": 1, "bytes": 10}
+
+
+def test_leave_keeps_received_and_stops_counting():
+    """
+    ルームから退出した後も受信済みの送信量が保持され、以降の送信は数えられないことをテストします。
+    """
+    stats = EmitStats()
+    stats.enter("sid1", "room")
+    stats.record("receive_chunk", "room", 10)
+
+    stats.leave("sid1", "room")
+    stats.record("receive_chunk", "room", 10)
+    stats.enter("sid1", "room")
+    stats.record("receive_chunk", "room", 5)
+
+    assert stats.get_connection_stats("sid1") == {"messages": 2, "bytes": 15}
+    assert stats.snapshot()["total_messages"] == 2
+
+
+def test_forget_keeps_totals():
+    """
+    切断された接続の統計を破棄しても合計値が保持されることをテストします。
+    """
+    stats = EmitStats()
+    stats.enter("sid1", "sid1")
+    stats.record("status_update", "sid1", 20)
+
+    stats.forget("sid1")
+
+    snapshot = stats.snapshot()
+    assert snapshot["connection_count"] == 0
+    assert snapshot["total_messages"] == 1
+    assert stats.get_connection_stats("sid1") == {"messages": 0, "bytes": 0}
+    assert stats.record("status_update", "sid1", 20) == 0
+
+
+def test_manager_tracks_rooms():
+    """
+    クライアントマネージャーがルームへの参加・退出と切断をEmitStatsに通知することをテストします。
+    """
+    stats = EmitStats()
+    manager = EmitStatsManager(stats)
+    manager.basic_enter_room("sid1", "/", None, eio_sid="eio1")
+    manager.basic_enter_room("sid1", "/", "sid1", eio_sid="eio1")
+    manager.basic_enter_room("sid1", "/", "room")
+
+    assert stats.record("receive_chunk", "room", 10) == 1
+
+    manager.basic_leave_room("sid1", "/", "room")
+    assert stats.record("receive_chunk", "room", 10) == 0
+    assert stats.get_connection_stats("sid1") == {"messages": 1, "bytes": 10}
+
+    manager.basic_disconnect("sid1", "/")
+    assert stats.snapshot()["connection_count"] == 0
+
+
+def test_async_manager_tracks_rooms():
+    """
+    非同期クライアントマネージャーがルームへの参加・退出をEmitStatsに通知することをテストします。
+    """
+
+    async def scenario():
+        stats = EmitStats()
+        manager = AsyncEmitStatsManager(stats)
+        manager.basic_enter_room("sid1", "/", None, eio_sid="eio1")
+        await manager.enter_room("sid1", "/", "room")
+        recipients = stats.record("receive_chunk", "room", 10)
+        await manager.leave_room("sid1", "/", "room")
+        return recipients, stats.record("receive_chunk", "room", 10)
+
+    assert asyncio.run(scenario()) == (1, 0)
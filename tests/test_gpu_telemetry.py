@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+GPUバックエンドのテストモジュール。
+"""
+
+import sys
+import time
+
+import pytest
+
+from src.gpu_telemetry import (
+    FakeGpuBackend,
+    NvidiaSmiStreamBackend,
+    create_gpu_backend,
+    parse_nvidia_smi_output,
+)
+
+# nvidia-smi --loop-ms の出力を模倣するスクリプト（2台のGPUの値を繰り返し出力する）
+FAKE_NVIDIA_SMI = """
+import sys, time
+for i in range(1000):
+    print(f"0, GPU A, {i % 100}, 5000, 10000")
+    print("1, GPU B, 10, 1000, 8000")
+    sys.stdout.flush()
+    time.sleep(0.01)
+"""
+
+
+def test_parse_nvidia_smi_output():
+    """
+    nvidia-smiの出力が共通の形式に変換されることをテストします。
+    """
+    gpus = parse_nvidia_smi_output("0, NVIDIA GeForce RTX 3080, 50, 5000, 10000\nbroken line\n")
+
+    assert gpus == [
+        {
+            "index": "0",
+            "name": "NVIDIA GeForce RTX 3080",
+            "utilization": 50.0,
+            "memory_used": 5000.0,
+            "memory_total": 10000.0,
+            "memory_used_percent": 50.0,
+        }
+    ]
+
+
+def test_stream_backend_reads_latest_values_from_one_process():
+    """
+    常駐させたプロセスの出力から最新値を返し、読み取りのたびにプロセスを起動しないことをテストします。
+    """
+    backend = NvidiaSmiStreamBackend(command=[sys.executable, "-c", FAKE_NVIDIA_SMI])
+    try:
+        first = backend.read()
+        process = backend._process
+        deadline = time.monotonic() + 2.0
+        gpus = first
+        while len(gpus) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+            gpus = backend.read()
+    finally:
+        backend.close()
+
+    assert [gpu["name"] for gpu in first][:1] == ["GPU A"]
+    assert [gpu["index"] for gpu in gpus] == ["0", "1"]
+    assert gpus[1]["memory_used_percent"] == 12.5
+    assert backend._process is None
+    assert process.poll() is not None
+    assert backend.restart_count == 0
+
+
+def test_stream_backend_does_not_respawn_failing_process():
+    """
+    プロセスがすぐに終了する場合も再起動の間隔内では起動し直さないことをテストします。
+    """
+    backend = NvidiaSmiStreamBackend(command=[sys.executable, "-c", "pass"], restart_interval=60.0)
+
+    assert backend.read() == []
+    assert backend.read() == []
+    assert backend.restart_count == 0
+    backend.close()
+
+
+def test_create_gpu_backend():
+    """
+    名前を指定してバックエンドを作成できることをテストします。
+    """
+    assert isinstance(create_gpu_backend("fake"), FakeGpuBackend)
+    assert create_gpu_backend("none") is None
+    with pytest.raises(ValueError):
+        create_gpu_backend("unknown")
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+ログ出力の設定のテストモジュール。
+"""
+
+import json
+import logging
+
+import pytest
+
+from src import log_utils
+from src.log_utils import LazyPayload, configure_logging, redact_payload, truncate
+
+
+@pytest.fixture(autouse=True)
+def restore_logging():
+    """
+    テストで変更したログの設定を元に戻すフィクスチャ。
+    """
+    logger = logging.getLogger(log_utils.ROOT_LOGGER_NAME)
+    handlers, level, propagate = list(logger.handlers), logger.level, logger.propagate
+    mode, max_chars = log_utils.payload_mode, log_utils.payload_max_chars
+    yield
+    logger.handlers[:] = handlers
+    logger.setLevel(level)
+    logger.propagate = propagate
+    log_utils.payload_mode, log_utils.payload_max_chars = mode, max_chars
+
+
+def test_truncate():
+    """
+    長い文字列の省略をテストします。
+    """
+    assert truncate("abc", 5) == "abc"
+    assert truncate("abcdefgh", 5) == "abcde...（3文字省略）"
+    assert truncate("abcdefgh", 0) == "abcdefgh"
+
+
+def test_redact_payload():
+    """
+    ペイロードの本文とコンテキストが伏せ字になり、元のペイロードは変更されないことをテストします。
+    """
+    payload = {
+        "model": "llama2",
+        "messages": [{"role": "user", "content": "秘密の質問"}],
+        "prompt": "続き",
+        "context": [1, 2, 3],
+        "options": {"temperature": 0.7},
+    }
+
+    redacted = redact_payload(payload)
+
+    assert redacted == {
+        "model": "llama2",
+        "messages": [{"role": "user", "content": "<5文字>"}],
+        "prompt": "<2文字>",
+        "context": "<3トークン>",
+        "options": {"temperature": 0.7},
+    }
+    assert payload["messages"][0]["content"] == "秘密の質問"
+
+
+def test_lazy_payload_formats_only_when_emitted(caplog):
+    """
+    LazyPayloadがログの出力時にだけ整形され、設定に従って伏せ字と省略が行われることをテストします。
+    """
+    formatted = []
+
+    class Recording(LazyPayload):
+        def __str__(self):
+            formatted.append(True)
+            return super().__str__()
+
+    logger = logging.getLogger("src.test")
+    payload = {"model": "llama2", "messages": [{"role": "user", "content": "こんにちは" * 100}]}
+
+    with caplog.at_level(logging.INFO, logger="src"):
+        logger.debug("ペイロード: %s", Recording(payload))
+    assert formatted == []
+
+    with caplog.at_level(logging.DEBUG, logger="src"):
+        logger.debug("ペイロード: %s", Recording(payload))
+    assert formatted
+    assert "<500文字>" in caplog.text
+
+    configure_logging(payloads="full", max_payload_chars=20)
+    assert str(LazyPayload(payload)) == truncate(json.dumps(payload, ensure_ascii=False), 20)
+
+
+def test_configure_logging_json_output(capsys):
+    """
+    JSON形式の出力とextraの値の出力、繰り返し設定しても出力が重複しないことをテストします。
+    """
+    configure_logging(level="debug", fmt="json")
+    logger = configure_logging(level="info", fmt="json")
+    assert logger.level == logging.INFO
+
+    logging.getLogger("src.test").info("起動しました: %s", "ok", extra={"host": "gpu1"})
+    logging.getLogger("src.test").debug("出力されない")
+
+    lines = capsys.readouterr().err.strip().splitlines()
+    assert len(lines) == 1
+    entry = json.loads(lines[0])
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "src.test"
+    assert entry["message"] == "起動しました: ok"
+    assert entry["host"] == "gpu1"
+
+
+def test_json_formatter_includes_exception(capsys):
+    """
+    例外の情報がJSONに含まれることをテストします。
+    """
+    configure_logging(fmt="json")
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logging.getLogger("src.test").exception("失敗しました")
+
+    entry = json.loads(capsys.readouterr().err)
+    assert entry["message"] == "失敗しました"
+    assert "ValueError: boom" in entry["exc_info"]
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+metricsモジュールのテストモジュール。
+"""
+
+import pytest
+
+from src.metrics import (
+    BACKEND_DURATION,
+    BACKEND_ERRORS,
+    GENERATED_TOKENS,
+    GENERATIONS,
+    TIME_TO_FIRST_TOKEN,
+    TOKENS_PER_SECOND,
+    Counter,
+    GenerationTimer,
+    Histogram,
+    MetricsRegistry,
+    escape_label_value,
+    format_value,
+    track_backend,
+)
+
+
+class FakeClock:
+    """
+    テスト用の時計。
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_format_value():
+    """
+    数値の表記をテストします。
+    """
+    assert format_value(3.0) == "3"
+    assert format_value(0.25) == "0.25"
+    assert format_value(float("inf")) == "+Inf"
+
+
+def test_escape_label_value():
+    """
+    ラベルの値のエスケープをテストします。
+    """
+    assert escape_label_value('a"b\\c\nd') == 'a\\"b\\\\c\\nd'
+
+
+def test_counter_rejects_negative_and_unknown_labels():
+    """
+    カウンタの減少と未定義のラベルが拒否されることをテストします。
+    """
+    counter = Counter("requests_total", "リクエスト数", ["model"])
+    counter.inc(model="a")
+    counter.inc(2, model="a")
+
+    assert counter.get(model="a") == 3
+    with pytest.raises(ValueError):
+        counter.inc(-1, model="a")
+    with pytest.raises(ValueError):
+        counter.inc(operation="a")
+
+
+def test_histogram_renders_cumulative_buckets():
+    """
+    ヒストグラムが累積の区切り、合計、件数を出力することをテストします。
+    """
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "所要時間", ["model"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        histogram.observe(value, model="llama2")
+
+    lines = registry.render().splitlines()
+
+    assert lines[0] == "# HELP latency_seconds 所要時間"
+    assert lines[1] == "# TYPE latency_seconds histogram"
+    assert 'latency_seconds_bucket{model="llama2",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{model="llama2",le="1"} 3' in lines
+    assert 'latency_seconds_bucket{model="llama2",le="+Inf"} 4' in lines
+    assert 'latency_seconds_sum{model="llama2"} 4.25' in lines
+    assert 'latency_seconds_count{model="llama2"} 4' in lines
+
+
+def test_histogram_time_uses_clock():
+    """
+    withブロックの所要時間が記録されることをテストします。
+    """
+    clock = FakeClock()
+    histogram = Histogram("wait_seconds", "待ち時間", ["model"])
+
+    with histogram.time(clock=clock, model="a"):
+        clock.now += 0.3
+
+    assert histogram.get_count(model="a") == 1
+    assert histogram.get_sum(model="a") == pytest.approx(0.3)
+
+
+def test_registry_rejects_duplicate_names():
+    """
+    同じ名前のメトリクスを登録できないことをテストします。
+    """
+    registry = MetricsRegistry()
+    registry.counter("a_total", "a")
+
+    with pytest.raises(ValueError):
+        registry.gauge("a_total", "a")
+
+
+def test_track_backend_counts_errors():
+    """
+    ollamaへのリクエストの失敗が記録されることをテストします。
+    """
+    before_errors = BACKEND_ERRORS.get(operation="test_op")
+    before_count = BACKEND_DURATION.get_count(operation="test_op")
+
+    with track_backend("test_op"):
+        pass
+    with pytest.raises(RuntimeError):
+        with track_backend("test_op"):
+            raise RuntimeError("接続できません")
+
+    assert BACKEND_DURATION.get_count(operation="test_op") == before_count + 2
+    assert BACKEND_ERRORS.get(operation="test_op") == before_errors + 1
+
+
+def test_generation_timer_records_final_chunk():
+    """
+    最初のトークンまでの時間と、最後のチャンクのトークン数と生成速度が記録されることをテストします。
+    """
+    clock = FakeClock()
+    timer = GenerationTimer("timer-test", clock=clock)
+    clock.now = 0.2
+    timer.on_chunk("")
+    clock.now = 0.5
+    timer.on_chunk("こん")
+    clock.now = 0.8
+    timer.on_chunk("にちは")
+    clock.now = 2.0
+
+    timer.finish("completed", {"done": True, "eval_count": 40, "eval_duration": 2_000_000_000, "prompt_eval_count": 10})
+    timer.finish("error")
+
+    assert GENERATIONS.get(model="timer-test", outcome="completed") == 1
+    assert GENERATIONS.get(model="timer-test", outcome="error") == 0
+    assert TIME_TO_FIRST_TOKEN.get_sum(model="timer-test") == pytest.approx(0.5)
+    assert GENERATED_TOKENS.get(model="timer-test") == 40
+    assert TOKENS_PER_SECOND.get_sum(model="timer-test") == pytest.approx(20.0)
+
+
+def test_generation_timer_without_tokens():
+    """
+    トークンを受信せずに終わった生成では最初のトークンまでの時間を記録しないことをテストします。
+    """
+    timer = GenerationTimer("timer-cancelled")
+    timer.finish("cancelled")
+
+    assert GENERATIONS.get(model="timer-cancelled", outcome="cancelled") == 1
+    assert TIME_TO_FIRST_TOKEN.get_count(model="timer-cancelled") == 0
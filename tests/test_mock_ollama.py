@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+mock_ollamaモジュールのテストモジュール。
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+import requests
+
+from src.mock_ollama import MockOllamaServer, keep_alive_seconds, model_digest, response_tokens
+from src.ollama_client import OllamaClient
+
+
+@pytest.fixture
+def use_http(monkeypatch):
+    """
+    ollama-pythonではなくHTTP APIでモックのサーバーと通信させるフィクスチャ。
+    """
+    monkeypatch.setattr("src.ollama_client.OLLAMA_AVAILABLE", False)
+
+
+def test_keep_alive_seconds():
+    """
+    keep_aliveの秒数と単位付きの文字列が秒数に変換されることをテストします。
+    """
+    assert keep_alive_seconds(None, 300.0) == 300.0
+    assert keep_alive_seconds("5m", 300.0) == 300.0
+    assert keep_alive_seconds("30s", 300.0) == 30.0
+    assert keep_alive_seconds(0, 300.0) == 0.0
+    assert keep_alive_seconds(-1, 300.0) == float("inf")
+    assert keep_alive_seconds("abc", 300.0) == 300.0
+
+
+def test_client_against_mock_server(use_http):
+    """
+    OllamaClientでモデル一覧、モデル情報、ロード、チャット、埋め込み、モデルの終了ができることをテストします。
+    """
+    with MockOllamaServer(tokens_per_second=0, first_token_delay=0, response_tokens=5) as server:
+        client = OllamaClient(host=server.url)
+        try:
+            models = client.list_models()
+            assert [model["name"] for model in models] == ["llama2:latest", "mistral:latest", "nomic-embed-text:latest"]
+            assert models[0]["digest"] == model_digest("llama2")
+            assert client.get_model_info("llama2")["model_info"]["llama.context_length"] == 4096
+
+            assert client.preload_model("llama2", keep_alive="10m")
+            assert [model["model"] for model in client.list_running_models()] == ["llama2:latest"]
+
+            received = []
+            chunks = list(client.chat_stream("llama2", [{"role": "user", "content": "こんにちは"}], callback=received.append))
+            expected = response_tokens("こんにちは", 5)
+            assert "".join(received) == "".join(expected)
+            assert chunks[-1]["message"]["content"] == "".join(expected)
+            assert chunks[-1]["eval_count"] == 5
+            assert chunks[-1]["done_reason"] == "stop"
+
+            generated = list(client.generate_stream("llama2", "こんにちは", context=[1], options={"num_predict": 2}))
+            assert generated[-1]["message"]["content"] == "".join(response_tokens("こんにちは", 2))
+            assert generated[-1]["context"] == [1, 5, 2]
+
+            similar = client.embed("nomic-embed-text", "空はなぜ青い")
+            assert similar == client.embed("nomic-embed-text", "空はなぜ青い")
+            assert len(similar) == 32
+            assert client.embed("unknown", "空") is None
+
+            assert client.kill_model("llama2:latest")
+            assert [model["model"] for model in client.list_running_models()] == ["nomic-embed-text:latest"]
+        finally:
+            client.close()
+
+        stats = server.stats()
+        assert stats["requests"]["/api/chat"] == 1
+        assert stats["tokens"] == 7
+        assert stats["active"] == 0
+
+
+def test_stream_timing_and_load_delay():
+    """
+    最初のトークンまでの時間、生成速度、モデルのロード時間が応答に反映されることをテストします。
+    """
+    with MockOllamaServer(tokens_per_second=100, first_token_delay=0.1, load_delay=0.1, response_tokens=11) as server:
+        payload = {"model": "llama2", "messages": [{"role": "user", "content": "hi"}], "stream": False}
+        started = time.monotonic()
+        first = requests.post(f"{server.url}/api/chat", json=payload).json()
+        elapsed = time.monotonic() - started
+        second = requests.post(f"{server.url}/api/chat", json=payload).json()
+
+    # ロード0.1秒、最初のトークンまで0.1秒、残りの10トークンに0.1秒
+    assert elapsed >= 0.29
+    assert first["load_duration"] >= 0.1e9
+    assert second["load_duration"] == 0
+    assert first["prompt_eval_duration"] >= 0.09e9
+    assert first["eval_duration"] >= 0.09e9
+    assert server.stats()["loads"] == 1
+
+
+def test_num_parallel_limits_concurrent_generations():
+    """
+    モデルごとの同時生成数を超えたリクエストが順番を待つことをテストします。
+    """
+    with MockOllamaServer(tokens_per_second=50, first_token_delay=0, response_tokens=5, num_parallel=1) as server:
+        payload = {"model": "llama2", "messages": [{"role": "user", "content": "hi"}], "stream": False}
+        threads = [
+            threading.Thread(target=requests.post, args=(f"{server.url}/api/chat",), kwargs={"json": payload})
+            for _ in range(3)
+        ]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+    # 1件あたり4トークン分（0.08秒）の生成を3件順番に行う
+    assert elapsed >= 0.22
+
+
+def test_error_and_disconnect_injection(use_http):
+    """
+    エラーと切断を指定した割合で発生させ、同じシードでは同じ順序で発生することをテストします。
+    """
+    messages = [{"role": "user", "content": "hi"}]
+    with MockOllamaServer(tokens_per_second=0, first_token_delay=0, error_rate=1.0) as server:
+        client = OllamaClient(host=server.url)
+        with pytest.raises(requests.HTTPError):
+            list(client.chat_stream("llama2", messages))
+        client.close()
+        assert server.stats()["injected_errors"] == 1
+
+    with MockOllamaServer(tokens_per_second=0, first_token_delay=0, disconnect_rate=1.0, response_tokens=4) as server:
+        client = OllamaClient(host=server.url)
+        with pytest.raises(requests.RequestException):
+            list(client.chat_stream("llama2", messages))
+        client.close()
+        assert server.stats()["injected_disconnects"] == 1
+        assert server.stats()["tokens"] == 2
+
+    def outcomes(seed):
+        with MockOllamaServer(tokens_per_second=0, first_token_delay=0, error_rate=0.5, seed=seed) as server:
+            return [
+                requests.post(
+                    f"{server.url}/api/chat", json={"model": "llama2", "messages": messages, "stream": False}
+                ).status_code
+                for _ in range(10)
+            ]
+
+    assert outcomes(1) == outcomes(1)
+    assert set(outcomes(1)) == {200, 500}
+
+
+def test_unknown_model_and_path():
+    """
+    提供していないモデルとパスに404を返すことをテストします。
+    """
+    with MockOllamaServer() as server:
+        assert requests.post(f"{server.url}/api/chat", json={"model": "unknown", "messages": []}).status_code == 404
+        assert requests.post(f"{server.url}/api/show", json={"name": "unknown"}).status_code == 404
+        assert requests.post(f"{server.url}/api/stop", json={"name": "llama2"}).status_code == 404
+        assert requests.post(f"{server.url}/api/chat", data=b"{broken").status_code == 400
+        assert requests.get(f"{server.url}/api/unknown").status_code == 404
+        assert requests.get(f"{server.url}/api/version").json()["version"]
+
+
+def test_async_client_against_mock_server():
+    """
+    AsyncOllamaClientでもモックのサーバーからストリーミング応答を受け取れることをテストします。
+    """
+    pytest.importorskip("aiohttp")
+    from src.async_ollama_client import AsyncOllamaClient
+
+    async def run(url):
+        client = AsyncOllamaClient(host=url)
+        try:
+            return [chunk async for chunk in client.chat_stream("llama2", [{"role": "user", "content": "こんにちは"}])]
+        finally:
+            await client.close()
+
+    with MockOllamaServer(tokens_per_second=0, first_token_delay=0, response_tokens=3) as server:
+        chunks = asyncio.run(run(server.url))
+
+    assert chunks[-1]["message"]["content"] == "".join(response_tokens("こんにちは", 3))
+    assert len(chunks) == 4
@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+モデルパラメータモジュールのテストモジュール。
+"""
+
+from src.model_params import DEFAULT_MODEL_PARAMS, apply_model_params, to_ollama_options
+
+
+def test_apply_model_params_clamps_values():
+    """
+    apply_model_paramsが値を範囲内に制限して更新することをテストします。
+    """
+    params = dict(DEFAULT_MODEL_PARAMS)
+
+    result = apply_model_params(params, {"temperature": 5, "top_k": 0, "context_length": 100000})
+
+    assert result is params
+    assert params["temperature"] == 1.0
+    assert params["top_k"] == 1
+    assert params["context_length"] == 32768
+    assert params["top_p"] == DEFAULT_MODEL_PARAMS["top_p"]
+
+
+def test_to_ollama_options():
+    """
+    to_ollama_optionsがcontext_lengthをnum_ctxに変換することをテストします。
+    """
+    options = to_ollama_options(DEFAULT_MODEL_PARAMS)
+
+    assert options["num_ctx"] == DEFAULT_MODEL_PARAMS["context_length"]
+    assert "context_length" not in options
+    assert options["temperature"] == DEFAULT_MODEL_PARAMS["temperature"]
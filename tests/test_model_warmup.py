@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+モデルの事前ロードとkeep_aliveの管理のテストモジュール。
+"""
+
+import asyncio
+import threading
+
+from src.model_warmup import AsyncModelWarmer, KeepAlivePolicy, ModelWarmer, parse_keep_alive, parse_model_keep_alive
+
+
+class FakeClock:
+    """
+    テスト用の時計。
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_parse_keep_alive():
+    """
+    keep_aliveの設定の解析をテストします。
+    """
+    assert parse_keep_alive(None) is None
+    assert parse_keep_alive(" ") is None
+    assert parse_keep_alive("-1") == -1
+    assert parse_keep_alive("300") == 300
+    assert parse_keep_alive("30m") == "30m"
+    assert parse_model_keep_alive("llama2=1h, mistral:7b=-1,invalid,phi=") == {"llama2:latest": "1h", "mistral:7b": -1}
+
+
+def test_keep_alive_policy():
+    """
+    モデルごとのkeep_aliveと固定モデルの判定をテストします。
+    """
+    policy = KeepAlivePolicy(default="5m", per_model={"llama2": "1h"}, pinned=["mistral"])
+
+    assert policy.for_model("llama2:latest") == "1h"
+    assert policy.for_model("mistral") == -1
+    assert policy.for_model("phi") == "5m"
+    assert KeepAlivePolicy().for_model("phi") is None
+
+    running = [{"id": "abc", "model": "llama2:latest"}]
+    assert policy.missing_pinned(running) == ["mistral:latest"]
+    assert policy.missing_pinned(running + [{"id": "def", "model": "mistral:latest"}]) == []
+
+
+def test_warm_deduplicates_in_flight_preloads():
+    """
+    同じモデルのロード中は重複してロードしないことをテストします。
+    """
+    release = threading.Event()
+    calls = []
+
+    def preload(model, keep_alive):
+        calls.append((model, keep_alive))
+        release.wait(2.0)
+        return True
+
+    warmer = ModelWarmer(preload, KeepAlivePolicy(per_model={"llama2": "1h"}))
+    thread = warmer.warm("llama2")
+    assert thread is not None
+    assert warmer.warm("llama2:latest") is None
+    assert warmer.stats()["loading"] == ["llama2:latest"]
+
+    release.set()
+    thread.join(2.0)
+    assert calls == [("llama2", "1h")]
+    assert warmer.stats() == {"pinned": [], "loading": [], "preloads": 1}
+
+    # ロードの完了後は再びロードできる
+    warmer.warm("llama2").join(2.0)
+    assert len(calls) == 2
+
+
+def test_observe_preloads_missing_pinned_models_with_backoff():
+    """
+    ロードされていない固定モデルをロードし、再試行までの間隔を空けることをテストします。
+    """
+    clock = FakeClock()
+    calls = []
+
+    def preload(model, keep_alive):
+        calls.append((model, keep_alive))
+        raise ConnectionError("refused")
+
+    warmer = ModelWarmer(preload, KeepAlivePolicy(pinned=["mistral"]), retry_interval=30.0, clock=clock)
+    running = [{"id": "abc", "model": "llama2:latest"}]
+
+    assert warmer.observe(running) is running
+    while warmer.stats()["loading"]:
+        threading.Event().wait(0.01)
+    assert calls == [("mistral:latest", -1)]
+
+    # 再試行までの間隔が経過するまではロードしない
+    clock.now = 10.0
+    warmer.observe(running)
+    assert len(calls) == 1
+
+    clock.now = 31.0
+    warmer.observe(running)
+    while warmer.stats()["loading"]:
+        threading.Event().wait(0.01)
+    assert len(calls) == 2
+
+    # ロード済みの場合は何もしない
+    clock.now = 100.0
+    warmer.observe(running + [{"id": "def", "model": "mistral:latest"}])
+    assert len(calls) == 2
+
+
+def test_async_model_warmer():
+    """
+    AsyncModelWarmerがタスクでモデルをロードし、closeでロードを取り消すことをテストします。
+    """
+
+    async def run():
+        calls = []
+        blocked = asyncio.Event()
+
+        async def preload(model, keep_alive):
+            calls.append((model, keep_alive))
+            if model == "slow":
+                await blocked.wait()
+            return True
+
+        warmer = AsyncModelWarmer(preload, KeepAlivePolicy(pinned=["llama2"]))
+        await warmer.warm("llama2")
+        assert calls == [("llama2", -1)]
+
+        task = warmer.warm("slow")
+        assert warmer.warm("slow") is None
+        await asyncio.sleep(0)
+        assert warmer.stats()["loading"] == ["slow:latest"]
+
+        await warmer.close()
+        assert task.cancelled()
+        assert warmer.stats()["loading"] == []
+
+    asyncio.run(run())
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+ndjsonモジュールのテストモジュール。
+"""
+
+import asyncio
+import json
+
+from src.ndjson import (
+    NdjsonLineSplitter,
+    aiter_chat_chunks,
+    iter_chat_chunks,
+    iter_ndjson_lines,
+    loads_stdlib,
+    parse_chat_line,
+)
+
+
+def make_stream(contents):
+    """
+    /api/chat のストリーミング応答と同じ形式のバイト列を作成します。
+
+    Args:
+        contents: 各行の本文のリスト（最後の行が完了を示す）
+
+    Returns:
+        bytes: NDJSONのバイト列
+    """
+    lines = []
+    for i, content in enumerate(contents):
+        line = {"model": "llama2", "message": {"role": "assistant", "content": content}, "done": i == len(contents) - 1}
+        lines.append(json.dumps(line, ensure_ascii=False).encode("utf-8"))
+    return b"\n".join(lines) + b"\n"
+
+
+def test_splitter_keeps_partial_lines():
+    """
+    行の途中で区切られたバイト列が次のfeedまで保持されることをテストします。
+    """
+    splitter = NdjsonLineSplitter()
+
+    assert splitter.feed(b'{"a": 1}\n{"b"') == [b'{"a": 1}']
+    assert splitter.feed(b": 2}\n\n") == [b'{"b": 2}']
+    assert splitter.feed(b'{"c": 3}') == []
+    assert splitter.close() == [b'{"c": 3}']
+    assert splitter.close() == []
+
+
+def test_iter_ndjson_lines_skips_blank_lines():
+    """
+    空行と空白だけの行が返されないことをテストします。
+    """
+    assert list(iter_ndjson_lines([b"\n", b'{"a": 1}\r\n', b"  \n"])) == [b'{"a": 1}\r']
+
+
+def test_iter_chat_chunks_across_buffer_boundaries():
+    """
+    マルチバイト文字の途中でバッファが区切られても正しく解析されることをテストします。
+    """
+    stream = make_stream(["こんにちは", "、世界", ""])
+    chunks = [stream[i : i + 5] for i in range(0, len(stream), 5)]
+
+    parsed = list(iter_chat_chunks(chunks))
+
+    assert [(content, done) for content, done, _ in parsed] == [("こんにちは", False), ("、世界", False), ("", True)]
+    assert parsed[-1][2]["model"] == "llama2"
+
+
+def test_parse_chat_line_ignores_invalid_lines(caplog):
+    """
+    本文を含まない行と解析できない行がNoneになることをテストします。
+    """
+    assert parse_chat_line(b'{"status": "loading"}') is None
+    assert parse_chat_line(b"[1, 2]") is None
+    assert parse_chat_line(b"{not json") is None
+    assert "JSONデコードエラー" in caplog.text
+
+
+def test_parse_generate_line_as_chat_chunk():
+    """
+    /api/generate の応答の行が /api/chat と同じ形式で返されることをテストします。
+    """
+    content, done, json_obj = parse_chat_line(b'{"model": "llama2", "response": "", "done": true, "context": [1, 2]}')
+
+    assert (content, done) == ("", True)
+    assert json_obj["message"] == {"role": "assistant", "content": ""}
+    assert json_obj["context"] == [1, 2]
+    assert "response" not in json_obj
+
+
+def test_aiter_chat_chunks():
+    """
+    非同期版が同期版と同じ結果を返すことをテストします。
+    """
+    stream = make_stream(["a", "b", "c"])
+
+    async def chunks():
+        for i in range(0, len(stream), 3):
+            yield stream[i : i + 3]
+
+    async def collect():
+        return [(content, done) async for content, done, _ in aiter_chat_chunks(chunks())]
+
+    assert asyncio.run(collect()) == [("a", False), ("b", False), ("c", True)]
+
+
+def test_stdlib_fallback(monkeypatch):
+    """
+    高速なJSONライブラリがない場合に標準のjsonモジュールで解析できることをテストします。
+    """
+    monkeypatch.setattr("src.ndjson.loads", loads_stdlib)
+    monkeypatch.setattr("src.ndjson.DecodeError", (json.JSONDecodeError, UnicodeDecodeError))
+
+    assert parse_chat_line(make_stream(["日本語"]).strip())[:2] == ("日本語", True)
+    assert parse_chat_line(b"\xff") is None
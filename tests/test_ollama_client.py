@@ -7,7 +7,8 @@ OllamaClientクラスのテストモジュール。
 import pytest
 import json
 from unittest.mock import patch, MagicMock, call
-from src.ollama_client import OllamaClient
+from src.gpu_telemetry import FakeGpuBackend, make_gpu_info
+from src.ollama_client import OllamaClient, TextAccumulator
 
 # src.ollama_client内のollamaをモック
 patch_path = "src.ollama_client.ollama"
@@ -73,7 +74,7 @@ def test_list_models_success(mock_ollama, ollama_client):
 
 
 @patch(patch_path)
-@patch("src.ollama_client.requests.get")
+@patch("src.ollama_client.requests.Session.get")
 @patch("src.ollama_client.subprocess.run")
 def test_list_models_error(mock_run, mock_get, mock_ollama, ollama_client):
     """
@@ -81,7 +82,7 @@ def test_list_models_error(mock_run, mock_get, mock_ollama, ollama_client):
 
     Args:
         mock_run: subprocessのrunメソッドのモック
-        mock_get: requestsのgetメソッドのモック
+        mock_get: requests.Sessionのgetメソッドのモック
         mock_ollama: ollamaモジュールのモック
         ollama_client: OllamaClientインスタンス
     """
@@ -101,13 +102,13 @@ def test_list_models_error(mock_run, mock_get, mock_ollama, ollama_client):
 
 
 @patch(patch_path)
-@patch("src.ollama_client.requests.post")
+@patch("src.ollama_client.requests.Session.post")
 def test_chat_success(mock_post, mock_ollama, ollama_client):
     """
     chatメソッドが成功した場合のテスト。
 
     Args:
-        mock_post: requestsのpostメソッドのモック
+        mock_post: requests.Sessionのpostメソッドのモック
         mock_ollama: ollamaモジュールのモック
         ollama_client: OllamaClientインスタンス
     """
@@ -118,9 +119,10 @@ def test_chat_success(mock_post, mock_ollama, ollama_client):
     # HTTPレスポンスのモック
     mock_post_response = MagicMock()
     mock_post_response.raise_for_status.return_value = None
-    mock_post_response.iter_lines.return_value = [
-        json.dumps({"message": {"content": "こんにちは、", "role": "assistant"}}).encode("utf-8"),
-        json.dumps({"message": {"content": "何かお手伝いできますか？", "role": "assistant"}, "done": True}).encode("utf-8"),
+    mock_post_response.iter_content.return_value = [
+        json.dumps({"message": {"content": "こんにちは、", "role": "assistant"}}).encode("utf-8") + b"\n",
+        json.dumps({"message": {"content": "何かお手伝いできますか？", "role": "assistant"}, "done": True}).encode("utf-8")
+        + b"\n",
     ]
     mock_post.return_value = mock_post_response
 
@@ -138,13 +140,13 @@ def test_chat_success(mock_post, mock_ollama, ollama_client):
 
 
 @patch(patch_path)
-@patch("src.ollama_client.requests.post")
+@patch("src.ollama_client.requests.Session.post")
 def test_chat_with_options(mock_post, mock_ollama, ollama_client):
     """
     chatメソッドがオプション付きで呼び出された場合のテスト。
 
     Args:
-        mock_post: requestsのpostメソッドのモック
+        mock_post: requests.Sessionのpostメソッドのモック
         mock_ollama: ollamaモジュールのモック
         ollama_client: OllamaClientインスタンス
     """
@@ -155,9 +157,10 @@ def test_chat_with_options(mock_post, mock_ollama, ollama_client):
     # HTTPレスポンスのモック
     mock_post_response = MagicMock()
     mock_post_response.raise_for_status.return_value = None
-    mock_post_response.iter_lines.return_value = [
-        json.dumps({"message": {"content": "こんにちは、", "role": "assistant"}}).encode("utf-8"),
-        json.dumps({"message": {"content": "何かお手伝いできますか？", "role": "assistant"}, "done": True}).encode("utf-8"),
+    mock_post_response.iter_content.return_value = [
+        json.dumps({"message": {"content": "こんにちは、", "role": "assistant"}}).encode("utf-8") + b"\n",
+        json.dumps({"message": {"content": "何かお手伝いできますか？", "role": "assistant"}, "done": True}).encode("utf-8")
+        + b"\n",
     ]
     mock_post.return_value = mock_post_response
 
@@ -178,13 +181,13 @@ def test_chat_with_options(mock_post, mock_ollama, ollama_client):
 
 
 @patch(patch_path)
-@patch("src.ollama_client.requests.post")
+@patch("src.ollama_client.requests.Session.post")
 def test_chat_error(mock_post, mock_ollama, ollama_client):
     """
     chatメソッドがエラーを発生させた場合のテスト。
 
     Args:
-        mock_post: requestsのpostメソッドのモック
+        mock_post: requests.Sessionのpostメソッドのモック
         mock_ollama: ollamaモジュールのモック
         ollama_client: OllamaClientインスタンス
     """
@@ -208,6 +211,25 @@ def test_chat_error(mock_post, mock_ollama, ollama_client):
     mock_post.assert_called_once()
 
 
+@patch("src.ollama_client.requests.Session.post")
+def test_preload_model(mock_post, ollama_client):
+    """
+    preload_modelがkeep_alive付きのプロンプトのない /api/generate を送信することをテストします。
+
+    Args:
+        mock_post: requests.Sessionのpostメソッドのモック
+        ollama_client: OllamaClientインスタンス
+    """
+    assert ollama_client.preload_model("llama2", keep_alive=-1) is True
+    mock_post.assert_called_once_with(
+        "http://localhost:11434/api/generate", json={"model": "llama2", "stream": False, "keep_alive": -1}
+    )
+
+    mock_post.side_effect = Exception("connection refused")
+    assert ollama_client.preload_model("llama2") is False
+    assert mock_post.call_args[1]["json"] == {"model": "llama2", "stream": False}
+
+
 @patch(patch_path)
 def test_get_model_info_success(mock_ollama, ollama_client):
     """
@@ -249,13 +271,13 @@ def test_get_model_info_error(mock_ollama, ollama_client):
     mock_ollama.show.assert_called_once_with("unknown-model")
 
 
-@patch("src.ollama_client.requests.get")
+@patch("src.ollama_client.requests.Session.get")
 def test_list_running_models_success(mock_get, ollama_client):
     """
     list_running_modelsメソッドが成功した場合のテスト。
 
     Args:
-        mock_get: requestsのgetメソッドのモック
+        mock_get: requests.Sessionのgetメソッドのモック
         ollama_client: OllamaClientインスタンス
     """
     # モックの設定
@@ -278,13 +300,13 @@ def test_list_running_models_success(mock_get, ollama_client):
     mock_get.assert_called_once_with("http://localhost:11434/api/ps")
 
 
-@patch("src.ollama_client.requests.get")
+@patch("src.ollama_client.requests.Session.get")
 def test_list_running_models_error(mock_get, ollama_client):
     """
     list_running_modelsメソッドがエラーを発生させた場合のテスト。
 
     Args:
-        mock_get: requestsのgetメソッドのモック
+        mock_get: requests.Sessionのgetメソッドのモック
         ollama_client: OllamaClientインスタンス
     """
     # モックの設定
@@ -298,15 +320,15 @@ def test_list_running_models_error(mock_get, ollama_client):
     mock_get.assert_called_once_with("http://localhost:11434/api/ps")
 
 
-@patch("src.ollama_client.requests.get")
-@patch("src.ollama_client.requests.post")
+@patch("src.ollama_client.requests.Session.get")
+@patch("src.ollama_client.requests.Session.post")
 def test_kill_model_success(mock_post, mock_get, ollama_client):
     """
     kill_modelメソッドが成功した場合のテスト。
 
     Args:
-        mock_post: requestsのpostメソッドのモック
-        mock_get: requestsのgetメソッドのモック
+        mock_post: requests.Sessionのpostメソッドのモック
+        mock_get: requests.Sessionのgetメソッドのモック
         ollama_client: OllamaClientインスタンス
     """
     # list_running_modelsのモック設定
@@ -328,15 +350,15 @@ def test_kill_model_success(mock_post, mock_get, ollama_client):
     assert mock_post.call_args_list[0] == call("http://localhost:11434/api/stop", json={"name": "llama2"})
 
 
-@patch("src.ollama_client.requests.get")
-@patch("src.ollama_client.requests.post")
+@patch("src.ollama_client.requests.Session.get")
+@patch("src.ollama_client.requests.Session.post")
 def test_kill_model_error(mock_post, mock_get, ollama_client):
     """
     kill_modelメソッドがエラーを発生させた場合のテスト。
 
     Args:
-        mock_post: requestsのpostメソッドのモック
-        mock_get: requestsのgetメソッドのモック
+        mock_post: requests.Sessionのpostメソッドのモック
+        mock_get: requests.Sessionのgetメソッドのモック
         ollama_client: OllamaClientインスタンス
     """
     # list_running_modelsのモック設定
@@ -359,73 +381,46 @@ def test_kill_model_error(mock_post, mock_get, ollama_client):
     ]
 
 
-@patch("src.ollama_client.platform.system")
-@patch("src.ollama_client.subprocess.run")
-def test_get_gpu_info_windows(mock_run, mock_system, ollama_client):
+def test_get_gpu_info_uses_backend():
     """
-    get_gpu_infoメソッドがWindows環境で成功した場合のテスト。
-
-    Args:
-        mock_run: subprocessのrunメソッドのモック
-        mock_system: platformのsystemメソッドのモック
-        ollama_client: OllamaClientインスタンス
+    get_gpu_infoメソッドがGPUバックエンドの値を返すことをテストします。
     """
-    # モックの設定
-    mock_system.return_value = "Windows"
-    mock_process = MagicMock()
-    mock_process.returncode = 0
-    mock_process.stdout = "0, NVIDIA GeForce RTX 3080, 50, 5000, 10000"
-    mock_run.return_value = mock_process
+    gpu = make_gpu_info("0", "NVIDIA GeForce RTX 3080", 50, 5000, 10000)
+    backend = FakeGpuBackend([gpu])
+    client = OllamaClient(gpu_backend=backend)
 
-    # テスト実行
-    result = ollama_client.get_gpu_info()
+    result = client.get_gpu_info()
 
-    # 検証
-    assert len(result) == 1
-    assert result[0]["index"] == "0"
-    assert result[0]["name"] == "NVIDIA GeForce RTX 3080"
-    assert result[0]["utilization"] == 50.0
-    assert result[0]["memory_used"] == 5000.0
-    assert result[0]["memory_total"] == 10000.0
+    assert result == [gpu]
     assert result[0]["memory_used_percent"] == 50.0
-    mock_system.assert_called_once()
-    mock_run.assert_called_once()
+    assert backend.read_count == 1
+    assert client.get_gpu_backend() is backend
 
 
-@patch("src.ollama_client.platform.system")
-@patch("src.ollama_client.subprocess.run")
-def test_get_gpu_info_linux(mock_run, mock_system, ollama_client):
+@patch("src.gpu_telemetry.shutil.which", return_value=None)
+@patch("src.gpu_telemetry.platform.system")
+@patch("src.gpu_telemetry.subprocess.Popen")
+def test_get_gpu_info_linux_without_nvidia_smi(mock_popen, mock_system, mock_which, ollama_client):
     """
-    get_gpu_infoメソッドがLinux環境で成功した場合のテスト。
+    nvidia-smiがない環境ではプロセスを起動せずに空のリストを返すことをテストします。
 
     Args:
-        mock_run: subprocessのrunメソッドのモック
+        mock_popen: subprocessのPopenのモック
         mock_system: platformのsystemメソッドのモック
+        mock_which: shutilのwhichのモック
         ollama_client: OllamaClientインスタンス
     """
-    # モックの設定
     mock_system.return_value = "Linux"
-    mock_process = MagicMock()
-    mock_process.returncode = 0
-    mock_process.stdout = "0, NVIDIA GeForce RTX 3080, 50, 5000, 10000"
-    mock_run.return_value = mock_process
 
-    # テスト実行
-    result = ollama_client.get_gpu_info()
+    with patch("src.gpu_telemetry.PYNVML_AVAILABLE", False):
+        assert ollama_client.get_gpu_info() == []
+        assert ollama_client.get_gpu_info() == []
 
-    # 検証
-    assert len(result) == 1
-    assert result[0]["index"] == "0"
-    assert result[0]["name"] == "NVIDIA GeForce RTX 3080"
-    assert result[0]["utilization"] == 50.0
-    assert result[0]["memory_used"] == 5000.0
-    assert result[0]["memory_total"] == 10000.0
-    assert result[0]["memory_used_percent"] == 50.0
+    mock_popen.assert_not_called()
     mock_system.assert_called_once()
-    mock_run.assert_called_once()
 
 
-@patch("src.ollama_client.platform.system")
+@patch("src.gpu_telemetry.platform.system")
 def test_get_gpu_info_unsupported_os(mock_system, ollama_client):
     """
     get_gpu_infoメソッドが未対応のOS環境で呼び出された場合のテスト。
@@ -443,3 +438,357 @@ def test_get_gpu_info_unsupported_os(mock_system, ollama_client):
     # 検証
     assert result == []
     mock_system.assert_called_once()
+
+
+def test_init_pool_settings():
+    """
+    コネクションプールとタイムアウトの設定をテストします。
+    """
+    client = OllamaClient(pool_connections=2, pool_maxsize=4, connect_timeout=1.5, read_timeout=30.0, keep_alive=False)
+
+    assert client.timeout == (1.5, 30.0)
+    assert client.adapter.timeout == (1.5, 30.0)
+    assert client.session.get_adapter("http://localhost:11434") is client.adapter
+    assert client.session.headers["Connection"] == "close"
+    assert client.adapter._pool_maxsize == 4
+
+
+@patch("requests.adapters.HTTPAdapter.send")
+def test_session_applies_default_timeout(mock_send, ollama_client):
+    """
+    タイムアウト未指定のリクエストに既定のタイムアウトが適用されることをテストします。
+
+    Args:
+        mock_send: HTTPAdapter.sendのモック
+        ollama_client: OllamaClientインスタンス
+    """
+    # モックの設定
+    mock_response = MagicMock()
+    mock_response.raise_for_status.return_value = None
+    mock_response.json.return_value = {"models": []}
+    mock_send.return_value = mock_response
+
+    # テスト実行
+    ollama_client.list_running_models()
+    ollama_client.list_running_models()
+
+    # 検証
+    assert mock_send.call_count == 2
+    assert mock_send.call_args[1]["timeout"] == ollama_client.timeout
+    stats = ollama_client.get_pool_stats()
+    assert stats["total_requests"] == 2
+    assert stats["failed_requests"] == 0
+    assert stats["hosts"] == {}
+
+
+def test_get_pool_stats_reuses_connection(ollama_client):
+    """
+    同一ホストへのリクエストで接続が再利用されることをテストします。
+
+    Args:
+        ollama_client: OllamaClientインスタンス
+    """
+    import http.server
+    import threading
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            body = json.dumps({"models": []}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        client = OllamaClient(host=f"http://127.0.0.1:{server.server_address[1]}")
+        for _ in range(3):
+            assert client.list_running_models() == []
+
+        stats = client.get_pool_stats()
+        host_stats = stats["hosts"][f"http://127.0.0.1:{server.server_address[1]}"]
+        assert stats["total_requests"] == 3
+        assert host_stats["requests"] == 3
+        assert host_stats["connections_created"] == 1
+        assert host_stats["idle_connections"] == 1
+        client.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_get_model_info_is_cached_and_invalidated():
+    """
+    モデル情報がキャッシュされ、invalidate_cacheで破棄されることをテストします。
+    """
+    client = OllamaClient()
+
+    with patch.object(client, "_fetch_model_info", return_value={"details": {}}) as mock_fetch:
+        assert client.get_model_info("llama2") == {"details": {}}
+        assert client.get_model_info("llama2") == {"details": {}}
+        assert mock_fetch.call_count == 1
+
+        client.invalidate_cache("llama2")
+        client.get_model_info("llama2")
+        assert mock_fetch.call_count == 2
+
+    assert client.get_cache_stats()["model_info"]["hits"] == 1
+
+
+def test_failed_model_list_is_not_cached():
+    """
+    モデル一覧の取得に失敗した場合の空の結果がキャッシュされないことをテストします。
+    """
+    client = OllamaClient()
+
+    with patch.object(client, "_fetch_models", side_effect=[[], [{"name": "llama2"}], []]) as mock_fetch:
+        assert client.list_models() == []
+        assert client.list_models() == [{"name": "llama2"}]
+        assert client.list_models() == [{"name": "llama2"}]
+        assert mock_fetch.call_count == 2
+
+
+@patch("src.ollama_client.requests.Session.get")
+@patch("src.ollama_client.requests.Session.post")
+def test_kill_model_remembers_working_endpoint(mock_post, mock_get, ollama_client):
+    """
+    kill_modelが成功したエンドポイントを記録し、次回は失敗したエンドポイントを試さないことをテストします。
+
+    Args:
+        mock_post: requests.Sessionのpostメソッドのモック
+        mock_get: requests.Sessionのgetメソッドのモック
+        ollama_client: OllamaClientインスタンス
+    """
+    mock_get.side_effect = Exception("Connection error")
+
+    def post(url, json=None):
+        if url.endswith("/api/stop"):
+            raise Exception("Not found")
+        return MagicMock()
+
+    mock_post.side_effect = post
+
+    assert ollama_client.kill_model("abc123") is True
+    assert mock_post.call_count == 3
+
+    mock_post.reset_mock()
+    assert ollama_client.kill_model("abc123") is True
+    assert mock_post.call_args_list == [call("http://localhost:11434/api/kill", json={"id": "abc123"})]
+    assert ollama_client.get_capabilities()["strategies"]["kill_model"] == "kill"
+
+
+@patch("src.ollama_client.requests.Session.get")
+def test_get_capabilities(mock_get, ollama_client):
+    """
+    get_capabilitiesがサーバーのバージョンと記録した方法を返すことをテストします。
+
+    Args:
+        mock_get: requests.Sessionのgetメソッドのモック
+        ollama_client: OllamaClientインスタンス
+    """
+    mock_response = MagicMock()
+    mock_response.json.return_value = {"version": "0.5.7", "processes": []}
+    mock_get.return_value = mock_response
+
+    ollama_client.list_running_models()
+
+    assert ollama_client.get_capabilities() == {"version": "0.5.7", "strategies": {"list_running_models": "http"}}
+
+
+def test_text_accumulator_joins_across_blocks():
+    """
+    TextAccumulatorがblock_sizeをまたいでチャンクを順に結合することをテストします。
+    """
+    accumulator = TextAccumulator(block_size=3)
+    for i in range(10):
+        accumulator.append(str(i))
+
+    assert accumulator.getvalue() == "0123456789"
+    assert accumulator.getvalue() == "0123456789"
+    assert TextAccumulator().getvalue() == ""
+
+
+@patch("src.ollama_client.requests.Session.post")
+def test_chat_stream_assembles_long_reply(mock_post, ollama_client):
+    """
+    chat_streamが多数のチャンクから完全な応答を組み立てることをテストします。
+
+    Args:
+        mock_post: requests.Sessionのpostメソッドのモック
+        ollama_client: OllamaClientインスタンス
+    """
+    tokens = [f"t{i} " for i in range(1000)]
+    lines = [json.dumps({"message": {"role": "assistant", "content": token}, "done": False}).encode() for token in tokens]
+    lines.append(json.dumps({"message": {"role": "assistant", "content": ""}, "done": True}).encode())
+    # 行の途中で区切られたバッファとして返す
+    stream = b"\n".join(lines) + b"\n"
+    mock_post.return_value.iter_content.return_value = [stream[i : i + 7] for i in range(0, len(stream), 7)]
+
+    received = []
+    chunks = list(ollama_client.chat_stream("llama2", [], callback=received.append))
+
+    assert received[:-1] == tokens
+    assert chunks[-1]["done"] is True
+    assert chunks[-1]["message"]["content"] == "".join(tokens)
+
+
+def test_chat_stream_cancel_closes_upstream_response():
+    """
+    生成を中止するとollamaへの接続が閉じられ、途中までの応答が返されることをテストします。
+    """
+    import http.server
+    import threading
+    import time
+
+    from src.cancellation import CancellationToken
+
+    disconnected = threading.Event()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            # 接続が閉じられるまでゆっくりとトークンを送り続ける
+            deadline = time.monotonic() + 5.0
+            try:
+                while time.monotonic() < deadline:
+                    line = json.dumps({"message": {"role": "assistant", "content": "tok "}, "done": False}).encode() + b"\n"
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                    self.wfile.flush()
+                    time.sleep(0.05)
+            except (BrokenPipeError, ConnectionResetError):
+                disconnected.set()
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        client = OllamaClient(host=f"http://127.0.0.1:{server.server_address[1]}")
+        token = CancellationToken()
+        chunks = []
+        started = time.monotonic()
+        for chunk in client.chat_stream("llama2", [], cancel_token=token):
+            chunks.append(chunk)
+            if len(chunks) == 2:
+                # 別のスレッドから中止する（stop_generationイベントや切断の処理と同じ）
+                threading.Timer(0.02, token.cancel).start()
+
+        assert time.monotonic() - started < 2.0
+        assert chunks[-1]["cancelled"] is True
+        assert chunks[-1]["done"] is True
+        assert chunks[-1]["message"]["content"].startswith("tok tok ")
+        assert disconnected.wait(2.0)
+        client.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@patch("src.ollama_client.requests.Session.post")
+def test_chat_stream_replays_cached_response(mock_post):
+    """
+    temperatureが0のチャットの応答がキャッシュされ、2回目はollamaに送信せずに同じ形式のチャンクで返されることをテストします。
+
+    Args:
+        mock_post: requests.Sessionのpostメソッドのモック
+    """
+    from src.response_cache import ResponseCache
+
+    client = OllamaClient(response_cache=ResponseCache())
+    lines = [
+        json.dumps({"message": {"role": "assistant", "content": "こんにちは"}, "done": False}).encode(),
+        json.dumps({"message": {"role": "assistant", "content": ""}, "done": True, "eval_count": 5}).encode(),
+    ]
+    mock_post.return_value.iter_content.return_value = [b"\n".join(lines) + b"\n"]
+    messages = [{"role": "user", "content": "hi"}]
+
+    with patch.object(client, "_fetch_models", return_value=[{"name": "llama2:latest", "digest": "sha256:aaa"}]):
+        first = list(client.chat_stream("llama2", messages, options={"temperature": 0}))
+        received = []
+        second = list(client.chat_stream("llama2", messages, options={"temperature": 0}, callback=received.append))
+        # temperatureが0でない場合はキャッシュしない
+        list(client.chat_stream("llama2", messages, options={"temperature": 0.8}))
+        assert client.chat("llama2", messages, options={"temperature": 0})["cached"] is True
+
+    assert mock_post.call_count == 2
+    assert first[-1]["message"]["content"] == "こんにちは"
+    assert "cached" not in first[-1]
+    assert second[-1]["cached"] is True
+    assert second[-1]["message"]["content"] == "こんにちは"
+    assert "".join(received) == "こんにちは"
+    stats = client.get_cache_stats()["responses"]
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+
+
+@patch("src.ollama_client.requests.Session.post")
+def test_chat_stream_returns_semantically_cached_reply(mock_post):
+    """
+    意味の近い質問にはollamaで生成せずにキャッシュした応答が返されることをテストします。
+
+    Args:
+        mock_post: requests.Sessionのpostメソッドのモック
+    """
+    pytest.importorskip("numpy")
+    from src.semantic_cache import SemanticCache
+
+    client = OllamaClient(semantic_cache=SemanticCache("nomic-embed-text", threshold=0.9))
+    embeddings = {"空はなぜ青いの？": [1.0, 0.0], "空はどうして青い？": [0.99, 0.05], "海はなぜ塩辛い？": [0.0, 1.0]}
+    lines = [
+        json.dumps({"message": {"role": "assistant", "content": "散乱のためです"}, "done": False}).encode(),
+        json.dumps({"message": {"role": "assistant", "content": ""}, "done": True}).encode(),
+    ]
+
+    def post(url, json=None, stream=False):
+        response = MagicMock()
+        if url.endswith("/api/embeddings"):
+            assert json["model"] == "nomic-embed-text"
+            response.json.return_value = {"embedding": embeddings[json["prompt"]]}
+        else:
+            response.iter_content.return_value = [b"\n".join(lines) + b"\n"]
+        return response
+
+    mock_post.side_effect = post
+
+    def ask(question):
+        return list(client.chat_stream("llama2", [{"role": "user", "content": question}]))
+
+    assert "cached" not in ask("空はなぜ青いの？")[-1]
+    similar = ask("空はどうして青い？")
+    assert similar[-1]["cached"] is True
+    assert similar[-1]["message"]["content"] == "散乱のためです"
+    assert "cached" not in ask("海はなぜ塩辛い？")[-1]
+
+    chat_urls = [c.args[0] for c in mock_post.call_args_list if c.args[0].endswith("/api/chat")]
+    assert len(chat_urls) == 2
+    assert client.get_cache_stats()["semantic"]["hits"] == 1
+
+
+@patch("src.ollama_client.requests.Session.post")
+def test_embed_failure_returns_none(mock_post, ollama_client):
+    """
+    埋め込みの取得に失敗した場合にNoneが返されることをテストします。
+
+    Args:
+        mock_post: requests.Sessionのpostメソッドのモック
+        ollama_client: OllamaClientインスタンス
+    """
+    mock_post.side_effect = Exception("Connection error")
+
+    assert ollama_client.embed("nomic-embed-text", "こんにちは") is None
@@ -0,0 +1,313 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+OllamaPoolクラスのテストモジュール。
+"""
+
+import pytest
+from unittest.mock import MagicMock
+
+from src.ollama_pool import NoHealthyBackend, OllamaPool, PoolMember, PoolRouter, normalize_model_name, parse_resident_models
+
+
+class FakeClock:
+    """
+    テスト用の時計。
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def ps_response(*models):
+    """
+    /api/ps の応答を作成します。
+
+    Args:
+        *models: (モデル名, VRAMの使用バイト数) のタプル
+
+    Returns:
+        dict: /api/ps の応答
+    """
+    return {"models": [{"name": name, "digest": "abcdef1234567890", "size_vram": vram} for name, vram in models]}
+
+
+@pytest.fixture
+def pool():
+    """
+    3つのホストのクライアントをモックに置き換えたOllamaPoolを提供するフィクスチャ。
+    """
+    pool = OllamaPool(["http://gpu1:11434", "http://gpu2:11434", "http://gpu3:11434/"], clock=FakeClock())
+    for member in pool.members:
+        member.client = MagicMock()
+    return pool
+
+
+def test_normalize_model_name_and_parse_resident_models():
+    """
+    モデル名の正規化と /api/ps の応答の解析をテストします。
+    """
+    assert normalize_model_name("llama2") == "llama2:latest"
+    assert normalize_model_name("llama2:13b") == "llama2:13b"
+
+    names, vram = parse_resident_models(ps_response(("llama2:latest", 100), ("mistral", 50)))
+    assert names == {"llama2:latest", "mistral:latest"}
+    assert vram == 150
+    assert parse_resident_models([]) == (set(), 0)
+
+
+def test_router_requires_members():
+    """
+    ホストのないPoolRouterは作成できないことをテストします。
+    """
+    with pytest.raises(ValueError):
+        PoolRouter([])
+
+
+def test_router_prefers_resident_then_least_loaded():
+    """
+    モデルをロード済みのホストを優先し、同じ条件では実行中の応答数の少ないホストを選択することをテストします。
+    """
+    a, b, c = PoolMember("a", None), PoolMember("b", None), PoolMember("c", None)
+    router = PoolRouter([a, b, c])
+    router.update_health(a, ps_response(("mistral", 10)))
+    router.update_health(b, ps_response(("llama2", 10)))
+    router.update_health(c, ps_response(("llama2", 10), ("phi", 10)))
+
+    assert router.candidates("llama2") == [b, c, a]
+    router.acquire(b)
+    assert router.candidates("llama2") == [c, b, a]
+
+    # ロード済みのホストがない場合は負荷（実行中の応答数、VRAMの使用量）の低いホストに配置する
+    assert router.candidates("gemma")[0] is a
+    router.release(b)
+    router.acquire(a)
+    assert router.candidates("gemma") == [b, c, a]
+
+
+def test_router_ejects_after_consecutive_failures():
+    """
+    連続して失敗したホストが一定時間振り分けの対象から外れ、その後に戻ることをテストします。
+    """
+    clock = FakeClock()
+    a, b = PoolMember("a", None), PoolMember("b", None)
+    router = PoolRouter([a, b], failure_threshold=2, eject_seconds=10.0, clock=clock)
+
+    router.record_failure(a, RuntimeError("boom"))
+    assert router.candidates() == [a, b]
+    router.record_success(a)
+    router.record_failure(a, RuntimeError("boom"))
+    assert router.candidates() == [a, b]  # 成功で連続失敗回数がリセットされる
+    router.record_failure(a, RuntimeError("boom"))
+    assert router.candidates() == [b]
+    assert router.status()[0]["available"] is False
+    assert router.status()[0]["ejected_for"] == 10.0
+
+    clock.now = 10.5
+    assert router.candidates() == [a, b]
+
+
+def test_router_falls_back_to_all_members_when_none_available():
+    """
+    すべてのホストが対象外の場合はすべてのホストを候補とすることをテストします。
+    """
+    a, b = PoolMember("a", None), PoolMember("b", None)
+    router = PoolRouter([a, b])
+    router.update_health(a, error=RuntimeError("down"))
+    assert router.candidates() == [b]
+    router.update_health(b, error=RuntimeError("down"))
+    assert router.candidates() == [a, b]
+
+
+def test_list_running_models_checks_health(pool):
+    """
+    起動中のモデルの一覧の取得でヘルスチェックが行われることをテストします。
+
+    Args:
+        pool: OllamaPoolインスタンス
+    """
+    gpu1, gpu2, gpu3 = pool.members
+    gpu1.client.fetch_ps.return_value = ps_response(("llama2:latest", 100))
+    gpu2.client.fetch_ps.side_effect = ConnectionError("refused")
+    gpu3.client.fetch_ps.return_value = ps_response()
+
+    models = pool.list_running_models()
+
+    assert models == [{"id": "abcdef123456", "model": "llama2:latest", "host": "http://gpu1:11434"}]
+    status = pool.get_pool_stats()["backends"]
+    assert [s["host"] for s in status] == ["http://gpu1:11434", "http://gpu2:11434", "http://gpu3:11434"]
+    assert [s["healthy"] for s in status] == [True, False, True]
+    assert status[0]["resident_models"] == ["llama2:latest"]
+    assert status[1]["last_error"] == "refused"
+
+
+def test_chat_stream_routes_to_resident_host(pool):
+    """
+    chat_streamがモデルをロード済みのホストに送信されることをテストします。
+
+    Args:
+        pool: OllamaPoolインスタンス
+    """
+    gpu1, gpu2, gpu3 = pool.members
+    gpu1.client.fetch_ps.return_value = ps_response(("mistral", 100))
+    gpu2.client.fetch_ps.return_value = ps_response(("llama2", 100))
+    gpu3.client.fetch_ps.return_value = ps_response()
+    pool.check_health()
+
+    def fake_chat_stream(model, messages, **kwargs):
+        assert gpu2.in_flight == 1
+        yield {"message": {"role": "assistant", "content": "こんにちは"}, "done": True}
+
+    gpu2.client.chat_stream.side_effect = fake_chat_stream
+
+    chunks = list(pool.chat_stream("llama2", [{"role": "user", "content": "こんにちは"}]))
+
+    assert chunks[-1]["message"]["content"] == "こんにちは"
+    gpu1.client.chat_stream.assert_not_called()
+    gpu3.client.chat_stream.assert_not_called()
+    assert gpu2.in_flight == 0
+    assert gpu2.requests == 1
+
+
+def test_chat_stream_retries_next_host_before_first_chunk(pool):
+    """
+    最初のチャンクを受信する前に失敗した場合は次のホストで再試行し、新たにロードしたホストを記録することをテストします。
+
+    Args:
+        pool: OllamaPoolインスタンス
+    """
+    gpu1, gpu2, gpu3 = pool.members
+    gpu1.client.chat_stream.side_effect = ConnectionError("refused")
+    gpu2.client.chat_stream.return_value = iter([{"message": {"role": "assistant", "content": "ok"}, "done": True}])
+
+    chunks = list(pool.chat_stream("gemma", []))
+
+    assert chunks == [{"message": {"role": "assistant", "content": "ok"}, "done": True}]
+    gpu3.client.chat_stream.assert_not_called()
+    assert gpu1.failures == 1
+    assert gpu1.in_flight == 0
+    assert "gemma:latest" in gpu2.resident_models
+    # 次のリクエストはロード済みのホストに送信される
+    assert pool.router.candidates("gemma")[0] is gpu2
+
+
+def test_chat_stream_does_not_retry_after_first_chunk(pool):
+    """
+    応答の途中で失敗した場合は再試行せずに例外を送出することをテストします。
+
+    Args:
+        pool: OllamaPoolインスタンス
+    """
+    gpu1, gpu2, _ = pool.members
+
+    def broken_stream(model, messages, **kwargs):
+        yield {"message": {"role": "assistant", "content": "途中"}, "done": False}
+        raise ConnectionError("reset")
+
+    gpu1.client.chat_stream.side_effect = broken_stream
+
+    stream = pool.chat_stream("llama2", [])
+    assert next(stream)["message"]["content"] == "途中"
+    with pytest.raises(ConnectionError):
+        next(stream)
+    gpu2.client.chat_stream.assert_not_called()
+    assert gpu1.in_flight == 0
+
+
+def test_chat_stream_ejects_failing_host(pool):
+    """
+    連続して失敗したホストが振り分けの対象から外れ、すべて失敗した場合はNoHealthyBackendを送出することをテストします。
+
+    Args:
+        pool: OllamaPoolインスタンス
+    """
+    for member in pool.members:
+        member.client.chat_stream.side_effect = ConnectionError("refused")
+
+    for _ in range(3):
+        with pytest.raises(NoHealthyBackend):
+            list(pool.chat_stream("llama2", []))
+
+    assert all(s["available"] is False for s in pool.get_pool_stats()["backends"])
+
+    # 復旧までの間もすべてのホストを候補として試す
+    pool.members[2].client.chat_stream.side_effect = None
+    pool.members[2].client.chat_stream.return_value = iter([{"message": {"role": "assistant", "content": "ok"}, "done": True}])
+    assert list(pool.chat_stream("llama2", []))[-1]["message"]["content"] == "ok"
+    assert pool.router.candidates("llama2") == [pool.members[2]]
+
+
+def test_list_models_merges_hosts(pool):
+    """
+    モデルの一覧がホストをまたいで重複なくまとめられることをテストします。
+
+    Args:
+        pool: OllamaPoolインスタンス
+    """
+    gpu1, gpu2, gpu3 = pool.members
+    gpu1.client.list_models.return_value = [{"name": "llama2:latest"}]
+    gpu2.client.list_models.return_value = [{"name": "llama2:latest"}, {"name": "mistral:latest"}]
+    gpu3.client.list_models.return_value = []
+
+    assert pool.list_models() == [{"name": "llama2:latest"}, {"name": "mistral:latest"}]
+
+
+def test_kill_model_targets_resident_hosts(pool):
+    """
+    モデルの終了がロード済みのホストにのみ送信されることをテストします。
+
+    Args:
+        pool: OllamaPoolインスタンス
+    """
+    gpu1, gpu2, gpu3 = pool.members
+    gpu1.client.fetch_ps.return_value = ps_response()
+    gpu2.client.fetch_ps.return_value = ps_response(("llama2", 100))
+    gpu3.client.fetch_ps.return_value = ps_response()
+    gpu2.client.kill_model.return_value = True
+    pool.check_health()
+
+    assert pool.kill_model("llama2:latest") is True
+    gpu2.client.kill_model.assert_called_once_with("llama2:latest")
+    gpu1.client.kill_model.assert_not_called()
+    assert gpu2.resident_models == set()
+
+
+def test_preload_model_records_resident_host(pool):
+    """
+    preload_modelが負荷の低いホストでモデルをロードし、ロード済みのホストとして記録することをテストします。
+
+    Args:
+        pool: OllamaPoolインスタンス
+    """
+    gpu1, gpu2, _ = pool.members
+    pool.router.acquire(gpu1)
+    gpu2.client.preload_model.return_value = True
+
+    assert pool.preload_model("gemma", keep_alive="10m") is True
+    gpu2.client.preload_model.assert_called_once_with("gemma", keep_alive="10m")
+    assert pool.router.candidates("gemma")[0] is gpu2
+
+
+def test_generate_stream_routes_to_resident_host(pool):
+    """
+    generate_streamがchat_streamと同じくモデルをロード済みのホストに送信されることをテストします。
+
+    Args:
+        pool: OllamaPoolインスタンス
+    """
+    gpu1, gpu2, gpu3 = pool.members
+    gpu1.client.fetch_ps.return_value = ps_response()
+    gpu2.client.fetch_ps.return_value = ps_response()
+    gpu3.client.fetch_ps.return_value = ps_response(("llama2", 100))
+    pool.check_health()
+    gpu3.client.generate_stream.return_value = iter([{"message": {"role": "assistant", "content": "ok"}, "done": True}])
+
+    chunks = list(pool.generate_stream("llama2", "こんにちは", context=[1, 2]))
+
+    assert chunks[-1]["message"]["content"] == "ok"
+    assert gpu3.client.generate_stream.call_args.kwargs["context"] == [1, 2]
+    gpu1.client.generate_stream.assert_not_called()
+    assert gpu3.requests == 1
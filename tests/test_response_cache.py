@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+response_cacheモジュールのテストモジュール。
+"""
+
+import json
+import os
+
+from src.metrics import RESPONSE_CACHE_REQUESTS
+from src.response_cache import (
+    DISK,
+    MEMORY,
+    MISS,
+    ResponseCache,
+    cacheable_response,
+    find_model_digest,
+    is_deterministic,
+    replay_chunks,
+    response_cache_key,
+)
+
+
+class FakeClock:
+    """
+    テスト用の時計。
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def final_chunk(content: str) -> dict:
+    """
+    ollamaの最後のチャンクを作成します。
+    """
+    return {
+        "model": "llama2",
+        "created_at": "2024-01-01T00:00:00Z",
+        "message": {"role": "assistant", "content": content},
+        "done": True,
+        "done_reason": "stop",
+        "eval_count": 10,
+        "eval_duration": 1_000_000,
+    }
+
+
+def test_is_deterministic():
+    """
+    temperatureが0の場合だけ決定的と判定されることをテストします。
+    """
+    assert is_deterministic({"temperature": 0})
+    assert is_deterministic({"temperature": "0.0"})
+    assert not is_deterministic({"temperature": 0.7})
+    assert not is_deterministic({})
+    assert not is_deterministic(None)
+    assert not is_deterministic({"temperature": "abc"})
+
+
+def test_find_model_digest():
+    """
+    タグを省略したモデル名でもダイジェストが見つかることをテストします。
+    """
+    models = [{"name": "llama2:latest", "digest": "sha256:aaa"}, {"name": "mistral:7b"}]
+
+    assert find_model_digest(models, "llama2") == "sha256:aaa"
+    assert find_model_digest(models, "llama2:latest") == "sha256:aaa"
+    assert find_model_digest(models, "mistral:7b") is None
+    assert find_model_digest(models, "unknown") is None
+
+
+def test_response_cache_key_is_canonical():
+    """
+    キーがオプションの順序に左右されず、ダイジェストやメッセージが違えば変わることをテストします。
+    """
+    messages = [{"role": "user", "content": "こんにちは"}]
+    key = response_cache_key("llama2", "sha256:aaa", messages, {"temperature": 0, "top_p": 0.9})
+
+    assert key == response_cache_key("llama2", "sha256:aaa", messages, {"top_p": 0.9, "temperature": 0})
+    assert key != response_cache_key("llama2", "sha256:bbb", messages, {"temperature": 0, "top_p": 0.9})
+    assert key != response_cache_key("llama2", "sha256:aaa", [], {"temperature": 0, "top_p": 0.9})
+
+
+def test_replay_chunks_matches_stream_format():
+    """
+    キャッシュした応答が途中のチャンクと完全な応答を含む最後のチャンクに分けられることをテストします。
+    """
+    response = cacheable_response(final_chunk("abcdefg"))
+    assert "eval_count" not in response
+
+    chunks = list(replay_chunks(response, chunk_chars=3))
+
+    assert [chunk["message"]["content"] for chunk in chunks] == ["abc", "def", "g", "abcdefg"]
+    assert [chunk["done"] for chunk in chunks] == [False, False, False, True]
+    assert chunks[-1]["cached"] is True
+    assert chunks[-1]["done_reason"] == "stop"
+
+
+def test_memory_tier_hits_and_evicts_by_bytes():
+    """
+    メモリのキャッシュが合計バイト数の上限を超えると最も古く使われた応答から破棄することをテストします。
+    """
+    size = len(json.dumps(cacheable_response(final_chunk("x" * 100))).encode("utf-8"))
+    cache = ResponseCache(memory_max_bytes=size * 2)
+    before_misses = RESPONSE_CACHE_REQUESTS.get(result=MISS)
+
+    cache.put("a", final_chunk("x" * 100))
+    cache.put("b", final_chunk("y" * 100))
+    assert cache.lookup("a")[1] == MEMORY
+    cache.put("c", final_chunk("z" * 100))
+
+    assert cache.get("b") is None
+    assert cache.get("a")["message"]["content"] == "x" * 100
+    assert cache.get("c")["message"]["content"] == "z" * 100
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["bytes"] == size * 2
+    assert stats["memory_hits"] == 3
+    assert stats["misses"] == 1
+    assert RESPONSE_CACHE_REQUESTS.get(result=MISS) == before_misses + 1
+
+    # 上限より大きい応答は保存しない
+    cache.put("d", final_chunk("w" * 1000))
+    assert cache.get("d") is None
+
+
+def test_entries_expire_after_ttl(tmp_path):
+    """
+    TTLを過ぎた応答がメモリとディスクのどちらからも返されないことをテストします。
+    """
+    clock = FakeClock()
+    cache = ResponseCache(disk_dir=str(tmp_path), ttl=60.0, clock=clock)
+    cache.put("a", final_chunk("hello"))
+
+    clock.now += 59.0
+    assert cache.get("a") is not None
+    clock.now += 2.0
+    assert cache.get("a") is None
+    assert cache.stats()["disk_entries"] == 0
+
+
+def test_disk_tier_survives_restart_and_promotes(tmp_path):
+    """
+    ディスクに保存した応答が作り直したキャッシュから読み込まれ、メモリに移されることをテストします。
+    """
+    cache = ResponseCache(disk_dir=str(tmp_path))
+    key = response_cache_key("llama2", "sha256:aaa", [], {"temperature": 0})
+    cache.put(key, final_chunk("こんにちは"))
+    assert os.path.exists(os.path.join(str(tmp_path), key[:2], f"{key}.json"))
+
+    reopened = ResponseCache(disk_dir=str(tmp_path))
+    response, result = reopened.lookup(key)
+    assert result == DISK
+    assert response["message"]["content"] == "こんにちは"
+    assert reopened.lookup(key)[1] == MEMORY
+    assert reopened.stats()["disk_hits"] == 1
+
+
+def test_disk_tier_evicts_by_bytes_and_drops_corrupt_files(tmp_path):
+    """
+    ディスクのキャッシュが上限を超えると古い応答のファイルを削除し、壊れたファイルを無視することをテストします。
+    """
+    clock = FakeClock()
+    cache = ResponseCache(memory_max_bytes=0, disk_dir=str(tmp_path), disk_max_bytes=600, clock=clock)
+    for key in ("aa1", "bb2", "cc3"):
+        cache.put(key, final_chunk("x" * 100))
+        clock.now += 1.0
+
+    assert cache.get("aa1") is None
+    assert not os.path.exists(os.path.join(str(tmp_path), "aa", "aa1.json"))
+    assert cache.get("cc3") is not None
+    assert cache.stats()["disk_bytes"] <= 600
+
+    with open(os.path.join(str(tmp_path), "cc", "cc3.json"), "w") as f:
+        f.write("{broken")
+    assert cache.get("cc3") is None
+    assert cache.stats()["disk_entries"] == 1
@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+スケジューラのテストモジュール。
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from src.cancellation import CancellationToken
+from src.scheduler import (
+    ADMITTED,
+    CANCELLED,
+    QUEUED,
+    AdmissionQueue,
+    AsyncGenerationScheduler,
+    GenerationScheduler,
+    QueueFull,
+    Ticket,
+    parse_model_limits,
+)
+
+
+class FakeClock:
+    """
+    テスト用の時計。
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_parse_model_limits():
+    """
+    モデルごとの同時実行数の設定の解析をテストします。
+    """
+    assert parse_model_limits("") == {}
+    assert parse_model_limits("llama2=4, mistral:7b=1,invalid") == {"llama2:latest": 4, "mistral:7b": 1}
+
+
+def test_admits_up_to_limit_per_model():
+    """
+    モデルごとの同時実行数まですぐに実行を許可し、超えた分を待ち行列に入れることをテストします。
+    """
+    queue = AdmissionQueue(max_concurrent_per_model=2, model_limits={"mistral": 1})
+    tickets = [Ticket("llama2", "a") for _ in range(3)]
+    for ticket in tickets:
+        queue.submit(ticket)
+
+    assert [t.state for t in tickets] == [ADMITTED, ADMITTED, QUEUED]
+    assert tickets[2].position == 1
+
+    # 別のモデルは別の上限で管理される
+    mistral = [Ticket("mistral:latest", "a"), Ticket("mistral", "b")]
+    for ticket in mistral:
+        queue.submit(ticket)
+    assert [t.state for t in mistral] == [ADMITTED, QUEUED]
+
+    changed = queue.finish(tickets[0])
+    assert changed == [tickets[2]]
+    assert tickets[2].state == ADMITTED
+    assert queue.stats()["llama2:latest"]["running"] == 2
+
+
+def test_limits_scale_with_backends():
+    """
+    同時実行数がollamaサーバー1台あたりの値としてサーバー数倍になることをテストします。
+    """
+    queue = AdmissionQueue(max_concurrent_per_model=2, model_limits={"mistral": 1}, backends=3)
+
+    assert queue.limit("llama2") == 6
+    assert queue.limit("mistral:latest") == 3
+    tickets = [Ticket("llama2", "a") for _ in range(7)]
+    for ticket in tickets:
+        queue.submit(ticket)
+    assert [t.state for t in tickets].count(ADMITTED) == 6
+    assert queue.stats()["llama2:latest"]["limit"] == 6
+
+
+def test_round_robin_between_users():
+    """
+    待ち行列からユーザーごとに順番に取り出されることをテストします。
+    """
+    queue = AdmissionQueue(max_concurrent_per_model=1, max_queue_per_user=10)
+    running = Ticket("llama2", "a")
+    queue.submit(running)
+
+    # ユーザーaが3件送信した後にユーザーbが1件送信する
+    a_tickets = [Ticket("llama2", "a") for _ in range(3)]
+    for ticket in a_tickets:
+        queue.submit(ticket)
+    b_ticket = Ticket("llama2", "b")
+    queue.submit(b_ticket)
+
+    assert [t.position for t in a_tickets] == [1, 3, 4]
+    assert b_ticket.position == 2
+
+    order = []
+    current = running
+    for _ in range(4):
+        admitted = [t for t in queue.finish(current) if t.state == ADMITTED]
+        assert len(admitted) == 1
+        current = admitted[0]
+        order.append(current)
+    assert order == [a_tickets[0], b_ticket, a_tickets[1], a_tickets[2]]
+
+
+def test_rejects_when_queue_is_full():
+    """
+    待ち行列が一杯の場合に再試行までの秒数を付けて拒否することをテストします。
+    """
+    clock = FakeClock()
+    queue = AdmissionQueue(max_concurrent_per_model=1, max_queue=2, max_queue_per_user=1, initial_duration=10.0, clock=clock)
+    queue.submit(Ticket("llama2", "a"))
+    queue.submit(Ticket("llama2", "b"))
+
+    # ユーザーごとの上限
+    with pytest.raises(QueueFull) as e:
+        queue.submit(Ticket("llama2", "b"))
+    assert e.value.retry_after == 20
+
+    queue.submit(Ticket("llama2", "c"))
+    # モデルの待ち行列の上限
+    with pytest.raises(QueueFull) as e:
+        queue.submit(Ticket("llama2", "d"))
+    assert e.value.retry_after == 30
+    assert queue.stats()["llama2:latest"]["rejected"] == 2
+
+
+def test_withdraw_updates_positions():
+    """
+    待ち行列から取り消すと後ろのリクエストの順番が繰り上がることをテストします。
+    """
+    queue = AdmissionQueue(max_concurrent_per_model=1)
+    queue.submit(Ticket("llama2", "a"))
+    second, third = Ticket("llama2", "b"), Ticket("llama2", "c")
+    queue.submit(second)
+    queue.submit(third)
+
+    changed = queue.withdraw(second)
+
+    assert changed == [second, third]
+    assert second.state == CANCELLED
+    assert third.position == 1
+    assert queue.withdraw(second) == []
+
+
+def test_scheduler_waits_and_reports_position():
+    """
+    GenerationSchedulerが順番を通知しながら待機し、空きができたら実行を許可することをテストします。
+    """
+    scheduler = GenerationScheduler(max_concurrent_per_model=1)
+    first = scheduler.acquire("llama2", "a")
+    positions = []
+    result = {}
+
+    def waiter():
+        result["ticket"] = scheduler.acquire("llama2", "b", on_queued=positions.append)
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    while not positions:
+        thread.join(0.01)
+
+    scheduler.release(first)
+    thread.join(2.0)
+
+    assert positions == [1]
+    assert result["ticket"].state == ADMITTED
+    scheduler.release(result["ticket"])
+    assert scheduler.stats()["llama2:latest"]["running"] == 0
+
+
+def test_scheduler_cancel_while_queued():
+    """
+    待機中に中止されると待ち行列から取り除かれ、Noneが返されることをテストします。
+    """
+    scheduler = GenerationScheduler(max_concurrent_per_model=1)
+    first = scheduler.acquire("llama2", "a")
+    token = CancellationToken()
+    result = {}
+
+    thread = threading.Thread(target=lambda: result.setdefault("ticket", scheduler.acquire("llama2", "b", cancel_token=token)))
+    thread.start()
+    while scheduler.stats()["llama2:latest"]["queued"] == 0:
+        thread.join(0.01)
+    token.cancel()
+    thread.join(2.0)
+
+    assert result["ticket"] is None
+    assert scheduler.stats()["llama2:latest"]["queued"] == 0
+    scheduler.release(first)
+
+
+def test_async_scheduler():
+    """
+    AsyncGenerationSchedulerが順番を待って実行を許可し、中止された場合はNoneを返すことをテストします。
+    """
+
+    async def run():
+        scheduler = AsyncGenerationScheduler(max_concurrent_per_model=1)
+        first = await scheduler.acquire("llama2", "a")
+        positions = []
+
+        async def on_queued(position):
+            positions.append(position)
+
+        second = asyncio.ensure_future(scheduler.acquire("llama2", "b", on_queued=on_queued))
+        token = CancellationToken()
+        third = asyncio.ensure_future(scheduler.acquire("llama2", "c", cancel_token=token))
+        await asyncio.sleep(0.01)
+        assert positions == [1]
+
+        token.cancel()
+        assert await asyncio.wait_for(third, 1.0) is None
+
+        scheduler.release(first)
+        ticket = await asyncio.wait_for(second, 1.0)
+        assert ticket.state == ADMITTED
+        scheduler.release(ticket)
+        assert scheduler.stats()["llama2:latest"]["running"] == 0
+
+    asyncio.run(run())
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+semantic_cacheモジュールのテストモジュール。
+"""
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from src.semantic_cache import SemanticCache, SemanticQuery, semantic_scope  # noqa: E402
+
+
+class FakeClock:
+    """
+    テスト用の時計。
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def final_chunk(content: str) -> dict:
+    """
+    ollamaの最後のチャンクを作成します。
+    """
+    return {"model": "llama2", "message": {"role": "assistant", "content": content}, "done": True, "eval_count": 3}
+
+
+def test_semantic_scope():
+    """
+    範囲のキーがモデル名、システムプロンプト、それまでの会話で決まることをテストします。
+    """
+    question = [{"role": "user", "content": "空はなぜ青い？"}]
+    scope, text = semantic_scope("llama2", question)
+
+    assert text == "空はなぜ青い？"
+    assert semantic_scope("llama2:latest", question)[0] == scope
+    assert semantic_scope("mistral", question)[0] != scope
+    assert semantic_scope("llama2", [{"role": "system", "content": "英語で答えて"}] + question)[0] != scope
+    history = [{"role": "user", "content": "こんにちは"}, {"role": "assistant", "content": "こんにちは！"}]
+    assert semantic_scope("llama2", history + question)[0] != scope
+    assert semantic_scope("llama2", history) is None
+    assert semantic_scope("llama2", [{"role": "user", "content": "  "}]) is None
+    assert semantic_scope("llama2", []) is None
+
+
+def test_lookup_returns_similar_question():
+    """
+    閾値以上の類似度の質問の応答が返され、範囲や閾値が合わない場合は返されないことをテストします。
+    """
+    cache = SemanticCache("embed", threshold=0.9)
+    cache.put(SemanticQuery("s1", [1.0, 0.0, 0.0]), final_chunk("青い光が散乱するためです"))
+
+    hit = cache.lookup(SemanticQuery("s1", [0.98, 0.1, 0.0]))
+    assert hit["message"]["content"] == "青い光が散乱するためです"
+    assert hit["similarity"] > 0.9
+    assert "eval_count" not in hit
+
+    assert cache.lookup(SemanticQuery("s1", [0.5, 0.5, 0.0])) is None
+    assert cache.lookup(SemanticQuery("s2", [1.0, 0.0, 0.0])) is None
+    # 次元の異なるベクトルやゼロベクトルは一致しない
+    assert cache.lookup(SemanticQuery("s1", [1.0, 0.0])) is None
+    assert cache.lookup(SemanticQuery("s1", [0.0, 0.0, 0.0])) is None
+
+    assert cache.stats() == {"scopes": 1, "entries": 1, "hits": 1, "misses": 4, "stores": 1}
+
+
+def test_entries_expire_and_evict_by_capacity():
+    """
+    TTLを過ぎた応答が返されず、容量に達すると最も古い質問から置き換えられることをテストします。
+    """
+    clock = FakeClock()
+    cache = SemanticCache("embed", threshold=0.99, max_entries=2, max_scopes=2, ttl=60.0, clock=clock)
+    cache.put(SemanticQuery("s1", [1.0, 0.0]), final_chunk("a"))
+    clock.now += 1.0
+    cache.put(SemanticQuery("s1", [0.0, 1.0]), final_chunk("b"))
+    clock.now += 1.0
+    cache.put(SemanticQuery("s1", [1.0, 1.0]), final_chunk("c"))
+
+    assert cache.lookup(SemanticQuery("s1", [1.0, 0.0])) is None
+    assert cache.lookup(SemanticQuery("s1", [0.0, 1.0]))["message"]["content"] == "b"
+    assert cache.lookup(SemanticQuery("s1", [1.0, 1.0]))["message"]["content"] == "c"
+
+    clock.now += 61.0
+    assert cache.lookup(SemanticQuery("s1", [1.0, 1.0])) is None
+
+    # 範囲の数が上限を超えると最も古く使われた範囲を破棄する
+    cache.put(SemanticQuery("s2", [1.0, 0.0]), final_chunk("d"))
+    cache.put(SemanticQuery("s3", [1.0, 0.0]), final_chunk("e"))
+    assert cache.stats()["scopes"] == 2
+    assert cache.lookup(SemanticQuery("s1", [0.0, 1.0])) is None
+
+
+def test_index_grows_beyond_initial_rows():
+    """
+    最初の行数を超えて質問を追加しても、すべての質問が検索できることをテストします。
+    """
+    cache = SemanticCache("embed", threshold=0.999, max_entries=100)
+    for i in range(40):
+        vector = [0.0] * 40
+        vector[i] = 1.0
+        cache.put(SemanticQuery("s1", vector), final_chunk(str(i)))
+
+    for i in (0, 17, 39):
+        vector = [0.0] * 40
+        vector[i] = 1.0
+        assert cache.lookup(SemanticQuery("s1", vector))["message"]["content"] == str(i)
+    assert cache.stats()["entries"] == 40
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+SessionManagerクラスのテストモジュール。
+"""
+
+import asyncio
+import threading
+
+from src.conversation_store import MemoryConversationStore
+from src.session_manager import SessionManager
+
+
+class FakeClock:
+    """
+    テスト用の手動で進める時計。
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_get_creates_and_reuses_session():
+    """
+    同じIDでは同じセッションが返され、異なるIDでは別のセッションが返されることをテストします。
+    """
+    manager = SessionManager(default_params={"temperature": 0.7})
+
+    session_a = manager.get("a")
+    session_b = manager.get("b")
+
+    assert manager.get("a") is session_a
+    assert session_a is not session_b
+    assert session_a.params == {"temperature": 0.7}
+    assert session_a.model is None
+    assert len(manager) == 2
+
+
+def test_default_params_are_copied():
+    """
+    セッションごとのパラメータが互いに影響しないことをテストします。
+    """
+    manager = SessionManager(default_params={"temperature": 0.7})
+
+    manager.get("a").params["temperature"] = 0.1
+
+    assert manager.get("b").params["temperature"] == 0.7
+    assert manager.default_params["temperature"] == 0.7
+
+
+def test_lru_eviction():
+    """
+    最大数を超えた場合に最も長くアクセスされていないセッションが破棄されることをテストします。
+    """
+    manager = SessionManager(max_sessions=2)
+
+    manager.get("a")
+    manager.get("b")
+    manager.get("a")  # aを最新にする
+    manager.get("c")
+
+    assert "a" in manager
+    assert "b" not in manager
+    assert "c" in manager
+    assert manager.stats()["evicted"] == 1
+
+
+def test_idle_ttl_eviction():
+    """
+    アイドル時間がTTLを超えたセッションが破棄されることをテストします。
+    """
+    clock = FakeClock()
+    manager = SessionManager(idle_ttl=10.0, clock=clock)
+
+    manager.get("a")
+    clock.now = 5.0
+    manager.get("b")
+    clock.now = 12.0
+
+    assert manager.evict_expired() == 1
+    assert "a" not in manager
+    assert "b" in manager
+
+    clock.now = 30.0
+    manager.get("c")
+    assert "b" not in manager
+    assert len(manager) == 1
+
+
+def test_remove():
+    """
+    removeメソッドをテストします。
+    """
+    manager = SessionManager()
+    manager.get("a")
+
+    assert manager.remove("a") is True
+    assert manager.remove("a") is False
+    assert len(manager) == 0
+
+
+def test_concurrent_access():
+    """
+    複数スレッドから同時にアクセスしてもセッションが一意に保たれることをテストします。
+    """
+    manager = SessionManager()
+    results = []
+
+    def worker():
+        for _ in range(100):
+            chat_session = manager.get("shared")
+            chat_session.add_message("user", "hello")
+        results.append(manager.get("shared"))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(result is results[0] for result in results)
+    assert len(results[0].get_messages()) == 800
+
+
+def test_session_is_restored_from_store():
+    """
+    ストアを指定した場合、破棄されたセッションがクライアントの最後の会話の直近のメッセージから復元されることをテストします。
+    """
+    store = MemoryConversationStore()
+    manager = SessionManager(store=store, max_resident_messages=2)
+    chat_session = manager.get("client")
+    chat_session.model = "llama2"
+    for i in range(3):
+        chat_session.add_message("user", f"m{i}")
+    conversation_id = chat_session.conversation_id
+
+    # 再起動後を想定して別のSessionManagerで取得する
+    restored = SessionManager(store=store, max_resident_messages=2).get("client")
+
+    assert restored is not chat_session
+    assert restored.conversation_id == conversation_id
+    assert restored.model == "llama2"
+    assert [message["content"] for message in restored.get_messages()] == ["m1", "m2"]
+    assert restored.next_seq == 3
+    assert SessionManager(store=store).get("other").get_messages() == []
+
+
+def test_aget_restores_off_the_event_loop():
+    """
+    agetがストアからの復元をイベントループのスレッド以外で行い、保持しているセッションはそのまま返すことをテストします。
+    """
+    store = MemoryConversationStore()
+    chat_session = SessionManager(store=store).get("client")
+    chat_session.model = "llama2"
+    chat_session.add_message("user", "hello")
+    reader_threads = []
+    latest_conversation = store.latest_conversation
+
+    def recording_latest_conversation(owner):
+        reader_threads.append(threading.get_ident())
+        return latest_conversation(owner)
+
+    store.latest_conversation = recording_latest_conversation
+    manager = SessionManager(store=store)
+
+    async def scenario():
+        restored = await manager.aget("client")
+        again = await manager.aget("client")
+        return threading.get_ident(), restored, again
+
+    loop_thread, restored, again = asyncio.run(scenario())
+
+    assert again is restored
+    assert [message["content"] for message in restored.get_messages()] == ["hello"]
+    assert len(reader_threads) == 1
+    assert reader_threads[0] != loop_thread
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+SystemMonitorクラスとAsyncSystemMonitorクラスのテストモジュール。
+"""
+
+import asyncio
+import threading
+import time
+
+from src.system_monitor import AsyncSystemMonitor, SystemMonitor
+
+
+class FakeClock:
+    """
+    テスト用の手動で進める時計。
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingSource:
+    """
+    呼び出し回数を数え、設定された値を返すデータソース。
+    """
+
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+def test_get_uses_cache_within_max_age():
+    """
+    キャッシュが有効な間はデータソースを呼び出さないことをテストします。
+    """
+    clock = FakeClock()
+    source = CountingSource([{"id": "abc", "model": "llama2"}])
+    monitor = SystemMonitor({"running_models": source}, interval=1.0, clock=clock)
+
+    assert monitor.get("running_models") == source.value
+    clock.now = 1.5
+    assert monitor.get("running_models") == source.value
+    assert source.calls == 1
+
+    # キャッシュが古くなったら再取得する
+    clock.now = 3.0
+    monitor.get("running_models")
+    assert source.calls == 2
+
+
+def test_sample_notifies_only_changes():
+    """
+    値が変化した項目のみが通知されることをテストします。
+    """
+    models = CountingSource([])
+    gpus = CountingSource([{"index": "0", "utilization": 10.0}])
+    notifications = []
+    monitor = SystemMonitor({"running_models": models, "gpus": gpus}, on_change=notifications.append)
+
+    assert monitor.sample() == {"running_models": [], "gpus": gpus.value}
+    assert monitor.sample() == {}
+
+    gpus.value = [{"index": "0", "utilization": 50.0}]
+    assert monitor.sample() == {"gpus": gpus.value}
+    assert notifications == [{"running_models": [], "gpus": [{"index": "0", "utilization": 10.0}]}, {"gpus": gpus.value}]
+    assert monitor.snapshot() == {"running_models": [], "gpus": gpus.value}
+
+
+def test_invalidate_forces_refresh():
+    """
+    invalidateでキャッシュが破棄されることをテストします。
+    """
+    source = CountingSource([])
+    monitor = SystemMonitor({"running_models": source}, interval=60.0)
+
+    monitor.get("running_models")
+    monitor.invalidate("running_models")
+    monitor.get("running_models")
+
+    assert source.calls == 2
+
+
+def test_concurrent_get_fetches_once():
+    """
+    同時に呼び出された場合もデータソースの呼び出しが1回にまとめられることをテストします。
+    """
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow_source():
+        calls.append(1)
+        started.set()
+        release.wait(1.0)
+        return ["value"]
+
+    monitor = SystemMonitor({"gpus": slow_source}, interval=60.0)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(monitor.get("gpus"))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    started.wait(1.0)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [["value"]] * 5
+
+
+def test_background_sampling():
+    """
+    サンプリングスレッドが定期的に状態を取得することをテストします。
+    """
+    source = CountingSource([])
+    monitor = SystemMonitor({"gpus": source}, interval=0.01)
+
+    monitor.start()
+    monitor.start()  # 二重に開始しても1スレッドのみ
+    deadline = time.monotonic() + 1.0
+    while source.calls < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    monitor.stop()
+
+    assert source.calls >= 3
+    assert not monitor.running
+
+
+def test_async_monitor_fetches_once_and_notifies():
+    """
+    AsyncSystemMonitorが同時の取得を1回にまとめ、変化した項目のみ通知することをテストします。
+    """
+    calls = []
+    notified = []
+
+    async def slow_source():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return ["value"]
+
+    async def on_change(changed):
+        notified.append(changed)
+
+    async def scenario():
+        monitor = AsyncSystemMonitor({"gpus": slow_source}, interval=60.0, on_change=on_change)
+        results = await asyncio.gather(*(monitor.get("gpus") for _ in range(5)))
+        changed = await monitor.sample()
+        return results, changed
+
+    results, changed = asyncio.run(scenario())
+
+    assert results == [["value"]] * 5
+    assert len(calls) == 2
+    assert changed == {}
+    assert notified == [{"gpus": ["value"]}]
+
+
+def test_async_background_sampling():
+    """
+    AsyncSystemMonitorのサンプリングタスクが定期的に状態を取得し、停止できることをテストします。
+    """
+    calls = []
+
+    async def source():
+        calls.append(1)
+        return []
+
+    async def scenario():
+        monitor = AsyncSystemMonitor({"gpus": source}, interval=0.01)
+        monitor.start()
+        monitor.start()  # 二重に開始しても1タスクのみ
+        deadline = time.monotonic() + 1.0
+        while len(calls) < 3 and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        await monitor.stop()
+        return monitor.running
+
+    assert asyncio.run(scenario()) is False
+    assert len(calls) >= 3
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+TTLCacheクラスのテストモジュール。
+"""
+
+import threading
+import time
+
+from src.ttl_cache import FRESH, MISS, STALE, TTLCache
+
+
+class FakeClock:
+    """
+    テスト用の手動で進める時計。
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lookup_states():
+    """
+    経過時間に応じてFRESH、STALE、MISSが返されることをテストします。
+    """
+    clock = FakeClock()
+    cache = TTLCache(10.0, stale_ttl=5.0, clock=clock)
+    cache.put("models", ["a"])
+
+    assert cache.lookup("models") == (["a"], FRESH)
+    clock.now = 12.0
+    assert cache.lookup("models") == (["a"], STALE)
+    clock.now = 16.0
+    assert cache.lookup("models") == (None, MISS)
+    assert cache.stats() == {"entries": 0, "hits": 1, "stale_hits": 1, "misses": 1}
+
+
+def test_get_or_load_caches_until_expired():
+    """
+    有効期限内はloaderを呼び出さないことをテストします。
+    """
+    clock = FakeClock()
+    cache = TTLCache(10.0, clock=clock)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return len(calls)
+
+    assert cache.get_or_load("key", loader) == 1
+    assert cache.get_or_load("key", loader) == 1
+    clock.now = 11.0
+    assert cache.get_or_load("key", loader) == 2
+
+
+def test_stale_value_is_returned_while_revalidating():
+    """
+    期限切れ後は古い値を返し、バックグラウンドで取得し直すことをテストします。
+    """
+    clock = FakeClock()
+    cache = TTLCache(10.0, stale_ttl=60.0, clock=clock)
+    refreshed = threading.Event()
+    values = iter(["old", "new"])
+
+    def loader():
+        value = next(values)
+        if value == "new":
+            refreshed.set()
+        return value
+
+    assert cache.get_or_load("key", loader) == "old"
+    clock.now = 20.0
+    assert cache.get_or_load("key", loader) == "old"
+    assert refreshed.wait(1.0)
+
+    deadline = time.monotonic() + 1.0
+    while cache.lookup("key", record=False)[0] != "new" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cache.get_or_load("key", loader) == "new"
+
+
+def test_should_cache_and_invalidate():
+    """
+    保存しない値とinvalidateの動作をテストします。
+    """
+    cache = TTLCache(10.0)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return [] if len(calls) == 1 else ["model"]
+
+    assert cache.get_or_load("models", loader, should_cache=bool) == []
+    assert cache.get_or_load("models", loader, should_cache=bool) == ["model"]
+    assert cache.get_or_load("models", loader, should_cache=bool) == ["model"]
+    assert len(calls) == 2
+
+    generation = cache.generation
+    cache.invalidate("models")
+    # 破棄より前に開始した取得の結果は保存しない
+    cache.put("models", ["old"], generation)
+    assert cache.lookup("models") == (None, MISS)
+
+
+def test_zero_ttl_disables_cache():
+    """
+    ttlが0の場合はキャッシュしないことをテストします。
+    """
+    cache = TTLCache(0)
+    calls = []
+
+    cache.get_or_load("key", lambda: calls.append(1))
+    cache.get_or_load("key", lambda: calls.append(1))
+
+    assert len(calls) == 2